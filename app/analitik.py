@@ -0,0 +1,230 @@
+"""Analitik margin & laba kotor penjualan dengan NumPy.
+
+Kolom item penjualan (produk, qty, harga, harga beli, waktu, kasir, metode
+bayar) dimuat sekali ke array (lihat app_simple.muat_data_penjualan), lalu
+semua agregat dihitung dengan operasi vektor: group-by memakai
+np.unique(return_inverse) + np.bincount, tanpa perulangan Python per item.
+Modul ini tidak tahu tentang database; app_simple memberi baris hasil query.
+
+Item produk yang sudah dihapus tidak punya harga beli (NaN): penjualannya
+tetap dihitung, tapi tidak masuk modal, laba maupun margin (margin =
+laba / penjualan yang modalnya diketahui). Kelompok yang modalnya tidak
+diketahui sama sekali mendapat laba & margin None.
+"""
+import numpy as np
+
+# Bucket waktu -> unit datetime64; 'minggu' mulai Senin, 'jam' = jam dalam sehari (0-23)
+BUCKET = ('jam', 'hari', 'minggu', 'bulan', 'tahun')
+URUTAN = ('laba', 'penjualan', 'jumlah', 'margin')
+_UNIT = {'hari': 'D', 'bulan': 'M', 'tahun': 'Y'}
+_FORMAT = {'hari': '%Y-%m-%d', 'minggu': '%Y-%m-%d', 'bulan': '%Y-%m', 'tahun': '%Y'}
+# produk_id, jumlah, harga, waktu (teks ISO 'YYYY-MM-DD HH:MM:SS[.ffffff]'), user_id
+_TIPE_BARIS = (np.int64, np.int64, np.float64, 'datetime64[us]', np.int64)
+
+
+def _margin(laba, penjualan):
+    """Margin kotor dalam persen dari penjualan; 0 jika tidak ada penjualan"""
+    return np.divide(laba * 100, penjualan, out=np.zeros_like(laba, dtype=float), where=penjualan != 0)
+
+
+def _atau_none(nilai, diketahui):
+    return float(nilai) if diketahui else None
+
+
+class DataPenjualan:
+    """Satu baris per item penjualan, disimpan per kolom"""
+
+    __slots__ = ('produk_id', 'jumlah', 'harga', 'harga_beli', 'kategori_id', 'waktu', 'user_id',
+                 'metode', 'label_metode')
+
+    def __init__(self, produk_id, jumlah, harga, harga_beli, kategori_id, waktu, user_id, metode, label_metode):
+        self.produk_id = produk_id
+        self.jumlah = jumlah
+        self.harga = harga
+        self.harga_beli = harga_beli
+        self.kategori_id = kategori_id
+        self.waktu = waktu  # datetime64[s], waktu lokal toko
+        self.user_id = user_id
+        self.metode = metode  # kode int, label di label_metode
+        self.label_metode = label_metode
+
+    @classmethod
+    def dari_baris(cls, partisi, produk):
+        """Bangun dari potongan baris query.
+
+        partisi: iterable list baris (produk_id, jumlah, harga, waktu teks
+        ISO, user_id, payment_method), tanpa NULL. produk: baris (id,
+        harga_beli, kategori_id) untuk harga beli & kategori saat ini; item
+        dari produk yang sudah dihapus mendapat harga beli NaN (tidak
+        diketahui) dan kategori 0.
+        """
+        kolom = [[] for _ in _TIPE_BARIS]
+        metode, kode = [], {}
+        for baris in partisi:
+            if not baris:
+                continue
+            *nilai, payment = zip(*baris)
+            for daftar, isi, tipe in zip(kolom, nilai, _TIPE_BARIS):
+                daftar.append(np.array(isi, dtype=tipe))
+            metode.append(np.array([kode.setdefault(m, len(kode)) for m in payment], dtype=np.int32))
+        produk_id, jumlah, harga, waktu, user_id = (np.concatenate(k) if k else np.zeros(0, dtype=t)
+                                                    for k, t in zip(kolom, _TIPE_BARIS))
+        metode = np.concatenate(metode) if metode else np.zeros(0, dtype=np.int32)
+
+        # Harga beli & kategori per item lewat lookup id produk yang terurut
+        harga_beli = np.full(len(produk_id), np.nan)
+        kategori_id = np.zeros(len(produk_id), dtype=np.int64)
+        produk = list(produk)
+        if produk:
+            ids, beli, kategori = (np.array(k, dtype=t) for k, t in
+                                   zip(zip(*produk), (np.int64, np.float64, np.int64)))
+            urut = np.argsort(ids)
+            ids, beli, kategori = ids[urut], beli[urut], kategori[urut]
+            posisi = np.searchsorted(ids, produk_id).clip(max=len(ids) - 1)
+            ada = ids[posisi] == produk_id
+            harga_beli[ada] = beli[posisi[ada]]
+            kategori_id[ada] = kategori[posisi[ada]]
+
+        return cls(produk_id, jumlah, harga, harga_beli, kategori_id, waktu.astype('datetime64[s]'), user_id,
+                   metode, list(kode))
+
+    def __len__(self):
+        return len(self.produk_id)
+
+    @property
+    def penjualan(self):
+        return self.harga * self.jumlah
+
+    @property
+    def modal_diketahui(self):
+        """Mask item yang harga belinya diketahui (produknya masih ada)"""
+        return ~np.isnan(self.harga_beli)
+
+    @property
+    def penjualan_bermodal(self):
+        """Penjualan item yang modalnya diketahui (pembagi margin), 0 untuk yang lain"""
+        return np.where(self.modal_diketahui, self.penjualan, 0)
+
+    @property
+    def modal(self):
+        return np.where(self.modal_diketahui, self.harga_beli, 0) * self.jumlah
+
+    @property
+    def laba(self):
+        return self.penjualan_bermodal - self.modal
+
+
+def ringkasan(data):
+    """Total periode: item, qty, penjualan, modal, laba kotor, margin (%) dan
+    penjualan tanpa modal (produk dihapus, tidak masuk laba & margin)
+    """
+    penjualan, bermodal = float(data.penjualan.sum()), float(data.penjualan_bermodal.sum())
+    modal = float(data.modal.sum())
+    return {
+        'item': len(data),
+        'jumlah': int(data.jumlah.sum()),
+        'penjualan': penjualan,
+        'modal': modal,
+        'laba': bermodal - modal,
+        'margin': float(_margin(np.array(bermodal - modal), np.array(bermodal))),
+        'tanpa_modal': penjualan - bermodal,
+    }
+
+
+def kelompokkan(kunci, data):
+    """Group-by kunci (array sejajar item): (nilai kunci terurut, jumlah,
+    penjualan, laba, penjualan bermodal, jumlah item bermodal)
+    """
+    nilai, posisi = np.unique(kunci, return_inverse=True)
+    n = len(nilai)
+    return (nilai,
+            np.bincount(posisi, weights=data.jumlah, minlength=n),
+            np.bincount(posisi, weights=data.penjualan, minlength=n),
+            np.bincount(posisi, weights=data.laba, minlength=n),
+            np.bincount(posisi, weights=data.penjualan_bermodal, minlength=n),
+            np.bincount(posisi, weights=data.modal_diketahui, minlength=n))
+
+
+def _baris(nilai, jumlah, penjualan, laba, bermodal, item_bermodal, indeks):
+    margin = _margin(laba, bermodal)
+    return [{'kunci': nilai[i].item(), 'jumlah': int(jumlah[i]), 'penjualan': float(penjualan[i]),
+             'laba': _atau_none(laba[i], item_bermodal[i]), 'margin': _atau_none(margin[i], item_bermodal[i])}
+            for i in indeks]
+
+
+def peringkat(kunci, data, urut='laba', limit=None):
+    """Kelompok kunci terurut menurun menurut laba/penjualan/jumlah/margin;
+    kelompok tanpa modal diketahui di akhir untuk urutan laba & margin
+    """
+    if urut not in URUTAN:
+        raise ValueError(f'Urutan harus salah satu dari {", ".join(URUTAN)}')
+    nilai, jumlah, penjualan, laba, bermodal, item_bermodal = grup = kelompokkan(kunci, data)
+    skor = {'laba': laba, 'penjualan': penjualan, 'jumlah': jumlah, 'margin': _margin(laba, bermodal)}[urut]
+    if urut in ('laba', 'margin'):
+        skor = np.where(item_bermodal > 0, skor, -np.inf)
+    # lexsort: kunci terakhir paling utama; seri diurutkan menurut nilai kunci
+    indeks = np.lexsort((nilai, -skor))[:limit]
+    return _baris(*grup, indeks)
+
+
+def per_produk(data, urut='laba', limit=None):
+    return peringkat(data.produk_id, data, urut, limit)
+
+
+def per_kategori(data, urut='laba', limit=None):
+    return peringkat(data.kategori_id, data, urut, limit)
+
+
+def per_kasir(data, urut='penjualan', limit=None):
+    return peringkat(data.user_id, data, urut, limit)
+
+
+def per_metode(data, urut='penjualan'):
+    hasil = peringkat(data.metode, data, urut)
+    for baris in hasil:
+        baris['kunci'] = data.label_metode[baris['kunci']]
+    return hasil
+
+
+def bucket_waktu(waktu, bucket):
+    """Awal bucket (datetime64) per item, atau jam 0-23 untuk bucket 'jam'"""
+    if bucket not in BUCKET:
+        raise ValueError(f'Bucket harus salah satu dari {", ".join(BUCKET)}')
+    hari = waktu.astype('datetime64[D]')
+    if bucket == 'jam':
+        return (waktu - hari).astype(np.int64) // 3600
+    if bucket == 'minggu':
+        # 1970-01-01 hari Kamis: geser 3 hari supaya minggu mulai Senin
+        return hari - (hari.astype(np.int64) + 3) % 7
+    return waktu.astype(f'datetime64[{_UNIT[bucket]}]')
+
+
+def per_waktu(data, bucket='hari'):
+    """Penjualan & laba per bucket waktu, urut kronologis; kunci berupa label teks"""
+    kunci = bucket_waktu(data.waktu, bucket)
+    grup = kelompokkan(kunci, data)
+    hasil = _baris(*grup, range(len(grup[0])))
+    for baris in hasil:
+        baris['kunci'] = (f"{baris['kunci']:02d}:00" if bucket == 'jam'
+                          else baris['kunci'].strftime(_FORMAT[bucket]))
+    return hasil
+
+
+def tahun_ke_tahun(data):
+    """Perbandingan bulan yang sama antar tahun.
+
+    Return (daftar tahun, 12 baris per bulan: {'bulan', 'penjualan',
+    'laba', 'margin'} dengan list sejajar daftar tahun).
+    """
+    bulan = data.waktu.astype('datetime64[M]').astype(np.int64)  # bulan sejak 1970-01
+    tahun, posisi = np.unique(bulan // 12, return_inverse=True)
+    sel = posisi * 12 + bulan % 12
+    ukuran = len(tahun) * 12
+    penjualan = np.bincount(sel, weights=data.penjualan, minlength=ukuran).reshape(-1, 12)
+    laba = np.bincount(sel, weights=data.laba, minlength=ukuran).reshape(-1, 12)
+    margin = _margin(laba, np.bincount(sel, weights=data.penjualan_bermodal, minlength=ukuran).reshape(-1, 12))
+    return [int(t) + 1970 for t in tahun], [
+        {'bulan': b + 1, 'penjualan': penjualan[:, b].tolist(), 'laba': laba[:, b].tolist(),
+         'margin': margin[:, b].tolist()}
+        for b in range(12)
+    ]
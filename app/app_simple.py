@@ -1,11 +1,20 @@
-﻿import os
+﻿import logging
+import os
 import sys
-import shutil
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session, send_from_directory
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session, send_file, send_from_directory, stream_with_context, get_template_attribute
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_, text
-from sqlalchemy.orm import joinedload
+from markupsafe import Markup
+from sqlalchemy import and_, or_, text, select, insert, update, delete, case, event, cast, inspect, bindparam, tuple_, null, union_all, literal_column, Integer, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload, Session, attributes
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm, CSRFProtect
 from flask_wtf.csrf import CSRFError, generate_csrf
@@ -13,9 +22,14 @@ from wtforms import StringField, PasswordField, SubmitField, DecimalField, Integ
 from wtforms.validators import DataRequired, Length, NumberRange, ValidationError, Optional
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime as dt, date
+import base64
+import hashlib
 import json
+import tempfile
+import uuid
 import io
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.chart import BarChart, Reference
 from openpyxl.styles import Alignment, Font
 from pathlib import Path
@@ -24,9 +38,33 @@ from dotenv import load_dotenv
 # Load environment variables from .env
 load_dotenv()
 
-print('=' * 60)
-print('KASIR TOKO SEMBAKO - WITH SIMPLE BACKUP SYSTEM')
-print('=' * 60)
+# Modul pendamping di folder app/ (bisa di-import baik lewat gunicorn app.app_simple
+# maupun python app/app_simple.py)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backup_service import BackupScheduler, ChangeDetector, online_backup, verify_backup
+from kode_allocator import KodeAllocator
+from pricing import PricingEngine, TierTable
+from product_io import (KOLOM_WAJIB_BARU, XLSX_MIMETYPE, baca_header, baris_file,
+                        format_variasi, tulis_csv, tulis_xlsx, validasi_baris)
+from barcode_index import BarcodeIndex, normalisasi_kode, urai_barcode_timbang
+from bulk_price import AturanHarga, baca_daftar_harga, daftar_harga_json, rencana as rencana_harga
+from catalog_snapshot import SnapshotManager
+from fuzzy_index import FuzzyIndex
+from search_index import PencarianLike, buat_pencarian, teks_cari_member, teks_cari_produk
+from group_commit import GroupCommitWriter
+import analitik
+from structured_log import setup_logging, get_logger
+
+setup_logging()
+log = get_logger('app')
+log_db = get_logger('db')
+log_backup = get_logger('backup')
+log_checkout = get_logger('checkout')
+# Log per item checkout: DEBUG, mati di production kecuali diaktifkan lewat
+# LOG_LEVELS=kasir.checkout.item=DEBUG (bisa di-sample lewat LOG_SAMPLE)
+log_item = get_logger('checkout.item')
+log_sync = get_logger('sync')
 
 # ==================== TIMEZONE HELPER ====================
 
@@ -63,33 +101,38 @@ def get_local_timezone_name():
         sign = '+' if offset_hours >= 0 else '-'
         return f'UTC{sign}{abs(offset_hours)}'
 
-# Debug: Print current time saat startup
 local_tz_name = get_local_timezone_name()
-print(f'[TIME] Local System Time: {get_local_now().strftime("%Y-%m-%d %H:%M:%S")}')
-print(f'[TIME] Detected Timezone: {local_tz_name}')
-print('=' * 60)
+log.info('Kasir Toko Sembako start', extra={
+    'waktu_lokal': get_local_now().strftime('%Y-%m-%d %H:%M:%S'),
+    'timezone': local_tz_name,
+    'pid': os.getpid(),
+})
 
 # ==================== SIMPLE BACKUP ====================
 
+def _file_database_sqlite():
+    """Path file database dari engine yang dipakai app, None jika bukan SQLite"""
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return os.path.abspath(url.database)
+
 def backup_database():
     """Backup database dengan error handling yang lebih baik"""
-    # Get base directory (parent of app folder)
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    db_file = os.path.join(base_dir, 'instance', 'kasir.db')
-    backup_folder = os.path.join(base_dir, 'backups')
-    
-    # Validasi path
-    if not os.path.exists(os.path.dirname(db_file)):
-        print(f"[Backup] ✗ Folder instance tidak ditemukan")
+    db_file = _file_database_sqlite()
+    backup_folder = _backup_folder
+    if db_file is None:
+        log_backup.info('Backup file hanya untuk SQLite, dilewati')
         return False
     
     # Pastikan folder backup ada
     try:
         if not os.path.exists(backup_folder):
             os.makedirs(backup_folder, exist_ok=True)
-            print(f"[Backup] Created folder: {backup_folder}")
+            log_backup.info('Folder backup dibuat', extra={'folder': backup_folder})
     except PermissionError:
-        print(f"[Backup] ✗ Tidak ada izin membuat folder backup")
+        log_backup.error('Tidak ada izin membuat folder backup', extra={'folder': backup_folder})
         return False
     
     if os.path.exists(db_file):
@@ -97,53 +140,93 @@ def backup_database():
             # Cek ukuran database
             db_size = os.path.getsize(db_file)
             if db_size == 0:
-                print("[Backup] ⚠️ Database kosong, backup dibatalkan")
+                log_backup.warning('Database kosong, backup dibatalkan')
                 return False
             
+            # Lewati jika isi database tidak berubah sejak backup terakhir
+            detector = _get_backup_detector(db_file, backup_folder)
+            changed, signature = detector.check()
+            if not changed:
+                log_backup.info('Tidak ada perubahan sejak backup terakhir, dilewati')
+                return True
+            
             # Nama file backup
             timestamp = get_local_now().strftime('%Y%m%d_%H%M%S')
-            backup_file = f'{backup_folder}/kasir_backup_{timestamp}.db'
+            backup_file = os.path.join(backup_folder, f'kasir_backup_{timestamp}.db')
             
-            # Copy database dengan verifikasi
-            shutil.copy2(db_file, backup_file)
+            # Salin lewat SQLite online backup API (bertahap, konsisten walau
+            # ada worker lain yang sedang menulis)
+            expected_pages = online_backup(db_file, backup_file)
             
-            # Verifikasi backup
-            if os.path.exists(backup_file):
-                backup_size = os.path.getsize(backup_file)
-                if backup_size == db_size:
-                    print(f'[Backup] ✓ {backup_file}')
-                    print(f'[Backup] Size: {backup_size/1024:.1f} KB')
-                    
-                    # Hapus backup lama (simpan 10 terbaru)
-                    try:
-                        backups = sorted([
-                            f for f in os.listdir(backup_folder) 
-                            if f.startswith('kasir_backup_') and f.endswith('.db')
-                        ])
-                        if len(backups) > 10:
-                            for old_backup in backups[:-10]:
-                                old_path = os.path.join(backup_folder, old_backup)
-                                os.remove(old_path)
-                                print(f'[Backup] Hapus backup lama: {old_backup}')
-                    except Exception as e:
-                        print(f'[Backup] ⚠️ Gagal hapus backup lama: {e}')
-                    
-                    return True
-                else:
-                    print(f'[Backup] ✗ Ukuran backup tidak sesuai')
-                    os.remove(backup_file)  # Hapus backup yang rusak
-                    return False
+            # Verifikasi backup per halaman
+            ok, pesan = verify_backup(backup_file, expected_pages)
+            if ok:
+                detector.mark_backed_up(signature)
+                log_backup.info('Backup selesai', extra={
+                    'file': backup_file,
+                    'ukuran_kb': round(os.path.getsize(backup_file) / 1024, 1),
+                    'verifikasi': pesan,
+                })
+                
+                # Hapus backup lama (simpan 10 terbaru)
+                try:
+                    backups = sorted([
+                        f for f in os.listdir(backup_folder) 
+                        if f.startswith('kasir_backup_') and f.endswith('.db')
+                    ])
+                    if len(backups) > 10:
+                        for old_backup in backups[:-10]:
+                            old_path = os.path.join(backup_folder, old_backup)
+                            os.remove(old_path)
+                            log_backup.info('Hapus backup lama', extra={'file': old_backup})
+                except Exception as e:
+                    log_backup.warning('Gagal hapus backup lama: %s', e)
+                
+                return True
             else:
-                print(f'[Backup] ✗ File backup tidak terbuat')
+                log_backup.error('Backup tidak konsisten: %s', pesan, extra={'file': backup_file})
+                os.remove(backup_file)  # Hapus backup yang rusak
                 return False
                 
-        except Exception as e:
-            print(f'[Backup] ✗ Error: {e}')
+        except Exception:
+            log_backup.exception('Backup gagal')
             return False
     else:
-        print(f'[Backup] ✗ Database not found: {db_file}')
+        log_backup.error('Database tidak ditemukan', extra={'db_file': db_file})
         return False
 
+_backup_detector = None
+
+def _get_backup_detector(db_file, backup_folder):
+    global _backup_detector
+    if _backup_detector is None:
+        _backup_detector = ChangeDetector(db_file, os.path.join(backup_folder, '.backup_state.json'))
+    return _backup_detector
+
+# Backup jalan di background, checkout cukup memanggil backup_scheduler.signal().
+# Banyak penjualan digabung jadi maksimal satu backup per BACKUP_INTERVAL detik.
+# Folder backup bisa dipindah lewat BACKUP_FOLDER (default backups/ di root project).
+BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', '300'))
+_backup_folder = os.path.abspath(os.getenv('BACKUP_FOLDER', '').strip() or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backups'))
+try:
+    os.makedirs(_backup_folder, exist_ok=True)
+except OSError as e:
+    log_backup.warning('Tidak bisa membuat folder backup: %s', e)
+backup_scheduler = BackupScheduler(backup_database, _backup_folder, interval=BACKUP_INTERVAL)
+
+def get_backup_status():
+    """Waktu & durasi backup terakhir untuk ditampilkan ke admin"""
+    status = backup_scheduler.status()
+    if not status.get('finished_at'):
+        return None
+    return {
+        'waktu': datetime.fromtimestamp(status['finished_at']).strftime('%Y-%m-%d %H:%M:%S'),
+        'durasi': status.get('duration', 0),
+        'success': status.get('success', False),
+        'interval': backup_scheduler.interval,
+    }
+
 # ==================== FLASK APP ====================
 
 # Get base directory
@@ -152,13 +235,13 @@ base_app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Database Configuration with better error handling
 DATABASE_URL = os.getenv('DATABASE_URL', '').strip()
 
-print(f"[DB] DATABASE_URL env set: {bool(DATABASE_URL)}")
+log_db.debug('DATABASE_URL env', extra={'diset': bool(DATABASE_URL)})
 
 # If not set or empty, use SQLite (Local development)
 if not DATABASE_URL or DATABASE_URL == 'None':
     db_path = os.path.join(base_app_dir, 'instance', 'kasir.db')
     DATABASE_URL = f'sqlite:///{db_path.replace(os.sep, "/")}'
-    print(f"[DB] Using SQLite: {DATABASE_URL[:50]}...")
+    log_db.info('Memakai SQLite', extra={'url': DATABASE_URL})
 else:
     # Validate & convert postgres:// to postgresql:// for SQLAlchemy 1.4+
     if DATABASE_URL.startswith('postgres://'):
@@ -170,14 +253,14 @@ else:
     
     # Validate that URL looks reasonable
     if not ('postgresql+psycopg://' in DATABASE_URL or 'postgresql://' in DATABASE_URL or 'sqlite:///' in DATABASE_URL):
-        print(f"[DB] WARNING: Invalid DATABASE_URL format")
-        print(f"[DB] Got: {DATABASE_URL[:50]}...")
+        log_db.warning('Format DATABASE_URL tidak valid, kembali ke SQLite',
+                       extra={'skema': DATABASE_URL.split(':', 1)[0]})
         # Fallback to SQLite
         db_path = os.path.join(base_app_dir, 'instance', 'kasir.db')
         DATABASE_URL = f'sqlite:///{db_path.replace(os.sep, "/")}'
-        print(f"[DB] Falling back to SQLite")
     else:
-        print(f"[DB] Using PostgreSQL: {DATABASE_URL.split('@')[0][:50]}...")
+        # Hanya host yang dicatat, bukan user/password
+        log_db.info('Memakai PostgreSQL', extra={'host': DATABASE_URL.rsplit('@', 1)[-1].split('/', 1)[0]})
 
 app = Flask(__name__)
 
@@ -195,8 +278,6 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True,
 }
 
-print(f"[DB] Final DATABASE_URI: {DATABASE_URL[:70]}...")
-
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -204,6 +285,32 @@ login_manager.login_message = 'Silakan login terlebih dahulu'
 login_manager.login_message_category = 'info'
 csrf = CSRFProtect(app)
 
+# ==================== STATEMENT COUNTER ====================
+
+_statement_counter = threading.local()
+
+class PenghitungStatement:
+    """Hitung jumlah SQL statement yang dijalankan di thread ini selama blok with"""
+
+    def __init__(self):
+        self.jumlah = 0
+
+    def __enter__(self):
+        stack = getattr(_statement_counter, 'stack', None)
+        if stack is None:
+            stack = _statement_counter.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _statement_counter.stack.remove(self)
+        return False
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _hitung_statement(conn, cursor, statement, parameters, context, executemany):
+    for penghitung in getattr(_statement_counter, 'stack', ()):
+        penghitung.jumlah += 1
+
 # ==================== AUTOMATIC DATABASE INITIALIZATION ====================
 _db_initialized = False
 
@@ -213,22 +320,58 @@ def init_db():
     if _db_initialized:
         return
     
-    print("[DB] Initializing database tables...")
+    log_db.info('Inisialisasi tabel database')
     with app.app_context():
         try:
+            rekap_baru = not inspect(db.engine).has_table(RekapProdukHarian.__tablename__)
             # Create all tables
             db.create_all()
+            _tambah_kolom_baru()
+            _siapkan_pencarian()
+            if rekap_baru:
+                # Database lama: isi rekap dari transaksi yang sudah ada
+                log_db.info('Membangun rekap harian', extra=_isi_rekap())
             db.session.commit()
-            print("[DB] OK - Database tables initialized!")
+            log_db.info('Tabel database siap')
             _db_initialized = True
                     
         except Exception as e:
-            print(f"[DB] ERROR - Error initializing database: {e}")
+            log_db.exception('Gagal inisialisasi database')
             try:
                 db.session.rollback()
             except:
                 pass
 
+def _tambah_kolom_baru():
+    """Kolom & index yang ditambahkan setelah tabelnya ada (create_all tidak mengubah tabel lama)"""
+    kolom = {c['name'] for c in inspect(db.engine).get_columns('produk')}
+    if 'versi' not in kolom:
+        db.session.execute(text("ALTER TABLE produk ADD COLUMN versi INTEGER DEFAULT 0"))
+        db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_produk_versi ON produk (versi)"))
+    if 'versi_stok' not in kolom:
+        db.session.execute(text("ALTER TABLE produk ADD COLUMN versi_stok INTEGER DEFAULT 0"))
+    conn = db.session.connection()
+    for model in (Produk, Transaksi, TransaksiItem):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+    for tabel in ('produk', 'member'):
+        if 'cari' not in {c['name'] for c in inspect(db.engine).get_columns(tabel)}:
+            db.session.execute(text(f"ALTER TABLE {tabel} ADD COLUMN cari TEXT"))
+    if inspect(db.engine).get_pk_constraint('idempotency_key')['constrained_columns'] == ['key']:
+        _migrasi_idempotency_key()
+
+def _migrasi_idempotency_key():
+    """Tabel lama ber-primary key key saja: pindahkan ke primary key (user_id, key)"""
+    db.session.execute(text("ALTER TABLE idempotency_key RENAME TO idempotency_key_lama"))
+    for index in IdempotencyKey.__table__.indexes:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    IdempotencyKey.__table__.create(db.session.connection())
+    db.session.execute(text(
+        "INSERT INTO idempotency_key (user_id, key, response, expires_at) "
+        "SELECT user_id, key, response, expires_at FROM idempotency_key_lama WHERE user_id IS NOT NULL"
+    ))
+    db.session.execute(text("DROP TABLE idempotency_key_lama"))
+
 # ==================== MEMBER CONFIG ====================
 
 POINTS_PER_RUPIAH = 10000  # 1 point per Rp 10.000
@@ -345,6 +488,8 @@ class Member(db.Model):
     created_at = db.Column(db.DateTime, default=get_local_now)
     points = db.Column(db.Integer, default=0)
     total_spent = db.Column(db.Float, default=0)
+    # Nama + nomor telepon ternormalisasi untuk index pencarian (diisi otomatis)
+    cari = db.Column(db.Text)
 
     def get_level(self):
         return get_member_level(self.points or 0)
@@ -360,18 +505,47 @@ class Produk(db.Model):
     kategori_id = db.Column(db.Integer, db.ForeignKey('kategori.id'))
     minimal_stok = db.Column(db.Integer, default=5)
     satuan = db.Column(db.String(20), default='pcs')
+    # Versi katalog saat baris ini (atau harga variasinya) terakhir berubah
+    versi = db.Column(db.Integer, default=0, index=True)
+    # Penanda stok (versi_stok) saat stoknya terakhir dikurangi checkout/sync
+    versi_stok = db.Column(db.Integer, default=0, index=True)
+    # Nama + kode ternormalisasi untuk index pencarian (diisi otomatis)
+    cari = db.Column(db.Text)
     harga_variasi = db.relationship('HargaVariasi', backref='produk', lazy=True, cascade='all, delete-orphan', order_by='HargaVariasi.min_qty')
+
+    # Urutan daftar produk admin (keyset: kolom sort + id)
+    __table_args__ = (
+        db.Index('ix_produk_nama_id', 'nama', 'id'),
+        db.Index('ix_produk_harga_jual_id', 'harga_jual', 'id'),
+        db.Index('ix_produk_stok_id', 'stok', 'id'),
+    )
+
+    # Aturan stok habis/hampir habis yang sama untuk daftar produk, ringkasan
+    # kategori, katalog kasir dan template (stok negatif/kosong = habis)
+    @hybrid_property
+    def stok_habis(self):
+        return (self.stok or 0) <= 0
+
+    @stok_habis.expression
+    def stok_habis(cls):
+        return or_(cls.stok <= 0, cls.stok.is_(None))
+
+    @hybrid_property
+    def stok_hampir_habis(self):
+        return not self.stok_habis and self.stok <= (self.minimal_stok or 0)
+
+    @stok_hampir_habis.expression
+    def stok_hampir_habis(cls):
+        return and_(cls.stok > 0, cls.stok <= cls.minimal_stok)
     
     def get_harga_by_qty(self, qty):
-        """Dapatkan harga berdasarkan quantity"""
-        # Cek apakah ada harga variasi
-        if self.harga_variasi:
-            # Sort descending by min_qty untuk cek dari qty terbesar
-            for variant in reversed(self.harga_variasi):
-                if qty >= variant.min_qty:
-                    return variant.harga
-        # Default ke harga jual
-        return self.harga_jual
+        """Dapatkan harga berdasarkan quantity (aturan tier sama dengan pricing_engine)"""
+        table = TierTable(
+            self.harga_jual,
+            [(v.min_qty, v.harga, v.keterangan) for v in self.harga_variasi]
+        )
+        tier = table.tier(qty)
+        return table.prices[tier] if tier >= 0 else table.harga_jual
     
     def to_dict(self):
         # Get price variants
@@ -397,10 +571,95 @@ class HargaVariasi(db.Model):
     harga = db.Column(db.Float, nullable=False)  # Harga per unit
     keterangan = db.Column(db.String(100))  # Opsional: keterangan tier harga
 
+class ProdukTerhapus(db.Model):
+    """Tombstone produk yang dihapus, untuk delta sync katalog"""
+    produk_id = db.Column(db.Integer, primary_key=True)
+    versi = db.Column(db.Integer, nullable=False, index=True)
+
+class RiwayatHarga(db.Model):
+    """Riwayat perubahan harga produk (form edit maupun perubahan massal)"""
+    id = db.Column(db.Integer, primary_key=True)
+    produk_id = db.Column(db.Integer, nullable=False, index=True)  # tanpa FK: riwayat tetap ada setelah produk dihapus
+    harga_beli_lama = db.Column(db.Float)
+    harga_beli_baru = db.Column(db.Float)
+    harga_jual_lama = db.Column(db.Float)
+    harga_jual_baru = db.Column(db.Float)
+    sumber = db.Column(db.String(20), nullable=False)  # form, massal, file
+    keterangan = db.Column(db.String(200))
+    # Satu perubahan massal = satu batch; kosong untuk edit satu produk
+    batch = db.Column(db.String(32), index=True)
+    user_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=get_local_now)
+
+# ==================== PENCARIAN ====================
+# Kolom cari diisi setiap insert/update lewat ORM; penulisan massal lewat Core
+# harus mengisinya sendiri (teks_cari_produk/teks_cari_member). Baris yang
+# masih NULL diisi ulang saat startup.
+
+PENCARIAN_LIMIT = 500
+
+pencarian = PencarianLike()
+
+@event.listens_for(Produk, 'before_insert')
+@event.listens_for(Produk, 'before_update')
+def _isi_cari_produk(mapper, connection, target):
+    cari = teks_cari_produk(target.nama, target.kode)
+    if target.cari != cari:
+        target.cari = cari
+
+@event.listens_for(Member, 'before_insert')
+@event.listens_for(Member, 'before_update')
+def _isi_cari_member(mapper, connection, target):
+    cari = teks_cari_member(target.nama, target.no_telp)
+    if target.cari != cari:
+        target.cari = cari
+
+def _siapkan_pencarian():
+    """Isi kolom cari yang kosong lalu pasang index teks sesuai backend"""
+    global pencarian
+    conn = db.session.connection()
+    for model, cols, isi in ((Produk, (Produk.nama, Produk.kode), teks_cari_produk),
+                             (Member, (Member.nama, Member.no_telp), teks_cari_member)):
+        kosong = conn.execute(select(model.id, *cols).where(model.cari.is_(None))).all()
+        if kosong:
+            conn.execute(
+                update(model.__table__).where(model.__table__.c.id == bindparam('b_id')),
+                [{'b_id': row[0], 'cari': isi(row[1], row[2])} for row in kosong],
+            )
+    pencarian = buat_pencarian(conn)
+    pencarian.pasang(conn, ['produk', 'member'])
+    log_db.info('Index pencarian siap', extra={'backend': pencarian.nama})
+
+def cari_ids(model, query, *filters, limit=PENCARIAN_LIMIT):
+    """id model yang cocok dengan query, urut relevansi.
+
+    Index teks mencocokkan awal kata; jika tidak ada hasil (mis. "mie" untuk
+    "Indomie"), dicoba sekali lagi sebagai potongan kata.
+    """
+    conn = db.session.connection()
+    ids = pencarian.cari_ids(conn, model, query, limit, *filters)
+    if not ids and type(pencarian) is not PencarianLike:
+        ids = PencarianLike().cari_ids(conn, model, query, limit, *filters)
+    return ids
+
+def cari_select(model, query, *filters):
+    """SELECT id model yang cocok (tanpa urutan/limit) untuk subquery, sehingga
+    hasil pencarian berapa pun banyaknya tidak dikirim sebagai parameter IN.
+    Cadangan potongan kata sama dengan cari_ids.
+    """
+    stmt = pencarian.cari_select(model, query, *filters)
+    if type(pencarian) is not PencarianLike and not db.session.execute(stmt.limit(1)).first():
+        stmt = PencarianLike().cari_select(model, query, *filters)
+    return stmt
+
+def urut_sesuai(ids, objek):
+    urutan = {id_: i for i, id_ in enumerate(ids)}
+    return sorted(objek, key=lambda o: urutan[o.id])
+
 class Transaksi(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     kode_transaksi = db.Column(db.String(50), unique=True, nullable=False)
-    tanggal = db.Column(db.DateTime, default=get_local_now)
+    tanggal = db.Column(db.DateTime, default=get_local_now, index=True)
     subtotal = db.Column(db.Float, nullable=False, default=0)
     discount_percent = db.Column(db.Float, default=0)
     discount_amount = db.Column(db.Float, default=0)
@@ -418,13 +677,67 @@ class Transaksi(db.Model):
 
 class TransaksiItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    transaksi_id = db.Column(db.Integer, db.ForeignKey('transaksi.id'))
+    transaksi_id = db.Column(db.Integer, db.ForeignKey('transaksi.id'), index=True)
     produk_id = db.Column(db.Integer, db.ForeignKey('produk.id'))
     produk = db.relationship('Produk')
     jumlah = db.Column(db.Integer, nullable=False)
     harga = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)
 
+class UrutanTransaksi(db.Model):
+    """Nomor urut transaksi terakhir yang sudah dipesan per hari"""
+    tanggal = db.Column(db.String(8), primary_key=True)  # YYYYMMDD
+    terakhir = db.Column(db.Integer, nullable=False, default=0)
+
+# Rekap penjualan harian: ditambah di transaksi DB yang sama dengan setiap
+# checkout, dibangun ulang dari transaksi dengan tools/rekap_ulang.py.
+# Tanpa FK: rekap tetap ada setelah produk/user dihapus.
+
+class RekapProdukHarian(db.Model):
+    """Jumlah terjual & nilai penjualan per hari x produk"""
+    tanggal = db.Column(db.Date, primary_key=True)
+    produk_id = db.Column(db.Integer, primary_key=True)
+    jumlah = db.Column(db.Integer, nullable=False, default=0)
+    penjualan = db.Column(db.Float, nullable=False, default=0)
+
+class RekapPembayaranHarian(db.Model):
+    """Jumlah & total transaksi per hari x metode pembayaran"""
+    tanggal = db.Column(db.Date, primary_key=True)
+    payment_method = db.Column(db.String(20), primary_key=True)
+    transaksi = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+
+class RekapKasirHarian(db.Model):
+    """Jumlah & total transaksi per hari x kasir (user_id 0 = tanpa kasir)"""
+    tanggal = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    transaksi = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+
+class PerubahanLaporan(db.Model):
+    """Periode lampau yang hasil laporannya berubah (penjualan offline mundur, bangun ulang rekap, hapus member).
+
+    versi diambil dari counter versi_laporan, jadi urut sesuai commit; cache
+    laporan di tiap worker membuang entri yang periodenya beririsan.
+    """
+    versi = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tanggal_mulai = db.Column(db.Date)  # kosong = semua hari
+    tanggal_selesai = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=get_local_now)
+
+class IdempotencyKey(db.Model):
+    """Respons checkout yang sudah diproses, supaya retry/double-click tidak dobel.
+
+    Key dibuat browser/register, jadi unik per user: key yang kebetulan sama
+    milik kasir lain tidak saling menimpa. sidik = hash isi penjualan, key
+    yang sama dengan isi berbeda ditolak (bukan di-replay).
+    """
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    key = db.Column(db.String(64), primary_key=True)
+    sidik = db.Column(db.String(64))  # NULL untuk baris dari sebelum ada sidik
+    response = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 class Pengaturan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
@@ -445,6 +758,140 @@ class Pengaturan(db.Model):
             db.session.add(setting)
         db.session.commit()
 
+# ==================== REKAP HARIAN ====================
+
+VERSI_LAPORAN_KEY = 'versi_laporan'
+# Naik hanya saat data produk yang dipakai laporan berubah (KOLOM_PRODUK_LAPORAN,
+# produk/kategori dihapus, nama kategori); stok & harga jual tidak menyentuhnya
+VERSI_PRODUK_LAPORAN_KEY = 'versi_produk_laporan'
+KOLOM_PRODUK_LAPORAN = ('kode', 'nama', 'harga_beli', 'kategori_id')
+
+def _insert_upsert(model):
+    """INSERT ... ON CONFLICT sesuai dialect (SQLite >= 3.24 dan Postgres)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+def _tambah_rekap(model, kunci, baris):
+    """Tambahkan nilai ke baris rekap (dibuat jika belum ada), satu executemany"""
+    if not baris:
+        return
+    stmt = _insert_upsert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(kunci),
+        set_={k: getattr(model, k) + stmt.excluded[k] for k in baris[0] if k not in kunci},
+    )
+    db.session.execute(stmt, baris)
+
+def _tandai_laporan_berubah(tanggal_mulai, tanggal_selesai):
+    """Cache laporan proses ini untuk periode itu dibuang setelah commit (lihat LaporanCache)"""
+    db.session.info.setdefault('laporan_berubah', []).append((tanggal_mulai, tanggal_selesai))
+
+def catat_perubahan_laporan(tanggal_mulai=None, tanggal_selesai=None):
+    """Hasil laporan periode lampau berubah (None = semua hari).
+
+    Dicatat di transaksi yang sedang berjalan dengan versi_laporan baru,
+    supaya worker lain ikut membuang cache laporan yang beririsan.
+    """
+    versi = _naikkan_versi_sql(db.session.connection(), VERSI_LAPORAN_KEY)
+    db.session.execute(insert(PerubahanLaporan).values(
+        versi=versi, tanggal_mulai=tanggal_mulai, tanggal_selesai=tanggal_selesai))
+    _tandai_laporan_berubah(tanggal_mulai, tanggal_selesai)
+
+def catat_rekap(penjualan):
+    """Tambahkan penjualan yang sedang disimpan ke tabel rekap harian.
+
+    penjualan: iterable (tanggal, payment_method, user_id, total, baris) dengan
+    baris dari hitung_harga_keranjang. Dipanggil sebelum commit checkout, jadi
+    rekap ikut di-commit atau di-rollback bersama transaksinya. Tiga statement
+    berapa pun jumlah penjualannya; baris diurutkan per kunci supaya checkout
+    bersamaan di Postgres mengunci baris rekap dengan urutan yang sama.
+    Cache laporan untuk hari yang berubah dibuang setelah commit.
+    """
+    produk, pembayaran, kasir = {}, {}, {}
+
+    def tambah(rekap, kunci, jumlah, nilai):
+        lama = rekap.get(kunci, (0, 0))
+        rekap[kunci] = (lama[0] + jumlah, lama[1] + nilai)
+
+    for tanggal, payment_method, user_id, total, baris in penjualan:
+        hari = tanggal.date()
+        tambah(pembayaran, (hari, payment_method or 'tunai'), 1, total)
+        tambah(kasir, (hari, user_id or 0), 1, total)
+        for b in baris:
+            tambah(produk, (hari, b['id']), b['quantity'], b['subtotal'])
+    if not pembayaran:
+        return
+
+    # Checkout hanya mengubah hari ini; penjualan offline bisa mengubah hari yang sudah tutup
+    mulai, selesai = min(h for h, _ in pembayaran), max(h for h, _ in pembayaran)
+    if mulai < get_local_now().date():
+        catat_perubahan_laporan(mulai, selesai)
+    else:
+        _tandai_laporan_berubah(mulai, selesai)
+
+    _tambah_rekap(RekapProdukHarian, ('tanggal', 'produk_id'), [
+        {'tanggal': hari, 'produk_id': produk_id, 'jumlah': jumlah, 'penjualan': nilai}
+        for (hari, produk_id), (jumlah, nilai) in sorted(produk.items())
+    ])
+    _tambah_rekap(RekapPembayaranHarian, ('tanggal', 'payment_method'), [
+        {'tanggal': hari, 'payment_method': metode, 'transaksi': jumlah, 'total': nilai}
+        for (hari, metode), (jumlah, nilai) in sorted(pembayaran.items())
+    ])
+    _tambah_rekap(RekapKasirHarian, ('tanggal', 'user_id'), [
+        {'tanggal': hari, 'user_id': user_id, 'transaksi': jumlah, 'total': nilai}
+        for (hari, user_id), (jumlah, nilai) in sorted(kasir.items())
+    ])
+
+def bangun_ulang_rekap(tanggal_mulai=None, tanggal_selesai=None):
+    """Hitung ulang tabel rekap dari transaksi: semua hari, atau satu periode saja.
+
+    Untuk database lama, setelah transaksi diubah/dihapus di luar checkout
+    (reset, koreksi langsung di database). Cache laporan yang mencakup
+    periode itu dibuang di semua worker. Tidak commit. Return jumlah baris
+    rekap yang ditulis per tabel.
+    """
+    if tanggal_mulai is not None:
+        tanggal_selesai = tanggal_selesai or tanggal_mulai
+    hasil = _isi_rekap(tanggal_mulai, tanggal_selesai)
+    catat_perubahan_laporan(tanggal_mulai, tanggal_selesai)
+    return hasil
+
+def _isi_rekap(tanggal_mulai=None, tanggal_selesai=None):
+    hari = db.func.date(Transaksi.tanggal)
+    rentang = ()
+    if tanggal_mulai is not None:
+        rentang = _rentang_laporan(tanggal_mulai, tanggal_selesai)
+    # Konstanta ditulis literal: ekspresi di SELECT dan GROUP BY harus identik
+    # di Postgres (parameter terikat dianggap berbeda)
+    produk_id = db.func.coalesce(TransaksiItem.produk_id, literal_column('0'))
+    metode = db.func.coalesce(Transaksi.payment_method, literal_column("'tunai'"))
+    user_id = db.func.coalesce(Transaksi.user_id, literal_column('0'))
+    sumber = [
+        (RekapProdukHarian, ['tanggal', 'produk_id', 'jumlah', 'penjualan'],
+         select(hari, produk_id, db.func.sum(TransaksiItem.jumlah), db.func.sum(TransaksiItem.subtotal))
+         .select_from(TransaksiItem)
+         .join(Transaksi, Transaksi.id == TransaksiItem.transaksi_id)
+         .where(*rentang)
+         .group_by(hari, produk_id)),
+        (RekapPembayaranHarian, ['tanggal', 'payment_method', 'transaksi', 'total'],
+         select(hari, metode, db.func.count(Transaksi.id), db.func.sum(Transaksi.total))
+         .where(*rentang)
+         .group_by(hari, metode)),
+        (RekapKasirHarian, ['tanggal', 'user_id', 'transaksi', 'total'],
+         select(hari, user_id, db.func.count(Transaksi.id), db.func.sum(Transaksi.total))
+         .where(*rentang)
+         .group_by(hari, user_id)),
+    ]
+    hasil = {}
+    for model, kolom, pilih in sumber:
+        hapus = delete(model)
+        if tanggal_mulai is not None:
+            hapus = hapus.where(model.tanggal.between(tanggal_mulai, tanggal_selesai))
+        db.session.execute(hapus)
+        hasil[model.__tablename__] = db.session.execute(insert(model).from_select(kolom, pilih)).rowcount
+    return hasil
+
 # ==================== DATABASE INITIALIZATION ====================
 # Initialize database and create admin user
 def ensure_admin_user():
@@ -460,9 +907,9 @@ def ensure_admin_user():
             admin.set_password('Admin123')
             db.session.add(admin)
             db.session.commit()
-            print("[DB] OK - Admin user created: admin / Admin123")
+            log_db.info('User admin dibuat', extra={'username': 'admin'})
     except Exception as e:
-        print(f"[DB] WARNING - Could not create admin user: {e}")
+        log_db.warning('Gagal membuat user admin: %s', e)
         try:
             db.session.rollback()
         except:
@@ -483,7 +930,7 @@ def seed_data_from_file():
         with open(data_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        print("[SEED] Seeding data from production_data_export.json...")
+        log_db.info('Seed data dari production_data_export.json')
         
         # Import Kategori
         kategori_map = {}
@@ -500,7 +947,7 @@ def seed_data_from_file():
             if k:
                 kategori_map[k_data['id']] = k.id
         
-        print(f"[SEED] OK - {len(kategori_map)} kategori seeded")
+        log_db.info('Seed kategori selesai', extra={'jumlah': len(kategori_map)})
         
         # Import Produk
         for p_data in data.get('produk', []):
@@ -517,7 +964,7 @@ def seed_data_from_file():
             )
             db.session.add(p)
         db.session.commit()
-        print(f"[SEED] OK - {len(data.get('produk', []))} produk seeded")
+        log_db.info('Seed produk selesai', extra={'jumlah': len(data.get('produk', []))})
         
         # Import Member
         for m_data in data.get('member', []):
@@ -533,10 +980,10 @@ def seed_data_from_file():
                 db.session.add(m)
         if data.get('member', []):
             db.session.commit()
-            print(f"[SEED] OK - {len(data.get('member', []))} member seeded")
+            log_db.info('Seed member selesai', extra={'jumlah': len(data.get('member', []))})
             
     except Exception as e:
-        print(f"[SEED] WARNING - Could not seed data: {e}")
+        log_db.warning('Gagal seed data: %s', e)
         try:
             db.session.rollback()
         except:
@@ -549,7 +996,7 @@ with app.app_context():
         ensure_admin_user()
         seed_data_from_file()
     except Exception as e:
-        print(f"[STARTUP] ERROR - Initialization error: {e}")
+        log.exception('Inisialisasi gagal saat startup')
 
 # ==================== FORMS ====================
 
@@ -643,19 +1090,21 @@ def index():
         return redirect(url_for('login'))
     
     try:
-        total_produk = Produk.query.count()
+        total_stok = ringkasan_kategori()['total']
+        total_produk = total_stok['jumlah']
         today = date.today()
-        total_transaksi_hari_ini = Transaksi.query.filter(db.func.date(Transaksi.tanggal) == today).count()
-        produk_habis = Produk.query.filter(Produk.stok <= Produk.minimal_stok).count()
+        total_transaksi_hari_ini = Transaksi.query.filter(*_rentang_laporan(today, today)).count()
+        produk_habis = total_stok['habis'] + total_stok['hampir_habis']
         
         return render_template('index.html', 
                              total_produk=total_produk,
                              total_transaksi=total_transaksi_hari_ini,
                              produk_habis=produk_habis,
+                             backup_status=get_backup_status() if current_user.role == 'admin' else None,
                              current_time=get_local_now(),
                              timezone_name=get_local_timezone_name())
     except Exception as e:
-        print(f"[ERROR] Index route: {e}")
+        log.exception('Error di halaman dashboard')
         return redirect(url_for('login'))
 
 @app.route('/login', methods=['GET', 'POST'], strict_slashes=False)
@@ -733,41 +1182,113 @@ def logout():
 
 # ==================== PRODUK ROUTES ====================
 
+PRODUK_PER_HALAMAN = 50
+PRODUK_PER_HALAMAN_MAX = 200
+PRODUK_SORT = {
+    'kode': Produk.kode,
+    'nama': Produk.nama,
+    'harga_jual': Produk.harga_jual,
+    'stok': Produk.stok,
+}
+def _encode_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def _decode_cursor(teks):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(teks + '=' * (-len(teks) % 4)))
+        return data if isinstance(data, dict) and isinstance(data.get('id'), int) else None
+    except (ValueError, TypeError):
+        return None
+
+def halaman_produk(filters, sort='kode', arah='asc', cursor=None, per=PRODUK_PER_HALAMAN):
+    """Satu halaman daftar produk dengan keyset (kolom sort, id).
+
+    cursor = {'v': nilai sort, 'id': id, 'mundur': bool} dari halaman
+    sebelumnya; hasil berisi cursor 'berikutnya'/'sebelumnya' (None jika tidak ada).
+    """
+    kolom = PRODUK_SORT[sort]
+    naik = arah == 'asc'
+    mundur = bool(cursor and cursor.get('mundur'))
+    query = Produk.query.filter(*filters).options(
+        joinedload(Produk.kategori_ref), selectinload(Produk.harga_variasi)
+    )
+    if cursor:
+        kunci, batas = tuple_(kolom, Produk.id), tuple_(cursor.get('v'), cursor['id'])
+        query = query.filter(kunci > batas if naik != mundur else kunci < batas)
+    urut = (kolom.asc(), Produk.id.asc()) if naik != mundur else (kolom.desc(), Produk.id.desc())
+    items = query.order_by(*urut).limit(per + 1).all()
+    ada_lagi = len(items) > per
+    items = items[:per]
+    if mundur:
+        items.reverse()
+
+    def cursor_dari(produk, ke_belakang):
+        return _encode_cursor({'v': getattr(produk, sort), 'id': produk.id, 'mundur': ke_belakang})
+
+    ada_berikutnya = ada_lagi if not mundur else True
+    ada_sebelumnya = ada_lagi if mundur else cursor is not None
+    return {
+        'items': items,
+        'berikutnya': cursor_dari(items[-1], False) if items and ada_berikutnya else None,
+        'sebelumnya': cursor_dari(items[0], True) if items and ada_sebelumnya else None,
+    }
+
 @app.route('/produk')
 @login_required
 def list_produk():
     filter_stok = request.args.get('filter', 'semua')
     search = request.args.get('q', '').strip()
     kategori_id = request.args.get('kategori_id', '').strip()
+    sort = request.args.get('sort', 'kode')
+    sort = sort if sort in PRODUK_SORT else 'kode'
+    arah = 'desc' if request.args.get('arah') == 'desc' else 'asc'
+    per = min(max(request.args.get('per', PRODUK_PER_HALAMAN, type=int) or PRODUK_PER_HALAMAN, 1),
+              PRODUK_PER_HALAMAN_MAX)
     
-    query = Produk.query
-    
+    filters = []
     if filter_stok == 'habis':
-        query = query.filter(Produk.stok == 0)
+        filters.append(Produk.stok_habis)
     elif filter_stok == 'hampir_habis':
-        query = query.filter(Produk.stok > 0, Produk.stok <= Produk.minimal_stok)
+        filters.append(Produk.stok_hampir_habis)
     elif filter_stok == 'tersedia':
-        query = query.filter(Produk.stok > 0)
+        filters.append(Produk.stok > 0)
 
     kategori_filter = None
     if kategori_id.isdigit():
-        kategori_filter = Kategori.query.get(int(kategori_id))
+        kategori_filter = db.session.get(Kategori, int(kategori_id))
         if kategori_filter:
-            query = query.filter(Produk.kategori_id == kategori_filter.id)
+            filters.append(Produk.kategori_id == kategori_filter.id)
+
+    # Jumlah per filter dari ringkasan kategori (satu query agregat, di-cache)
+    jumlah_filter = jumlah_per_filter(kategori_filter.id if kategori_filter else None)
 
     if search:
-        query = query.filter(
-            or_(
-                Produk.nama.ilike(f'%{search}%'),
-                Produk.kode.ilike(f'%{search}%')
-            )
+        # Hasil pencarian diurutkan menurut relevansi (maks. PENCARIAN_LIMIT),
+        # dipotong per halaman dengan nomor halaman
+        halaman_ke = max(request.args.get('hal', 1, type=int) or 1, 1)
+        ids = cari_ids(Produk, search, *filters)
+        potong = ids[(halaman_ke - 1) * per:halaman_ke * per]
+        query = Produk.query.filter(Produk.id.in_(potong)).options(
+            joinedload(Produk.kategori_ref), selectinload(Produk.harga_variasi)
         )
-    
-    produk_list = query.order_by(Produk.kode).all()
-    kategori_list = Kategori.query.all()
+        halaman = {
+            'items': urut_sesuai(potong, query.all()) if potong else [],
+            'berikutnya': halaman_ke + 1 if halaman_ke * per < len(ids) else None,
+            'sebelumnya': halaman_ke - 1 if halaman_ke > 1 else None,
+        }
+        total = len(ids)
+    else:
+        halaman = halaman_produk(filters, sort, arah, _decode_cursor(request.args.get('c', '')), per)
+        total = jumlah_filter.get(filter_stok, 0)
+
     return render_template('produk/list.html', 
-                         produk_list=produk_list,
-                         kategori_list=kategori_list,
+                         produk_list=halaman['items'],
+                         halaman=halaman,
+                         total=total,
+                         jumlah_filter=jumlah_filter,
+                         sort=sort,
+                         arah=arah,
+                         per=per,
                          filter_stok=filter_stok,
                          search=search,
                          kategori_filter=kategori_filter)
@@ -780,7 +1301,7 @@ def tambah_produk():
         return redirect(url_for('list_produk'))
     
     form = ProdukForm()
-    form.kategori_id.choices = [(k.id, k.nama) for k in Kategori.query.all()]
+    form.kategori_id.choices = pilihan_kategori()
     
     if form.validate_on_submit():
         try:
@@ -835,15 +1356,26 @@ def edit_produk(id):
     produk = Produk.query.get_or_404(id)
     form = ProdukForm(obj=produk)
     form.product_id.data = produk.id
-    form.kategori_id.choices = [(k.id, k.nama) for k in Kategori.query.all()]
+    form.kategori_id.choices = pilihan_kategori()
     
     if form.validate_on_submit():
         try:
+            harga_lama = (produk.harga_beli, produk.harga_jual)
             produk.kode = form.kode.data
             produk.nama = form.nama.data
             produk.deskripsi = form.deskripsi.data
             produk.harga_beli = float(form.harga_beli.data)
             produk.harga_jual = float(form.harga_jual.data)
+            if (produk.harga_beli, produk.harga_jual) != harga_lama:
+                db.session.add(RiwayatHarga(
+                    produk_id=produk.id,
+                    harga_beli_lama=harga_lama[0],
+                    harga_beli_baru=produk.harga_beli,
+                    harga_jual_lama=harga_lama[1],
+                    harga_jual_baru=produk.harga_jual,
+                    sumber='form',
+                    user_id=current_user.id,
+                ))
             produk.stok = form.stok.data
             produk.kategori_id = form.kategori_id.data if form.kategori_id.data else None
             produk.minimal_stok = form.minimal_stok.data
@@ -892,13 +1424,482 @@ def hapus_produk(id):
     flash('Produk berhasil dihapus!', 'success')
     return redirect(url_for('list_produk'))
 
+# ==================== HARGA MASSAL ====================
+# Ubah harga banyak produk sekaligus: persen/pembulatan per kategori atau
+# hasil pencarian, margin dari harga beli, atau daftar harga supplier (CSV/XLSX).
+# Rencana dihitung dari dua SELECT; penerapannya satu UPDATE produk dan satu
+# UPDATE harga_variasi per HARGA_MASSAL_CHUNK baris (SET ... = CASE id ...),
+# satu INSERT riwayat (executemany), ditambah kenaikan versi katalog/harga
+# di transaksi yang sama.
+
+HARGA_MASSAL_PRATINJAU = 200  # baris diff yang ditampilkan di pratinjau
+# Baris per UPDATE: setiap baris memakai id (IN + WHEN per kolom) dan nilai
+# per kolom, tetap jauh di bawah batas 32766 parameter SQLite
+HARGA_MASSAL_CHUNK = 500
+
+def rencana_harga_massal(aturan, kategori_id=None, q='', daftar=None):
+    """{'versi', 'perubahan', 'jumlah_produk', 'tidak_dikenal'} tanpa menulis apa pun"""
+    versi = _versi_katalog()
+    filters = []
+    if kategori_id:
+        filters.append(Produk.kategori_id == kategori_id)
+    if q:
+        filters.append(Produk.id.in_(cari_select(Produk, q)))
+    produk = db.session.execute(
+        select(Produk.id, Produk.kode, Produk.nama, Produk.harga_beli, Produk.harga_jual)
+        .where(*filters).order_by(Produk.kode)
+    ).all()
+    variasi = {}
+    if aturan.variasi:
+        for row in db.session.execute(
+            select(HargaVariasi.produk_id, HargaVariasi.id, HargaVariasi.harga)
+            .join(Produk, Produk.id == HargaVariasi.produk_id).where(*filters)
+            .order_by(HargaVariasi.produk_id, HargaVariasi.min_qty)
+        ):
+            variasi.setdefault(row.produk_id, []).append((row.id, row.harga))
+    tidak_dikenal = []
+    if daftar is not None:
+        dikenal = {normalisasi_kode(row.kode) for row in produk}
+        tidak_dikenal = sorted(kode for kode in daftar if kode not in dikenal)
+    return {
+        'versi': versi,
+        'perubahan': rencana_harga(produk, variasi, aturan, daftar),
+        'jumlah_produk': len(produk) if daftar is None else len(daftar) - len(tidak_dikenal),
+        'tidak_dikenal': tidak_dikenal,
+    }
+
+def _update_per_id(conn, tabel, baris):
+    """UPDATE nilai berbeda per id: satu statement per HARGA_MASSAL_CHUNK baris.
+
+    baris: list dict berisi 'id' dan kolom yang diubah (kolom sama di setiap dict).
+    """
+    kolom = [k for k in baris[0] if k != 'id']
+    for awal in range(0, len(baris), HARGA_MASSAL_CHUNK):
+        chunk = baris[awal:awal + HARGA_MASSAL_CHUNK]
+        conn.execute(
+            update(tabel).where(tabel.c.id.in_([b['id'] for b in chunk]))
+            .values({k: case({b['id']: b[k] for b in chunk}, value=tabel.c.id) for k in kolom})
+        )
+
+def terapkan_harga_massal(perubahan, sumber, keterangan, user_id=None):
+    """Tulis hasil rencana_harga_massal (belum commit), return id batch riwayat"""
+    if not perubahan:
+        return None
+    conn = db.session.connection()
+    _update_per_id(conn, Produk.__table__, [
+        {'id': p['id'], 'harga_beli': p['harga_beli_baru'], 'harga_jual': p['harga_jual_baru']} for p in perubahan
+    ])
+    tier = [{'id': v['id'], 'harga': v['baru']} for p in perubahan for v in p['variasi']]
+    if tier:
+        _update_per_id(conn, HargaVariasi.__table__, tier)
+    batch = uuid.uuid4().hex
+    waktu = get_local_now()
+    conn.execute(insert(RiwayatHarga), [
+        {
+            'produk_id': p['id'],
+            'harga_beli_lama': p['harga_beli_lama'],
+            'harga_beli_baru': p['harga_beli_baru'],
+            'harga_jual_lama': p['harga_jual_lama'],
+            'harga_jual_baru': p['harga_jual_baru'],
+            'sumber': sumber,
+            'keterangan': keterangan[:200],
+            'batch': batch,
+            'user_id': user_id,
+            'created_at': waktu,
+        }
+        for p in perubahan
+    ])
+    # UPDATE lewat Core tidak terlihat oleh after_flush: naikkan versi sendiri
+    _naikkan_versi_katalog_sql(conn, [p['id'] for p in perubahan])
+    _naikkan_versi_harga_sql(conn)
+    if any(p['harga_beli_baru'] != p['harga_beli_lama'] for p in perubahan):
+        _naikkan_versi_sql(conn, VERSI_PRODUK_LAPORAN_KEY)
+    return batch
+
+def riwayat_harga_massal(limit=10):
+    """Ringkasan batch perubahan massal terakhir (satu query GROUP BY)"""
+    return db.session.execute(
+        select(
+            RiwayatHarga.batch,
+            db.func.min(RiwayatHarga.sumber).label('sumber'),
+            db.func.min(RiwayatHarga.keterangan).label('keterangan'),
+            db.func.min(RiwayatHarga.created_at).label('waktu'),
+            db.func.count().label('jumlah'),
+        )
+        .where(RiwayatHarga.batch.is_not(None))
+        .group_by(RiwayatHarga.batch)
+        .order_by(db.func.max(RiwayatHarga.id).desc())
+        .limit(limit)
+    ).all()
+
+@app.route('/produk/harga-massal', methods=['GET', 'POST'])
+@login_required
+def harga_massal():
+    if current_user.role != 'admin':
+        flash('Akses ditolak!', 'danger')
+        return redirect(url_for('list_produk'))
+
+    hasil = None
+    daftar = None
+    if request.method == 'POST':
+        try:
+            aturan = AturanHarga(
+                mode=request.form.get('mode', 'persen'),
+                nilai=request.form.get('nilai') or 0,
+                kelipatan=request.form.get('kelipatan') or 1,
+                pembulatan=request.form.get('pembulatan', 'terdekat'),
+                variasi=bool(request.form.get('variasi')),
+            )
+            file = request.files.get('file')
+            if file and file.filename:
+                daftar = baca_daftar_harga(file.stream, file.filename)
+            elif request.form.get('daftar'):
+                # Daftar dari pratinjau sebelumnya (tidak perlu unggah ulang)
+                daftar = daftar_harga_json(request.form['daftar'])
+            kategori_id = request.form.get('kategori_id', type=int)
+            q = request.form.get('q', '').strip()
+            if daftar is None and not kategori_id and not q and not request.form.get('semua'):
+                raise ValueError('Pilih kategori, isi pencarian, unggah daftar harga, atau centang semua produk')
+            hasil = rencana_harga_massal(aturan, kategori_id, q, daftar)
+        except (ValueError, ArithmeticError) as e:
+            flash(f'Error: {e}', 'danger')
+        else:
+            if request.form.get('aksi') == 'terapkan':
+                if request.form.get('versi', type=int) != hasil['versi']:
+                    flash('Katalog berubah sejak pratinjau. Periksa ulang perubahan di bawah.', 'warning')
+                elif not hasil['perubahan']:
+                    flash('Tidak ada harga yang berubah.', 'info')
+                else:
+                    sumber = 'file' if daftar is not None else 'massal'
+                    try:
+                        terapkan_harga_massal(hasil['perubahan'], sumber, aturan.keterangan(), current_user.id)
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        flash(f'Gagal menerapkan harga: {str(e)}', 'danger')
+                    else:
+                        log.info('Harga massal diterapkan', extra={
+                            'jumlah': len(hasil['perubahan']), 'sumber': sumber})
+                        flash(f"Harga {len(hasil['perubahan'])} produk diperbarui.", 'success')
+                        return redirect(url_for('harga_massal'))
+
+    return render_template('produk/harga_massal.html',
+                         hasil=hasil,
+                         daftar=daftar,
+                         pratinjau_max=HARGA_MASSAL_PRATINJAU,
+                         kategori_list=pilihan_kategori(),
+                         riwayat=riwayat_harga_massal(),
+                         form=request.form)
+
+# ==================== IMPORT/EXPORT PRODUK ====================
+# File dibaca & ditulis per baris (product_io.py). Import: satu query lookup
+# kode -> id di awal, lalu per IMPOR_CHUNK baris satu INSERT produk baru,
+# satu UPDATE produk lama dan DELETE+INSERT tier harga (executemany), semua
+# di satu transaksi. Ada baris tidak valid: seluruh import dibatalkan.
+
+IMPOR_CHUNK = 1000
+IMPOR_GALAT_MAX = 20
+
+def _baris_ekspor_produk():
+    """Baris KOLOM_PRODUK per produk, dibaca per IMPOR_CHUNK produk (keyset id)"""
+    kategori = dict(db.session.execute(select(Kategori.id, Kategori.nama)).all())
+    terakhir = 0
+    while True:
+        rows = db.session.execute(
+            select(Produk.id, Produk.kode, Produk.nama, Produk.kategori_id, Produk.harga_beli, Produk.harga_jual,
+                   Produk.stok, Produk.minimal_stok, Produk.satuan, Produk.deskripsi)
+            .where(Produk.id > terakhir).order_by(Produk.id).limit(IMPOR_CHUNK)
+        ).all()
+        if not rows:
+            return
+        tier = {}
+        for v in db.session.execute(
+            select(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.harga, HargaVariasi.keterangan)
+            .where(HargaVariasi.produk_id.between(rows[0].id, rows[-1].id))
+            .order_by(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.id)
+        ):
+            tier.setdefault(v.produk_id, []).append((v.min_qty, v.harga, v.keterangan))
+        for row in rows:
+            yield [row.kode, row.nama, kategori.get(row.kategori_id, ''), row.harga_beli, row.harga_jual,
+                   row.stok or 0, row.minimal_stok, row.satuan or '', row.deskripsi or '',
+                   format_variasi(tier.get(row.id, ()))]
+        terakhir = rows[-1].id
+
+def _tulis_impor(conn, chunk, lookup, kategori, diubah):
+    """Tulis satu potongan baris tervalidasi; return (ditambah, diperbarui)"""
+    for data in chunk:
+        nama = data.get('kategori')
+        if nama and nama.strip().lower() not in kategori:
+            kategori[nama.strip().lower()] = conn.execute(
+                insert(Kategori).values(nama=nama.strip()).returning(Kategori.id)).scalar()
+
+    def kategori_id(data):
+        nama = data.get('kategori')
+        return kategori[nama.strip().lower()] if nama else None
+
+    baru = [d for d in chunk if normalisasi_kode(d['kode']) not in lookup]
+    lama = [d for d in chunk if normalisasi_kode(d['kode']) in lookup]
+    ids = {}
+    if baru:
+        # RETURNING kode juga: urutan baris hasil executemany tidak dijamin
+        rows = conn.execute(insert(Produk).returning(Produk.id, Produk.kode), [
+            {
+                'kode': d['kode'],
+                'nama': d['nama'],
+                'deskripsi': d.get('deskripsi'),
+                'harga_beli': d['harga_beli'],
+                'harga_jual': d['harga_jual'],
+                'stok': d.get('stok') or 0,
+                'kategori_id': kategori_id(d),
+                'minimal_stok': 5 if d.get('minimal_stok') is None else d['minimal_stok'],
+                'satuan': d.get('satuan') or 'pcs',
+                # Core tidak memicu _isi_cari_produk: isi kolom pencarian sendiri
+                'cari': teks_cari_produk(d['nama'], d['kode']),
+            }
+            for d in baru
+        ]).all()
+        for produk_id, kode in rows:
+            lookup[normalisasi_kode(kode)] = ids[kode] = produk_id
+    if lama:
+        # Sel kosong (None) tidak mengubah nilai lama
+        kolom = {
+            'nama': Produk.nama, 'deskripsi': Produk.deskripsi, 'harga_beli': Produk.harga_beli,
+            'harga_jual': Produk.harga_jual, 'stok': Produk.stok, 'minimal_stok': Produk.minimal_stok,
+            'satuan': Produk.satuan, 'kategori_id': Produk.kategori_id, 'cari': Produk.cari,
+        }
+        tabel = Produk.__table__
+        conn.execute(
+            update(tabel).where(tabel.c.id == bindparam('b_id'))
+            .values({nama: db.func.coalesce(bindparam(f'b_{nama}', type_=k.type), k) for nama, k in kolom.items()}),
+            [
+                {
+                    'b_id': lookup[normalisasi_kode(d['kode'])],
+                    **{f'b_{nama}': d.get(nama) for nama in kolom if nama not in ('kategori_id', 'cari')},
+                    'b_kategori_id': kategori_id(d),
+                    'b_cari': teks_cari_produk(d['nama'], d['kode']) if d.get('nama') else None,
+                }
+                for d in lama
+            ],
+        )
+        for d in lama:
+            ids[d['kode']] = lookup[normalisasi_kode(d['kode'])]
+    tier = [d for d in chunk if d.get('harga_variasi') is not None]
+    if tier:
+        conn.execute(delete(HargaVariasi).where(HargaVariasi.produk_id.in_([ids[d['kode']] for d in tier])))
+        baris_tier = [
+            {'produk_id': ids[d['kode']], 'min_qty': min_qty, 'harga': harga, 'keterangan': keterangan}
+            for d in tier for min_qty, harga, keterangan in d['harga_variasi']
+        ]
+        if baris_tier:
+            conn.execute(insert(HargaVariasi), baris_tier)
+    diubah.extend(ids.values())
+    return len(baru), len(lama)
+
+def impor_produk(stream, nama_file):
+    """Upsert produk per kode dari file XLSX/CSV (belum commit).
+
+    Return {'ditambah', 'diperbarui', 'galat'}; jika galat tidak kosong,
+    pemanggil harus rollback (potongan yang sudah ditulis ikut batal).
+    """
+    baris_iter = baris_file(stream, nama_file)
+    posisi = baca_header(baris_iter)
+    conn = db.session.connection()
+    # Satu query untuk semua produk: lookup kode -> id, bukan query per baris
+    lookup = {normalisasi_kode(kode): pid for pid, kode in conn.execute(select(Produk.id, Produk.kode))}
+    kategori = {nama.strip().lower(): kid for kid, nama in conn.execute(select(Kategori.id, Kategori.nama))}
+    jumlah_kategori = len(kategori)
+    hasil = {'ditambah': 0, 'diperbarui': 0, 'galat': []}
+    dilihat, diubah, chunk = set(), [], []
+
+    def tulis():
+        if chunk and not hasil['galat']:
+            ditambah, diperbarui = _tulis_impor(conn, chunk, lookup, kategori, diubah)
+            hasil['ditambah'] += ditambah
+            hasil['diperbarui'] += diperbarui
+        chunk.clear()
+
+    for nomor, row in enumerate(baris_iter, start=2):
+        if all(v is None or str(v).strip() == '' for v in row):
+            continue
+        try:
+            data = validasi_baris(row, posisi, nomor)
+            kunci = normalisasi_kode(data['kode'])
+            if kunci in dilihat:
+                raise ValueError(f"Baris {nomor}: kode {data['kode']} muncul lebih dari sekali")
+            dilihat.add(kunci)
+            if kunci not in lookup:
+                kurang = [k for k in KOLOM_WAJIB_BARU if data.get(k) is None]
+                if kurang:
+                    raise ValueError(f"Baris {nomor}: produk baru {data['kode']} tanpa {', '.join(kurang)}")
+        except ValueError as e:
+            hasil['galat'].append(str(e))
+            if len(hasil['galat']) >= IMPOR_GALAT_MAX:
+                break
+            continue
+        chunk.append(data)
+        if len(chunk) >= IMPOR_CHUNK:
+            tulis()
+    tulis()
+
+    if diubah and not hasil['galat']:
+        # INSERT/UPDATE lewat Core tidak terlihat oleh after_flush: naikkan versi sendiri
+        _naikkan_versi_katalog_sql(conn, diubah)
+        _naikkan_versi_harga_sql(conn)
+        if len(kategori) > jumlah_kategori:
+            _naikkan_versi_sql(conn, VERSI_KATEGORI_KEY)
+        if hasil['diperbarui']:
+            _naikkan_versi_sql(conn, VERSI_PRODUK_LAPORAN_KEY)
+    return hasil
+
+@app.route('/produk/export')
+@login_required
+def export_produk():
+    if request.args.get('format') == 'csv':
+        response = app.response_class(stream_with_context(tulis_csv(_baris_ekspor_produk())), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=produk_export.csv'
+        return response
+    # Workbook write-only ditulis ke file sementara (bukan BytesIO) lalu dikirim
+    berkas = tempfile.TemporaryFile()
+    tulis_xlsx(_baris_ekspor_produk(), berkas)
+    berkas.seek(0)
+    return send_file(berkas, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name='produk_export.xlsx')
+
+@app.route('/produk/template')
+@login_required
+def download_produk_template():
+    output = io.BytesIO()
+    tulis_xlsx([
+        ['8991002101012', 'Minyak Goreng Bimoli 2L', 'Minyak', 32000, 36000, 24, 5, 'pcs', '', '6:35000:Grosir; 12:34500'],
+        ['GULA-1KG', 'Gula Pasir 1Kg', 'Sembako', 15500, 17000, 50, 10, 'kg', 'Curah', ''],
+    ], output)
+    output.seek(0)
+    return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name='produk_template.xlsx')
+
+@app.route('/produk/import', methods=['POST'])
+@login_required
+def import_produk():
+    if current_user.role != 'admin':
+        flash('Akses ditolak!', 'danger')
+        return redirect(url_for('list_produk'))
+
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        flash('File XLSX/CSV tidak ditemukan.', 'danger')
+        return redirect(url_for('list_produk'))
+
+    try:
+        hasil = impor_produk(file.stream, file.filename)
+        if hasil['galat']:
+            db.session.rollback()
+            flash('Import dibatalkan, tidak ada produk yang diubah. ' + ' '.join(hasil['galat']), 'danger')
+        else:
+            db.session.commit()
+            log.info('Import produk selesai', extra={'ditambah': hasil['ditambah'], 'diperbarui': hasil['diperbarui']})
+            flash(f"Import selesai: {hasil['ditambah']} ditambah, {hasil['diperbarui']} diperbarui.", 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Gagal import produk: {str(e)}', 'danger')
+
+    return redirect(url_for('list_produk'))
+
+# ==================== RINGKASAN KATEGORI ====================
+# Jumlah produk, stok habis/hampir habis & nilai stok per kategori dari satu
+# query GROUP BY. Cache dibuang saat versi katalog (tulis produk) atau versi
+# kategori berubah; stok yang berkurang karena checkout tidak menaikkan versi,
+# jadi angka stok bisa tertinggal paling lama TTL ini.
+
+VERSI_KATEGORI_KEY = 'versi_kategori'
+RINGKASAN_KATEGORI_TTL = 30
+
+_ringkasan_kategori_cache = None
+
+def _kategori_berubah(session):
+    return any(isinstance(obj, Kategori) for obj in (*session.new, *session.dirty, *session.deleted))
+
+def _agregat_produk():
+    # Outer join: kategori tanpa produk memberi satu baris Produk.id NULL yang
+    # tidak boleh terhitung habis
+    return (
+        db.func.count(Produk.id).label('jumlah'),
+        db.func.coalesce(db.func.sum(
+            case((and_(Produk.id.is_not(None), Produk.stok_habis), 1), else_=0)
+        ), 0).label('habis'),
+        db.func.coalesce(db.func.sum(
+            case((Produk.stok_hampir_habis, 1), else_=0)
+        ), 0).label('hampir_habis'),
+        db.func.coalesce(db.func.sum(Produk.stok * Produk.harga_beli), 0).label('nilai_stok'),
+    )
+
+def _hitung_ringkasan_kategori():
+    per_kategori = (
+        select(Kategori.id, Kategori.nama, Kategori.deskripsi, *_agregat_produk())
+        .select_from(Kategori)
+        .outerjoin(Produk, Produk.kategori_id == Kategori.id)
+        .group_by(Kategori.id, Kategori.nama, Kategori.deskripsi)
+    )
+    tanpa_kategori = select(
+        cast(null(), Integer), cast(null(), String), cast(null(), String), *_agregat_produk()
+    ).where(Produk.kategori_id.is_(None))
+    kategori, tanpa = [], None
+    for row in db.session.execute(union_all(per_kategori, tanpa_kategori)):
+        baris = dict(row._mapping)
+        baris['nilai_stok'] = float(baris['nilai_stok'] or 0)
+        if baris['id'] is None:
+            tanpa = baris if baris['jumlah'] else None
+        else:
+            kategori.append(baris)
+    kategori.sort(key=lambda k: k['nama'].lower())
+    total = {kolom: sum(k[kolom] for k in kategori + ([tanpa] if tanpa else []))
+             for kolom in ('jumlah', 'habis', 'hampir_habis', 'nilai_stok')}
+    return {'kategori': kategori, 'tanpa_kategori': tanpa, 'total': total}
+
+def ringkasan_kategori():
+    """{'kategori': [baris per kategori urut nama], 'tanpa_kategori': baris|None, 'total': {...}}
+
+    Setiap baris: id, nama, deskripsi, jumlah, habis, hampir_habis, nilai_stok.
+    """
+    global _ringkasan_kategori_cache
+    versi = tuple(db.session.execute(
+        select(Pengaturan.key, Pengaturan.value)
+        .where(Pengaturan.key.in_((VERSI_KATALOG_KEY, VERSI_KATEGORI_KEY)))
+        .order_by(Pengaturan.key)
+    ).all())
+    sekarang = time.monotonic()
+    cache = _ringkasan_kategori_cache
+    if cache and cache[0] == versi and sekarang - cache[1] < RINGKASAN_KATEGORI_TTL:
+        return cache[2]
+    data = _hitung_ringkasan_kategori()
+    _ringkasan_kategori_cache = (versi, sekarang, data)
+    return data
+
+def jumlah_per_filter(kategori_id=None):
+    """Jumlah produk untuk tiap filter stok daftar produk (semua kategori atau satu)"""
+    ringkasan = ringkasan_kategori()
+    if kategori_id is None:
+        baris = ringkasan['total']
+    else:
+        baris = next((k for k in ringkasan['kategori'] if k['id'] == kategori_id), None)
+        if baris is None:
+            return {}
+    return {
+        'semua': baris['jumlah'],
+        'tersedia': baris['jumlah'] - baris['habis'],
+        'hampir_habis': baris['hampir_habis'],
+        'habis': baris['habis'],
+    }
+
+def pilihan_kategori():
+    return [(k['id'], k['nama']) for k in ringkasan_kategori()['kategori']]
+
 # ==================== KATEGORI ROUTES ====================
 
 @app.route('/kategori')
 @login_required
 def list_kategori():
-    kategori_list = Kategori.query.all()
-    return render_template('produk/kategori.html', kategori_list=kategori_list)
+    ringkasan = ringkasan_kategori()
+    return render_template('produk/kategori.html',
+                         kategori_list=ringkasan['kategori'],
+                         tanpa_kategori=ringkasan['tanpa_kategori'])
 
 @app.route('/kategori/tambah', methods=['GET', 'POST'])
 @login_required
@@ -976,17 +1977,11 @@ def kategori_produk(id):
 @login_required
 def list_member():
     search = request.args.get('q', '').strip()
-    query = Member.query
-
     if search:
-        query = query.filter(
-            or_(
-                Member.nama.ilike(f'%{search}%'),
-                Member.no_telp.ilike(f'%{search}%')
-            )
-        )
-
-    member_list = query.order_by(Member.nama).all()
+        ids = cari_ids(Member, search)
+        member_list = urut_sesuai(ids, Member.query.filter(Member.id.in_(ids)).all()) if ids else []
+    else:
+        member_list = Member.query.order_by(Member.nama).all()
     return render_template('member/list.html', member_list=member_list, search=search)
 
 @app.route('/member/<int:id>/transaksi')
@@ -1236,6 +2231,7 @@ def hapus_member(id):
             {Transaksi.member_id: None},
             synchronize_session=False
         )
+        catat_perubahan_laporan()  # top member di laporan lama ikut berubah
         db.session.delete(member)
         db.session.commit()
         flash('Member berhasil dihapus!', 'success')
@@ -1250,13 +2246,14 @@ def hapus_member(id):
 @app.route('/kasir')
 @login_required
 def kasir():
-    kategori_list = Kategori.query.all()
+    kategori_list = ringkasan_kategori()['kategori']
     member_list = Member.query.order_by(Member.nama).all()
-    # Eager load harga_variasi untuk performa dan avoid lazy loading issues
-    produk_list = Produk.query.filter(Produk.stok > 0).options(db.joinedload(Produk.harga_variasi)).all()
+    # Hanya layar pertama yang dirender server (HTML dari cache grid);
+    # sisanya dimuat lewat /api/katalog
+    katalog = grid_cache.get()
     return render_template('transaksi/kasir.html', 
                          kategori_list=kategori_list,
-                         produk_list=produk_list,
+                         katalog=katalog,
                          member_list=member_list)
 
 @app.route('/api/produk')
@@ -1265,96 +2262,905 @@ def get_api_produk():
     search = request.args.get('search', '').strip()
     kategori_id = request.args.get('kategori_id', type=int)
     
-    query = Produk.query.filter(Produk.stok > 0)
-    
-    if search:
-        query = query.filter(
-            or_(
-                Produk.nama.ilike(f'%{search}%'),
-                Produk.kode.ilike(f'%{search}%')
+    filters = [Produk.stok > 0]
+    if kategori_id:
+        filters.append(Produk.kategori_id == kategori_id)
+
+    def buat(versi, stok):
+        if not search:
+            # Batasi hasil untuk performa
+            query = Produk.query.filter(*filters).options(joinedload(Produk.harga_variasi))
+            return [p.to_dict() for p in query.limit(50)]
+        ids = cari_ids(Produk, search, *filters, limit=50)
+        if ids:
+            return [p.to_dict() for p in produk_by_ids(ids)]
+        # Tidak ada yang cocok persis: mungkin salah ketik, pakai saran fuzzy
+        return [p.to_dict() for p in produk_by_ids(saran_index.cari(search, limit=50), *filters)]
+
+    # ETag versi katalog + stok: pencarian yang sama dijawab 304 selama katalog
+    # tidak berubah dan belum ada penjualan baru
+    return _json_katalog(buat)
+
+# ==================== KODE TRANSAKSI ====================
+
+def _reserve_kode_block(tanggal, jumlah):
+    """Pesan blok nomor urut dan langsung commit, return nomor pertama.
+
+    Dipanggil di awal checkout/batch sebelum ada baris yang dikunci atau
+    ditulis, jadi commit ini hanya menutup transaksi baca request dan blok
+    tetap terpesan walau penjualannya gagal. Memakai koneksi session, bukan
+    koneksi kedua dari pool: thread yang sudah memegang koneksi tidak ikut
+    menunggu koneksi lain saat pool penuh.
+    """
+    if db.session.new or db.session.dirty or db.session.deleted:
+        raise RuntimeError('Blok nomor transaksi harus dipesan sebelum ada perubahan di session')
+    for _ in range(3):
+        try:
+            result = db.session.execute(
+                update(UrutanTransaksi)
+                .where(UrutanTransaksi.tanggal == tanggal)
+                .values(terakhir=UrutanTransaksi.terakhir + jumlah)
             )
+            if result.rowcount == 0:
+                db.session.execute(insert(UrutanTransaksi).values(tanggal=tanggal, terakhir=jumlah))
+                awal = 1
+            else:
+                awal = db.session.execute(
+                    select(UrutanTransaksi.terakhir).where(UrutanTransaksi.tanggal == tanggal)
+                ).scalar_one() - jumlah + 1
+            db.session.commit()
+            return awal
+        except IntegrityError:
+            # Worker lain baru saja membuat baris untuk tanggal ini, ulangi lewat UPDATE
+            db.session.rollback()
+            continue
+    raise RuntimeError(f'Gagal memesan nomor transaksi untuk {tanggal}')
+
+def _release_kode_block(tanggal, awal, akhir):
+    """Kembalikan nomor awal..akhir jika belum ada worker lain yang memesan sesudahnya"""
+    # Dipanggil saat worker berhenti (atexit), di luar request
+    with app.app_context(), db.engine.begin() as conn:
+        result = conn.execute(
+            update(UrutanTransaksi)
+            .where(UrutanTransaksi.tanggal == tanggal, UrutanTransaksi.terakhir == akhir)
+            .values(terakhir=awal - 1)
         )
-    
+        return result.rowcount == 1
+
+kode_allocator = KodeAllocator(_reserve_kode_block, _release_kode_block)
+
+# ==================== IDEMPOTENCY ====================
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24')))
+
+class IdempotencyConflict(Exception):
+    """Idempotency key sudah dipakai user yang sama untuk penjualan dengan isi berbeda"""
+
+class IdempotencyStore:
+    """Respons per (user, idempotency key): LRU kecil di memori di depan tabel idempotency_key.
+
+    Tabel dipakai bersama semua worker gunicorn (primary key, lookup O(1) per key),
+    LRU lokal membuat replay di worker yang sama tidak menyentuh database sama sekali.
+    """
+
+    PURGE_INTERVAL = 600  # detik
+    PESAN_KONFLIK = 'Idempotency key sudah dipakai untuk transaksi lain'
+
+    def __init__(self, max_local=2048, ttl=IDEMPOTENCY_TTL):
+        self.max_local = max_local
+        self.ttl = ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    @staticmethod
+    def valid_key(key):
+        return (isinstance(key, str) and 0 < len(key) <= 64
+                and all(c.isascii() and (c.isalnum() or c in '-_.:') for c in key))
+
+    @staticmethod
+    def sidik(penjualan):
+        """Hash isi penjualan (dict dari _parse_checkout/_parse_penjualan_offline).
+
+        Tanggal tidak ikut: checkout yang sudah sampai ke server lalu dikirim
+        lagi lewat antrian offline (key sama, tanggal dari register) tetap replay.
+        """
+        isi = [sorted(penjualan['lines']), penjualan['bayar'], penjualan['payment_method'],
+               penjualan['member_id'], penjualan['member_manual']]
+        return hashlib.sha256(json.dumps(isi).encode()).hexdigest()
+
+    def get(self, key, user_id, sidik):
+        """Respons tersimpan untuk key milik user ini, atau None.
+
+        Melempar IdempotencyConflict jika key sudah dipakai untuk isi lain.
+        """
+        now = get_local_now()
+        with self._lock:
+            entry = self._local.get((user_id, key))
+            if entry is not None:
+                expires_at, tersimpan, response = entry
+                if expires_at > now:
+                    self._local.move_to_end((user_id, key))
+                    return self._cocokkan(tersimpan, sidik, response)
+                del self._local[(user_id, key)]
+        row = db.session.get(IdempotencyKey, (user_id, key))
+        if row is None or row.expires_at <= now:
+            return None
+        response = json.loads(row.response)
+        self._remember_local(key, user_id, row.expires_at, row.sidik, response)
+        return self._cocokkan(row.sidik, sidik, response)
+
+    @classmethod
+    def _cocokkan(cls, tersimpan, sidik, response):
+        if tersimpan is not None and tersimpan != sidik:
+            raise IdempotencyConflict(cls.PESAN_KONFLIK)
+        return response
+
+    def get_many(self, pasangan):
+        """{(user_id, key): (sidik, respons)} untuk pasangan yang sudah ada (satu query)"""
+        if not pasangan:
+            return {}
+        rows = db.session.execute(
+            select(IdempotencyKey.user_id, IdempotencyKey.key, IdempotencyKey.sidik, IdempotencyKey.response)
+            .where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(list(pasangan)),
+                   IdempotencyKey.expires_at > get_local_now())
+        ).all()
+        return {(row.user_id, row.key): (row.sidik, json.loads(row.response)) for row in rows}
+
+    def new_row(self, key, user_id, sidik, response):
+        """Baris untuk disimpan di transaksi checkout yang sama"""
+        return IdempotencyKey(
+            key=key,
+            user_id=user_id,
+            sidik=sidik,
+            response=json.dumps(response),
+            expires_at=get_local_now() + self.ttl
+        )
+
+    def remember(self, key, user_id, sidik, response):
+        """Simpan ke LRU lokal setelah transaksi checkout ter-commit"""
+        self._remember_local(key, user_id, get_local_now() + self.ttl, sidik, response)
+        self._purge_expired()
+
+    def _remember_local(self, key, user_id, expires_at, sidik, response):
+        with self._lock:
+            self._local[(user_id, key)] = (expires_at, sidik, response)
+            self._local.move_to_end((user_id, key))
+            while len(self._local) > self.max_local:
+                self._local.popitem(last=False)
+
+    def _purge_expired(self):
+        # Hapus key kedaluwarsa di database sesekali, bukan di setiap checkout
+        if time.monotonic() - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(IdempotencyKey.__table__.delete().where(
+                    IdempotencyKey.expires_at <= get_local_now()))
+        except Exception as e:
+            get_logger('idempotency').warning('Gagal hapus key kedaluwarsa: %s', e)
+
+idempotency_store = IdempotencyStore()
+
+# ==================== PRICING ENGINE ====================
+
+# Versi harga disimpan di tabel pengaturan supaya semua worker tahu kapan
+# cache tabel harga mereka harus dibangun ulang
+VERSI_HARGA_KEY = 'versi_harga'
+
+def _load_tier_harga(produk_ids):
+    """harga_jual & semua HargaVariasi untuk produk_ids (dua query)"""
+    hasil = {
+        row.id: (row.harga_jual, [])
+        for row in db.session.execute(
+            select(Produk.id, Produk.harga_jual).where(Produk.id.in_(produk_ids))
+        )
+    }
+    for row in db.session.execute(
+        select(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.harga, HargaVariasi.keterangan)
+        .where(HargaVariasi.produk_id.in_(produk_ids))
+        .order_by(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.id)
+    ):
+        hasil[row.produk_id][1].append((row.min_qty, row.harga, row.keterangan))
+    return hasil
+
+def _versi_harga():
+    return db.session.execute(
+        select(Pengaturan.value).where(Pengaturan.key == VERSI_HARGA_KEY)
+    ).scalar() or '0'
+
+pricing_engine = PricingEngine(_load_tier_harga, _versi_harga)
+
+def _harga_berubah(session):
+    for obj in session.new:
+        if isinstance(obj, (Produk, HargaVariasi)):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, (Produk, HargaVariasi)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, HargaVariasi) and session.is_modified(obj):
+            return True
+        if isinstance(obj, Produk) and attributes.get_history(obj, 'harga_jual').has_changes():
+            return True
+    return False
+
+def _produk_laporan_berubah(session):
+    """Apakah flush ini mengubah data produk/kategori yang dipakai laporan"""
+    for obj in session.deleted:
+        if isinstance(obj, (Produk, Kategori)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Produk) and any(
+                attributes.get_history(obj, kolom).has_changes() for kolom in KOLOM_PRODUK_LAPORAN):
+            return True
+        if isinstance(obj, Kategori) and attributes.get_history(obj, 'nama').has_changes():
+            return True
+    return False
+
+def _produk_berubah(session):
+    """(id produk yang baru/berubah, id produk yang dihapus) dari flush ini"""
+    berubah, dihapus = set(), set()
+    for obj in session.new:
+        if isinstance(obj, Produk):
+            berubah.add(obj.id)
+        elif isinstance(obj, HargaVariasi):
+            berubah.add(obj.produk_id)
+    for obj in session.deleted:
+        if isinstance(obj, Produk):
+            dihapus.add(obj.id)
+        elif isinstance(obj, HargaVariasi):
+            berubah.add(obj.produk_id)
+    for obj in session.dirty:
+        if isinstance(obj, Produk) and session.is_modified(obj):
+            berubah.add(obj.id)
+        elif isinstance(obj, HargaVariasi) and session.is_modified(obj):
+            berubah.add(obj.produk_id)
+    berubah.discard(None)
+    return berubah - dihapus, dihapus
+
+@event.listens_for(Session, 'after_flush')
+def _catat_perubahan_katalog(session, flush_context):
+    """Naikkan versi katalog/harga di transaksi yang sama dengan perubahannya.
+
+    Hanya menangkap perubahan lewat ORM; UPDATE massal ke produk atau
+    harga_variasi harus memanggil _naikkan_versi_katalog_sql() (dan
+    _naikkan_versi_harga_sql() jika harga ikut berubah) sendiri.
+    """
+    berubah, dihapus = _produk_berubah(session)
+    if berubah or dihapus:
+        conn = session.connection()
+        _naikkan_versi_katalog_sql(conn, berubah, dihapus)
+        if _harga_berubah(session):
+            _naikkan_versi_harga_sql(conn)
+    if _kategori_berubah(session):
+        _naikkan_versi_sql(session.connection(), VERSI_KATEGORI_KEY)
+    if _produk_laporan_berubah(session):
+        _naikkan_versi_sql(session.connection(), VERSI_PRODUK_LAPORAN_KEY)
+
+def _naikkan_versi_sql(conn, key):
+    """Naikkan counter di pengaturan dan kembalikan nilai barunya.
+
+    Baris counter terkunci sampai commit, jadi versi berurutan sesuai
+    urutan commit dan tidak ada dua transaksi dengan versi yang sama.
+    """
+    versi = conn.execute(
+        update(Pengaturan)
+        .where(Pengaturan.key == key)
+        .values(value=cast(cast(Pengaturan.value, Integer) + 1, String))
+        .returning(Pengaturan.value)
+    ).scalar()
+    if versi is None:
+        conn.execute(insert(Pengaturan).values(key=key, value='1'))
+        return 1
+    return int(versi)
+
+def _naikkan_versi_harga_sql(conn):
+    return _naikkan_versi_sql(conn, VERSI_HARGA_KEY)
+
+# Batas id per IN (...): SQLite membatasi jumlah parameter per statement
+VERSI_IN_CHUNK = 10000
+
+def _naikkan_versi_katalog_sql(conn, produk_ids=(), dihapus=()):
+    """Naikkan versi katalog dan tandai produk_ids/dihapus dengan versi itu"""
+    versi = _naikkan_versi_sql(conn, VERSI_KATALOG_KEY)
+    produk_ids = list(produk_ids)
+    for i in range(0, len(produk_ids), VERSI_IN_CHUNK):
+        conn.execute(update(Produk).where(Produk.id.in_(produk_ids[i:i + VERSI_IN_CHUNK])).values(versi=versi))
+    # Id yang dipakai lagi (SQLite bisa memakai ulang id terbesar) bukan lagi tombstone
+    ids = produk_ids + list(dihapus)
+    for i in range(0, len(ids), VERSI_IN_CHUNK):
+        conn.execute(delete(ProdukTerhapus).where(ProdukTerhapus.produk_id.in_(ids[i:i + VERSI_IN_CHUNK])))
+    if dihapus:
+        conn.execute(insert(ProdukTerhapus), [{'produk_id': pid, 'versi': versi} for pid in dihapus])
+    return versi
+
+def hitung_harga_keranjang(lines, tables=None):
+    """Harga server-side untuk baris keranjang [(produk_id, qty), ...].
+
+    Tier dipilih dari total qty produk di seluruh keranjang. tables bisa
+    diisi hasil pricing_engine.tables() supaya banyak keranjang dihitung
+    dengan satu kali cek versi. Return (baris, subtotal, qty_per_produk);
+    produk yang tidak ditemukan punya 'harga' None.
+    """
+    qty_per_produk = {}
+    for produk_id, qty in lines:
+        qty_per_produk[produk_id] = qty_per_produk.get(produk_id, 0) + qty
+    if tables is None:
+        tables = pricing_engine.tables(list(qty_per_produk))
+
+    baris = []
+    subtotal = 0
+    for produk_id, qty in lines:
+        table = tables.get(produk_id)
+        if table is None:
+            baris.append({'id': produk_id, 'quantity': qty, 'harga': None, 'subtotal': None})
+            continue
+        tier = table.tier(qty_per_produk[produk_id])
+        harga = table.prices[tier] if tier >= 0 else table.harga_jual
+        baris.append({
+            'id': produk_id,
+            'quantity': qty,
+            'harga': harga,
+            'subtotal': harga * qty,
+            'tier_min_qty': table.breakpoints[tier] if tier >= 0 else None,
+            'tier_keterangan': table.labels[tier] if tier >= 0 else None,
+        })
+        subtotal += harga * qty
+    return baris, subtotal, qty_per_produk
+
+def _parse_baris_keranjang(items):
+    """Validasi item keranjang dari client, return [(produk_id, qty), ...]"""
+    if not isinstance(items, list):
+        raise CheckoutError('Format item tidak valid')
+    lines = []
+    for item in items:
+        try:
+            produk_id = int(item['id'])
+            qty = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise CheckoutError('Format item tidak valid')
+        if qty < 1:
+            raise CheckoutError('Data item tidak valid')
+        lines.append((produk_id, qty))
+    return lines
+
+# ==================== KATALOG ====================
+
+# Versi katalog naik setiap ada perubahan Produk/HargaVariasi lewat ORM
+# (tambah, edit, hapus, harga, stok dari form). Pengurangan stok oleh checkout
+# tidak menaikkan versi katalog (kartu & harga tidak berubah); checkout
+# menaikkan penanda stok (versi_stok) dan menandai produk yang stoknya
+# berkurang dengan nilai itu di UPDATE stok yang sama (lihat _kurangi_stok).
+# Counter terkunci sampai commit, jadi penanda mengikuti urutan commit dan
+# tidak pernah mundur. ETag & delta katalog memakai keduanya.
+VERSI_KATALOG_KEY = 'versi_katalog'
+VERSI_STOK_KEY = 'versi_stok'
+KATALOG_HALAMAN_AWAL = 24  # kartu yang dirender server di halaman kasir
+KATALOG_LIMIT_DEFAULT = 100
+KATALOG_LIMIT_MAX = 500
+# Perubahan lebih dari ini sejak versi klien: klien diminta memuat ulang penuh
+KATALOG_DELTA_MAX = 1000
+KATALOG_FILTER_STOK = {
+    'ada': Produk.stok > 0,
+    'habis': Produk.stok_habis,
+    'semua': None,
+}
+
+_KOLOM_KATALOG = (Produk.id, Produk.kode, Produk.nama, Produk.harga_jual, Produk.stok, Produk.satuan, Produk.kategori_id)
+
+def _versi_katalog():
+    return int(db.session.execute(
+        select(Pengaturan.value).where(Pengaturan.key == VERSI_KATALOG_KEY)
+    ).scalar() or 0)
+
+def _versi_katalog_stok():
+    """(versi katalog, penanda stok) dalam satu query"""
+    versi = dict(db.session.execute(
+        select(Pengaturan.key, Pengaturan.value).where(Pengaturan.key.in_((VERSI_KATALOG_KEY, VERSI_STOK_KEY)))
+    ).all())
+    return int(versi.get(VERSI_KATALOG_KEY) or 0), int(versi.get(VERSI_STOK_KEY) or 0)
+
+def _kurangi_stok(qty_per_produk):
+    """Satu UPDATE bersyarat untuk stok semua produk {produk_id: qty}, return rowcount.
+
+    Baris hanya berubah jika stoknya masih cukup, jadi rowcount < jumlah
+    produk berarti ada yang kalah rebutan dengan kasir lain. Produk yang
+    berubah ditandai penanda stok baru untuk delta stok katalog.
+    """
+    versi_stok = _naikkan_versi_sql(db.session.connection(), VERSI_STOK_KEY)
+    qty_case = case(qty_per_produk, value=Produk.id)
+    return db.session.execute(
+        update(Produk)
+        .where(Produk.id.in_(list(qty_per_produk)), Produk.stok >= qty_case)
+        .values(stok=Produk.stok - qty_case, versi_stok=versi_stok)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def _item_katalog(rows, semua=False):
+    """Baris _KOLOM_KATALOG -> dict katalog, harga variasi dalam satu query.
+
+    semua=True jika rows adalah seluruh produk (tanpa IN daftar id yang panjang).
+    """
+    variasi = {row.id: [] for row in rows}
+    if rows:
+        query = (
+            select(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.harga, HargaVariasi.keterangan)
+            .order_by(HargaVariasi.produk_id, HargaVariasi.min_qty, HargaVariasi.id)
+        )
+        if not semua:
+            query = query.where(HargaVariasi.produk_id.in_(variasi))
+        for v in db.session.execute(query):
+            if v.produk_id in variasi:
+                variasi[v.produk_id].append({'min_qty': v.min_qty, 'harga': v.harga, 'keterangan': v.keterangan})
+    return [
+        {
+            'id': row.id,
+            'kode': row.kode,
+            'nama': row.nama,
+            'harga_jual': row.harga_jual,
+            'harga_variasi': variasi[row.id],
+            'stok': row.stok or 0,
+            'satuan': row.satuan,
+            'kategori_id': row.kategori_id,
+        }
+        for row in rows
+    ]
+
+def _item_snapshot(snapshot, rows):
+    """Baris (id, stok) -> dict katalog dari snapshot, stok dari database.
+
+    Produk yang belum ada di snapshot (ditambah setelah versinya dibaca)
+    dilewati; klien melihatnya setelah versi berikutnya.
+    """
+    items = []
+    for row in rows:
+        produk = snapshot.get(row.id)
+        if produk is not None:
+            produk['stok'] = row.stok or 0
+            items.append(produk)
+    return items
+
+def _select_halaman(kolom, cursor, limit, kategori_id, stok):
+    """SELECT satu halaman katalog urut id, satu baris lebih untuk tahu ada halaman berikutnya"""
+    query = select(*kolom).where(Produk.id > cursor).order_by(Produk.id).limit(limit + 1)
+    if KATALOG_FILTER_STOK[stok] is not None:
+        query = query.where(KATALOG_FILTER_STOK[stok])
     if kategori_id:
-        query = query.filter_by(kategori_id=kategori_id)
-    
-    produk_list = query.limit(50).all()  # Batasi hasil untuk performa
-    
-    return jsonify([p.to_dict() for p in produk_list])
+        query = query.where(Produk.kategori_id == kategori_id)
+    return query
+
+def halaman_katalog(cursor=0, limit=KATALOG_LIMIT_DEFAULT, kategori_id=None, stok='ada', versi=None):
+    """Satu halaman katalog, urut id (keyset: id > cursor), dalam tiga query
+    (atau satu query id + stok dan detail dari snapshot bersama jika
+    KATALOG_SNAPSHOT_PATH diisi).
+
+    next_cursor None berarti halaman terakhir. Versi dibaca sebelum data,
+    jadi perubahan di tengah jalan paling buruk membuat klien memuat ulang.
+    """
+    if versi is None:
+        versi = _versi_katalog()
+    snapshot = katalog_snapshot.get(versi) if katalog_snapshot is not None else None
+    kolom = (Produk.id, Produk.stok) if snapshot is not None else _KOLOM_KATALOG
+    rows = db.session.execute(_select_halaman(kolom, cursor, limit, kategori_id, stok)).all()
+    ada_lagi = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'versi': versi,
+        'items': _item_snapshot(snapshot, rows) if snapshot is not None else _item_katalog(rows),
+        'next_cursor': rows[-1].id if ada_lagi else None,
+    }
 
-@app.route('/transaksi/checkout', methods=['POST'])
+def perubahan_katalog(sejak, versi=None, stok_sejak=None, stok=None):
+    """Produk yang berubah & id yang dihapus setelah versi `sejak`.
+
+    Jika stok_sejak (penanda stok klien) diberikan, produk yang terjual sejak
+    itu ikut dikirim, jadi stok klien tetap segar. reset True berarti klien
+    harus memuat ulang katalog penuh (versi klien tidak dikenal, atau
+    perubahannya terlalu banyak untuk dikirim sebagai delta). Produk berubah
+    dikirim apa pun stoknya; filter stok urusan klien.
+    """
+    if versi is None:
+        versi, stok = _versi_katalog_stok()
+    if sejak == versi and (stok_sejak is None or stok_sejak == stok):
+        return {'versi': versi, 'stok': stok, 'reset': False, 'items': [], 'dihapus': []}
+    if sejak <= 0 or sejak > versi or (stok_sejak is not None and not 0 <= stok_sejak <= stok):
+        return {'versi': versi, 'stok': stok, 'reset': True}
+    berubah = Produk.versi > sejak
+    if stok_sejak is not None and stok_sejak < stok:
+        berubah = or_(berubah, Produk.versi_stok > stok_sejak)
+    rows = db.session.execute(
+        select(*_KOLOM_KATALOG).where(berubah).order_by(Produk.id).limit(KATALOG_DELTA_MAX + 1)
+    ).all()
+    if len(rows) > KATALOG_DELTA_MAX:
+        return {'versi': versi, 'stok': stok, 'reset': True}
+    dihapus = db.session.execute(
+        select(ProdukTerhapus.produk_id).where(ProdukTerhapus.versi > sejak).order_by(ProdukTerhapus.produk_id)
+    ).scalars().all()
+    return {'versi': versi, 'stok': stok, 'reset': False, 'items': _item_katalog(rows), 'dihapus': dihapus}
+
+def _json_katalog(buat):
+    """Respons JSON dengan ETag versi katalog + penanda stok: 304 tanpa query
+    data jika klien sudah punya keduanya. buat(versi, stok) -> data JSON.
+    """
+    versi, stok = _versi_katalog_stok()
+    etag = f'katalog-{versi}-{stok}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(buat(versi, stok))
+    response.set_etag(etag)
+    # Boleh disimpan browser, tapi selalu divalidasi ulang (If-None-Match)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/katalog')
 @login_required
-@csrf.exempt
-def checkout():
-    print("\n" + "="*50)
-    print("CHECKOUT PROCESS STARTED")
-    print("="*50)
-    
+def api_katalog():
+    """Katalog per halaman untuk halaman kasir (lazy load)"""
+    stok = request.args.get('stok', 'ada')
+    if stok not in KATALOG_FILTER_STOK:
+        return jsonify({'success': False, 'message': 'Filter stok harus ada, habis, atau semua'}), 400
+    limit = request.args.get('limit', KATALOG_LIMIT_DEFAULT, type=int)
+    return _json_katalog(lambda versi, _: halaman_katalog(
+        cursor=request.args.get('cursor', 0, type=int),
+        limit=min(max(limit, 1), KATALOG_LIMIT_MAX),
+        kategori_id=request.args.get('kategori_id', type=int),
+        stok=stok,
+        versi=versi,
+    ))
+
+@app.route('/api/katalog/perubahan')
+@login_required
+def api_katalog_perubahan():
+    """Delta katalog sejak versi tertentu (?sejak=N&stok=M) untuk sinkron register"""
+    sejak = request.args.get('sejak', 0, type=int)
+    stok_sejak = request.args.get('stok', type=int)
+    return _json_katalog(lambda versi, stok: perubahan_katalog(sejak, versi, stok_sejak, stok))
+
+# ==================== SNAPSHOT KATALOG ====================
+# Dengan beberapa worker gunicorn, katalog cukup disimpan sekali di file yang
+# di-mmap semua worker (lihat catalog_snapshot.py) alih-alih index/dict per
+# proses. Aktif jika KATALOG_SNAPSHOT_PATH diisi, mis. instance/katalog.snap;
+# dipakai halaman katalog, scan barcode, dan snapshot register offline.
+# Stok tidak ikut di snapshot (checkout tidak menaikkan versi katalog); setiap
+# pemakai membacanya dari database.
+
+KATALOG_SNAPSHOT_PATH = os.getenv('KATALOG_SNAPSHOT_PATH', '').strip()
+
+def _load_katalog_semua():
+    versi = _versi_katalog()
+    rows = db.session.execute(select(*_KOLOM_KATALOG).order_by(Produk.id)).all()
+    return versi, _item_katalog(rows, semua=True)
+
+katalog_snapshot = (
+    SnapshotManager(KATALOG_SNAPSHOT_PATH, _load_katalog_semua, _versi_katalog)
+    if KATALOG_SNAPSHOT_PATH else None
+)
+
+# ==================== GRID KASIR ====================
+# Kartu produk layar pertama kasir tanpa badge stok dirender sekali per versi
+# katalog (naik setiap produk/harga variasi berubah) lalu disimpan sebagai HTML
+# jadi. Checkout hanya mengubah stok, jadi per request cukup satu query
+# (id, stok) untuk memilih kartu yang lolos filter stok dan menempel badgenya.
+
+class GridCache:
+    """LRU kecil HTML kartu grid kasir (tanpa stok) per proses, key produk_id,
+    semuanya dari satu versi katalog
+    """
+
+    def __init__(self, max_entri=2000):
+        self.max_entri = max_entri
+        self._entri = OrderedDict()
+        self._versi = None
+        self._lock = threading.Lock()
+        self.stats = {'hit': 0, 'render': 0}
+
+    def _kartu(self, versi, ids):
+        """{produk_id: Markup kepala kartu} untuk ids; produk yang sudah dihapus dilewati"""
+        with self._lock:
+            if self._versi is None or versi > self._versi:
+                self._entri.clear()
+                self._versi = versi
+            kartu = {}
+            if versi == self._versi:
+                for produk_id in ids:
+                    if produk_id in self._entri:
+                        self._entri.move_to_end(produk_id)
+                        kartu[produk_id] = self._entri[produk_id]
+            self.stats['hit'] += len(kartu)
+        kurang = [produk_id for produk_id in ids if produk_id not in kartu]
+        if not kurang:
+            return kartu
+        snapshot = katalog_snapshot.get(versi) if katalog_snapshot is not None else None
+        if snapshot is not None:
+            items = [produk for produk in map(snapshot.get, kurang) if produk is not None]
+        else:
+            items = _item_katalog(db.session.execute(select(*_KOLOM_KATALOG).where(Produk.id.in_(kurang))).all())
+        kepala_kartu = get_template_attribute('transaksi/_grid_produk.html', 'kepala_kartu')
+        baru = {produk['id']: kepala_kartu(produk) for produk in items}
+        with self._lock:
+            self.stats['render'] += len(baru)
+            # Versi lebih lama dari isi cache (request yang kalah balapan): tidak disimpan
+            if versi == self._versi:
+                self._entri.update(baru)
+                while len(self._entri) > self.max_entri:
+                    self._entri.popitem(last=False)
+        kartu.update(baru)
+        return kartu
+
+    def get(self, kategori_id=None, stok='ada', versi=None, penanda=None):
+        """{'versi', 'penanda', 'grid' (Markup), 'next_cursor'} untuk layar pertama"""
+        if versi is None or penanda is None:
+            versi, penanda = _versi_katalog_stok()
+        rows = db.session.execute(
+            _select_halaman((Produk.id, Produk.stok), 0, KATALOG_HALAMAN_AWAL, kategori_id, stok)
+        ).all()
+        ada_lagi = len(rows) > KATALOG_HALAMAN_AWAL
+        rows = rows[:KATALOG_HALAMAN_AWAL]
+        kartu = self._kartu(versi, [row.id for row in rows])
+        ekor_kartu = get_template_attribute('transaksi/_grid_produk.html', 'ekor_kartu')
+        return {
+            'versi': versi,
+            'penanda': penanda,
+            'grid': Markup('').join(kartu[row.id] + ekor_kartu(row.stok or 0) for row in rows if row.id in kartu),
+            'next_cursor': rows[-1].id if ada_lagi else None,
+        }
+
+grid_cache = GridCache()
+
+@app.route('/kasir/grid')
+@login_required
+def kasir_grid():
+    """HTML kartu layar pertama (ganti kategori di kasir), dengan ETag versi
+    katalog + penanda stok; X-Katalog-Versi hanya versi katalog (untuk lazy load)
+    """
+    stok = request.args.get('stok', 'ada')
+    if stok not in KATALOG_FILTER_STOK:
+        return jsonify({'success': False, 'message': 'Filter stok harus ada, habis, atau semua'}), 400
+    versi, penanda = _versi_katalog_stok()
+    etag = f'katalog-{versi}-{penanda}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        grid = grid_cache.get(request.args.get('kategori_id', type=int), stok, versi=versi, penanda=penanda)
+        response = app.response_class(str(grid['grid']), mimetype='text/html')
+        response.headers['X-Next-Cursor'] = '' if grid['next_cursor'] is None else str(grid['next_cursor'])
+    response.headers['X-Katalog-Versi'] = str(versi)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# ==================== SCAN BARCODE ====================
+
+def _prefix_env(name, default):
+    return {p.strip() for p in os.getenv(name, default).split(',') if p.strip()}
+
+# Prefix EAN-13 timbangan toko: berat dalam gram atau harga dalam rupiah
+BARCODE_PREFIX_BERAT = _prefix_env('BARCODE_PREFIX_BERAT', '20,21,22,23,24')
+BARCODE_PREFIX_HARGA = _prefix_env('BARCODE_PREFIX_HARGA', '25,26,27,28,29')
+# Gram per satuan produk yang bisa dijual dengan barcode berat
+SATUAN_BERAT = {'g': 1, 'gr': 1, 'gram': 1, 'kg': 1000, 'kilo': 1000, 'kilogram': 1000}
+
+class BarcodeTidakValid(Exception):
+    """Barcode timbangan dikenali, tapi nilainya bukan quantity bulat produk itu"""
+
+def _load_barcode_delta(sejak):
+    data = perubahan_katalog(sejak)
+    if data['reset']:
+        return None
+    return data['versi'], data['items'], data['dihapus']
+
+barcode_index = BarcodeIndex(_load_katalog_semua, _load_barcode_delta, _versi_katalog)
+
+def scan_barcode(kode):
+    """Produk untuk hasil scan + quantity yang ditambahkan, atau None.
+
+    Kode produk yang persis sama selalu menang; barcode timbangan baru diurai
+    jika tidak ada produk dengan kode itu. Quantity keranjang bilangan bulat,
+    jadi barcode timbangan yang nilainya tidak pas (berat untuk produk
+    bersatuan pcs, harga bukan kelipatan harga satuan) ditolak dengan
+    BarcodeTidakValid, bukan dibulatkan. Stok produk dibaca dari database:
+    index barcode & snapshot hanya ikut versi katalog, bukan checkout.
+    """
+    kode = normalisasi_kode(kode)
+    cari_kode = katalog_snapshot.get().get_kode if katalog_snapshot is not None else barcode_index.get
+
+    def cari(kode):
+        produk = cari_kode(kode)
+        if produk is None:
+            return None
+        stok = db.session.execute(select(Produk.stok).where(Produk.id == produk['id'])).scalar()
+        return {**produk, 'stok': stok or 0}
+
+    produk = cari(kode)
+    if produk:
+        return {'produk': produk, 'quantity': 1}
+    timbang = urai_barcode_timbang(kode, BARCODE_PREFIX_BERAT, BARCODE_PREFIX_HARGA)
+    if not timbang:
+        return None
+    kandidat, jenis, nilai = timbang
+    produk = next((p for p in map(cari, kandidat) if p), None)
+    if not produk:
+        return None
+    if jenis == 'berat':
+        gram = SATUAN_BERAT.get((produk['satuan'] or '').strip().lower())
+        if gram is None:
+            raise BarcodeTidakValid(f"Barcode berat tidak bisa dipakai untuk produk bersatuan {produk['satuan'] or '-'}")
+        quantity, sisa = divmod(nilai, gram)
+        if sisa or not quantity:
+            raise BarcodeTidakValid(f"Berat {nilai} gram bukan kelipatan 1 {produk['satuan']}")
+    else:
+        harga = produk['harga_jual'] or 0
+        quantity = round(nilai / harga) if harga > 0 else 0
+        if not quantity or abs(quantity * harga - nilai) > 0.005:
+            raise BarcodeTidakValid(f'Harga di barcode (Rp {nilai:,}) bukan kelipatan harga satuan (Rp {harga:,.0f})')
+    return {'produk': produk, 'quantity': quantity, 'timbang': {'jenis': jenis, 'nilai': nilai}}
+
+@app.route('/api/scan')
+@login_required
+def api_scan():
+    """Lookup barcode persis untuk scanner kasir (?kode=...)"""
     try:
-        # Log user dan IP
-        user_info = f"User: {current_user.username} (ID: {current_user.id})"
-        ip_info = f"IP: {request.remote_addr}"
-        print(f"[Checkout] {user_info} | {ip_info}")
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'success': False, 'message': 'Data tidak valid'})
-        
-        items = data.get('items', [])
-        total = data.get('total', 0)
-        bayar = data.get('bayar', 0)
-        payment_method = data.get('payment_method', 'tunai')
-        member_id = data.get('member_id')
-        member_manual = data.get('member_manual')  # Input manual nama/telp
-        
-        print(f"[Checkout] Items: {len(items)}")
-        print(f"[Checkout] Total: Rp {total}")
-        print(f"[Checkout] Bayar: Rp {bayar}")
-        
-        if not items:
-            return jsonify({'success': False, 'message': 'Keranjang kosong'})
-        
-        # Validasi tipe data
+        hasil = scan_barcode(request.args.get('kode', ''))
+    except BarcodeTidakValid as e:
+        return jsonify({'success': False, 'message': str(e)}), 422
+    if not hasil:
+        return jsonify({'success': False, 'message': 'Barcode tidak ditemukan'}), 404
+    return jsonify({'success': True, **hasil})
+
+# ==================== SARAN PRODUK ====================
+# Saran nama produk yang tahan salah ketik ("indomi gorng"), dari index di memori
+
+SARAN_LIMIT = 10
+
+def _load_saran_semua():
+    versi = _versi_katalog()
+    return versi, db.session.execute(select(Produk.id, Produk.cari)).all()
+
+def _load_saran_delta(sejak):
+    data = perubahan_katalog(sejak)
+    if data['reset']:
+        return None
+    items = [(p['id'], teks_cari_produk(p['nama'], p['kode'])) for p in data['items']]
+    return data['versi'], items, data['dihapus']
+
+saran_index = FuzzyIndex(_load_saran_semua, _load_saran_delta, _versi_katalog)
+
+def produk_by_ids(ids, *filters):
+    """Produk dengan id tertentu (urutan ids dipertahankan), harga variasi ikut dimuat"""
+    if not ids:
+        return []
+    query = Produk.query.filter(Produk.id.in_(ids), *filters).options(joinedload(Produk.harga_variasi))
+    return urut_sesuai(ids, query)
+
+@app.route('/api/produk/saran')
+@login_required
+def api_produk_saran():
+    """Saran produk untuk kotak pencarian kasir (?q=..., maks. 10)"""
+    ids = saran_index.cari(request.args.get('q', ''), limit=SARAN_LIMIT)
+    return jsonify({'items': [p.to_dict() for p in produk_by_ids(ids)]})
+
+# ==================== CHECKOUT ENGINE ====================
+
+class CheckoutError(Exception):
+    """Error validasi checkout, pesannya aman ditampilkan ke kasir"""
+
+def _produk_stok_kurang(qty_per_produk, produk_map):
+    """Nama produk pertama yang stoknya sudah tidak cukup (untuk pesan error)"""
+    stok_sekarang = dict(db.session.execute(
+        select(Produk.id, Produk.stok).where(Produk.id.in_(list(qty_per_produk)))
+    ).all())
+    for produk_id, qty in qty_per_produk.items():
+        if (stok_sekarang.get(produk_id) or 0) < qty:
+            return produk_map[produk_id].nama
+    return 'produk'
+
+def _parse_checkout(data, user_id, idempotency_key=None):
+    """Validasi body checkout, return dict penjualan (format sama dengan sync offline)"""
+    if not data:
+        raise CheckoutError('Data tidak valid')
+
+    items = data.get('items', [])
+    bayar = data.get('bayar', 0)
+    member_id = data.get('member_id')
+    member_manual = data.get('member_manual')  # Input manual nama/telp
+
+    if not items:
+        raise CheckoutError('Keranjang kosong')
+
+    # Validasi tipe data
+    try:
+        float(data.get('total', 0))
+        bayar = float(bayar)
+    except (TypeError, ValueError):
+        raise CheckoutError('Format angka tidak valid')
+
+    if member_id:
         try:
-            total = float(total)
-            bayar = float(bayar)
-        except ValueError:
-            return jsonify({'success': False, 'message': 'Format angka tidak valid'})
-        
-        member = None
-        if member_id:
-            try:
-                member = Member.query.get(int(member_id))
-            except (TypeError, ValueError):
-                return jsonify({'success': False, 'message': 'Member tidak valid'})
-            if not member:
-                return jsonify({'success': False, 'message': 'Member tidak ditemukan'})
+            member_id = int(member_id)
+        except (TypeError, ValueError):
+            raise CheckoutError('Member tidak valid')
+    else:
+        member_id = None
 
-        # Calculate totals server-side
-        subtotal = 0
-        for item in items:
-            try:
-                qty = int(item.get('quantity', 1))
-                price = float(item.get('price', 0))
-            except (TypeError, ValueError):
-                return jsonify({'success': False, 'message': 'Format item tidak valid'})
-            if qty < 1 or price < 0:
-                return jsonify({'success': False, 'message': 'Data item tidak valid'})
-            subtotal += qty * price
+    return {
+        'client_id': idempotency_key,
+        'user_id': user_id,
+        'tanggal': None,  # diisi saat disimpan
+        'lines': _parse_baris_keranjang(items),
+        'bayar': bayar,
+        'payment_method': data.get('payment_method', 'tunai'),
+        'member_id': member_id,
+        'member_manual': member_manual if not member_id else None,  # Simpan input manual jika bukan member terdaftar
+    }
+
+def proses_checkout(penjualan):
+    """Simpan satu penjualan (dict dari _parse_checkout) dengan jumlah statement SQL yang tetap.
+
+    Semua produk di keranjang dimuat dengan satu query IN (...), item
+    disimpan dengan satu bulk INSERT, stok dikurangi dengan satu UPDATE
+    (CASE per produk), dan agregat member diperbarui di transaksi yang sama.
+    Hanya ada satu commit. Melempar CheckoutError jika data tidak valid.
+
+    Pengurangan stok bersyarat (stok >= qty) di database, jadi dua kasir yang
+    menjual sisa stok terakhir bersamaan tidak bisa membuat stok minus.
+
+    Harga setiap baris dihitung ulang dengan pricing_engine (harga dari
+    browser tidak dipakai), jadi total selalu sama dengan /api/cart/quote.
+
+    Jika ada idempotency key (client_id), respons disimpan di transaksi yang
+    sama; request kembar yang lolos bersamaan gagal di primary key
+    (IntegrityError).
+    """
+    user_id = penjualan['user_id']
+    idempotency_key = penjualan['client_id']
+    sidik = IdempotencyStore.sidik(penjualan) if idempotency_key else None
+    bayar = penjualan['bayar']
+    payment_method = penjualan['payment_method']
+    member_id = penjualan['member_id']
+    member_manual = penjualan['member_manual']
+
+    # Nomor urut harian dari blok milik worker ini (tanpa lock global per
+    # penjualan), diambil sebelum baris produk dikunci: pemesanan blok baru
+    # di-commit lewat koneksi session ini (lihat _reserve_kode_block)
+    tanggal = get_local_now()
+    tanggal_kode = tanggal.strftime('%Y%m%d')
+    nomor = kode_allocator.ambil(tanggal_kode)
+    kode_transaksi = kode_allocator.format(tanggal_kode, nomor)
+
+    try:
+        # Harga setiap baris dihitung ulang di server; 'price' dari browser diabaikan
+        baris, subtotal, qty_per_produk = hitung_harga_keranjang(penjualan['lines'])
+        if any(b['harga'] is None for b in baris):
+            raise CheckoutError('Produk tidak ditemukan')
 
         total = subtotal
-        points_earned = calculate_points_from_total(total) if member else 0
+        points_earned = calculate_points_from_total(total) if member_id else 0
 
         if bayar < total:
-            return jsonify({'success': False, 'message': 'Pembayaran kurang'})
-        
-        kode_transaksi = f'TRX{get_local_now().strftime("%Y%m%d%H%M%S")}'
-        print(f"[Checkout] Transaction code: {kode_transaksi}")
-        print(f"[Checkout] Local Time: {get_local_now().strftime('%Y-%m-%d %H:%M:%S')} {get_local_timezone_name()}")
-        
-        # Buat transaksi
+            raise CheckoutError('Pembayaran kurang')
+
+        # Satu query untuk semua produk di keranjang. Di PostgreSQL baris produk
+        # dikunci berurutan id (FOR UPDATE) supaya dua checkout tidak deadlock.
+        produk_rows = db.session.execute(
+            select(Produk.id, Produk.nama, Produk.stok)
+            .where(Produk.id.in_(list(qty_per_produk)))
+            .order_by(Produk.id)
+            .with_for_update()
+        ).all()
+        produk_map = {row.id: row for row in produk_rows}
+        for produk_id, qty in qty_per_produk.items():
+            produk = produk_map.get(produk_id)
+            if not produk:
+                raise CheckoutError('Produk tidak ditemukan')
+            if (produk.stok or 0) < qty:
+                raise CheckoutError(f'Stok {produk.nama} tidak cukup')
+
         transaksi = Transaksi(
             kode_transaksi=kode_transaksi,
+            tanggal=tanggal,
             subtotal=subtotal,
             discount_percent=0,
             discount_amount=0,
@@ -1362,67 +3168,50 @@ def checkout():
             bayar=bayar,
             kembalian=bayar - total,
             payment_method=payment_method,
-            user_id=current_user.id,
-            member_id=member.id if member else None,
-            member_manual=member_manual if not member else None,  # Simpan input manual jika bukan member terdaftar
+            user_id=user_id,
+            member_id=member_id,
+            member_manual=member_manual,
             points_earned=points_earned
         )
         db.session.add(transaksi)
         db.session.flush()
-        
-        # Log timestamp transaksi
-        print(f"[Checkout] Transaction timestamp: {transaksi.tanggal.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Tambahkan items
-        for item in items:
-            produk = Produk.query.get(item['id'])
-            if not produk:
-                return jsonify({'success': False, 'message': f'Produk tidak ditemukan'})
-                
-            quantity = item.get('quantity', 1)
-            
-            print(f"[Checkout] Item: {produk.nama} x{quantity}")
-            
-            if produk.stok < quantity:
-                return jsonify({'success': False, 'message': f'Stok {produk.nama} tidak cukup'})
-            
-            transaksi_item = TransaksiItem(
-                transaksi_id=transaksi.id,
-                produk_id=item['id'],
-                jumlah=quantity,
-                harga=item['price'],
-                subtotal=item['price'] * quantity
+        transaksi_id = transaksi.id
+
+        # Satu bulk INSERT untuk semua item
+        db.session.execute(insert(TransaksiItem), [
+            {
+                'transaksi_id': transaksi_id,
+                'produk_id': b['id'],
+                'jumlah': b['quantity'],
+                'harga': b['harga'],
+                'subtotal': b['subtotal'],
+            }
+            for b in baris
+        ])
+
+        # Stok kurang di salah satu produk: seluruh penjualan dibatalkan
+        if _kurangi_stok(qty_per_produk) != len(qty_per_produk):
+            raise CheckoutError(f'Stok {_produk_stok_kurang(qty_per_produk, produk_map)} tidak cukup')
+
+        if member_id:
+            result = db.session.execute(
+                update(Member)
+                .where(Member.id == member_id)
+                .values(
+                    points=db.func.coalesce(Member.points, 0) + points_earned,
+                    total_spent=db.func.coalesce(Member.total_spent, 0) + total
+                )
+                .execution_options(synchronize_session=False)
             )
-            db.session.add(transaksi_item)
-            produk.stok -= quantity
-        
-        # Commit transaksi
-        db.session.commit()
+            if result.rowcount == 0:
+                raise CheckoutError('Member tidak ditemukan')
 
-        if member:
-            member.points = (member.points or 0) + points_earned
-            member.total_spent = (member.total_spent or 0) + total
-            db.session.commit()
-        print("[Checkout] ✓ Transaction saved to database")
-        
-        # === BACKUP SETELAH TRANSAKSI ===
-        print("\n[Backup] Starting backup after transaction...")
-        backup_success = backup_database()
-        
-        if backup_success:
-            print("[Backup] ✓ Backup completed successfully!")
-        else:
-            print("[Backup] ✗ Backup failed!")
-        
-        print("="*50)
-        print("CHECKOUT PROCESS COMPLETED")
-        print("="*50 + "\n")
-        
-        return jsonify({
-            'success': True,
+        catat_rekap([(tanggal, payment_method, user_id, total, baris)])
+
+        hasil = {
             'kode_transaksi': kode_transaksi,
             'kembalian': bayar - total,
-            'transaksi_id': transaksi.id,
+            'transaksi_id': transaksi_id,
             'total': total,
             'subtotal': subtotal,
             'discount_percent': 0,
@@ -1430,22 +3219,599 @@ def checkout():
             'points_earned': points_earned,
             'bayar': bayar,
             'payment_method': payment_method,
-            'tanggal': transaksi.tanggal.strftime('%Y-%m-%d %H:%M:%S'),
-            'kasir': current_user.nama
+            'tanggal': tanggal.strftime('%Y-%m-%d %H:%M:%S'),
+            'items': len(baris),
+        }
+        if idempotency_key:
+            db.session.add(idempotency_store.new_row(idempotency_key, user_id, sidik, hasil))
+
+        db.session.commit()
+    except Exception:
+        # Penjualan batal, nomor dipakai lagi oleh checkout berikutnya
+        db.session.rollback()
+        kode_allocator.kembalikan(tanggal_kode, nomor)
+        raise
+
+    if idempotency_key:
+        idempotency_store.remember(idempotency_key, user_id, sidik, hasil)
+    _log_items(kode_transaksi, baris)
+    return hasil
+
+def _log_items(kode_transaksi, baris):
+    # Tanpa biaya kecuali kasir.checkout.item diset ke DEBUG
+    if not log_item.isEnabledFor(logging.DEBUG):
+        return
+    for b in baris:
+        log_item.debug('Item terjual', extra={
+            'kode': kode_transaksi, 'produk_id': b['id'], 'qty': b['quantity'], 'harga': b['harga'],
+        })
+
+def _respons_checkout(hasil, **extra):
+    payload = {k: v for k, v in hasil.items() if k != 'items'}
+    return jsonify({'success': True, 'kasir': current_user.nama, **payload, **extra})
+
+# ==================== PENJUALAN BATCH ====================
+# Banyak penjualan disimpan dalam satu transaksi dengan jumlah statement
+# tetap. Dipakai sync antrian offline register dan group commit checkout.
+
+class _BatchStokBerubah(Exception):
+    """Stok berubah oleh checkout lain di tengah batch, ulangi seluruh batch"""
+
+def simpan_penjualan_batch(penjualan, blok_per_tanggal=True):
+    """Simpan list penjualan (dict dari _parse_checkout/_parse_penjualan_offline).
+
+    Penjualan diproses urut waktu. Yang client_id-nya sudah pernah tersimpan
+    untuk user yang sama (atau muncul dua kali di batch) menjadi 'duplikat'
+    dengan respons aslinya, atau 'ditolak' jika isi penjualannya berbeda.
+    Yang produk/membernya tidak ada, stoknya tidak cukup, atau bayarnya kurang
+    setelah harga dihitung ulang menjadi 'konflik' dan tidak disimpan. Sisanya
+    disimpan dalam satu transaksi: satu INSERT transaksi, satu INSERT item,
+    satu UPDATE stok dan satu UPDATE member untuk seluruh batch.
+
+    blok_per_tanggal=True memesan satu blok nomor per tanggal (antrian offline
+    bisa berisi hari-hari sebelumnya); False memakai kode_allocator seperti
+    checkout biasa. Return list (status, data) sesuai urutan input: data
+    berupa respons checkout untuk 'ok'/'duplikat' dan pesan untuk
+    'konflik'/'ditolak'.
+    """
+    for _ in range(3):
+        try:
+            return _simpan_batch_sekali(penjualan, blok_per_tanggal)
+        except (_BatchStokBerubah, IntegrityError):
+            # Kasir lain checkout / register lain sync batch yang sama bersamaan
+            db.session.rollback()
+    raise CheckoutError('Database sedang sibuk, coba lagi')
+
+def _simpan_batch_sekali(penjualan, blok_per_tanggal):
+    sekarang = get_local_now()
+    hasil = [None] * len(penjualan)
+
+    # Dedupe per (user, client_id) di dalam batch & terhadap yang sudah
+    # tersimpan (satu query); key sama dengan isi berbeda ditolak
+    sidik = [IdempotencyStore.sidik(p) if p['client_id'] else None for p in penjualan]
+    sudah_ada = idempotency_store.get_many({(p['user_id'], p['client_id']) for p in penjualan if p['client_id']})
+    unik, pertama, kembar = [], {}, {}
+    for i, p in enumerate(penjualan):
+        key = (p['user_id'], p['client_id']) if p['client_id'] else None
+        if key in sudah_ada:
+            tersimpan, respons_lama = sudah_ada[key]
+            if tersimpan is not None and tersimpan != sidik[i]:
+                hasil[i] = ('ditolak', IdempotencyStore.PESAN_KONFLIK)
+            else:
+                hasil[i] = ('duplikat', respons_lama)
+        elif key in pertama:
+            if sidik[pertama[key]] != sidik[i]:
+                hasil[i] = ('ditolak', IdempotencyStore.PESAN_KONFLIK)
+            else:
+                kembar[i] = pertama[key]
+        else:
+            if key:
+                pertama[key] = i
+            unik.append(i)
+    unik.sort(key=lambda i: penjualan[i]['tanggal'] or sekarang)
+
+    # Nomor transaksi dipesan untuk semua kandidat sebelum baris produk dikunci
+    # (lihat _reserve_kode_block); yang tidak terpakai dikembalikan di akhir
+    nomor = _NomorBatch(blok_per_tanggal)
+    for i in unik:
+        nomor.pesan(i, (penjualan[i]['tanggal'] or sekarang).strftime('%Y%m%d'))
+    nomor.reserve()
+
+    # Semua produk & member yang disebut batch ini, masing-masing satu query
+    produk_ids = sorted({produk_id for i in unik for produk_id, _ in penjualan[i]['lines']})
+    tables = pricing_engine.tables(produk_ids) if produk_ids else {}
+    stok = {}
+    nama = {}
+    if produk_ids:
+        for row in db.session.execute(
+            select(Produk.id, Produk.nama, Produk.stok)
+            .where(Produk.id.in_(produk_ids))
+            .order_by(Produk.id)
+            .with_for_update()
+        ):
+            stok[row.id] = row.stok or 0
+            nama[row.id] = row.nama
+    member_ids = {penjualan[i]['member_id'] for i in unik if penjualan[i]['member_id']}
+    member_ada = set(db.session.execute(
+        select(Member.id).where(Member.id.in_(member_ids))
+    ).scalars()) if member_ids else set()
+
+    diterima = []
+    for i in unik:
+        p = penjualan[i]
+        baris, subtotal, qty_per_produk = hitung_harga_keranjang(p['lines'], tables)
+        pesan = None
+        if any(b['harga'] is None or b['id'] not in stok for b in baris):
+            pesan = 'Produk tidak ditemukan'
+        elif p['member_id'] and p['member_id'] not in member_ada:
+            pesan = 'Member tidak ditemukan'
+        elif p['bayar'] < subtotal:
+            pesan = 'Pembayaran kurang'
+        else:
+            kurang = next((pid for pid, qty in qty_per_produk.items() if stok[pid] < qty), None)
+            if kurang is not None:
+                pesan = f'Stok {nama[kurang]} tidak cukup'
+        if pesan:
+            hasil[i] = ('konflik', pesan)
+            continue
+        for pid, qty in qty_per_produk.items():
+            stok[pid] -= qty
+        diterima.append((i, p['tanggal'] or sekarang, baris, subtotal, qty_per_produk))
+
+    if not diterima:
+        db.session.rollback()
+        nomor.lepas()
+        return _isi_kembar(hasil, kembar)
+
+    kode = {i: nomor.kode(i) for i, *_rest in diterima}
+
+    try:
+        transaksi_rows = []
+        for i, tanggal, baris, subtotal, _qty in diterima:
+            p = penjualan[i]
+            transaksi_rows.append({
+                'kode_transaksi': kode[i],
+                'tanggal': tanggal,
+                'subtotal': subtotal,
+                'discount_percent': 0,
+                'discount_amount': 0,
+                'total': subtotal,
+                'bayar': p['bayar'],
+                'kembalian': p['bayar'] - subtotal,
+                'payment_method': p['payment_method'],
+                'user_id': p['user_id'],
+                'member_id': p['member_id'],
+                'member_manual': p['member_manual'],
+                'points_earned': calculate_points_from_total(subtotal) if p['member_id'] else 0,
+            })
+        # render_nulls: baris dengan/tanpa member tetap satu batch INSERT
+        transaksi_id = dict(db.session.execute(
+            insert(Transaksi).returning(Transaksi.kode_transaksi, Transaksi.id)
+            .execution_options(render_nulls=True),
+            transaksi_rows
+        ).all())
+
+        db.session.execute(insert(TransaksiItem), [
+            {
+                'transaksi_id': transaksi_id[kode[i]],
+                'produk_id': b['id'],
+                'jumlah': b['quantity'],
+                'harga': b['harga'],
+                'subtotal': b['subtotal'],
+            }
+            for i, _tanggal, baris, _subtotal, _qty in diterima
+            for b in baris
+        ])
+
+        # Stok seluruh batch dalam satu UPDATE bersyarat (sama seperti checkout)
+        qty_total = {}
+        for *_rest, qty_per_produk in diterima:
+            for pid, qty in qty_per_produk.items():
+                qty_total[pid] = qty_total.get(pid, 0) + qty
+        if _kurangi_stok(qty_total) != len(qty_total):
+            raise _BatchStokBerubah()
+
+        points, spent = {}, {}
+        for row in transaksi_rows:
+            if row['member_id']:
+                points[row['member_id']] = points.get(row['member_id'], 0) + row['points_earned']
+                spent[row['member_id']] = spent.get(row['member_id'], 0) + row['total']
+        if points:
+            db.session.execute(
+                update(Member)
+                .where(Member.id.in_(list(points)))
+                .values(
+                    points=db.func.coalesce(Member.points, 0) + case(points, value=Member.id),
+                    total_spent=db.func.coalesce(Member.total_spent, 0) + case(spent, value=Member.id)
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        catat_rekap(
+            (tanggal, row['payment_method'], row['user_id'], row['total'], baris)
+            for (_i, tanggal, baris, _subtotal, _qty), row in zip(diterima, transaksi_rows)
+        )
+
+        respons = {}
+        for (i, tanggal, baris, _subtotal, _qty), row in zip(diterima, transaksi_rows):
+            respons[i] = {
+                'kode_transaksi': row['kode_transaksi'],
+                'kembalian': row['kembalian'],
+                'transaksi_id': transaksi_id[row['kode_transaksi']],
+                'total': row['total'],
+                'subtotal': row['subtotal'],
+                'discount_percent': 0,
+                'discount_amount': 0,
+                'points_earned': row['points_earned'],
+                'bayar': row['bayar'],
+                'payment_method': row['payment_method'],
+                'tanggal': tanggal.strftime('%Y-%m-%d %H:%M:%S'),
+                'items': len(baris),
+            }
+            if penjualan[i]['client_id']:
+                db.session.add(idempotency_store.new_row(penjualan[i]['client_id'], row['user_id'], sidik[i],
+                                                         respons[i]))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        nomor.lepas(semua=True)
+        raise
+    nomor.lepas()
+
+    for i in respons:
+        if penjualan[i]['client_id']:
+            idempotency_store.remember(penjualan[i]['client_id'], penjualan[i]['user_id'], sidik[i], respons[i])
+        hasil[i] = ('ok', respons[i])
+    for i, _tanggal, baris, _subtotal, _qty in diterima:
+        _log_items(kode[i], baris)
+    return _isi_kembar(hasil, kembar)
+
+class _NomorBatch:
+    """Nomor transaksi untuk kandidat satu batch, dipesan sebelum baris dikunci.
+
+    Tanpa blok_per_tanggal setiap kandidat mengambil nomor dari kode_allocator.
+    Dengan blok_per_tanggal satu blok dipesan langsung per tanggal (antrian
+    offline bisa berisi hari-hari sebelumnya), lalu penjualan yang diterima
+    mendapat nomor berurutan dari awal blok dan sisa di ujung blok dikembalikan
+    jika belum ada worker lain yang memesan sesudahnya.
+    """
+
+    def __init__(self, blok_per_tanggal):
+        self.blok_per_tanggal = blok_per_tanggal
+        self._tanggal = {}   # i -> tanggal_kode
+        self._nomor = {}     # i -> nomor (allocator)
+        self._blok = {}      # tanggal_kode -> [nomor awal, jumlah, terpakai]
+        self._dipakai = set()
+
+    def pesan(self, i, tanggal_kode):
+        self._tanggal[i] = tanggal_kode
+        if self.blok_per_tanggal:
+            self._blok.setdefault(tanggal_kode, [0, 0, 0])[1] += 1
+        else:
+            self._nomor[i] = kode_allocator.ambil(tanggal_kode)
+
+    def reserve(self):
+        for tanggal_kode, blok in self._blok.items():
+            blok[0] = _reserve_kode_block(tanggal_kode, blok[1])
+
+    def kode(self, i):
+        """Kode transaksi untuk kandidat i yang diterima (urut pemanggilan per tanggal)"""
+        tanggal_kode = self._tanggal[i]
+        self._dipakai.add(i)
+        if self.blok_per_tanggal:
+            blok = self._blok[tanggal_kode]
+            nomor = blok[0] + blok[2]
+            blok[2] += 1
+        else:
+            nomor = self._nomor[i]
+        return kode_allocator.format(tanggal_kode, nomor)
+
+    def lepas(self, semua=False):
+        """Kembalikan nomor yang tidak dipakai (semua=True setelah rollback)"""
+        if semua:
+            self._dipakai.clear()
+            for blok in self._blok.values():
+                blok[2] = 0
+        for i, nomor in self._nomor.items():
+            if i not in self._dipakai:
+                kode_allocator.kembalikan(self._tanggal[i], nomor)
+        for tanggal_kode, (awal, jumlah, terpakai) in self._blok.items():
+            if terpakai < jumlah:
+                try:
+                    _release_kode_block(tanggal_kode, awal + terpakai, awal + jumlah - 1)
+                except SQLAlchemyError as e:
+                    # Penjualannya sudah tersimpan; sisa blok hanya jadi nomor yang terlewat
+                    log_sync.warning('Gagal mengembalikan sisa blok nomor: %s', e, extra={'tanggal': tanggal_kode})
+        self._nomor, self._blok = {}, {}
+
+def _isi_kembar(hasil, kembar):
+    # Request kembar di batch yang sama mendapat hasil penjualan pertamanya
+    for i, j in kembar.items():
+        status, data = hasil[j]
+        hasil[i] = ('duplikat', data) if status in ('ok', 'duplikat') else hasil[j]
+    return hasil
+
+# ==================== SINKRON PENJUALAN OFFLINE ====================
+
+# Batas penjualan per request sync (register mengirim antrian per potongan)
+SYNC_MAX_PENJUALAN = 500
+
+def _waktu_iso(teks):
+    """datetime.fromisoformat yang juga menerima akhiran Z dari Date.toISOString()
+    (Python < 3.11 menolaknya)
+    """
+    teks = str(teks)
+    if teks[-1:] in ('Z', 'z'):
+        teks = teks[:-1] + '+00:00'
+    return datetime.fromisoformat(teks)
+
+def _parse_penjualan_offline(sale, user_id, sekarang):
+    """Validasi satu penjualan dari antrian offline register"""
+    if not isinstance(sale, dict):
+        raise CheckoutError('Data tidak valid')
+    client_id = sale.get('client_id')
+    if not IdempotencyStore.valid_key(client_id):
+        raise CheckoutError('client_id tidak valid')
+    if not sale.get('items'):
+        raise CheckoutError('Keranjang kosong')
+    try:
+        tanggal = _waktu_iso(sale.get('tanggal'))
+        bayar = float(sale.get('bayar', 0))
+        member_id = int(sale['member_id']) if sale.get('member_id') else None
+    except (TypeError, ValueError):
+        raise CheckoutError('Format data tidak valid')
+    if tanggal.tzinfo is not None:
+        # Jam dari browser (UTC) dijadikan jam lokal server seperti kolom tanggal lain
+        tanggal = tanggal.astimezone().replace(tzinfo=None)
+    if tanggal > sekarang + timedelta(minutes=5):
+        raise CheckoutError('Tanggal transaksi di masa depan')
+    return {
+        'client_id': client_id,
+        'user_id': user_id,
+        'tanggal': tanggal,
+        'lines': _parse_baris_keranjang(sale['items']),
+        'bayar': bayar,
+        'payment_method': sale.get('payment_method') or 'tunai',
+        'member_id': member_id,
+        'member_manual': sale.get('member_manual') if not member_id else None,
+    }
+
+def proses_sync_penjualan(sales, user_id):
+    """Simpan antrian penjualan offline, return hasil per penjualan sesuai urutan input"""
+    sekarang = get_local_now()
+    hasil = [None] * len(sales)
+    valid, posisi = [], []
+    for i, sale in enumerate(sales):
+        try:
+            valid.append(_parse_penjualan_offline(sale, user_id, sekarang))
+            posisi.append(i)
+        except CheckoutError as e:
+            client_id = sale.get('client_id') if isinstance(sale, dict) else None
+            hasil[i] = {'client_id': client_id, 'status': 'ditolak', 'message': str(e)}
+
+    for i, p, (status, data) in zip(posisi, valid, simpan_penjualan_batch(valid)):
+        if status in ('ok', 'duplikat'):
+            hasil[i] = {'client_id': p['client_id'], 'status': status, 'kode_transaksi': data['kode_transaksi'],
+                        'transaksi_id': data['transaksi_id'], 'total': data['total']}
+        else:
+            hasil[i] = {'client_id': p['client_id'], 'status': status, 'message': data}
+    return hasil
+
+# ==================== GROUP COMMIT CHECKOUT ====================
+# Opsional untuk SQLite (GROUP_COMMIT=1): checkout diantrikan ke satu writer
+# per worker yang menyimpan semua penjualan yang datang bersamaan dalam satu
+# transaksi & satu fsync. Paling efektif dengan satu worker gunicorn yang
+# memakai banyak thread (--threads), karena writer tidak dibagi antar proses.
+
+GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', '5'))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', '64'))
+
+def _proses_batch_checkout(penjualan):
+    """Dijalankan di thread writer: simpan batch, return hasil per checkout"""
+    with app.app_context():
+        with PenghitungStatement() as penghitung:
+            hasil = simpan_penjualan_batch(penjualan, blok_per_tanggal=False)
+        info = {'statement_count': penghitung.jumlah, 'batch_size': len(penjualan)}
+        keluaran = []
+        for status, data in hasil:
+            if status == 'ok':
+                keluaran.append((data, info))
+            elif status == 'duplikat':
+                keluaran.append((data, {**info, 'replay': True}))
+            elif status == 'ditolak':
+                keluaran.append(IdempotencyConflict(data))
+            else:
+                keluaran.append(CheckoutError(data))
+        return keluaran
+
+def group_commit_aktif():
+    return os.getenv('GROUP_COMMIT', '').lower() in ('1', 'true', 'yes') and DATABASE_URL.startswith('sqlite')
+
+checkout_writer = GroupCommitWriter(
+    _proses_batch_checkout,
+    window=GROUP_COMMIT_WINDOW_MS / 1000,
+    max_batch=GROUP_COMMIT_MAX_BATCH,
+) if group_commit_aktif() else None
+
+@app.route('/transaksi/checkout', methods=['POST'])
+@login_required
+@csrf.exempt
+def checkout():
+    # Konteks yang ikut di setiap record log checkout
+    konteks = {'user': current_user.username, 'ip': request.remote_addr}
+    try:
+        data = request.get_json(silent=True)
+        
+        # Retry/double-click dengan key & isi yang sama mendapat respons asli,
+        # tanpa menyimpan transaksi atau mengurangi stok lagi
+        idempotency_key = request.headers.get('Idempotency-Key') or (data or {}).get('idempotency_key')
+        if idempotency_key is not None and not IdempotencyStore.valid_key(idempotency_key):
+            return jsonify({'success': False, 'message': 'Idempotency key tidak valid'})
+        penjualan = _parse_checkout(data, current_user.id, idempotency_key)
+        sidik = IdempotencyStore.sidik(penjualan)
+        if idempotency_key:
+            hasil = idempotency_store.get(idempotency_key, current_user.id, sidik)
+            if hasil is not None:
+                log_checkout.info('Replay checkout', extra={**konteks, 'kode': hasil['kode_transaksi']})
+                return _respons_checkout(hasil, replay=True)
+        
+        extra = {}
+        with PenghitungStatement() as penghitung:
+            if checkout_writer is not None:
+                # Disimpan oleh thread writer bersama checkout lain yang datang bersamaan
+                hasil, info = checkout_writer.submit(penjualan)
+                extra = {'batch_size': info['batch_size']}
+                penghitung.jumlah = info['statement_count']
+                if info.get('replay'):
+                    log_checkout.info('Replay checkout', extra={**konteks, 'kode': hasil['kode_transaksi']})
+                    return _respons_checkout(hasil, replay=True)
+            else:
+                try:
+                    hasil = proses_checkout(penjualan)
+                except IntegrityError:
+                    # Request kembar diproses bersamaan dan yang lain sudah commit duluan
+                    hasil = idempotency_store.get(idempotency_key, current_user.id, sidik) if idempotency_key else None
+                    if hasil is None:
+                        raise
+                    log_checkout.info('Replay checkout', extra={**konteks, 'kode': hasil['kode_transaksi']})
+                    return _respons_checkout(hasil, replay=True)
+        
+        # Satu record per penjualan
+        log_checkout.info('Checkout tersimpan', extra={
+            **konteks,
+            'kode': hasil['kode_transaksi'],
+            'items': hasil['items'],
+            'total': hasil['total'],
+            'bayar': hasil['bayar'],
+            'tanggal': hasil['tanggal'],
+            'statements': penghitung.jumlah,
+            **extra,
         })
         
-    except Exception as e:
+        # Backup dijadwalkan di background, checkout tidak menunggu
+        if DATABASE_URL.startswith('sqlite'):
+            backup_scheduler.signal()
+        
+        return _respons_checkout(hasil, statement_count=penghitung.jumlah, **extra)
+    
+    except IdempotencyConflict as e:
         db.session.rollback()
-        print(f"[Checkout] ✗ Error: {e}")
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"[Checkout TRACEBACK] {error_detail}")
+        log_checkout.info('Checkout ditolak: %s', e, extra=konteks)
+        return jsonify({'success': False, 'message': str(e)}), 409
+
+    except CheckoutError as e:
+        db.session.rollback()
+        log_checkout.info('Checkout ditolak: %s', e, extra=konteks)
+        return jsonify({'success': False, 'message': str(e)})
+
+    except TimeoutError:
+        # Masih di antrian group commit saat timeout: dibatalkan, belum tersimpan
+        log_checkout.warning('Checkout timeout di antrian group commit', extra=konteks)
+        return jsonify({'success': False, 'message': 'Server sedang sibuk, coba lagi'}), 503
+        
+    except Exception:
+        db.session.rollback()
+        log_checkout.exception('Checkout error', extra=konteks)
         
         return jsonify({
             'success': False, 
             'message': 'Terjadi kesalahan sistem'
         })
 
+@app.route('/api/cart/quote', methods=['POST'])
+@login_required
+@csrf.exempt
+def cart_quote():
+    """Harga seluruh keranjang dalam satu panggilan (aturan sama dengan checkout)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        baris, subtotal, _ = hitung_harga_keranjang(_parse_baris_keranjang(data.get('items', [])))
+    except CheckoutError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'items': baris,
+        'subtotal': subtotal,
+        'total': subtotal,
+    })
+
+@app.route('/api/kasir/snapshot')
+@login_required
+def kasir_snapshot():
+    """Katalog untuk mode offline register: produk + tier harga + member.
+
+    Setelah ini register cukup mengambil
+    /api/katalog/perubahan?sejak=versi_katalog&stok=stok_katalog.
+    """
+    versi_katalog, stok_katalog = _versi_katalog_stok()
+    if katalog_snapshot is not None:
+        produk = _item_snapshot(katalog_snapshot.get(versi_katalog),
+                                db.session.execute(select(Produk.id, Produk.stok).order_by(Produk.id)))
+    else:
+        produk = []
+        for p in Produk.query.options(joinedload(Produk.harga_variasi)).order_by(Produk.id):
+            produk.append({
+                'id': p.id,
+                'kode': p.kode,
+                'nama': p.nama,
+                'harga_jual': p.harga_jual,
+                'harga_variasi': [
+                    {'min_qty': v.min_qty, 'harga': v.harga, 'keterangan': v.keterangan}
+                    for v in p.harga_variasi
+                ],
+                'stok': p.stok,
+                'satuan': p.satuan,
+            })
+    member = [{'id': m.id, 'nama': m.nama, 'no_telp': m.no_telp} for m in Member.query.order_by(Member.nama)]
+    return jsonify({
+        'versi_harga': _versi_harga(),
+        'versi_katalog': versi_katalog,
+        'stok_katalog': stok_katalog,
+        'dibuat': get_local_now().strftime('%Y-%m-%d %H:%M:%S'),
+        'produk': produk,
+        'member': member,
+    })
+
+@app.route('/transaksi/sync', methods=['POST'])
+@login_required
+@csrf.exempt
+def sync_penjualan():
+    """Terima antrian penjualan offline register dalam satu request"""
+    data = request.get_json(silent=True) or {}
+    sales = data.get('sales')
+    if not isinstance(sales, list):
+        return jsonify({'success': False, 'message': 'Data tidak valid'}), 400
+    if len(sales) > SYNC_MAX_PENJUALAN:
+        return jsonify({'success': False, 'message': f'Maksimal {SYNC_MAX_PENJUALAN} penjualan per sync'}), 413
+
+    mulai = time.perf_counter()
+    try:
+        with PenghitungStatement() as penghitung:
+            hasil = proses_sync_penjualan(sales, current_user.id)
+    except CheckoutError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 503
+    except Exception:
+        db.session.rollback()
+        log_sync.exception('Sync error', extra={'user': current_user.username})
+        return jsonify({'success': False, 'message': 'Terjadi kesalahan sistem'}), 500
+
+    ringkasan = {}
+    for h in hasil:
+        ringkasan[h['status']] = ringkasan.get(h['status'], 0) + 1
+    log_sync.info('Sync penjualan offline', extra={
+        'user': current_user.username,
+        'penjualan': len(sales),
+        'ringkasan': ringkasan,
+        'statements': penghitung.jumlah,
+        'durasi': round(time.perf_counter() - mulai, 3),
+    })
+
+    if ringkasan.get('ok') and DATABASE_URL.startswith('sqlite'):
+        backup_scheduler.signal()
+
+    return jsonify({'success': True, 'hasil': hasil, 'ringkasan': ringkasan})
+
 @app.route('/transaksi')
 @login_required
 def list_transaksi():
@@ -1492,98 +3858,437 @@ def view_struk(id):
                          settings=settings,
                          timezone_name=get_local_timezone_name())
 
-@app.route('/laporan')
-@login_required
-def laporan():
-    if current_user.role != 'admin':
-        flash('Akses ditolak! Hanya admin yang bisa melihat laporan.', 'danger')
-        return redirect(url_for('index'))
-    
-    # Get date parameters and convert to date objects
+# ==================== LAPORAN PENJUALAN ====================
+
+LAPORAN_TOP_PRODUK = 5
+LAPORAN_TOP_MEMBER = 25
+# Detail transaksi di halaman laporan: hanya yang terbaru (ringkasan tetap seluruh periode)
+LAPORAN_DETAIL_MAX = 200
+
+def _rentang_laporan(tanggal_mulai, tanggal_selesai):
+    """Filter [mulai 00:00, selesai+1 00:00) langsung di kolom tanggal supaya index terpakai"""
+    awal = datetime.combine(tanggal_mulai, datetime.min.time())
+    akhir = datetime.combine(tanggal_selesai + timedelta(days=1), datetime.min.time())
+    return Transaksi.tanggal >= awal, Transaksi.tanggal < akhir
+
+def _bagi_periode(tanggal_mulai, tanggal_selesai):
+    """(hari tutup, hari terbuka): sampai kemarin dibaca dari rekap, hari ini dst. dari transaksi.
+
+    Masing-masing (mulai, selesai) atau None jika kosong; periode terbalik
+    tetap diteruskan ke transaksi supaya hasilnya kosong seperti biasa.
+    """
+    hari_ini = get_local_now().date()
+    kemarin = hari_ini - timedelta(days=1)
+    tutup = (tanggal_mulai, min(tanggal_selesai, kemarin)) if tanggal_mulai <= min(tanggal_selesai, kemarin) else None
+    terbuka = (max(tanggal_mulai, hari_ini), tanggal_selesai)
+    if terbuka[0] > terbuka[1] and tutup:
+        terbuka = None
+    return tutup, terbuka
+
+def _gabung(bagian):
+    return bagian[0] if len(bagian) == 1 else union_all(*bagian)
+
+def _per_produk(tutup, terbuka):
+    """Subquery (produk_id, jumlah, penjualan): rekap hari tutup + item transaksi hari terbuka.
+
+    Tiap bagian sudah dikelompokkan per produk, jadi join ke produk hanya
+    untuk satu-dua baris per produk, bukan per hari x produk.
+    """
+    bagian = []
+    if tutup:
+        bagian.append(select(RekapProdukHarian.produk_id, db.func.sum(RekapProdukHarian.jumlah).label('jumlah'),
+                             db.func.sum(RekapProdukHarian.penjualan).label('penjualan'))
+                      .where(RekapProdukHarian.tanggal.between(*tutup))
+                      .group_by(RekapProdukHarian.produk_id))
+    if terbuka:
+        bagian.append(select(TransaksiItem.produk_id, db.func.sum(TransaksiItem.jumlah).label('jumlah'),
+                             db.func.sum(TransaksiItem.subtotal).label('penjualan'))
+                      .join(Transaksi, Transaksi.id == TransaksiItem.transaksi_id)
+                      .where(*_rentang_laporan(*terbuka))
+                      .group_by(TransaksiItem.produk_id))
+    return _gabung(bagian).subquery()
+
+def penjualan_produk(per_produk, limit=None):
+    """([(kode, nama, jumlah, penjualan, keuntungan)], total keuntungan semua produk).
+
+    Baris urut penjualan terbesar (dipotong limit); total keuntungan dihitung
+    dengan window function di query yang sama, sebelum LIMIT. Produk yang
+    sudah dihapus tidak punya harga beli: keuntungannya None dan tidak ikut
+    total (sama dengan analitik margin).
+    """
+    jumlah = db.func.sum(per_produk.c.jumlah)
+    penjualan = db.func.sum(per_produk.c.penjualan)
+    keuntungan = penjualan - jumlah * Produk.harga_beli
+    baris, total_keuntungan = [], 0
+    for kode, nama, qty, total, untung, semua in db.session.execute(
+        select(Produk.kode, Produk.nama, jumlah, penjualan, keuntungan, db.func.sum(keuntungan).over())
+        .select_from(per_produk)
+        .outerjoin(Produk, Produk.id == per_produk.c.produk_id)
+        .group_by(per_produk.c.produk_id, Produk.kode, Produk.nama, Produk.harga_beli)
+        .order_by(penjualan.desc(), per_produk.c.produk_id)
+        .limit(limit)
+    ):
+        baris.append((kode or '-', nama or '(produk dihapus)', int(qty or 0), float(total or 0),
+                      None if untung is None else float(untung)))
+        total_keuntungan = semua or 0
+    return baris, total_keuntungan
+
+def hitung_laporan(tanggal_mulai, tanggal_selesai):
+    """Ringkasan penjualan satu periode dari query agregat GROUP BY.
+
+    Hari yang sudah tutup dibaca dari tabel rekap harian, hanya hari ini
+    yang dihitung dari transaksi; kedua bagian digabung dengan UNION ALL di
+    query yang sama, jadi jumlah query tetap (empat) berapa pun panjang
+    periodenya. Keuntungan = penjualan - jumlah x harga beli produk saat ini;
+    subtotal item selalu harga x jumlah, jadi hasilnya sama dengan perhitungan
+    per item. Produk yang sudah dihapus tidak punya harga beli: keuntungannya
+    None di penjualan_produk dan tidak ikut total_keuntungan.
+    """
+    tutup, terbuka = _bagi_periode(tanggal_mulai, tanggal_selesai)
+    rentang = _rentang_laporan(*terbuka) if terbuka else None
+    hari = db.func.date(Transaksi.tanggal)
+
+    def per_rekap(model, *kolom):
+        return select(*kolom).where(model.tanggal.between(*tutup))
+
+    bagian = []
+    if tutup:
+        bagian.append(per_rekap(RekapPembayaranHarian, RekapPembayaranHarian.tanggal,
+                                RekapPembayaranHarian.payment_method, RekapPembayaranHarian.transaksi,
+                                RekapPembayaranHarian.total))
+    if terbuka:
+        metode = db.func.coalesce(Transaksi.payment_method, literal_column("'tunai'"))
+        bagian.append(select(hari, metode, db.func.count(Transaksi.id), db.func.sum(Transaksi.total))
+                      .where(*rentang).group_by(hari, metode))
+    sales_by_date = {}
+    payment_count = {}
+    for tanggal, metode_bayar, jumlah, total in db.session.execute(_gabung(bagian)):
+        # SQLite mengembalikan teks, Postgres objek date
+        kunci = str(tanggal)[:10]
+        sales_by_date[kunci] = sales_by_date.get(kunci, 0.0) + float(total or 0)
+        payment_count[metode_bayar] = payment_count.get(metode_bayar, 0) + jumlah
+
+    produk, total_keuntungan = penjualan_produk(_per_produk(tutup, terbuka), LAPORAN_TOP_PRODUK)
+    top_products = [[nama, penjualan] for _kode, nama, _jumlah, penjualan, _untung in produk]
+
+    bagian = []
+    if tutup:
+        bagian.append(per_rekap(RekapKasirHarian, RekapKasirHarian.user_id, RekapKasirHarian.transaksi,
+                                RekapKasirHarian.total))
+    if terbuka:
+        user_id = db.func.coalesce(Transaksi.user_id, literal_column('0'))
+        bagian.append(select(user_id.label('user_id'), db.func.count(Transaksi.id).label('transaksi'),
+                             db.func.sum(Transaksi.total).label('total'))
+                      .where(*rentang).group_by(user_id))
+    per_user = _gabung(bagian).subquery()
+    total_kasir = db.func.sum(per_user.c.total)
+    per_kasir = [
+        {'nama': nama or '-', 'total_transaksi': jumlah or 0, 'total_penjualan': total or 0}
+        for _, nama, jumlah, total in db.session.execute(
+            select(per_user.c.user_id, User.nama, db.func.sum(per_user.c.transaksi), total_kasir)
+            .select_from(per_user)
+            .outerjoin(User, User.id == per_user.c.user_id)
+            .group_by(per_user.c.user_id, User.nama)
+            .order_by(total_kasir.desc())
+        )
+    ]
+
+    # Member tidak punya rekap: satu range scan index tanggal di transaksi
+    total_member = db.func.sum(Transaksi.total)
+    top_members = [
+        {'nama': nama, 'total_spent': total or 0, 'total_transaksi': jumlah or 0}
+        for _, nama, total, jumlah in db.session.execute(
+            select(Member.id, Member.nama, total_member, db.func.count(Transaksi.id))
+            .join(Transaksi, Transaksi.member_id == Member.id)
+            .where(*_rentang_laporan(tanggal_mulai, tanggal_selesai))
+            .group_by(Member.id, Member.nama)
+            .order_by(total_member.desc())
+            .limit(LAPORAN_TOP_MEMBER)
+        )
+    ]
+
+    return {
+        'total_penjualan': sum(sales_by_date.values()),
+        'total_transaksi': sum(payment_count.values()),
+        'total_keuntungan': total_keuntungan,
+        'sales_by_date': sales_by_date,
+        'payment_count': payment_count,
+        'top_products': top_products,
+        'per_kasir': per_kasir,
+        'top_members': top_members,
+    }
+
+# ==================== CACHE LAPORAN ====================
+# Hasil laporan per (jenis, tanggal_mulai, tanggal_selesai), LRU per proses.
+# Setelah commit yang menulis rekap, entri yang periodenya mencakup hari yang
+# berubah dibuang: checkout hanya menyentuh periode yang memuat hari ini,
+# periode lampau tetap tersimpan sampai penjualan offline mundur, bangun
+# ulang rekap atau reset menyentuhnya (PerubahanLaporan, berlaku di semua
+# worker). Checkout di worker lain tidak terlihat di sini, jadi entri yang
+# memuat hari ini kedaluwarsa paling lama TTL ini. Perubahan kode/nama/harga
+# beli/kategori produk membuang semua entri (versi_produk_laporan); stok,
+# harga jual dan tier harga tidak.
+
+LAPORAN_CACHE_MAX = 64
+LAPORAN_CACHE_TTL_HARI_INI = 60
+
+class LaporanCache:
+    """LRU hasil laporan per proses: key (jenis, tanggal_mulai, tanggal_selesai)"""
+
+    def __init__(self, max_entri=LAPORAN_CACHE_MAX, ttl_hari_ini=LAPORAN_CACHE_TTL_HARI_INI):
+        self.max_entri = max_entri
+        self.ttl_hari_ini = ttl_hari_ini
+        self._entri = OrderedDict()  # key -> (data, dibuat, terbuka)
+        self._lock = threading.Lock()
+        self._versi = None  # (versi produk laporan, versi laporan) terakhir yang sudah diterapkan
+        self._generasi = 0  # naik setiap pembuangan; hasil yang dihitung sebelumnya tidak disimpan
+        self.stats = {'hit': 0, 'miss': 0, 'dibuang': 0}
+
+    def get(self, jenis, tanggal_mulai, tanggal_selesai, hitung):
+        """Hasil hitung(tanggal_mulai, tanggal_selesai) dari cache, dihitung jika belum ada/kedaluwarsa"""
+        self._sinkron()
+        key = (jenis, tanggal_mulai, tanggal_selesai)
+        sekarang = time.monotonic()
+        with self._lock:
+            entri = self._entri.get(key)
+            if entri is not None and (not entri[2] or sekarang - entri[1] < self.ttl_hari_ini):
+                self._entri.move_to_end(key)
+                self.stats['hit'] += 1
+                return entri[0]
+            self.stats['miss'] += 1
+            generasi = self._generasi
+        data = hitung(tanggal_mulai, tanggal_selesai)
+        # Periode yang memuat hari ini masih bisa berubah karena checkout di worker lain
+        terbuka = tanggal_selesai >= get_local_now().date()
+        with self._lock:
+            if generasi == self._generasi:
+                self._entri[key] = (data, sekarang, terbuka)
+                self._entri.move_to_end(key)
+                while len(self._entri) > self.max_entri:
+                    self._entri.popitem(last=False)
+        return data
+
+    def buang(self, tanggal_mulai=None, tanggal_selesai=None):
+        """Buang entri yang periodenya beririsan dengan [tanggal_mulai, tanggal_selesai] (None = semua)"""
+        with self._lock:
+            self._generasi += 1
+            for key in list(self._entri):
+                _jenis, mulai, selesai = key
+                if tanggal_mulai is None or (mulai <= tanggal_selesai and tanggal_mulai <= selesai):
+                    del self._entri[key]
+                    self.stats['dibuang'] += 1
+
+    def _sinkron(self):
+        """Terapkan perubahan dari worker lain: produk (KOLOM_PRODUK_LAPORAN) dan PerubahanLaporan"""
+        versi = dict(db.session.execute(
+            select(Pengaturan.key, Pengaturan.value)
+            .where(Pengaturan.key.in_((VERSI_PRODUK_LAPORAN_KEY, VERSI_LAPORAN_KEY)))
+        ).all())
+        versi = (int(versi.get(VERSI_PRODUK_LAPORAN_KEY) or 0), int(versi.get(VERSI_LAPORAN_KEY) or 0))
+        lama = self._versi
+        if lama == versi:
+            return
+        if lama is None or versi[0] != lama[0]:
+            self.buang()
+        elif versi[1] > lama[1]:
+            for mulai, selesai in db.session.execute(
+                select(PerubahanLaporan.tanggal_mulai, PerubahanLaporan.tanggal_selesai)
+                .where(PerubahanLaporan.versi > lama[1], PerubahanLaporan.versi <= versi[1])
+            ):
+                self.buang(mulai, selesai)
+        self._versi = versi
+
+    def info(self):
+        with self._lock:
+            return {**self.stats, 'entri': len(self._entri), 'max_entri': self.max_entri}
+
+laporan_cache = LaporanCache()
+
+@event.listens_for(Session, 'after_commit')
+def _buang_cache_laporan(session):
+    for tanggal_mulai, tanggal_selesai in session.info.pop('laporan_berubah', ()):
+        laporan_cache.buang(tanggal_mulai, tanggal_selesai)
+
+@event.listens_for(Session, 'after_rollback')
+def _batal_buang_cache_laporan(session):
+    session.info.pop('laporan_berubah', None)
+
+def _periode_laporan():
+    """(tanggal_mulai, tanggal_selesai) dari query string; default dan fallback hari ini"""
     try:
         tanggal_mulai_str = request.args.get('tanggal_mulai', date.today().strftime('%Y-%m-%d'))
         tanggal_selesai_str = request.args.get('tanggal_selesai', date.today().strftime('%Y-%m-%d'))
         
         # Parse strings to date objects
-        from datetime import datetime as dt
-        tanggal_mulai = dt.strptime(tanggal_mulai_str, '%Y-%m-%d').date()
-        tanggal_selesai = dt.strptime(tanggal_selesai_str, '%Y-%m-%d').date()
+        return (dt.strptime(tanggal_mulai_str, '%Y-%m-%d').date(),
+                dt.strptime(tanggal_selesai_str, '%Y-%m-%d').date())
     except (ValueError, TypeError):
-        tanggal_mulai = date.today()
-        tanggal_selesai = date.today()
-        tanggal_mulai_str = tanggal_mulai.strftime('%Y-%m-%d')
-        tanggal_selesai_str = tanggal_selesai.strftime('%Y-%m-%d')
-    
-    transaksi_list = Transaksi.query.filter(
-        db.func.date(Transaksi.tanggal) >= tanggal_mulai,
-        db.func.date(Transaksi.tanggal) <= tanggal_selesai
-    ).order_by(Transaksi.tanggal).all()
-    
-    total_penjualan = sum(t.total for t in transaksi_list)
-    total_transaksi = len(transaksi_list)
-    total_keuntungan = 0
-    for t in transaksi_list:
-        for item in t.items:
-            harga_beli = item.produk.harga_beli if item.produk else 0
-            total_keuntungan += (item.harga - harga_beli) * item.jumlah
-    
-    # Chart data: Sales per day
-    from collections import defaultdict
-    sales_by_date = defaultdict(float)
-    for t in transaksi_list:
-        date_str = t.tanggal.strftime('%Y-%m-%d')
-        sales_by_date[date_str] += t.total
-    
-    # Chart data: Payment method distribution
-    payment_count = defaultdict(int)
-    for t in transaksi_list:
-        payment_count[t.payment_method or 'tunai'] += 1
-    
-    # Chart data: Top 5 products
-    from collections import Counter
-    product_sales = Counter()
-    for t in transaksi_list:
-        for item in t.items:
-            product_sales[item.produk.nama] += item.subtotal
-    top_products = product_sales.most_common(5)
-
-    top_members_rows = (db.session.query(
-        Member.id,
-        Member.nama,
-        db.func.sum(Transaksi.total).label('total_spent'),
-        db.func.count(Transaksi.id).label('total_transaksi')
-    )
-        .join(Transaksi, Transaksi.member_id == Member.id)
-        .filter(
-            db.func.date(Transaksi.tanggal) >= tanggal_mulai,
-            db.func.date(Transaksi.tanggal) <= tanggal_selesai
-        )
-        .group_by(Member.id, Member.nama)
-        .order_by(db.func.sum(Transaksi.total).desc())
-        .limit(25)
-        .all())
+        return date.today(), date.today()
 
-    top_members = [
-        {
-            'nama': row.nama,
-            'total_spent': row.total_spent or 0,
-            'total_transaksi': row.total_transaksi or 0
-        }
-        for row in top_members_rows
-    ]
+@app.route('/laporan')
+@login_required
+def laporan():
+    if current_user.role != 'admin':
+        flash('Akses ditolak! Hanya admin yang bisa melihat laporan.', 'danger')
+        return redirect(url_for('index'))
+    
+    tanggal_mulai, tanggal_selesai = _periode_laporan()
+    ringkasan = laporan_cache.get('ringkasan', tanggal_mulai, tanggal_selesai, hitung_laporan)
+    transaksi_list = (Transaksi.query
+                      .options(joinedload(Transaksi.user))
+                      .filter(*_rentang_laporan(tanggal_mulai, tanggal_selesai))
+                      .order_by(Transaksi.tanggal.desc())
+                      .limit(LAPORAN_DETAIL_MAX)
+                      .all())
     
     return render_template('laporan/index.html',
                          transaksi_list=transaksi_list,
                          tanggal_mulai=tanggal_mulai,
                          tanggal_selesai=tanggal_selesai,
-                         total_penjualan=total_penjualan,
-                         total_keuntungan=total_keuntungan,
-                         total_transaksi=total_transaksi,
-                         sales_by_date=dict(sales_by_date),
-                         payment_count=dict(payment_count),
-                         top_products=top_products,
-                         top_members=top_members,
-                         timezone_name=get_local_timezone_name())
+                         timezone_name=get_local_timezone_name(),
+                         cache_laporan=laporan_cache.info(),
+                         **ringkasan)
+
+@app.route('/laporan/export')
+@login_required
+def export_laporan():
+    """Laporan periode dalam XLSX: ringkasan, per hari, metode bayar, per produk, per kasir"""
+    if current_user.role != 'admin':
+        flash('Akses ditolak! Hanya admin yang bisa melihat laporan.', 'danger')
+        return redirect(url_for('index'))
+
+    tanggal_mulai, tanggal_selesai = _periode_laporan()
+    ringkasan = laporan_cache.get('ringkasan', tanggal_mulai, tanggal_selesai, hitung_laporan)
+    produk, _ = laporan_cache.get('produk', tanggal_mulai, tanggal_selesai,
+                                  lambda m, s: penjualan_produk(_per_produk(*_bagi_periode(m, s))))
+
+    wb = Workbook(write_only=True)
+    tebal = Font(bold=True)
+
+    def sheet(judul, header, baris):
+        ws = wb.create_sheet(judul)
+        judul_kolom = []
+        for nama in header:
+            cell = WriteOnlyCell(ws, value=nama)
+            cell.font = tebal
+            judul_kolom.append(cell)
+        ws.append(judul_kolom)
+        for row in baris:
+            ws.append(list(row))
+
+    sheet('Ringkasan', ['keterangan', 'nilai'], [
+        ('Periode', f'{tanggal_mulai:%d-%m-%Y} s/d {tanggal_selesai:%d-%m-%Y}'),
+        ('Total transaksi', ringkasan['total_transaksi']),
+        ('Total penjualan', ringkasan['total_penjualan']),
+        ('Total keuntungan', ringkasan['total_keuntungan']),
+    ])
+    sheet('Per Hari', ['tanggal', 'penjualan'], sorted(ringkasan['sales_by_date'].items()))
+    sheet('Pembayaran', ['metode', 'transaksi'], sorted(ringkasan['payment_count'].items()))
+    sheet('Produk', ['kode', 'nama', 'jumlah', 'penjualan', 'keuntungan'], produk)
+    sheet('Kasir', ['kasir', 'transaksi', 'penjualan'],
+          [(k['nama'], k['total_transaksi'], k['total_penjualan']) for k in ringkasan['per_kasir']])
+
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    nama_file = f'laporan_{tanggal_mulai:%Y%m%d}_{tanggal_selesai:%Y%m%d}.xlsx'
+    return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=nama_file)
+
+# ==================== ANALITIK MARGIN ====================
+# Margin & laba kotor untuk periode panjang (perbandingan tahun ke tahun):
+# kolom item penjualan dimuat sekali ke array NumPy lalu dikelompokkan di
+# analitik.py. Harga beli = harga beli produk saat ini, sama dengan laporan.
+
+ANALITIK_TOP = 20
+ANALITIK_CHUNK = 50_000
+
+def muat_data_penjualan(tanggal_mulai=None, tanggal_selesai=None):
+    """Item penjualan satu periode (None = semua) sebagai analitik.DataPenjualan.
+
+    Dua query: item join transaksi (dibaca per ANALITIK_CHUNK baris) dan
+    harga beli + kategori semua produk untuk lookup di NumPy. Lewat Core,
+    bukan ORM, dan waktu dibaca sebagai teks ISO yang di-parse NumPy
+    sekaligus, jadi tidak ada objek datetime per baris.
+    """
+    rentang = ()
+    if tanggal_mulai is not None:
+        rentang = _rentang_laporan(tanggal_mulai, tanggal_selesai or tanggal_mulai)
+    stmt = (
+        select(db.func.coalesce(TransaksiItem.produk_id, 0), TransaksiItem.jumlah, TransaksiItem.harga,
+               cast(Transaksi.tanggal, String), db.func.coalesce(Transaksi.user_id, 0),
+               db.func.coalesce(Transaksi.payment_method, 'tunai'))
+        .join(Transaksi, TransaksiItem.transaksi_id == Transaksi.id)
+        .where(*rentang)
+    )
+    conn = db.session.connection()
+    produk = conn.execute(select(Produk.id, Produk.harga_beli, db.func.coalesce(Produk.kategori_id, 0))).all()
+    hasil = conn.execute(stmt.execution_options(yield_per=ANALITIK_CHUNK))
+    return analitik.DataPenjualan.dari_baris(hasil.partitions(), produk)
+
+def hitung_analitik(tanggal_mulai, tanggal_selesai, bucket='bulan', urut='laba'):
+    """Ringkasan margin, peringkat produk/kategori/kasir/metode, bucket waktu dan tahun ke tahun"""
+    data = muat_data_penjualan(tanggal_mulai, tanggal_selesai)
+    produk = analitik.per_produk(data, urut, ANALITIK_TOP)
+    kategori = analitik.per_kategori(data, urut)
+    kasir = analitik.per_kasir(data, urut)
+
+    # Nama hanya untuk kunci yang ditampilkan
+    nama_produk = dict(db.session.execute(
+        select(Produk.id, Produk.nama).where(Produk.id.in_([p['kunci'] for p in produk]))
+    ).all())
+    nama_kategori = dict(db.session.execute(select(Kategori.id, Kategori.nama)).all())
+    nama_kasir = dict(db.session.execute(
+        select(User.id, User.nama).where(User.id.in_([k['kunci'] for k in kasir]))
+    ).all())
+    for p in produk:
+        p['nama'] = nama_produk.get(p['kunci'], '(produk dihapus)')
+    for k in kategori:
+        k['nama'] = nama_kategori.get(k['kunci'], 'Tanpa kategori')
+    for k in kasir:
+        k['nama'] = nama_kasir.get(k['kunci'], '-')
+
+    tahun, per_bulan = analitik.tahun_ke_tahun(data)
+    return {
+        'ringkasan': analitik.ringkasan(data),
+        'produk': produk,
+        'kategori': kategori,
+        'kasir': kasir,
+        'metode': analitik.per_metode(data, urut),
+        'waktu': analitik.per_waktu(data, bucket),
+        'tahun': tahun,
+        'per_bulan': per_bulan,
+    }
+
+@app.route('/laporan/analitik')
+@login_required
+def laporan_analitik():
+    """Analisis margin: default dari awal tahun lalu sampai hari ini"""
+    if current_user.role != 'admin':
+        flash('Akses ditolak! Hanya admin yang bisa melihat laporan.', 'danger')
+        return redirect(url_for('index'))
+
+    if 'tanggal_mulai' in request.args:
+        tanggal_mulai, tanggal_selesai = _periode_laporan()
+    else:
+        tanggal_selesai = date.today()
+        tanggal_mulai = date(tanggal_selesai.year - 1, 1, 1)
+    bucket = request.args.get('bucket', 'bulan')
+    if bucket not in analitik.BUCKET:
+        bucket = 'bulan'
+    urut = request.args.get('urut', 'laba')
+    if urut not in analitik.URUTAN:
+        urut = 'laba'
+
+    hasil = laporan_cache.get(f'analitik-{bucket}-{urut}', tanggal_mulai, tanggal_selesai,
+                              lambda m, s: hitung_analitik(m, s, bucket, urut))
+    return render_template('laporan/analitik.html',
+                           tanggal_mulai=tanggal_mulai,
+                           tanggal_selesai=tanggal_selesai,
+                           bucket=bucket,
+                           urut=urut,
+                           daftar_bucket=analitik.BUCKET,
+                           daftar_urut=analitik.URUTAN,
+                           **hasil)
 
 # ==================== PENGATURAN ROUTES ====================
 
@@ -1627,13 +4332,21 @@ def backup_now():
         flash('Akses ditolak!', 'danger')
         return redirect(url_for('index'))
     
-    if backup_database():
+    if backup_scheduler.run_now():
         flash('Backup berhasil dibuat!', 'success')
     else:
         flash('Gagal membuat backup!', 'danger')
     
     return redirect(url_for('index'))
 
+@app.route('/admin/backup-status')
+@login_required
+def backup_status():
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Akses ditolak!'}), 403
+    
+    return jsonify({'success': True, 'backup': get_backup_status()})
+
 @app.route('/admin/restore-backup')
 @login_required
 def restore_backup():
@@ -1665,7 +4378,7 @@ def internal_server_error(e):
 
 @app.errorhandler(CSRFError)
 def handle_csrf_error(e):
-    print(f"[CSRF] {e.description}")
+    log.warning('CSRF ditolak: %s', e.description, extra={'path': request.path, 'ip': request.remote_addr})
     return render_template('errors/400.html'), 400
 
 # ==================== INIT DATABASE ====================
@@ -1699,7 +4412,7 @@ def init_database():
             db.session.commit()
         except Exception as e:
             db.session.rollback()
-            print(f"[DB] Warning: gagal migrasi kolom member_id: {e}")
+            log_db.warning('Gagal migrasi kolom transaksi/member: %s', e)
         
         if not User.query.filter_by(username='admin').first():
             admin = User(username='admin', nama='Administrator', role='admin')
@@ -1746,23 +4459,15 @@ def init_database():
                     db.session.add(produk)
             
             db.session.commit()
-            print('✓ Database initialized')
-            print('  Admin: admin / Admin123')
-            print('  Kasir: kasir / Kasir123')
-            print('  Note: Password harus mengandung huruf besar dan angka')
+            log_db.info('Database diinisialisasi dengan user default', extra={'users': ['admin', 'kasir']})
             
             # Backup pertama
-            print('\n[Backup] Creating first backup...')
-            backup_database()
+            log_backup.info('Membuat backup pertama')
+            backup_scheduler.run_now()
 
 # ==================== RUN APP ====================
 
 if __name__ == '__main__':
     init_database()
-    print('\n' + '='*60)
-    print('SERVER READY!')
-    print('URL Lokal: http://localhost:5000')
-    print('URL Jaringan: http://0.0.0.0:5000')
-    print('Backup folder: backups/')
-    print('='*60 + '\n')
+    log.info('Server siap', extra={'url': 'http://localhost:5000', 'backup_folder': _backup_folder})
     app.run(host='0.0.0.0', debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""Backup database di background.
+
+Checkout hanya memanggil ``BackupScheduler.signal()``. Thread background
+menggabungkan banyak sinyal menjadi maksimal satu backup per interval, dan
+file lock memastikan hanya satu proses (worker gunicorn) yang menjalankan
+backup pada satu waktu. Status backup terakhir disimpan di file JSON supaya
+semua worker melihat data yang sama.
+
+Salinan SQLite dibuat lewat online backup API (bertahap per sekian halaman)
+sehingga konsisten walau ada worker lain yang sedang menulis, dan dilewati
+jika database tidak berubah sejak backup terakhir (data_version, ukuran &
+mtime file; tanpa membaca isi database).
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Jumlah halaman per langkah backup & jeda antar langkah: writer lain hanya
+# tertahan selama satu langkah, bukan selama seluruh file disalin.
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+BACKUP_MAX_RESTARTS = 3
+
+log = logging.getLogger('kasir.backup')
+
+
+class _BackupStalled(Exception):
+    pass
+
+
+def online_backup(db_file, backup_file, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP,
+                  max_restarts=BACKUP_MAX_RESTARTS):
+    """Salin database lewat sqlite3 online backup API, return jumlah halaman sumber.
+
+    SQLite mengulang backup bertahap dari awal setiap kali ada koneksi lain yang
+    menulis. Jika backup tidak maju lebih dari max_restarts kali (toko sedang
+    ramai), sisa salinan dilakukan dalam satu langkah supaya tetap selesai.
+    """
+    progress = {'remaining': None, 'total': None, 'restarts': 0, 'stalled': False}
+
+    def _progress(status, remaining, total):
+        progress['total'] = total
+        if progress['stalled']:
+            return
+        if progress['remaining'] is not None and remaining >= progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > max_restarts:
+                progress['stalled'] = True
+                raise _BackupStalled()
+        progress['remaining'] = remaining
+
+    src = sqlite3.connect(db_file)
+    try:
+        dst = sqlite3.connect(backup_file)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=_progress, sleep=sleep)
+            except _BackupStalled:
+                src.backup(dst, pages=-1, progress=_progress)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    # Jumlah halaman sumber pada snapshot yang selesai disalin
+    return progress['total']
+
+
+def verify_backup(backup_file, expected_pages):
+    """Cek konsistensi backup per halaman, return (ok, pesan)"""
+    try:
+        conn = sqlite3.connect(f'file:{backup_file}?mode=ro', uri=True)
+        try:
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            check = conn.execute('PRAGMA quick_check').fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return False, f'tidak bisa dibuka: {e}'
+    if page_count != expected_pages:
+        return False, f'jumlah halaman {page_count}, seharusnya {expected_pages}'
+    if check != 'ok':
+        return False, f'quick_check: {check}'
+    return True, f'{page_count} halaman OK'
+
+
+class ChangeDetector:
+    """Deteksi apakah database berubah sejak backup terakhir, tanpa membaca isinya.
+
+    Cek pertama lewat ``PRAGMA data_version`` di koneksi yang dibiarkan terbuka
+    (tanpa I/O, hanya berlaku di proses ini). Jika belum diketahui atau berubah,
+    bandingkan ukuran & mtime file database dan -wal dengan yang tercatat saat
+    backup terakhir di state file, sehingga tetap berlaku lintas proses dan
+    setelah restart. Setiap commit mengubah salah satunya; checkpoint WAL tanpa
+    perubahan data paling buruk membuat satu backup tambahan. Isi file hanya
+    dibaca saat backup dan verifikasinya (verify_backup).
+    """
+
+    def __init__(self, db_file, state_path):
+        self.db_file = db_file
+        self.state_path = state_path
+        self._conn = None
+        self._data_version = None
+        self._checked_version = None
+
+    def check(self):
+        """Return (berubah, tanda file) untuk disimpan lewat mark_backed_up()"""
+        data_version = self._read_data_version()
+        self._checked_version = data_version
+        tanda = self.signature()
+        if data_version is not None and data_version == self._data_version:
+            return False, tanda
+        if tanda == self._load_state().get('signature'):
+            self._data_version = data_version
+            return False, tanda
+        return True, tanda
+
+    def mark_backed_up(self, signature):
+        """Simpan tanda file dari check() sebelum backup yang baru dibuat"""
+        self._data_version = self._checked_version
+        state = self._load_state()
+        state.update({'signature': signature, 'time': time.time()})
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def signature(self):
+        """[ukuran, mtime_ns] file database dan -wal (0, 0 jika tidak ada)"""
+        tanda = []
+        for path in (self.db_file, f'{self.db_file}-wal'):
+            try:
+                st = os.stat(path)
+                tanda += [st.st_size, st.st_mtime_ns]
+            except OSError:
+                tanda += [0, 0]
+        return tanda
+
+    def _read_data_version(self):
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            self._conn = None
+            return None
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+class FileLock:
+    """Kunci file antar-proses (non-blocking)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def acquire(self):
+        """Coba ambil kunci, return False jika sedang dipegang proses lain"""
+        fh = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+class BackupScheduler:
+    """Jalankan backup_fn di background, maksimal sekali per interval detik"""
+
+    # Jeda sebelum mencoba lagi jika proses lain sedang backup
+    LOCK_RETRY_SECONDS = 5
+
+    def __init__(self, backup_fn, state_dir, interval=300):
+        self.backup_fn = backup_fn
+        self.state_dir = state_dir
+        self.interval = interval
+        self.status_path = os.path.join(state_dir, '.backup_status.json')
+        self.lock = FileLock(os.path.join(state_dir, '.backup.lock'))
+        self._cond = threading.Condition()
+        self._pending_since = None
+        self._thread = None
+        atexit.register(self._flush_pending)
+
+    def signal(self):
+        """Tandai ada perubahan data yang perlu di-backup (tidak blocking)"""
+        with self._cond:
+            if self._pending_since is None:
+                self._pending_since = time.time()
+            self._ensure_thread()
+            self._cond.notify()
+
+    def run_now(self):
+        """Backup langsung (untuk tombol backup manual), return True jika berhasil"""
+        with self._cond:
+            pending_since = self._pending_since or time.time()
+            self._pending_since = None
+        ok = self._run(pending_since, force=True)
+        if ok is None:
+            # Proses lain sedang backup, kembalikan sinyal supaya tidak hilang
+            self._requeue(pending_since)
+            return False
+        return ok
+
+    def status(self):
+        """Status backup terakhir (dibagi ke semua worker lewat file JSON)"""
+        try:
+            with open(self.status_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _ensure_thread(self):
+        # Thread dibuat saat sinyal pertama, jadi aman dengan fork gunicorn
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='backup-scheduler', daemon=True)
+            self._thread.start()
+
+    def _requeue(self, pending_since):
+        with self._cond:
+            if self._pending_since is None or pending_since < self._pending_since:
+                self._pending_since = pending_since
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending_since is None:
+                    self._cond.wait()
+
+            # Gabungkan sinyal: tunggu sampai interval sejak backup terakhir lewat
+            delay = (self.status().get('finished_at') or 0) + self.interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._cond:
+                pending_since = self._pending_since
+                self._pending_since = None
+            if pending_since is None:
+                continue
+
+            if self._run(pending_since) is None:
+                self._requeue(pending_since)
+                time.sleep(self.LOCK_RETRY_SECONDS)
+
+    def _run(self, pending_since, force=False):
+        """Return True/False hasil backup, atau None jika lock dipegang proses lain"""
+        if not self.lock.acquire():
+            return None
+        try:
+            status = self.status()
+            if not force and status.get('success') and (status.get('started_at') or 0) >= pending_since:
+                # Perubahan ini sudah tercakup backup dari worker lain
+                return True
+
+            started_at = time.time()
+            try:
+                ok = bool(self.backup_fn())
+            except Exception:
+                log.exception('Backup gagal')
+                ok = False
+            finished_at = time.time()
+
+            self._write_status({
+                'started_at': started_at,
+                'finished_at': finished_at,
+                'duration': round(finished_at - started_at, 3),
+                'success': ok,
+                'pid': os.getpid(),
+            })
+            return ok
+        finally:
+            self.lock.release()
+
+    def _write_status(self, status):
+        tmp_path = f'{self.status_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, self.status_path)
+        except OSError as e:
+            log.warning('Gagal simpan status backup: %s', e)
+
+    def _flush_pending(self):
+        # Saat worker berhenti, jangan tinggalkan penjualan yang belum di-backup
+        with self._cond:
+            pending_since = self._pending_since
+            self._pending_since = None
+        if pending_since is not None:
+            self._run(pending_since)
@@ -0,0 +1,113 @@
+"""Index barcode di memori untuk scan kasir.
+
+Peta ``kode -> record produk`` (dict siap jsonify, lengkap dengan tier harga)
+dibangun sekali, lalu diperbarui per produk memakai feed perubahan katalog:
+saat versi katalog berubah, hanya produk yang berubah/dihapus sejak versi
+index yang dimuat ulang. Scan cukup satu cek versi + satu lookup dict.
+
+Juga mengurai barcode timbangan EAN-13 (prefix 20-29) yang berisi kode
+barang dan berat/harga, mis. 2012345005121 = barang 12345, 512 gram.
+"""
+import threading
+
+
+def normalisasi_kode(kode):
+    return (kode or '').strip().upper()
+
+
+def ean13_valid(kode):
+    if len(kode) != 13 or not kode.isdigit():
+        return False
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(kode[:12]))
+    return (10 - total % 10) % 10 == int(kode[12])
+
+
+def urai_barcode_timbang(kode, prefix_berat, prefix_harga):
+    """Barcode timbangan '2P IIIII NNNNN C' -> (kandidat kode, jenis, nilai).
+
+    jenis 'berat' (nilai gram) atau 'harga' (nilai rupiah) tergantung prefix.
+    Produk dicari dengan kode 7 digit ('2P' + IIIII) lalu 5 digit (IIIII).
+    Return None jika bukan barcode timbangan yang valid.
+    """
+    if not ean13_valid(kode):
+        return None
+    prefix = kode[:2]
+    if prefix in prefix_berat:
+        jenis = 'berat'
+    elif prefix in prefix_harga:
+        jenis = 'harga'
+    else:
+        return None
+    return (kode[:7], kode[2:7]), jenis, int(kode[7:12])
+
+
+class BarcodeIndex:
+    """kode produk -> record, diperbarui bertahap mengikuti versi katalog"""
+
+    def __init__(self, load_all_fn, load_delta_fn, version_fn):
+        """load_all_fn() -> (versi, [record])
+        load_delta_fn(sejak) -> (versi, [record berubah], [id dihapus]),
+            atau None jika harus dibangun ulang penuh
+        version_fn() -> versi katalog saat ini
+        Setiap record minimal punya 'id' dan 'kode'.
+        """
+        self.load_all_fn = load_all_fn
+        self.load_delta_fn = load_delta_fn
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._by_kode = {}
+        self._kode_by_id = {}
+        self._version = None
+        self.stats = {'rebuild': 0, 'delta': 0, 'produk_delta': 0}
+
+    def get(self, kode):
+        """Record untuk kode (tanpa membedakan huruf besar/kecil), atau None"""
+        self._refresh()
+        return self._by_kode.get(normalisasi_kode(kode))
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def __len__(self):
+        return len(self._by_kode)
+
+    def _refresh(self):
+        version = self.version_fn()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return  # sudah diperbarui thread lain
+            delta = self.load_delta_fn(self._version) if self._version is not None else None
+            if delta is None:
+                self._rebuild()
+            else:
+                self._apply(*delta)
+
+    def _rebuild(self):
+        version, records = self.load_all_fn()
+        by_kode, kode_by_id = {}, {}
+        for record in records:
+            kode = normalisasi_kode(record['kode'])
+            by_kode[kode] = record
+            kode_by_id[record['id']] = kode
+        # Ganti referensi sekaligus: pembaca tanpa lock melihat index lama atau baru
+        self._by_kode, self._kode_by_id = by_kode, kode_by_id
+        self._version = version
+        self.stats['rebuild'] += 1
+
+    def _apply(self, version, records, dihapus):
+        by_kode, kode_by_id = dict(self._by_kode), dict(self._kode_by_id)
+        for produk_id in list(dihapus) + [r['id'] for r in records]:
+            lama = kode_by_id.pop(produk_id, None)
+            if lama is not None and by_kode.get(lama, {}).get('id') == produk_id:
+                del by_kode[lama]
+        for record in records:
+            kode = normalisasi_kode(record['kode'])
+            by_kode[kode] = record
+            kode_by_id[record['id']] = kode
+        self._by_kode, self._kode_by_id = by_kode, kode_by_id
+        self._version = version
+        self.stats['delta'] += 1
+        self.stats['produk_delta'] += len(records) + len(dihapus)
@@ -0,0 +1,158 @@
+"""Perubahan harga massal: aturan persen/margin + pembulatan, dan daftar harga supplier.
+
+Harga baru dihitung di Python dengan Decimal (bukan ROUND() di SQL yang
+berbeda perilakunya antara SQLite dan Postgres), jadi pratinjau dan
+penerapan selalu menghasilkan angka yang sama. app_simple menulis hasilnya
+dengan beberapa statement UPDATE/INSERT massal.
+"""
+import json
+import math
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+
+from barcode_index import normalisasi_kode
+from product_io import angka, baca_header, baris_file
+
+PEMBULATAN = {'terdekat': ROUND_HALF_UP, 'atas': ROUND_CEILING, 'bawah': ROUND_FLOOR}
+# persen: dari harga jual lama; margin: dari harga beli (baru, jika ada di daftar supplier)
+MODE = ('persen', 'margin')
+KOLOM_DAFTAR = ('harga_beli', 'harga_jual')
+
+
+def _decimal(nilai):
+    return Decimal(str(nilai))
+
+
+class AturanHarga:
+    """Harga jual baru = basis x (1 + nilai/100), dibulatkan ke kelipatan"""
+
+    __slots__ = ('mode', 'nilai', 'kelipatan', 'pembulatan', 'variasi')
+
+    def __init__(self, mode='persen', nilai=0, kelipatan=1, pembulatan='terdekat', variasi=True):
+        if mode not in MODE:
+            raise ValueError('Mode harus persen atau margin')
+        if pembulatan not in PEMBULATAN:
+            raise ValueError('Pembulatan harus terdekat, atas, atau bawah')
+        self.mode = mode
+        self.nilai = _decimal(nilai or 0)
+        self.kelipatan = _decimal(kelipatan or 1)
+        if self.nilai <= -100:
+            raise ValueError('Perubahan harus lebih dari -100%')
+        if self.kelipatan <= 0:
+            raise ValueError('Kelipatan pembulatan harus lebih dari 0')
+        self.pembulatan = pembulatan
+        self.variasi = bool(variasi)
+
+    def bulatkan(self, harga):
+        langkah = (_decimal(harga) / self.kelipatan).quantize(Decimal(1), rounding=PEMBULATAN[self.pembulatan])
+        return float(langkah * self.kelipatan)
+
+    def harga_mentah(self, harga_jual, harga_beli):
+        """Harga jual sebelum dibulatkan (Decimal)"""
+        basis = harga_jual if self.mode == 'persen' else harga_beli
+        return _decimal(basis) * (1 + self.nilai / 100)
+
+    def keterangan(self):
+        basis = 'harga jual' if self.mode == 'persen' else 'margin dari harga beli'
+        teks = f'{self.nilai.normalize():+f}% {basis}'
+        if self.kelipatan != 1:
+            teks += f', kelipatan {self.kelipatan.normalize():f} ({self.pembulatan})'
+        return teks
+
+
+def rencana(produk, variasi, aturan, daftar=None):
+    """Daftar perubahan (hanya produk yang harganya berubah).
+
+    produk: iterable (id, kode, nama, harga_beli, harga_jual)
+    variasi: {produk_id: [(id, harga), ...]} tier yang ikut disesuaikan
+    daftar: {kode ternormalisasi: {'harga_beli', 'harga_jual'}} dari file
+    supplier; jika diisi, hanya produk di daftar yang diproses. harga_jual
+    di daftar dipakai apa adanya, selain itu dihitung dengan aturan.
+    Tier harga variasi diskalakan dengan rasio harga jual baru/lama.
+    """
+    hasil = []
+    for produk_id, kode, nama, harga_beli, harga_jual in produk:
+        baris = {}
+        if daftar is not None:
+            baris = daftar.get(normalisasi_kode(kode))
+            if baris is None:
+                continue
+        beli_baru = baris.get('harga_beli')
+        if beli_baru is None:
+            beli_baru = harga_beli
+        if baris.get('harga_jual') is not None:
+            mentah = _decimal(baris['harga_jual'])
+            jual_baru = float(baris['harga_jual'])
+        else:
+            mentah = aturan.harga_mentah(harga_jual, beli_baru)
+            jual_baru = aturan.bulatkan(mentah)
+        tier = []
+        if aturan.variasi and harga_jual and mentah != _decimal(harga_jual):
+            rasio = mentah / _decimal(harga_jual)
+            for variasi_id, harga in variasi.get(produk_id, ()):
+                baru = aturan.bulatkan(_decimal(harga) * rasio)
+                if baru != harga:
+                    tier.append({'id': variasi_id, 'lama': harga, 'baru': baru})
+        if jual_baru == harga_jual and beli_baru == harga_beli and not tier:
+            continue
+        hasil.append({
+            'id': produk_id,
+            'kode': kode,
+            'nama': nama,
+            'harga_beli_lama': harga_beli,
+            'harga_beli_baru': float(beli_baru),
+            'harga_jual_lama': harga_jual,
+            'harga_jual_baru': jual_baru,
+            'variasi': tier,
+        })
+    return hasil
+
+
+def baca_daftar_harga(stream, nama_file):
+    """File daftar harga supplier (CSV atau XLSX) -> {kode ternormalisasi: harga}.
+
+    Kolom wajib: kode, dan minimal salah satu dari harga_beli/harga_jual.
+    """
+    baris_iter = baris_file(stream, nama_file)
+    posisi = baca_header(baris_iter)
+    if not any(k in posisi for k in KOLOM_DAFTAR):
+        raise ValueError('Header harus berisi kode dan harga_beli dan/atau harga_jual')
+    daftar = {}
+    for nomor, row in enumerate(baris_iter, start=2):
+        sel = {k: row[i] if i < len(row) else None for k, i in posisi.items()}
+        kode = normalisasi_kode(str(sel['kode'] or ''))
+        if not kode:
+            continue
+        harga = {k: angka(sel.get(k), nomor, k) for k in KOLOM_DAFTAR}
+        if harga['harga_beli'] is None and harga['harga_jual'] is None:
+            continue
+        daftar[kode] = harga
+    return daftar
+
+
+def daftar_harga_json(teks):
+    """Daftar harga yang dikirim ulang dari pratinjau (JSON) -> bentuk baca_daftar_harga.
+
+    Isi form bisa diubah klien, jadi bentuknya diperiksa seperti file:
+    {kode: {'harga_beli': angka|null, 'harga_jual': angka|null}}.
+    """
+    try:
+        data = json.loads(teks)
+    except ValueError:
+        raise ValueError('Daftar harga dari pratinjau tidak valid, unggah ulang file') from None
+    if not isinstance(data, dict):
+        raise ValueError('Daftar harga dari pratinjau tidak valid, unggah ulang file')
+    daftar = {}
+    for kode, harga in data.items():
+        if not isinstance(harga, dict):
+            raise ValueError(f'Daftar harga untuk kode {kode} tidak valid')
+        baris = {}
+        for kolom in KOLOM_DAFTAR:
+            nilai = harga.get(kolom)
+            if nilai is not None and (isinstance(nilai, bool) or not isinstance(nilai, (int, float))
+                                      or not math.isfinite(nilai) or nilai < 0):
+                raise ValueError(f'{kolom} untuk kode {kode} harus angka dan tidak boleh negatif')
+            baris[kolom] = nilai
+        if baris['harga_beli'] is None and baris['harga_jual'] is None:
+            continue
+        daftar[normalisasi_kode(kode)] = baris
+    return daftar
@@ -0,0 +1,246 @@
+"""Snapshot katalog di file yang di-mmap bersama oleh semua worker.
+
+Satu file read-only berisi seluruh katalog (produk + tier harga) dalam
+record lebar tetap dan tabel string, sehingga setiap worker gunicorn cukup
+memetakan file yang sama: halamannya dibagi lewat page cache OS, bukan
+disalin ke dict di setiap proses.
+
+Format (little-endian)::
+
+    header   magic 'KSNP', format, versi katalog, jumlah produk/variasi,
+             offset setiap bagian
+    produk   PRODUK per record, urut id (pencarian biner by id)
+    variasi  VARIASI per tier harga, berurutan per produk
+    kode     index record (u32) urut kode ternormalisasi (lookup scan)
+    string   UTF-8 berurutan; string direferensikan (offset, panjang)
+
+Saat versi katalog berubah, satu proses (dengan file lock) membangun file
+baru di samping lalu ``os.replace`` ke nama akhir; proses lain yang sedang
+membaca tetap memakai mmap lama sampai melihat file baru. Hanya untuk
+POSIX (gunicorn): di Windows file yang sedang di-mmap tidak bisa diganti.
+
+Stok tidak disimpan: checkout mengubahnya tanpa menaikkan versi katalog,
+jadi pemanggil menimpa stok dari database (lihat halaman_katalog).
+"""
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+
+from barcode_index import normalisasi_kode
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = b'KSNP'
+FORMAT = 2
+HEADER = struct.Struct('<4sHHqIIQQQQ')
+# id, harga_jual, kategori_id, (offset, panjang) kode/nama/satuan, variasi awal, jumlah variasi
+PRODUK = struct.Struct('<qdq8I')
+# min_qty, harga, (offset, panjang) keterangan
+VARIASI = struct.Struct('<qdII')
+KODE = struct.Struct('<I')
+TANPA_KATEGORI = -1
+TANPA_STRING = 0xFFFFFFFF  # panjang untuk string None
+
+
+class _Id:
+    """Urutan id record sebagai sequence, untuk bisect tanpa menyalin"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.jumlah
+
+    def __getitem__(self, i):
+        return self.snapshot._id(i)
+
+
+class CatalogSnapshot:
+    """Pembaca satu file snapshot (read-only, zero-copy sampai dict hasil)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            st = os.fstat(f.fileno())
+        self.identitas = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self._view = memoryview(self._mm)
+        (magic, fmt, _, self.versi, self.jumlah, self.jumlah_variasi,
+         self._off_produk, self._off_variasi, self._off_kode, self._off_string) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f'Bukan snapshot katalog: {path}')
+        self._ids = _Id(self)
+
+    def __len__(self):
+        return self.jumlah
+
+    def _id(self, i):
+        return struct.unpack_from('<q', self._mm, self._off_produk + i * PRODUK.size)[0]
+
+    def _string(self, offset, panjang):
+        if panjang == TANPA_STRING:
+            return None
+        awal = self._off_string + offset
+        return str(self._view[awal:awal + panjang], 'utf-8')
+
+    def item(self, i):
+        """Record ke-i sebagai dict katalog (format _item_katalog tanpa stok)"""
+        (produk_id, harga_jual, kategori_id, kode_off, kode_len, nama_off, nama_len,
+         satuan_off, satuan_len, var_awal, var_jumlah) = PRODUK.unpack_from(self._mm, self._off_produk + i * PRODUK.size)
+        variasi = []
+        for j in range(var_awal, var_awal + var_jumlah):
+            min_qty, harga, ket_off, ket_len = VARIASI.unpack_from(self._mm, self._off_variasi + j * VARIASI.size)
+            variasi.append({'min_qty': min_qty, 'harga': harga, 'keterangan': self._string(ket_off, ket_len)})
+        return {
+            'id': produk_id,
+            'kode': self._string(kode_off, kode_len),
+            'nama': self._string(nama_off, nama_len),
+            'harga_jual': harga_jual,
+            'harga_variasi': variasi,
+            'satuan': self._string(satuan_off, satuan_len),
+            'kategori_id': None if kategori_id == TANPA_KATEGORI else kategori_id,
+        }
+
+    def get(self, produk_id):
+        i = bisect_right(self._ids, produk_id) - 1
+        return self.item(i) if i >= 0 and self._id(i) == produk_id else None
+
+    def _kode(self, k):
+        i = KODE.unpack_from(self._mm, self._off_kode + k * KODE.size)[0]
+        off, panjang = struct.unpack_from('<II', self._mm, self._off_produk + i * PRODUK.size + 24)
+        return i, normalisasi_kode(self._string(off, panjang))
+
+    def get_kode(self, kode):
+        """Record untuk kode (tanpa membedakan huruf besar/kecil), atau None"""
+        kode = normalisasi_kode(kode)
+        rendah, tinggi = 0, self.jumlah
+        while rendah < tinggi:
+            tengah = (rendah + tinggi) // 2
+            if self._kode(tengah)[1] < kode:
+                rendah = tengah + 1
+            else:
+                tinggi = tengah
+        if rendah < self.jumlah:
+            i, nilai = self._kode(rendah)
+            if nilai == kode:
+                return self.item(i)
+        return None
+
+    def semua(self):
+        return [self.item(i) for i in range(self.jumlah)]
+
+
+def tulis_snapshot(path, versi, items):
+    """Tulis items (dict katalog, urut id) ke file sementara lalu ganti path secara atomik"""
+    strings, string_bytes = {}, bytearray()
+
+    def ref(teks):
+        if teks is None:
+            return 0, TANPA_STRING
+        if teks not in strings:
+            data = teks.encode('utf-8')
+            strings[teks] = (len(string_bytes), len(data))
+            string_bytes.extend(data)
+        return strings[teks]
+
+    items = sorted(items, key=lambda p: p['id'])
+    produk, variasi = bytearray(), bytearray()
+    jumlah_variasi = 0
+    for p in items:
+        tier = p.get('harga_variasi') or []
+        kategori_id = p.get('kategori_id')
+        produk += PRODUK.pack(
+            p['id'], float(p['harga_jual'] or 0),
+            TANPA_KATEGORI if kategori_id is None else kategori_id,
+            *ref(p['kode']), *ref(p['nama']), *ref(p.get('satuan')),
+            jumlah_variasi, len(tier),
+        )
+        for v in tier:
+            variasi += VARIASI.pack(int(v['min_qty']), float(v['harga']), *ref(v.get('keterangan')))
+        jumlah_variasi += len(tier)
+    urut_kode = sorted(range(len(items)), key=lambda i: normalisasi_kode(items[i]['kode']))
+    kode = b''.join(KODE.pack(i) for i in urut_kode)
+
+    off_produk = HEADER.size
+    off_variasi = off_produk + len(produk)
+    off_kode = off_variasi + len(variasi)
+    off_string = off_kode + len(kode)
+    header = HEADER.pack(MAGIC, FORMAT, 0, versi, len(items), jumlah_variasi,
+                         off_produk, off_variasi, off_kode, off_string)
+
+    sementara = f'{path}.{os.getpid()}.tmp'
+    with open(sementara, 'wb') as f:
+        for bagian in (header, produk, variasi, kode, string_bytes):
+            f.write(bagian)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(sementara, path)
+
+
+@contextmanager
+def _kunci_file(path):
+    """Lock eksklusif antar proses (flock); tanpa fcntl cukup lock thread"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SnapshotManager:
+    """Snapshot terbaru untuk versi katalog saat ini, dibangun ulang oleh satu proses"""
+
+    def __init__(self, path, load_fn, version_fn):
+        """load_fn() -> (versi, [dict katalog]); version_fn() -> versi katalog saat ini"""
+        self.path = path
+        self.load_fn = load_fn
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.stats = {'rebuild': 0, 'buka': 0}
+
+    def get(self, versi=None):
+        if versi is None:
+            versi = self.version_fn()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.versi == versi:
+            return snapshot
+        with self._lock:
+            snapshot = self._buka()
+            if snapshot is not None and snapshot.versi == versi:
+                return snapshot
+            with _kunci_file(self.path + '.lock'):
+                # Proses lain mungkin sudah membangunnya selama kita menunggu lock
+                snapshot = self._buka()
+                if snapshot is not None and snapshot.versi == versi:
+                    return snapshot
+                versi_baru, items = self.load_fn()
+                tulis_snapshot(self.path, versi_baru, items)
+                self.stats['rebuild'] += 1
+                return self._buka()
+
+    def _buka(self):
+        """Petakan ulang file jika sudah diganti sejak terakhir dibuka"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        lama = self._snapshot
+        if lama is not None and lama.identitas == (st.st_ino, st.st_mtime_ns, st.st_size):
+            return lama
+        try:
+            baru = CatalogSnapshot(self.path)
+        except (OSError, ValueError, struct.error):
+            return None  # file rusak/terpotong: dibangun ulang
+        # mmap lama tidak ditutup: request lain mungkin masih membacanya (dilepas GC)
+        self._snapshot = baru
+        self.stats['buka'] += 1
+        return baru
@@ -0,0 +1,228 @@
+"""Index nama produk di memori untuk saran pencarian yang tahan salah ketik.
+
+Setiap kata query dicocokkan ke kosakata (semua kata di nama/kode produk):
+
+- persis atau awal kata ("indo" -> "indomie") lewat kosakata terurut +
+  bisect, setara trie yang diratakan ke satu list;
+- salah ketik ("gorng" -> "goreng", "minyk" -> "minyak") lewat index
+  trigram kosakata, lalu jarak edit ke awal kata (maks. 1, atau 2 untuk
+  kata panjang).
+
+Produk harus cocok dengan semua kata query; skor = jumlah skor per kata
+(persis > awal kata > salah ketik), seri diurutkan nama terpendek.
+
+Data disimpan ringkas: posting list ``array('I')`` per kata dan array per
+slot produk, bukan dict per entri. Index dibangun saat pertama dipakai
+lalu diperbarui per produk mengikuti versi katalog (seperti BarcodeIndex).
+"""
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from search_index import normalisasi_teks
+
+SKOR_PERSIS = 1.0
+SKOR_AWAL = 0.7  # + hingga 0.3 sesuai seberapa banyak kata yang sudah diketik
+SKOR_SALAH_KETIK = 0.6  # - 0.15 per edit
+MAKS_KATA_AWAL = 2000  # batas kata kosakata untuk prefix sangat pendek ("a")
+
+
+def _trigram(kata):
+    teks = '  ' + kata
+    return [teks[i:i + 3] for i in range(len(kata))]
+
+
+def _jarak_awal(query, kata, maks):
+    """Jarak edit terkecil antara query dan awal kata, atau maks + 1"""
+    kata = kata[:len(query) + maks]
+    baris = list(range(len(kata) + 1))
+    for i, cq in enumerate(query, 1):
+        baru = [i]
+        for j, ck in enumerate(kata, 1):
+            baru.append(min(baris[j] + 1, baru[j - 1] + 1, baris[j - 1] + (cq != ck)))
+        if min(baru) > maks:
+            return maks + 1
+        baris = baru
+    return min(baris)
+
+
+class FuzzyIndex:
+    """Saran produk dari nama/kode, diperbarui bertahap mengikuti versi katalog"""
+
+    def __init__(self, load_all_fn, load_delta_fn, version_fn):
+        """load_all_fn() -> (versi, [(id, teks)])
+        load_delta_fn(sejak) -> (versi, [(id, teks) berubah], [id dihapus]),
+            atau None jika harus dibangun ulang penuh
+        version_fn() -> versi katalog saat ini
+        teks sudah dinormalisasi (kolom ``cari``).
+        """
+        self.load_all_fn = load_all_fn
+        self.load_delta_fn = load_delta_fn
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._version = None
+        self.stats = {'rebuild': 0, 'delta': 0, 'produk_delta': 0}
+        self._kosongkan()
+
+    def _kosongkan(self):
+        # Slot produk
+        self._slot_id = array('q')
+        self._slot_panjang = array('I')
+        self._slot_teks = []
+        self._slot_by_id = {}
+        self._slot_bebas = []
+        # Kosakata
+        self._token_id = {}
+        self._tokens = []
+        self._urut = []
+        self._posting = []
+        self._trigram = {}
+
+    def cari(self, query, limit=10):
+        """id produk paling cocok dengan query, urut skor"""
+        kata = list(dict.fromkeys(normalisasi_teks(query).split()))
+        if not kata:
+            return []
+        self._refresh()
+        with self._lock:
+            # Kata yang ada di kosakata awalnya tidak dicari sebagai salah ketik;
+            # jika gabungannya kosong ("sedap" padahal maksudnya "sedaap"), ulangi
+            return self._cari(kata, limit, False) or self._cari(kata, limit, True)
+
+    def _cari(self, kata, limit, fuzzy_semua):
+        per_kata = []
+        for k in kata:
+            # slot -> skor terbaik kata ini; skor tinggi ditulis terakhir (dict.fromkeys/update di C)
+            skor = {}
+            for tid, s in sorted(self._kata_cocok(k, fuzzy_semua).items(), key=lambda it: it[1]):
+                skor.update(dict.fromkeys(self._posting[tid], s))
+            if not skor:
+                return []
+            per_kata.append(skor)
+        per_kata.sort(key=len)
+        if len(per_kata) == 1:
+            total = per_kata[0]
+        else:
+            kandidat = list(set(per_kata[0]).intersection(*per_kata[1:]))
+            if not kandidat:
+                return []
+            # Jumlah skor per slot tanpa loop Python: map/zip berjalan di C
+            skor_kata = [map(skor.__getitem__, kandidat) for skor in per_kata]
+            total = dict(zip(kandidat, map(sum, zip(*skor_kata))))
+        # Ambang skor top-N dulu, baru urutkan yang lolos (seri: teks terpendek)
+        batas = heapq.nlargest(limit, total.values())[-1]
+        panjang = self._slot_panjang
+        unggul = [slot for slot, s in total.items() if s >= batas]
+        unggul.sort(key=lambda slot: (-total[slot], panjang[slot]))
+        return [self._slot_id[slot] for slot in unggul[:limit]]
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def __len__(self):
+        return len(self._slot_by_id)
+
+    def ukuran(self):
+        """Jumlah produk, kata kosakata, trigram, dan entri posting"""
+        return {
+            'produk': len(self._slot_by_id),
+            'kata': len(self._tokens),
+            'trigram': len(self._trigram),
+            'posting': sum(len(p) for p in self._posting),
+        }
+
+    def _kata_cocok(self, kata, fuzzy_semua=False):
+        """token id -> skor untuk satu kata query"""
+        hasil = {}
+        urut = self._urut
+        i = bisect_left(urut, kata)
+        while i < len(urut) and urut[i].startswith(kata) and len(hasil) < MAKS_KATA_AWAL:
+            token = urut[i]
+            skor = SKOR_PERSIS if token == kata else SKOR_AWAL + 0.3 * len(kata) / len(token)
+            hasil[self._token_id[token]] = skor
+            i += 1
+        if len(kata) < 3 or kata.isdigit() or (kata in self._token_id and not fuzzy_semua):
+            # Kata sangat pendek, angka (ukuran, kode), dan kata yang memang ada
+            # di kosakata tidak dicari sebagai salah ketik
+            return hasil
+        maks = 1 if len(kata) < 8 else 2
+        gram = _trigram(kata)
+        hitung = Counter()
+        for g in gram:
+            hitung.update(self._trigram.get(g, ()))
+        batas = max(1, len(gram) - 3 * maks)  # satu edit merusak paling banyak 3 trigram
+        for tid, n in hitung.items():
+            if n < batas or tid in hasil or len(self._tokens[tid]) < len(kata) - maks:
+                continue
+            jarak = _jarak_awal(kata, self._tokens[tid], maks)
+            if jarak <= maks:
+                hasil[tid] = SKOR_SALAH_KETIK - 0.15 * jarak
+        return hasil
+
+    def _refresh(self):
+        version = self.version_fn()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return  # sudah diperbarui thread lain
+            delta = self.load_delta_fn(self._version) if self._version is not None else None
+            if delta is None:
+                self._rebuild()
+            else:
+                self._apply(*delta)
+
+    def _rebuild(self):
+        version, records = self.load_all_fn()
+        self._kosongkan()
+        for produk_id, teks in records:
+            self._tambah(produk_id, teks)
+        self._version = version
+        self.stats['rebuild'] += 1
+
+    def _apply(self, version, records, dihapus):
+        for produk_id in list(dihapus) + [produk_id for produk_id, _ in records]:
+            self._hapus(produk_id)
+        for produk_id, teks in records:
+            self._tambah(produk_id, teks)
+        self._version = version
+        self.stats['delta'] += 1
+        self.stats['produk_delta'] += len(records) + len(dihapus)
+
+    def _token(self, token):
+        tid = self._token_id.get(token)
+        if tid is None:
+            tid = len(self._tokens)
+            self._token_id[token] = tid
+            self._tokens.append(token)
+            self._posting.append(array('I'))
+            insort(self._urut, token)
+            for g in set(_trigram(token)):
+                self._trigram.setdefault(g, array('I')).append(tid)
+        return tid
+
+    def _tambah(self, produk_id, teks):
+        teks = teks or ''
+        if self._slot_bebas:
+            slot = self._slot_bebas.pop()
+            self._slot_id[slot], self._slot_panjang[slot], self._slot_teks[slot] = produk_id, len(teks), teks
+        else:
+            slot = len(self._slot_id)
+            self._slot_id.append(produk_id)
+            self._slot_panjang.append(len(teks))
+            self._slot_teks.append(teks)
+        self._slot_by_id[produk_id] = slot
+        for token in dict.fromkeys(teks.split()):
+            self._posting[self._token(token)].append(slot)
+
+    def _hapus(self, produk_id):
+        slot = self._slot_by_id.pop(produk_id, None)
+        if slot is None:
+            return
+        for token in dict.fromkeys(self._slot_teks[slot].split()):
+            self._posting[self._token_id[token]].remove(slot)
+        self._slot_teks[slot] = ''
+        self._slot_bebas.append(slot)
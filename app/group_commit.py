@@ -0,0 +1,106 @@
+"""Group commit untuk deployment SQLite.
+
+Di SQLite setiap commit memegang satu-satunya write lock dan membayar satu
+fsync, jadi checkout yang masing-masing commit sendiri cepat mentok di
+beberapa puluh penjualan per detik. GroupCommitWriter mengantrikan pekerjaan
+ke satu thread writer; semua yang datang selama writer sibuk (atau dalam
+jendela beberapa milidetik saat toko ramai) diproses sebagai satu batch dalam
+satu transaksi, lalu setiap request menerima hasilnya masing-masing.
+
+Timeout hanya berlaku selama pekerjaan masih di antrian: pekerjaan yang
+belum diambil writer dibatalkan dan tidak akan pernah diproses, jadi request
+boleh menganggapnya gagal. Pekerjaan yang sudah masuk batch ditunggu sampai
+batchnya selesai, karena batch itu masih bisa commit.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class GroupCommitWriter:
+    """Satu thread writer per proses yang memproses pekerjaan per batch"""
+
+    def __init__(self, process_batch, window=0.005, max_batch=64, timeout=30, name='group-commit'):
+        """process_batch(items) -> list hasil sesuai urutan items; elemen yang
+        berupa Exception dilempar ke request pemiliknya. Jika process_batch
+        sendiri melempar exception, semua request di batch itu menerimanya.
+        """
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._last_batch = 0
+        self.stats = {'batch': 0, 'item': 0, 'max_batch': 0}
+
+    def submit(self, item):
+        """Antrikan item dan tunggu hasilnya (dipanggil dari thread request).
+
+        Melempar TimeoutError jika item masih di antrian setelah timeout detik;
+        item itu dibatalkan dan dijamin tidak diproses.
+        """
+        future = Future()
+        self._ensure_thread().put((item, future))
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise TimeoutError(f'Masih di antrian {self.name} setelah {self.timeout} detik') from None
+        # Sudah diproses writer: hasilnya pasti datang, tunggu tanpa batas
+        return future.result()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Thread & antrian induk tidak ikut ke proses hasil fork (gunicorn)
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, args=(self._queue,), name=self.name, daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _loop(self, antrian):
+        while True:
+            batch = [antrian.get()]
+            # Ambil semua yang sudah menunggu. Jendela tunggu hanya dipakai saat
+            # batch sebelumnya berisi lebih dari satu (ramai), supaya penjualan
+            # tunggal saat sepi tidak menunggu sia-sia.
+            deadline = time.monotonic() + (self.window if self._last_batch > 1 else 0)
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        batch.append(antrian.get(timeout=remaining))
+                    else:
+                        batch.append(antrian.get_nowait())
+                except queue.Empty:
+                    break
+            self._last_batch = len(batch)
+            self._run(batch)
+
+    def _run(self, batch):
+        # Yang sudah dibatalkan (timeout di antrian) dilewati; sisanya tidak
+        # bisa dibatalkan lagi sejak di sini
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        self.stats['batch'] += 1
+        self.stats['item'] += len(batch)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,111 @@
+"""Alokasi nomor transaksi harian (TRX20260208-00042).
+
+Setiap worker memesan blok nomor dari satu baris urutan per hari di database
+(counter yang selalu rapat), lalu membagikannya ke checkout tanpa perlu
+query/lock global per penjualan. Ukuran blok adaptif: saat sepi satu nomor
+per pesanan, saat ramai blok membesar sampai BLOCK_MAX. Nomor dari penjualan
+yang gagal dikembalikan ke pool dan dipakai penjualan berikutnya, dan sisa
+blok dikembalikan ke database saat worker berhenti jika belum ada worker lain
+yang memesan sesudahnya.
+
+Yang dijamin: nomor unik per hari di semua worker. Yang sengaja tidak
+dijamin (harga dari blok per worker): nomor antar worker bisa tidak urut
+waktu saat ramai, dan nomor bisa terlewat jika sisa blok tidak bisa
+dikembalikan (worker lain sudah memesan sesudahnya, atau worker mati).
+Nomor struk bukan bukti kelengkapan penjualan; laporan menghitung dari
+tabel transaksi, bukan dari nomor urut.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger('kasir.kode')
+
+
+class KodeAllocator:
+    """Pembagi nomor urut per hari, aman untuk banyak thread & worker"""
+
+    BLOCK_MAX = 64
+    # Pesanan blok berikutnya dalam jeda ini dianggap "ramai", blok digandakan
+    BURST_SECONDS = 1.0
+
+    def __init__(self, reserve_fn, release_fn=None, prefix='TRX'):
+        """reserve_fn(tanggal, jumlah) -> nomor pertama blok (blok = nomor..nomor+jumlah-1).
+        release_fn(tanggal, nomor_awal, nomor_akhir) mengembalikan sisa blok jika
+        nomor_akhir masih nomor terakhir yang dipesan untuk tanggal itu.
+        """
+        self.reserve_fn = reserve_fn
+        self.release_fn = release_fn
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.release_unused)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._tanggal = None
+        self._free = []          # nomor yang dikembalikan (dipakai lebih dulu)
+        self._next = 0           # nomor berikutnya di blok aktif
+        self._end = -1           # nomor terakhir di blok aktif
+        self._block_size = 1
+        self._last_reserve = 0.0
+
+    def ambil(self, tanggal):
+        """Ambil nomor urut untuk tanggal (format YYYYMMDD)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proses hasil fork (gunicorn --preload) tidak boleh memakai blok induknya
+                self._reset()
+            if tanggal != self._tanggal:
+                self._tanggal = tanggal
+                self._free = []
+                self._next, self._end = 0, -1
+            if self._free:
+                return self._free.pop()
+            if self._next > self._end:
+                self._reserve_block(tanggal)
+            nomor = self._next
+            self._next += 1
+            return nomor
+
+    def kembalikan(self, tanggal, nomor):
+        """Kembalikan nomor yang tidak jadi dipakai (penjualan gagal)"""
+        with self._lock:
+            if tanggal == self._tanggal and self._pid == os.getpid():
+                self._free.append(nomor)
+                self._free.sort(reverse=True)
+
+    def format(self, tanggal, nomor):
+        return f'{self.prefix}{tanggal}-{nomor:05d}'
+
+    def release_unused(self):
+        """Kembalikan sisa blok aktif ke database (dipanggil saat worker berhenti)"""
+        with self._lock:
+            if self.release_fn is None or self._pid != os.getpid() or self._tanggal is None:
+                return
+            sisa = sorted(self._free + list(range(self._next, self._end + 1)))
+            if not sisa or sisa[-1] != self._end:
+                return
+            # Hanya ekor yang bersambung dengan akhir blok yang bisa dikembalikan
+            awal = self._end
+            while awal - 1 in sisa:
+                awal -= 1
+            try:
+                if self.release_fn(self._tanggal, awal, self._end):
+                    self._end = awal - 1
+                    self._next = min(self._next, awal)
+                    self._free = [n for n in self._free if n < awal]
+            except Exception as e:
+                log.warning('Gagal mengembalikan sisa nomor: %s', e)
+
+    def _reserve_block(self, tanggal):
+        now = time.monotonic()
+        if now - self._last_reserve < self.BURST_SECONDS:
+            self._block_size = min(self._block_size * 2, self.BLOCK_MAX)
+        else:
+            self._block_size = 1
+        self._last_reserve = now
+        awal = self.reserve_fn(tanggal, self._block_size)
+        self._next, self._end = awal, awal + self._block_size - 1
@@ -0,0 +1,68 @@
+"""Harga jual server-side (harga bertingkat per quantity).
+
+Tier harga tiap produk dikompilasi sekali menjadi tabel breakpoint terurut,
+lalu harga untuk suatu quantity dicari dengan binary search. Tabel disimpan
+di memori dan hanya dibangun ulang jika versi harga di database berubah
+(HargaVariasi atau harga_jual diubah, oleh worker mana pun).
+"""
+import threading
+from bisect import bisect_right
+
+
+class TierTable:
+    """Tabel harga satu produk: harga_jual + breakpoint min_qty terurut"""
+
+    __slots__ = ('harga_jual', 'breakpoints', 'prices', 'labels')
+
+    def __init__(self, harga_jual, variasi):
+        """variasi: iterable (min_qty, harga, keterangan)"""
+        variasi = sorted(variasi, key=lambda v: v[0])
+        self.harga_jual = harga_jual
+        self.breakpoints = tuple(v[0] for v in variasi)
+        self.prices = tuple(v[1] for v in variasi)
+        self.labels = tuple(v[2] for v in variasi)
+
+    def tier(self, qty):
+        """Index tier yang berlaku untuk qty, atau -1 jika pakai harga_jual"""
+        return bisect_right(self.breakpoints, qty) - 1
+
+
+class PricingEngine:
+    """Cache tabel harga per produk, dipakai quote keranjang & checkout"""
+
+    def __init__(self, load_fn, version_fn):
+        """load_fn(produk_ids) -> {produk_id: (harga_jual, [(min_qty, harga, keterangan), ...])}
+        version_fn() -> versi harga saat ini (berubah setiap kali harga diubah)
+        """
+        self.load_fn = load_fn
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._version = None
+
+    def tables(self, produk_ids):
+        """Tabel harga untuk produk_ids (produk yang tidak ada tidak dikembalikan)"""
+        version = self.version_fn()
+        with self._lock:
+            if version != self._version:
+                self._tables = {}
+                self._version = version
+            tables = self._tables
+        missing = [pid for pid in produk_ids if pid not in tables]
+        if missing:
+            loaded = {
+                pid: TierTable(harga_jual, variasi)
+                for pid, (harga_jual, variasi) in self.load_fn(missing).items()
+            }
+            with self._lock:
+                # Jangan isi cache versi baru dengan data yang dibaca di versi lama
+                if self._version == version:
+                    self._tables.update(loaded)
+            tables = {**tables, **loaded}
+        return {pid: tables[pid] for pid in produk_ids if pid in tables}
+
+    def invalidate(self):
+        """Kosongkan cache lokal (versi dibaca ulang pada pemakaian berikutnya)"""
+        with self._lock:
+            self._tables = {}
+            self._version = None
@@ -0,0 +1,203 @@
+"""Baca/tulis file produk (XLSX atau CSV) secara streaming.
+
+Baris dibaca satu per satu (openpyxl read-only, csv.reader di atas stream
+upload) dan ditulis satu per satu (openpyxl write-only, CSV per baris),
+jadi memori tidak tumbuh dengan jumlah produk. Penulisan ke database ada
+di app_simple (impor_produk).
+
+Tier harga variasi disimpan di satu sel: ``min_qty:harga:keterangan``
+dipisah ``;``, mis. ``12:11500:Grosir; 24:11000``; ``-`` menghapus semua
+tier. Saat import, sel kosong berarti nilai lama tidak diubah.
+"""
+import csv
+import io
+import re
+from decimal import Decimal, InvalidOperation
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+KOLOM_PRODUK = ('kode', 'nama', 'kategori', 'harga_beli', 'harga_jual', 'stok', 'minimal_stok', 'satuan',
+                'deskripsi', 'harga_variasi')
+# Kolom yang wajib terisi untuk produk baru
+KOLOM_WAJIB_BARU = ('nama', 'harga_beli', 'harga_jual')
+PANJANG_MAKS = {'kode': 50, 'nama': 200, 'satuan': 20, 'kategori': 100}
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_RIBUAN = re.compile(r'\d{1,3}([.,])\d{3}(\1\d{3})*')
+
+
+def angka(nilai, nomor_baris, nama='harga'):
+    """Sel angka -> float; kosong -> None. Menerima 12500, 12.500, 12.500,50 dan 12,500.50"""
+    if nilai is None or nilai == '':
+        return None
+    if isinstance(nilai, (int, float)):
+        hasil = Decimal(str(nilai))
+    else:
+        teks = str(nilai).replace('Rp', '').replace(' ', '').strip()
+        if not teks:
+            return None
+        if ',' in teks and '.' in teks:
+            # Pemisah yang terakhir adalah desimal
+            ribuan = '.' if teks.rfind(',') > teks.rfind('.') else ','
+            teks = teks.replace(ribuan, '').replace(',', '.')
+        elif _RIBUAN.fullmatch(teks):
+            teks = teks.replace('.', '').replace(',', '')
+        elif ',' in teks:
+            teks = teks.replace(',', '.')
+        try:
+            hasil = Decimal(teks)
+        except InvalidOperation:
+            raise ValueError(f'Baris {nomor_baris}: {nama} "{nilai}" bukan angka') from None
+    if hasil < 0:
+        raise ValueError(f'Baris {nomor_baris}: {nama} tidak boleh negatif')
+    return float(hasil)
+
+
+def _bulat(nilai, nomor_baris, nama):
+    hasil = angka(nilai, nomor_baris, nama)
+    if hasil is None:
+        return None
+    if hasil != int(hasil):
+        raise ValueError(f'Baris {nomor_baris}: {nama} harus bilangan bulat')
+    return int(hasil)
+
+
+def baris_file(stream, nama_file):
+    """Generator tuple per baris (baris pertama header) dari stream file upload"""
+    if nama_file.lower().endswith('.xlsx'):
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    teks = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    contoh = teks.read(4096)
+    teks.seek(0)
+    try:
+        dialek = csv.Sniffer().sniff(contoh, delimiters=',;\t')
+    except csv.Error:
+        dialek = csv.excel
+    try:
+        yield from csv.reader(teks, dialek)
+    finally:
+        teks.detach()  # stream upload ditutup oleh werkzeug
+
+
+def baca_header(baris_iter, wajib=('kode',)):
+    """{nama kolom: posisi} dari baris pertama; ValueError jika kolom wajib tidak ada"""
+    header = next(baris_iter, None)
+    if not header:
+        raise ValueError('File kosong')
+    header = [str(h).strip().lower() if h is not None else '' for h in header]
+    kurang = [k for k in wajib if k not in header]
+    if kurang:
+        raise ValueError(f"Header tidak sesuai, kolom {', '.join(kurang)} tidak ada. Gunakan template yang disediakan.")
+    return {nama: i for i, nama in reversed(list(enumerate(header))) if nama}
+
+
+def format_variasi(tier):
+    """[(min_qty, harga, keterangan), ...] -> teks sel harga_variasi"""
+    bagian = []
+    for min_qty, harga, keterangan in tier:
+        harga = int(harga) if float(harga).is_integer() else harga
+        bagian.append(f'{min_qty}:{harga}:{keterangan}' if keterangan else f'{min_qty}:{harga}')
+    return '; '.join(bagian)
+
+
+def urai_variasi(teks, nomor_baris):
+    """Teks sel harga_variasi -> [(min_qty, harga, keterangan), ...] urut min_qty.
+
+    None untuk sel kosong (tier tidak diubah), [] untuk "-" (tier dihapus).
+    """
+    if teks is None or not str(teks).strip():
+        return None
+    if str(teks).strip() == '-':
+        return []
+    tier = {}
+    for bagian in str(teks or '').split(';'):
+        bagian = bagian.strip()
+        if not bagian:
+            continue
+        kolom = [k.strip() for k in bagian.split(':', 2)]
+        if len(kolom) < 2:
+            raise ValueError(f'Baris {nomor_baris}: harga_variasi "{bagian}" harus min_qty:harga[:keterangan]')
+        min_qty = _bulat(kolom[0], nomor_baris, 'min_qty harga variasi')
+        harga = angka(kolom[1], nomor_baris, 'harga variasi')
+        if not min_qty or harga is None:
+            raise ValueError(f'Baris {nomor_baris}: harga_variasi "{bagian}" harus min_qty:harga[:keterangan]')
+        if min_qty in tier:
+            raise ValueError(f'Baris {nomor_baris}: min_qty {min_qty} harga variasi ganda')
+        tier[min_qty] = (min_qty, harga, (kolom[2] if len(kolom) > 2 else '')[:100] or None)
+    return [tier[q] for q in sorted(tier)]
+
+
+def validasi_baris(row, posisi, nomor_baris):
+    """Nilai kolom yang ada di header, sudah divalidasi: {kolom: nilai}.
+
+    Sel kosong menjadi None (produk lama: tidak diubah, produk baru: nilai
+    default); kode selalu ada dan sudah dibersihkan.
+    """
+    def sel(nama):
+        i = posisi.get(nama)
+        if i is None or i >= len(row):
+            return None
+        nilai = row[i]
+        if isinstance(nilai, str):
+            nilai = nilai.strip()
+        return None if nilai == '' else nilai
+
+    kode = sel('kode')
+    kode = str(int(kode) if isinstance(kode, float) and kode.is_integer() else kode).strip() if kode is not None else ''
+    if not kode:
+        raise ValueError(f'Baris {nomor_baris}: kode kosong')
+    hasil = {'kode': kode}
+    for nama in ('nama', 'kategori', 'satuan', 'deskripsi'):
+        if nama in posisi:
+            nilai = sel(nama)
+            hasil[nama] = str(nilai) if nilai is not None else None
+    for nama in ('harga_beli', 'harga_jual'):
+        if nama in posisi:
+            hasil[nama] = angka(sel(nama), nomor_baris, nama)
+    for nama in ('stok', 'minimal_stok'):
+        if nama in posisi:
+            hasil[nama] = _bulat(sel(nama), nomor_baris, nama)
+    if 'harga_variasi' in posisi:
+        hasil['harga_variasi'] = urai_variasi(sel('harga_variasi'), nomor_baris)
+    for nama, maks in PANJANG_MAKS.items():
+        if hasil.get(nama) and len(hasil[nama]) > maks:
+            raise ValueError(f'Baris {nomor_baris}: {nama} lebih dari {maks} karakter')
+    return hasil
+
+
+def tulis_csv(baris_iter, header=KOLOM_PRODUK):
+    """Generator potongan teks CSV (untuk respons streaming)"""
+    buffer = io.StringIO()
+    penulis = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM supaya Excel membaca UTF-8
+    penulis.writerow(header)
+    for n, baris in enumerate(baris_iter, start=1):
+        penulis.writerow(baris)
+        if n % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def tulis_xlsx(baris_iter, berkas, judul='Produk', header=KOLOM_PRODUK):
+    """Tulis baris ke berkas (path atau file object) dengan workbook write-only"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(judul)
+    tebal = Font(bold=True)
+    judul_kolom = []
+    for nama in header:
+        cell = WriteOnlyCell(ws, value=nama)
+        cell.font = tebal
+        judul_kolom.append(cell)
+    ws.append(judul_kolom)
+    for baris in baris_iter:
+        ws.append(baris)
+    wb.save(berkas)
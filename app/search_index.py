@@ -0,0 +1,187 @@
+"""Pencarian teks produk & member berbasis index database.
+
+Setiap tabel yang bisa dicari punya kolom ``cari``: nama (dan kode/telepon)
+yang sudah dinormalisasi (huruf kecil, tanpa tanda baca, singkatan satuan
+diperluas). Kolom ini diisi aplikasi setiap kali baris ditulis; index
+teksnya dipilih sesuai backend:
+
+- SQLite: tabel virtual FTS5 (external content) yang disinkronkan trigger
+  ``AFTER INSERT/DELETE/UPDATE OF cari``, diurutkan dengan bm25.
+- PostgreSQL: index GIN ``to_tsvector('simple', cari)`` + pg_trgm (jika
+  ekstensi bisa dipasang) untuk potongan kata, diurutkan ts_rank/similarity.
+- Lainnya / FTS tidak tersedia: LIKE per kata pada kolom ``cari``.
+
+Query dinormalisasi dengan aturan yang sama, dan setiap kata dicocokkan
+sebagai prefix (mis. "indo gor" menemukan "Indomie Goreng").
+"""
+import re
+
+from sqlalchemy import and_, column, false, func, or_, select, table, text
+
+# Singkatan satuan umum di nama produk toko -> bentuk panjang
+SINGKATAN_SATUAN = {
+    'g': 'gram', 'gr': 'gram', 'grm': 'gram', 'gram': 'gram',
+    'kg': 'kilogram', 'kilo': 'kilogram',
+    'l': 'liter', 'lt': 'liter', 'ltr': 'liter',
+    'ml': 'mililiter', 'cc': 'mililiter',
+    'pc': 'pcs', 'pcs': 'pcs',
+    'bks': 'bungkus', 'bk': 'bungkus',
+    'btl': 'botol', 'bt': 'botol',
+    'krt': 'karton', 'ktn': 'karton',
+    'ktk': 'kotak', 'klg': 'kaleng', 'sct': 'sachet', 'sch': 'sachet',
+    'rtg': 'renteng', 'btg': 'batang', 'lbr': 'lembar', 'bh': 'buah',
+    'pck': 'pack', 'pak': 'pack', 'gln': 'galon', 'jrg': 'jerigen',
+}
+
+_BUKAN_HURUF_ANGKA = re.compile(r'[^0-9a-z]+')
+# "2L" -> "2 L", "500ml" -> "500 ml", "1,5kg" -> "1 5 kg" (koma/titik jadi pemisah)
+_ANGKA_HURUF = re.compile(r'(?<=[0-9])(?=[a-z])|(?<=[a-z])(?=[0-9])')
+
+
+def normalisasi_teks(teks):
+    teks = _BUKAN_HURUF_ANGKA.sub(' ', (teks or '').lower())
+    teks = _ANGKA_HURUF.sub(' ', teks)
+    return ' '.join(SINGKATAN_SATUAN.get(kata, kata) for kata in teks.split())
+
+
+def teks_cari_produk(nama, kode):
+    # Kode disimpan utuh (tanpa pecah angka/huruf) supaya bisa dicari persis
+    kode = _BUKAN_HURUF_ANGKA.sub('', (kode or '').lower())
+    return f'{normalisasi_teks(nama)} {kode}'.strip()
+
+
+def teks_cari_member(nama, no_telp):
+    # Nomor lengkap untuk pencarian prefix + 4 digit terakhir (yang biasa disebut pelanggan)
+    digit = re.sub(r'\D', '', no_telp or '')
+    return ' '.join(filter(None, [normalisasi_teks(nama), digit, digit[-4:] if len(digit) > 4 else '']))
+
+
+def _kata_query(query):
+    return normalisasi_teks(query).split()
+
+
+class PencarianLike:
+    """Cadangan tanpa index teks: setiap kata harus muncul di kolom cari"""
+
+    nama = 'like'
+
+    def pasang(self, conn, tabel_list):
+        pass
+
+    def _cari(self, model, kata, *filters):
+        """(SELECT id yang cocok, urutan relevansi)"""
+        stmt = select(model.id).where(and_(*[model.cari.like(f'%{k}%') for k in kata]), *filters)
+        return stmt, [func.length(model.cari)]
+
+    def cari_ids(self, conn, model, query, limit, *filters):
+        kata = _kata_query(query)
+        if not kata:
+            return []
+        stmt, urutan = self._cari(model, kata, *filters)
+        return list(conn.execute(stmt.order_by(*urutan, model.id).limit(limit)).scalars())
+
+    def cari_select(self, model, query, *filters):
+        """SELECT id yang cocok tanpa urutan/limit, untuk subquery (mis. IN)"""
+        kata = _kata_query(query)
+        if not kata:
+            return select(model.id).where(false())
+        return self._cari(model, kata, *filters)[0]
+
+
+class PencarianSqlite(PencarianLike):
+    """FTS5 external content table <tabel>_fts di atas kolom cari"""
+
+    nama = 'sqlite-fts5'
+
+    def pasang(self, conn, tabel_list):
+        for tabel in tabel_list:
+            fts = f'{tabel}_fts'
+            baru = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nama"), {'nama': fts}
+            ).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"cari, content='{tabel}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            # UPDATE OF cari: update stok oleh checkout tidak menyentuh index
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabel} BEGIN "
+                f"INSERT INTO {fts}(rowid, cari) VALUES (new.id, new.cari); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabel} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, cari) VALUES ('delete', old.id, old.cari); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF cari ON {tabel} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, cari) VALUES ('delete', old.id, old.cari); "
+                f"INSERT INTO {fts}(rowid, cari) VALUES (new.id, new.cari); END"
+            ))
+            if baru:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    def _cari(self, model, kata, *filters):
+        fts_nama = f'{model.__tablename__}_fts'
+        fts = table(fts_nama, column('rowid'), column('rank'))
+        match = ' '.join(f'"{k}"*' for k in kata)
+        stmt = (
+            select(model.id)
+            .join(fts, fts.c.rowid == model.id)
+            .where(text(f'{fts_nama} MATCH :match').bindparams(match=match), *filters)
+        )
+        return stmt, [fts.c.rank]
+
+
+class PencarianPostgres(PencarianLike):
+    """tsvector (index GIN ekspresi) + pg_trgm untuk potongan kata"""
+
+    nama = 'postgres-tsvector'
+
+    def __init__(self):
+        self.trigram = False
+
+    def pasang(self, conn, tabel_list):
+        try:
+            with conn.begin_nested():
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        except Exception:
+            pass  # user database tanpa hak CREATE EXTENSION: tsvector saja
+        self.trigram = bool(conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first())
+        for tabel in tabel_list:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{tabel}_cari_fts ON {tabel} "
+                f"USING gin (to_tsvector('simple', coalesce(cari, '')))"
+            ))
+            if self.trigram:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{tabel}_cari_trgm ON {tabel} USING gin (cari gin_trgm_ops)"
+                ))
+
+    def _cari(self, model, kata, *filters):
+        # Ekspresi harus sama persis dengan index supaya index GIN terpakai
+        vector = func.to_tsvector(text("'simple'"), func.coalesce(model.cari, ''))
+        tsquery = func.to_tsquery(text("'simple'"), ' & '.join(f'{k}:*' for k in kata))
+        cocok = vector.op('@@')(tsquery)
+        urutan = [func.ts_rank(vector, tsquery).desc()]
+        if self.trigram:
+            normal = ' '.join(kata)
+            cocok = or_(cocok, model.cari.like(f'%{normal}%'))
+            urutan.append(func.similarity(model.cari, normal).desc())
+        return select(model.id).where(cocok, *filters), urutan
+
+
+def buat_pencarian(conn):
+    """Pilih backend sesuai dialect (FTS5 dicek, bisa tidak ada di build SQLite tertentu)"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        try:
+            conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar()
+            conn.execute(text('CREATE VIRTUAL TABLE IF NOT EXISTS temp._cek_fts5 USING fts5(x)'))
+            conn.execute(text('DROP TABLE temp._cek_fts5'))
+            return PencarianSqlite()
+        except Exception:
+            return PencarianLike()
+    if dialect == 'postgresql':
+        return PencarianPostgres()
+    return PencarianLike()
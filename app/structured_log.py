@@ -0,0 +1,176 @@
+"""Logging terstruktur & non-blocking untuk aplikasi kasir dan tools.
+
+Semua logger berada di bawah ``kasir`` (mis. ``kasir.checkout``,
+``kasir.backup``). Record dimasukkan ke antrian oleh thread pemanggil dan
+ditulis ke stdout oleh satu thread listener, jadi request tidak pernah
+menunggu I/O log. Format JSON satu baris per record (cocok untuk log
+collector), atau teks biasa untuk dipakai di terminal.
+
+Konfigurasi lewat environment:
+    LOG_FORMAT   json | text                         (default json)
+    LOG_LEVEL    level logger kasir                  (default INFO)
+    LOG_LEVELS   level per modul, mis. "kasir.checkout.item=DEBUG,kasir.backup=WARNING"
+    LOG_SAMPLE   sampling record DEBUG per modul, mis. "kasir.checkout.item=0.01"
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+ROOT_LOGGER = 'kasir'
+
+# Atribut bawaan LogRecord; atribut lain berasal dari extra={...} dan ikut ditulis
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _parse_mapping(value):
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}"""
+    hasil = {}
+    for bagian in (value or '').split(','):
+        if '=' in bagian:
+            key, val = bagian.split('=', 1)
+            hasil[key.strip()] = val.strip()
+    return hasil
+
+
+def _extra_fields(record):
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS and not k.startswith('_')}
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris: ts, level, logger, msg + field dari extra"""
+
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        data.update(_extra_fields(record))
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format terminal: jam level logger: pesan key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s', '%H:%M:%S')
+
+    def format(self, record):
+        teks = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            teks += ' ' + ' '.join(f'{k}={v}' for k, v in extra.items())
+        return teks
+
+
+class SamplingFilter(logging.Filter):
+    """Loloskan hanya sebagian record DEBUG dari logger tertentu (rate 0..1)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        # Prefix terpanjang menang: kasir.checkout.item lebih spesifik dari kasir.checkout
+        self.rates = sorted(((name, float(rate)) for name, rate in rates.items()), key=lambda r: -len(r[0]))
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Tulis ke sys.stdout yang aktif saat record ditulis, bukan saat setup.
+
+    pytest dan tools bisa mengganti lalu menutup sys.stdout setelah logging
+    dipasang; record dari thread background/atexit tetap ke stream yang hidup.
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Pesan & traceback dirender sekarang (args bisa berubah setelah ini),
+        # format JSON/teks dikerjakan thread listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_lock = threading.Lock()
+_state = {'handler': None, 'listener': None, 'output': None}
+
+
+def setup_logging(fmt=None, level=None, stream=None):
+    """Pasang handler antrian di logger kasir (aman dipanggil berkali-kali)"""
+    with _lock:
+        if _state['handler'] is not None:
+            return logging.getLogger(ROOT_LOGGER)
+
+        fmt = (fmt or os.getenv('LOG_FORMAT') or 'json').lower()
+        output = logging.StreamHandler(stream) if stream is not None else _StdoutHandler()
+        output.setFormatter(TextFormatter() if fmt == 'text' else JsonFormatter())
+
+        handler = _QueueHandler(queue.SimpleQueue())
+        handler.addFilter(SamplingFilter(_parse_mapping(os.getenv('LOG_SAMPLE'))))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel((level or os.getenv('LOG_LEVEL') or 'INFO').upper())
+        for name, name_level in _parse_mapping(os.getenv('LOG_LEVELS')).items():
+            logging.getLogger(name).setLevel(name_level.upper())
+        root.addHandler(handler)
+        root.propagate = False
+
+        _state.update(handler=handler, output=output)
+        _start_listener()
+        atexit.register(_stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_after_fork)
+        return root
+
+
+def get_logger(name):
+    """Logger di bawah kasir.*, mis. get_logger('checkout') -> kasir.checkout"""
+    if not name.startswith(ROOT_LOGGER):
+        name = f'{ROOT_LOGGER}.{name}'
+    return logging.getLogger(name)
+
+
+def _start_listener():
+    listener = logging.handlers.QueueListener(_state['handler'].queue, _state['output'])
+    listener.start()
+    _state['listener'] = listener
+
+
+def _stop_listener():
+    # Tulis semua record yang masih di antrian sebelum proses berhenti
+    listener = _state['listener']
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def _after_fork():
+    # Thread listener tidak ikut ke proses anak (worker gunicorn --preload)
+    _state['handler'].queue = queue.SimpleQueue()
+    _start_listener()
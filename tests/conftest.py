@@ -0,0 +1,102 @@
+"""
+Fixture bersama untuk test aplikasi kasir.
+
+app_simple membaca DATABASE_URL saat diimport lalu langsung membuat tabel dan
+mengisi data awal, jadi environment disiapkan di sini sebelum modul test mana
+pun diimport: satu database SQLite sementara untuk seluruh sesi pytest. Isi
+database setelah data awal disimpan sebagai template; sebelum setiap test
+database dipulihkan dari template itu, cache per proses dikosongkan dan
+app.config dikembalikan, jadi test tidak saling mempengaruhi walau dijalankan
+bersama dalam satu proses.
+
+KASIR_TEST_DATABASE_URL=postgresql://... menjalankan test di server database:
+tabel dibuat ulang dan data awal diisi ulang setiap test (lebih lambat).
+
+Cara pakai:
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+TMP_DIR = Path(tempfile.mkdtemp(prefix='kasir_test_'))
+DB_FILE = TMP_DIR / 'kasir_test.db'
+
+os.environ['DATABASE_URL'] = os.environ.get('KASIR_TEST_DATABASE_URL') or f'sqlite:///{DB_FILE.as_posix()}'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ['BACKUP_FOLDER'] = str(TMP_DIR / 'backups')
+# Fitur opsional diaktifkan per test, bukan dari environment pengembang
+for nama in ('KATALOG_SNAPSHOT_PATH', 'GROUP_COMMIT'):
+    os.environ.pop(nama, None)
+sys.path.insert(0, str(BASE_DIR / 'app'))
+
+import app_simple  # noqa: E402
+from app_simple import app, db  # noqa: E402
+
+
+def _simpan_template():
+    """Salinan database setelah data awal di memori (hanya SQLite)"""
+    with app.app_context():
+        if db.engine.url.get_backend_name() != 'sqlite':
+            return None
+        db.engine.dispose()
+    template = sqlite3.connect(':memory:', check_same_thread=False)
+    with closing(sqlite3.connect(DB_FILE)) as sumber:
+        sumber.backup(template)
+    return template
+
+
+_TEMPLATE = _simpan_template()
+_CONFIG = dict(app.config)
+
+
+def _pulihkan_database():
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+        if _TEMPLATE is not None:
+            with closing(sqlite3.connect(DB_FILE)) as tujuan:
+                _TEMPLATE.backup(tujuan)
+            return
+        db.drop_all()
+        app_simple._db_initialized = False
+        app_simple.init_db()
+        app_simple.ensure_admin_user()
+        app_simple.seed_data_from_file()
+        db.session.remove()
+
+
+def _kosongkan_cache():
+    """Cache per proses kembali seperti worker yang baru start"""
+    for index in (app_simple.barcode_index, app_simple.saran_index, app_simple.pricing_engine):
+        index.invalidate()
+    for cache in (app_simple.grid_cache, app_simple.laporan_cache):
+        with cache._lock:
+            cache._entri.clear()
+            cache.stats = dict.fromkeys(cache.stats, 0)
+    app_simple.grid_cache._versi = None
+    app_simple.laporan_cache._versi = None
+    with app_simple.idempotency_store._lock:
+        app_simple.idempotency_store._local.clear()
+    with app_simple.kode_allocator._lock:
+        app_simple.kode_allocator._reset()
+    app_simple._ringkasan_kategori_cache = None
+    app_simple._backup_detector = None
+
+
+@pytest.fixture(autouse=True)
+def kasir_bersih():
+    """Database berisi data awal saja dan cache kosong untuk setiap test"""
+    _pulihkan_database()
+    _kosongkan_cache()
+    yield
+    with app.app_context():
+        db.session.remove()
+    app.config.clear()
+    app.config.update(_CONFIG)
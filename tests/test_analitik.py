@@ -0,0 +1,146 @@
+"""
+Analitik margin dengan NumPy: laba kotor, margin, peringkat produk/kategori
+dan bucket waktu sama dengan perhitungan per item lewat ORM, konsisten
+dengan laporan penjualan, produk yang dihapus dilaporkan tanpa modal (bukan
+margin 100%), dan halaman analisis margin tampil untuk admin.
+
+Cara pakai:
+    python -m pytest tests/test_analitik.py
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import analitik
+from app_simple import (app, db, Kategori, Produk, Transaksi, TransaksiItem, bangun_ulang_rekap,
+                        hitung_analitik, hitung_laporan, muat_data_penjualan)
+
+METODE = ['tunai', 'qris', None, 'debit']
+
+
+def per_item_orm(mulai, selesai, kunci):
+    """Perhitungan per item: {kunci(item): [qty, penjualan, laba, penjualan bermodal, item bermodal]}
+
+    Item produk yang sudah dihapus tidak punya harga beli: tidak masuk laba & margin.
+    """
+    hasil = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0])
+    for item in TransaksiItem.query.join(Transaksi).all():
+        if not mulai <= item.transaksi_ref.tanggal.date() <= selesai:
+            continue
+        baris = hasil[kunci(item)]
+        baris[0] += item.jumlah
+        baris[1] += item.harga * item.jumlah
+        if item.produk:
+            baris[2] += (item.harga - item.produk.harga_beli) * item.jumlah
+            baris[3] += item.harga * item.jumlah
+            baris[4] += 1
+    return hasil
+
+
+def sama(hasil, harapan):
+    assert {b['kunci'] for b in hasil} == set(harapan), (sorted(b['kunci'] for b in hasil), sorted(harapan))
+    for b in hasil:
+        qty, penjualan, laba, bermodal, item_bermodal = harapan[b['kunci']]
+        assert b['jumlah'] == qty and abs(b['penjualan'] - penjualan) < 0.01, (b, harapan[b['kunci']])
+        if not item_bermodal:
+            assert b['laba'] is None and b['margin'] is None, b
+            continue
+        assert abs(b['laba'] - laba) < 0.01, (b, harapan[b['kunci']])
+        assert abs(b['margin'] - (laba * 100 / bermodal if bermodal else 0)) < 1e-6
+
+
+def test_analitik():
+    app.config['WTF_CSRF_ENABLED'] = False
+    hari_ini = date.today()
+    awal = date(hari_ini.year - 1, 1, 1)
+    with app.app_context():
+        kategori = [Kategori(nama=f'Analitik {n}') for n in range(3)]
+        db.session.add_all(kategori)
+        db.session.flush()
+        produk = [Produk(kode=f'ANL-{n}', nama=f'Produk Analitik {n}', harga_beli=1000 + 250 * n,
+                         harga_jual=1500 + 400 * n, stok=0, kategori_id=kategori[n % 3].id if n < 6 else None)
+                  for n in range(8)]
+        db.session.add_all(produk)
+        db.session.flush()
+        hapus = produk[-1]
+        for n in range(300):
+            # Dua tahun ke belakang, jam 06:00-21:59
+            waktu = datetime.combine(awal + timedelta(days=n * 2 % (hari_ini - awal).days), datetime.min.time()) + \
+                timedelta(hours=6 + n % 16, minutes=n % 60)
+            items = []
+            for k in range(1 + n % 3):
+                p = produk[(n + k) % len(produk)]
+                jumlah = 1 + (n + k) % 5
+                harga = p.harga_jual - (100 if n % 4 == 0 else 0)  # sebagian dengan diskon
+                items.append(TransaksiItem(produk_id=p.id, jumlah=jumlah, harga=harga, subtotal=harga * jumlah))
+            total = sum(i.subtotal for i in items)
+            db.session.add(Transaksi(kode_transaksi=f'ANL-{n:04d}', tanggal=waktu, subtotal=total, total=total,
+                                     bayar=total, kembalian=0, payment_method=METODE[n % len(METODE)],
+                                     user_id=1, items=items))
+        db.session.commit()
+        hapus_id = hapus.id
+        db.session.delete(hapus)
+        bangun_ulang_rekap()
+        db.session.commit()
+
+        mulai, selesai = awal, hari_ini
+        data = muat_data_penjualan(mulai, selesai)
+        semua = per_item_orm(mulai, selesai, lambda i: 0)[0]
+        total = analitik.ringkasan(data)
+        assert total['jumlah'] == semua[0]
+        assert abs(total['penjualan'] - semua[1]) < 0.01 and abs(total['laba'] - semua[2]) < 0.01
+        assert abs(total['margin'] - semua[2] * 100 / semua[3]) < 1e-6
+        assert abs(total['tanpa_modal'] - (semua[1] - semua[3])) < 0.01 and total['tanpa_modal'] > 0
+        assert abs(total['laba'] - hitung_laporan(mulai, selesai)['total_keuntungan']) < 0.01
+
+        sama(analitik.per_produk(data), per_item_orm(mulai, selesai, lambda i: i.produk_id or 0))
+        sama(analitik.per_kategori(data), per_item_orm(
+            mulai, selesai, lambda i: (i.produk.kategori_id or 0) if i.produk else 0))
+        sama(analitik.per_metode(data), per_item_orm(
+            mulai, selesai, lambda i: i.transaksi_ref.payment_method or 'tunai'))
+        sama(analitik.per_waktu(data, 'bulan'), per_item_orm(
+            mulai, selesai, lambda i: i.transaksi_ref.tanggal.strftime('%Y-%m')))
+        sama(analitik.per_waktu(data, 'jam'), per_item_orm(
+            mulai, selesai, lambda i: f'{i.transaksi_ref.tanggal.hour:02d}:00'))
+        sama(analitik.per_waktu(data, 'minggu'), per_item_orm(
+            mulai, selesai, lambda i: (i.transaksi_ref.tanggal.date()
+                                       - timedelta(days=i.transaksi_ref.tanggal.weekday())).isoformat()))
+
+        # Bucket harian sama dengan penjualan harian di laporan
+        harian = {b['kunci']: b['penjualan'] for b in analitik.per_waktu(data, 'hari')}
+        laporan = hitung_laporan(mulai, selesai)['sales_by_date']
+        assert harian.keys() == laporan.keys()
+        assert all(abs(harian[k] - v) < 0.01 for k, v in laporan.items())
+
+        # Peringkat menurun; produk dihapus (modal tidak diketahui) di akhir, bukan margin 100%
+        peringkat = analitik.per_produk(data, 'margin')
+        margin = [b['margin'] for b in peringkat[:-1]]
+        assert margin == sorted(margin, reverse=True)
+        assert peringkat[-1]['kunci'] == hapus_id and peringkat[-1]['margin'] is None
+        assert analitik.per_produk(data, 'laba')[-1]['kunci'] == hapus_id
+
+        # Tahun ke tahun: satu kolom per tahun, total sama dengan bucket tahunan
+        tahun, per_bulan = analitik.tahun_ke_tahun(data)
+        assert tahun == [awal.year, hari_ini.year]
+        tahunan = {int(b['kunci']): b['laba'] for b in analitik.per_waktu(data, 'tahun')}
+        for i, t in enumerate(tahun):
+            assert abs(sum(b['laba'][i] for b in per_bulan) - tahunan[t]) < 0.01
+
+        # Periode sebagian
+        bulan_ini = hari_ini.replace(day=1)
+        sebagian = analitik.ringkasan(muat_data_penjualan(bulan_ini, hari_ini))
+        assert abs(sebagian['penjualan'] - hitung_laporan(bulan_ini, hari_ini)['total_penjualan']) < 0.01
+
+        hasil = hitung_analitik(mulai, selesai, 'bulan', 'laba')
+        assert {k['nama'] for k in hasil['kategori']} == {k.nama for k in kategori} | {'Tanpa kategori'}
+        assert hasil['produk'][-1]['nama'] == '(produk dihapus)' and hasil['produk'][-1]['laba'] is None
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        halaman = client.get('/laporan/analitik')
+        assert halaman.status_code == 200
+        teks = halaman.get_data(as_text=True)
+        assert 'Tahun ke Tahun</h5>' in teks and 'Analitik 0' in teks
+        halaman = client.get(f'/laporan/analitik?tanggal_mulai={bulan_ini}&tanggal_selesai={hari_ini}'
+                             '&bucket=jam&urut=margin')
+        assert halaman.status_code == 200 and 'Tahun ke Tahun</h5>' not in halaman.get_data(as_text=True)
+        assert client.get('/laporan/analitik?bucket=abad&urut=x').status_code == 200
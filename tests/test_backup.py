@@ -0,0 +1,184 @@
+"""
+Backup database: banyak sinyal checkout digabung jadi satu backup per
+interval, file lock mencegah dua worker backup bersamaan tanpa kehilangan
+sinyal, backup_database menyalin file database dari DATABASE_URL, online
+backup tetap konsisten walau ada penulis lain, dan deteksi perubahan tidak
+membaca isi database.
+
+Cara pakai:
+    python -m pytest tests/test_backup.py
+"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import app_simple
+from app_simple import app, Produk, backup_database
+from backup_service import BackupScheduler, ChangeDetector, online_backup, verify_backup
+
+
+class BackupPalsu:
+    """backup_fn yang menghitung pemanggilan, opsional lambat"""
+
+    def __init__(self, jeda=0):
+        self.jeda = jeda
+        self.jumlah = 0
+        self.mulai = threading.Event()
+
+    def __call__(self):
+        self.mulai.set()
+        time.sleep(self.jeda)
+        self.jumlah += 1
+        return True
+
+
+def tunggu(kondisi, batas=5):
+    akhir = time.monotonic() + batas
+    while not kondisi():
+        assert time.monotonic() < akhir, 'timeout'
+        time.sleep(0.01)
+
+
+def test_sinyal_digabung(tmp_path):
+    backup = BackupPalsu()
+    scheduler = BackupScheduler(backup, str(tmp_path), interval=0.5)
+    for _ in range(50):
+        scheduler.signal()
+    tunggu(lambda: backup.jumlah == 1)
+    pertama = scheduler.status()
+
+    # Sinyal dalam interval menunggu interval lewat, lalu jadi satu backup lagi
+    for _ in range(20):
+        scheduler.signal()
+        time.sleep(0.01)
+    tunggu(lambda: backup.jumlah == 2)
+    kedua = scheduler.status()
+    assert kedua['success'] and kedua['started_at'] >= pertama['finished_at'] + 0.5
+    time.sleep(0.3)
+    assert backup.jumlah == 2 and scheduler._pending_since is None
+
+
+def test_lock_antar_worker(tmp_path):
+    lambat, cepat = BackupPalsu(jeda=0.3), BackupPalsu()
+    worker_a = BackupScheduler(lambat, str(tmp_path), interval=0)
+    worker_b = BackupScheduler(cepat, str(tmp_path), interval=0)
+
+    # Perubahan di worker B, lalu worker A mulai backup (lambat)
+    sinyal_b = time.time()
+    worker_b._requeue(sinyal_b)
+    jalan = threading.Thread(target=worker_a.run_now)
+    jalan.start()
+    assert lambat.mulai.wait(5)
+
+    # Selama A memegang lock, B tidak ikut backup dan sinyalnya tidak hilang
+    assert worker_b.run_now() is False
+    assert cepat.jumlah == 0 and worker_b._pending_since == sinyal_b
+    jalan.join()
+    assert lambat.jumlah == 1
+
+    # Backup A dimulai setelah sinyal B: sudah tercakup, B tidak backup lagi saat berhenti
+    worker_b._flush_pending()
+    assert cepat.jumlah == 0 and worker_b._pending_since is None
+
+    # Perubahan sesudah backup A tetap di-backup oleh B
+    worker_b._requeue(time.time())
+    worker_b._flush_pending()
+    assert cepat.jumlah == 1 and worker_a.status()['started_at'] > sinyal_b
+
+
+def test_backup_database_dari_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_simple, '_backup_folder', str(tmp_path))
+    with app.app_context():
+        jumlah_produk = Produk.query.count()
+
+    assert backup_database()
+    backup = list(tmp_path.glob('kasir_backup_*.db'))
+    assert len(backup) == 1
+    with closing(sqlite3.connect(backup[0])) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM produk').fetchone()[0] == jumlah_produk
+
+    # Tidak ada perubahan sejak backup terakhir: dilewati
+    assert backup_database()
+    assert list(tmp_path.glob('kasir_backup_*.db')) == backup
+
+    # Database server (bukan file SQLite) tidak di-backup di sini
+    monkeypatch.setattr(app_simple, '_file_database_sqlite', lambda: None)
+    assert backup_database() is False
+
+
+def buat_database(path, baris=2000):
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, nama TEXT)')
+        conn.executemany('INSERT INTO item (nama) VALUES (?)', [(f'item {n}' * 5,) for n in range(baris)])
+        conn.commit()
+
+
+def test_online_backup_dan_verifikasi(tmp_path):
+    sumber, tujuan = str(tmp_path / 'kasir.db'), str(tmp_path / 'backup.db')
+    buat_database(sumber)
+
+    # Worker lain terus menulis selama backup bertahap: tetap selesai & konsisten
+    selesai = threading.Event()
+
+    def tulis():
+        with closing(sqlite3.connect(sumber)) as conn:
+            while not selesai.is_set():
+                conn.execute("INSERT INTO item (nama) VALUES ('baru')")
+                conn.commit()
+
+    penulis = threading.Thread(target=tulis)
+    penulis.start()
+    try:
+        halaman = online_backup(sumber, tujuan, pages=1, sleep=0.001)
+    finally:
+        selesai.set()
+        penulis.join()
+    ok, pesan = verify_backup(tujuan, halaman)
+    assert ok, pesan
+    with closing(sqlite3.connect(tujuan)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM item').fetchone()[0] >= 2000
+
+    assert not verify_backup(tujuan, halaman + 1)[0]
+    with open(tujuan, 'r+b') as f:
+        f.truncate(halaman * 4096 // 2)
+    assert not verify_backup(tujuan, halaman)[0]
+
+
+def test_change_detector(tmp_path, monkeypatch):
+    db_file, state = str(tmp_path / 'kasir.db'), str(tmp_path / '.backup_state.json')
+    buat_database(db_file)
+    detector = ChangeDetector(db_file, state)
+    berubah, tanda = detector.check()
+    assert berubah
+    detector.mark_backed_up(tanda)
+    assert detector.check()[0] is False
+
+    # Tulis dari koneksi lain: data_version & ukuran/mtime file berubah
+    with closing(sqlite3.connect(db_file)) as conn:
+        conn.execute("INSERT INTO item (nama) VALUES ('x')")
+        conn.commit()
+    berubah, tanda = detector.check()
+    assert berubah
+    detector.mark_backed_up(tanda)
+
+    # Proses lain / setelah restart: cukup state file, tanpa data_version
+    lain = ChangeDetector(db_file, state)
+    assert lain.check()[0] is False
+    with closing(sqlite3.connect(db_file)) as conn:
+        conn.execute("UPDATE item SET nama = 'y' WHERE id = 1")
+        conn.commit()
+    assert lain.check()[0] and detector.check()[0]
+
+    # Isi database tidak dibaca saat cek perubahan
+    dibuka = []
+    asli = open
+
+    def open_dicatat(path, *args, **kwargs):
+        dibuka.append(str(path))
+        return asli(path, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', open_dicatat)
+    detector.check()
+    assert dibuka == [state]
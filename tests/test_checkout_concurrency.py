@@ -0,0 +1,78 @@
+"""
+Stress test: banyak kasir checkout bersamaan ke beberapa produk "rebutan".
+
+Memastikan stok tidak pernah minus dan stok akhir sama dengan
+stok awal dikurangi jumlah yang benar-benar terjual.
+
+Cara pakai:
+    python -m pytest tests/test_checkout_concurrency.py
+    KASIR_TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_checkout_concurrency.py
+"""
+import random
+import threading
+
+from app_simple import app, db, Produk, TransaksiItem
+
+JUMLAH_KASIR = 12
+CHECKOUT_PER_KASIR = 25
+STOK_AWAL = 60
+HOT_PRODUK = 3
+BAYAR = 10_000_000
+
+
+def kasir_worker(produk_ids, hasil, lock, seed):
+    rng = random.Random(seed)
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        for _ in range(CHECKOUT_PER_KASIR):
+            keranjang = rng.sample(produk_ids, rng.randint(1, len(produk_ids)))
+            items = [{'id': pid, 'quantity': rng.randint(1, 3)} for pid in keranjang]
+            # Harga dihitung server, bayar cukup besar supaya tidak pernah kurang
+            data = client.post('/transaksi/checkout', json={
+                'items': items, 'total': 0, 'bayar': BAYAR, 'payment_method': 'tunai'
+            }).get_json()
+            with lock:
+                hasil.append((data, items))
+
+
+def test_stok_tidak_oversell():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(HOT_PRODUK)]
+        db.session.query(Produk).filter(Produk.id.in_(produk_ids)).update(
+            {Produk.stok: STOK_AWAL}, synchronize_session=False)
+        db.session.query(TransaksiItem).filter(TransaksiItem.produk_id.in_(produk_ids)).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+    hasil, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=kasir_worker, args=(produk_ids, hasil, lock, seed))
+        for seed in range(JUMLAH_KASIR)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    terjual = {pid: 0 for pid in produk_ids}
+    sukses = 0
+    for data, items in hasil:
+        if data['success']:
+            sukses += 1
+            for item in items:
+                terjual[item['id']] += item['quantity']
+
+    with app.app_context():
+        stok_akhir = {p.id: p.stok for p in Produk.query.filter(Produk.id.in_(produk_ids))}
+        item_db = dict(db.session.query(TransaksiItem.produk_id, db.func.sum(TransaksiItem.jumlah))
+                       .filter(TransaksiItem.produk_id.in_(produk_ids))
+                       .group_by(TransaksiItem.produk_id).all())
+
+    print(f"Checkout: {len(hasil)} | sukses: {sukses} | gagal: {len(hasil) - sukses}")
+    for pid in produk_ids:
+        print(f"  Produk {pid}: terjual {terjual[pid]} | stok akhir {stok_akhir[pid]}")
+        assert stok_akhir[pid] >= 0, 'stok minus'
+        assert stok_akhir[pid] == STOK_AWAL - terjual[pid], 'stok tidak sesuai penjualan'
+        assert (item_db.get(pid) or 0) == terjual[pid], 'item transaksi tidak sesuai'
+    assert sukses > 0
@@ -0,0 +1,42 @@
+"""
+Cek jumlah SQL statement checkout tetap flat walau keranjang makin besar.
+
+Cara pakai:
+    python -m pytest tests/test_checkout_statements.py
+"""
+
+from app_simple import app, db, Produk
+
+
+def checkout_statement_count(client, produk_ids):
+    items = [{'id': pid, 'quantity': 1} for pid in produk_ids]
+    # Harga dihitung ulang di server, bayar cukup besar untuk keranjang apa pun
+    response = client.post('/transaksi/checkout', json={
+        'items': items,
+        'total': 0,
+        'bayar': 100_000_000,
+        'payment_method': 'tunai',
+    })
+    data = response.get_json()
+    assert data['success'], data
+    return data['statement_count']
+
+
+def test_statement_count_flat():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 1000})
+        db.session.commit()
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(40)]
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        # Ambil minimum dari beberapa checkout: sesekali ada 2 statement tambahan
+        # saat worker memesan blok nomor transaksi baru
+        counts = {
+            n: min(checkout_statement_count(client, produk_ids[:n]) for _ in range(3))
+            for n in (1, 10, 40)
+        }
+
+    print(f"Statement per checkout: {counts}")
+    assert len(set(counts.values())) == 1, counts
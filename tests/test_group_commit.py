@@ -0,0 +1,151 @@
+"""
+GroupCommitWriter: pekerjaan yang datang selama writer sibuk digabung jadi
+satu batch, hasil/exception sampai ke request pemiliknya, timeout hanya
+membatalkan pekerjaan yang belum diambil writer, proses hasil fork memakai
+thread & antrian sendiri, dan checkout lewat writer menyimpan penjualan
+serta me-replay/menolak idempotency key seperti checkout biasa.
+
+Cara pakai:
+    python -m pytest tests/test_group_commit.py
+"""
+import threading
+import time
+
+import pytest
+
+import app_simple
+import group_commit
+from app_simple import app, db, Produk, Transaksi
+from group_commit import GroupCommitWriter
+
+
+class ProsesPalsu:
+    """process_batch yang mencatat batch; batch pertama bisa ditahan"""
+
+    def __init__(self, tahan=False):
+        self.batch = []
+        self.mulai = threading.Event()
+        self.lanjut = threading.Event()
+        if not tahan:
+            self.lanjut.set()
+
+    def __call__(self, items):
+        self.batch.append(list(items))
+        self.mulai.set()
+        assert self.lanjut.wait(5)
+        return [ValueError(item) if item == 'gagal' else item * 2 for item in items]
+
+
+def kirim_semua(writer, items):
+    """submit dari satu thread per item, return {item: hasil atau exception}"""
+    hasil, lock = {}, threading.Lock()
+
+    def kirim(item):
+        try:
+            keluaran = writer.submit(item)
+        except Exception as e:
+            keluaran = e
+        with lock:
+            hasil[item] = keluaran
+
+    threads = [threading.Thread(target=kirim, args=(item,)) for item in items]
+    for t in threads:
+        t.start()
+    return threads, hasil
+
+
+def tunggu_antrian(writer, jumlah):
+    for _ in range(500):
+        if writer._queue.qsize() >= jumlah:
+            return
+        time.sleep(0.01)
+    raise AssertionError('antrian tidak terisi')
+
+
+def test_batch_digabung_dan_hasil_per_request():
+    proses = ProsesPalsu(tahan=True)
+    writer = GroupCommitWriter(proses, window=0)
+
+    # Writer sibuk dengan batch pertama, sementara request lain mengantri
+    pertama, hasil_pertama = kirim_semua(writer, ['a'])
+    assert proses.mulai.wait(5)
+    antri, hasil = kirim_semua(writer, ['b', 'c', 'gagal', 'd'])
+    tunggu_antrian(writer, 4)
+    proses.lanjut.set()
+    for t in pertama + antri:
+        t.join()
+
+    assert proses.batch[0] == ['a'] and sorted(proses.batch[1]) == ['b', 'c', 'd', 'gagal']
+    assert hasil_pertama == {'a': 'aa'}
+    assert {k: v for k, v in hasil.items() if k != 'gagal'} == {'b': 'bb', 'c': 'cc', 'd': 'dd'}
+    assert isinstance(hasil['gagal'], ValueError)
+    assert writer.stats == {'batch': 2, 'item': 5, 'max_batch': 4}
+
+
+def test_exception_batch_ke_semua_request():
+    def rusak(items):
+        raise RuntimeError('database terkunci')
+
+    writer = GroupCommitWriter(rusak)
+    with pytest.raises(RuntimeError, match='terkunci'):
+        writer.submit(1)
+
+
+def test_timeout_hanya_untuk_yang_masih_antri():
+    proses = ProsesPalsu(tahan=True)
+    writer = GroupCommitWriter(proses, window=0, timeout=0.2)
+
+    # 'a' sudah diproses writer lebih lama dari timeout: tetap menunggu hasilnya
+    pertama, hasil_pertama = kirim_semua(writer, ['a'])
+    assert proses.mulai.wait(5)
+    # 'b' masih di antrian saat timeout: dibatalkan dan tidak pernah diproses
+    with pytest.raises(TimeoutError):
+        writer.submit('b')
+    proses.lanjut.set()
+    for t in pertama:
+        t.join()
+    assert hasil_pertama == {'a': 'aa'}
+
+    assert writer.submit('c') == 'cc'
+    assert proses.batch == [['a'], ['c']]
+
+
+def test_thread_baru_setelah_fork(monkeypatch):
+    writer = GroupCommitWriter(ProsesPalsu())
+    assert writer.submit('a') == 'aa'
+    antrian, thread = writer._queue, writer._thread
+
+    # Proses anak (pid lain) tidak memakai antrian & thread milik induk
+    monkeypatch.setattr(group_commit.os, 'getpid', lambda: -1)
+    assert writer.submit('b') == 'bb'
+    assert writer._queue is not antrian and writer._thread is not thread
+    assert writer._thread.is_alive()
+
+
+def test_checkout_lewat_writer(monkeypatch):
+    app.config['WTF_CSRF_ENABLED'] = False
+    monkeypatch.setattr(app_simple, 'checkout_writer', GroupCommitWriter(app_simple._proses_batch_checkout))
+    with app.app_context():
+        produk = Produk.query.order_by(Produk.id).first()
+        produk.stok = 10
+        db.session.commit()
+        produk_id, transaksi_awal = produk.id, Transaksi.query.count()
+
+    def checkout(client, quantity):
+        response = client.post('/transaksi/checkout', headers={'Idempotency-Key': 'writer-1'}, json={
+            'items': [{'id': produk_id, 'quantity': quantity}], 'total': 0, 'bayar': 10_000_000})
+        return response.status_code, response.get_json()
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        status, asli = checkout(client, 2)
+        assert status == 200 and asli['success'] and asli['batch_size'] == 1
+        app_simple.idempotency_store._local.clear()
+        status, ulang = checkout(client, 2)
+        assert ulang['replay'] and ulang['kode_transaksi'] == asli['kode_transaksi']
+        status, konflik = checkout(client, 3)
+        assert status == 409 and not konflik['success']
+
+    with app.app_context():
+        assert db.session.get(Produk, produk_id).stok == 8
+        assert Transaksi.query.count() == transaksi_awal + 1
@@ -0,0 +1,103 @@
+"""
+Harga massal: pratinjau tidak menulis apa pun, penerapan memakai jumlah
+statement tetap (berapa pun produknya), mencatat riwayat, menaikkan versi
+katalog/harga, dan daftar harga supplier (CSV) dicocokkan per kode. Filter
+pencarian dipakai sebagai subquery dan daftar dari form yang rusak ditolak.
+
+Cara pakai:
+    python -m pytest tests/test_harga_massal.py
+"""
+import io
+
+from app_simple import (app, db, Produk, Kategori, HargaVariasi, RiwayatHarga, AturanHarga,
+                        PenghitungStatement, rencana_harga_massal, terapkan_harga_massal,
+                        hitung_harga_keranjang, perubahan_katalog, _versi_katalog, _versi_harga)
+
+
+def harga(kode):
+    produk = Produk.query.filter_by(kode=kode).one()
+    return produk.harga_beli, produk.harga_jual, [v.harga for v in produk.harga_variasi]
+
+
+def test_harga_massal():
+    with app.app_context():
+        minyak = Kategori(nama='Minyak Test')
+        lain = Kategori(nama='Lain Test')
+        db.session.add_all([minyak, lain])
+        db.session.flush()
+        for n in range(60):
+            produk = Produk(kode=f'MNY-{n:03d}', nama=f'Minyak Goreng {n}', harga_beli=10000 + n,
+                            harga_jual=12000 + n * 10, stok=5, kategori_id=minyak.id)
+            produk.harga_variasi.append(HargaVariasi(min_qty=12, harga=11500))
+            db.session.add(produk)
+        db.session.add(Produk(kode='LAIN-1', nama='Gula', harga_beli=9000, harga_jual=10000, kategori_id=lain.id))
+        db.session.commit()
+        minyak_id, lain_id = minyak.id, lain.id
+
+        # Rencana: +10%, dibulatkan ke atas kelipatan 500; tier ikut naik
+        aturan = AturanHarga('persen', 10, 500, 'atas')
+        versi, versi_harga = _versi_katalog(), _versi_harga()
+        hasil = rencana_harga_massal(aturan, minyak_id)
+        assert hasil['jumlah_produk'] == 60 and len(hasil['perubahan']) == 60
+        assert hasil['perubahan'][0]['harga_jual_baru'] == 13500 and hasil['perubahan'][0]['variasi'][0]['baru'] == 13000
+        assert harga('MNY-000') == (10000, 12000, [11500])  # belum ditulis
+
+        with PenghitungStatement() as penghitung:
+            batch = terapkan_harga_massal(hasil['perubahan'], 'massal', aturan.keterangan())
+            db.session.commit()
+        # update produk + update tier + insert riwayat + versi katalog (3) + versi harga
+        assert penghitung.jumlah <= 7, penghitung.jumlah
+        assert harga('MNY-000') == (10000, 13500, [13000]) and harga('MNY-059') == (10059, 14000, [13000])
+        assert harga('LAIN-1') == (9000, 10000, [])
+        assert RiwayatHarga.query.filter_by(batch=batch).count() == 60
+        assert _versi_katalog() > versi and _versi_harga() != versi_harga
+        produk_id = Produk.query.filter_by(kode='MNY-000').one().id
+        assert produk_id in {p['id'] for p in perubahan_katalog(versi)['items']}
+        baris, _, _ = hitung_harga_keranjang([(produk_id, 12)])
+        assert baris[0]['harga'] == 13000
+        assert not rencana_harga_massal(aturan.__class__('persen', 0, 500), minyak_id)['perubahan']
+
+        # Pencarian: hasil sebagai subquery, bukan ribuan parameter IN
+        with PenghitungStatement() as penghitung:
+            assert rencana_harga_massal(aturan, q='minyak goreng')['jumlah_produk'] == 60
+            assert rencana_harga_massal(aturan, q='goreng 59')['jumlah_produk'] == 1
+        assert penghitung.jumlah <= 8, penghitung.jumlah
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        assert client.get('/produk/harga-massal').status_code == 200
+
+        # Daftar supplier: harga beli baru, harga jual dari margin 20%
+        csv = 'kode;harga_beli\nmny-001;20.000\nTIDAK-ADA;5000\n'
+        data = {'mode': 'margin', 'nilai': '20', 'kelipatan': '100', 'pembulatan': 'terdekat', 'aksi': 'pratinjau',
+                'file': (io.BytesIO(csv.encode()), 'supplier.csv')}
+        halaman = client.post('/produk/harga-massal', data=data, content_type='multipart/form-data').get_data(as_text=True)
+        assert 'TIDAK-ADA' in halaman and '24,000' in halaman
+        with app.app_context():
+            assert harga('MNY-001')[0] == 10001
+            versi = _versi_katalog()
+
+        # Versi pratinjau kedaluwarsa: tidak diterapkan
+        data = {'mode': 'margin', 'nilai': '20', 'kelipatan': '100', 'pembulatan': 'terdekat', 'aksi': 'terapkan',
+                'daftar': '{"MNY-001": {"harga_beli": 20000, "harga_jual": null}}'}
+        client.post('/produk/harga-massal', data={**data, 'versi': versi - 1})
+        with app.app_context():
+            assert harga('MNY-001')[0] == 10001
+        client.post('/produk/harga-massal', data={**data, 'versi': versi})
+        with app.app_context():
+            assert harga('MNY-001')[:2] == (20000, 24000)
+            riwayat = RiwayatHarga.query.filter_by(sumber='file').one()
+            assert (riwayat.harga_beli_lama, riwayat.harga_jual_lama) == (10001, 13500)
+
+        # Daftar dari form yang bentuknya salah: pesan error, bukan 500
+        for rusak in ('[1, 2]', '{"MNY-001": 5}', '{"MNY-001": {"harga_beli": "x"}}', '{"MNY-001": {"harga_jual": -1}}',
+                      'bukan json'):
+            response = client.post('/produk/harga-massal', data={**data, 'daftar': rusak, 'versi': versi})
+            assert response.status_code == 200 and 'Error:' in response.get_data(as_text=True), rusak
+
+        # Tanpa filter apa pun ditolak (harus centang semua produk)
+        client.post('/produk/harga-massal', data={'mode': 'persen', 'nilai': '50', 'aksi': 'terapkan', 'versi': versi})
+        with app.app_context():
+            assert harga('LAIN-1')[1] == 10000
+            print(f"Riwayat harga: {RiwayatHarga.query.count()} baris, kategori lain {lain_id} tidak berubah")
@@ -0,0 +1,134 @@
+"""
+Idempotency key checkout: retry dengan key & isi yang sama di-replay tanpa
+transaksi baru, key yang sama dengan isi berbeda ditolak (409), key milik
+kasir lain tidak saling menimpa, request kembar yang datang bersamaan hanya
+tersimpan sekali, dan tabel lama (primary key key saja) dimigrasi.
+
+Cara pakai:
+    python -m pytest tests/test_idempotency.py
+"""
+import threading
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import app_simple
+from app_simple import app, db, IdempotencyKey, Produk, Transaksi, User
+
+BAYAR = 10_000_000
+
+
+def login(client, username='admin', password='Admin123'):
+    client.post('/login', data={'username': username, 'password': password})
+
+
+def checkout(client, key, produk_id, quantity=1):
+    response = client.post('/transaksi/checkout', headers={'Idempotency-Key': key}, json={
+        'items': [{'id': produk_id, 'quantity': quantity}], 'total': 0, 'bayar': BAYAR, 'payment_method': 'tunai'
+    })
+    return response.status_code, response.get_json()
+
+
+def siapkan():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        produk = Produk.query.order_by(Produk.id).first()
+        produk.stok = 100
+        kasir = User(username='kasir2', nama='Kasir Dua', role='kasir')
+        kasir.set_password('Kasir123')
+        db.session.add(kasir)
+        db.session.commit()
+        return produk.id
+
+
+def stok_dan_transaksi(produk_id):
+    with app.app_context():
+        return db.session.get(Produk, produk_id).stok, Transaksi.query.count()
+
+
+def test_replay_dan_konflik():
+    produk_id = siapkan()
+    _, transaksi_awal = stok_dan_transaksi(produk_id)
+    with app.test_client() as client:
+        login(client)
+        status, asli = checkout(client, 'key-1', produk_id, 2)
+        assert status == 200 and asli['success'] and 'replay' not in asli
+
+        # Retry (respons dari LRU lokal, lalu dari database seperti worker lain)
+        status, ulang = checkout(client, 'key-1', produk_id, 2)
+        assert ulang['replay'] and ulang['kode_transaksi'] == asli['kode_transaksi']
+        app_simple.idempotency_store._local.clear()
+        status, ulang = checkout(client, 'key-1', produk_id, 2)
+        assert ulang['replay'] and ulang['transaksi_id'] == asli['transaksi_id']
+
+        # Key sama, isi keranjang berbeda: ditolak, bukan respons transaksi lain
+        for _ in range(2):
+            status, konflik = checkout(client, 'key-1', produk_id, 3)
+            assert status == 409 and not konflik['success'], konflik
+            app_simple.idempotency_store._local.clear()
+    assert stok_dan_transaksi(produk_id) == (98, transaksi_awal + 1)
+
+    # Key yang sama milik kasir lain adalah penjualan sendiri
+    with app.test_client() as client:
+        login(client, 'kasir2', 'Kasir123')
+        status, lain = checkout(client, 'key-1', produk_id, 3)
+        assert status == 200 and lain['success'] and 'replay' not in lain
+        assert lain['kode_transaksi'] != asli['kode_transaksi']
+    assert stok_dan_transaksi(produk_id) == (95, transaksi_awal + 2)
+
+    # Antrian offline memakai key yang sama: replay atau ditolak, tidak disimpan lagi
+    sales = [{'client_id': 'key-1', 'tanggal': datetime.now().isoformat(), 'bayar': BAYAR,
+              'items': [{'id': produk_id, 'quantity': qty}]} for qty in (2, 5)]
+    with app.test_client() as client:
+        login(client)
+        hasil = client.post('/transaksi/sync', json={'sales': sales}).get_json()['hasil']
+    assert hasil[0]['status'] == 'duplikat' and hasil[0]['kode_transaksi'] == asli['kode_transaksi']
+    assert hasil[1]['status'] == 'ditolak'
+    assert stok_dan_transaksi(produk_id) == (95, transaksi_awal + 2)
+
+
+def test_request_kembar_bersamaan():
+    produk_id = siapkan()
+    stok_awal, transaksi_awal = stok_dan_transaksi(produk_id)
+    jumlah = 8
+    mulai = threading.Barrier(jumlah)
+    hasil, lock = [], threading.Lock()
+
+    def kirim():
+        with app.test_client() as client:
+            login(client)
+            mulai.wait()
+            respons = checkout(client, 'kembar', produk_id)
+            with lock:
+                hasil.append(respons)
+
+    threads = [threading.Thread(target=kirim) for _ in range(jumlah)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(status == 200 and data['success'] for status, data in hasil), hasil
+    assert len({data['kode_transaksi'] for _, data in hasil}) == 1
+    assert sum('replay' not in data for _, data in hasil) == 1
+    assert stok_dan_transaksi(produk_id) == (stok_awal - 1, transaksi_awal + 1)
+
+
+def test_migrasi_primary_key_lama():
+    with app.app_context():
+        db.session.execute(text('DROP TABLE idempotency_key'))
+        db.session.execute(text(
+            'CREATE TABLE idempotency_key (key VARCHAR(64) PRIMARY KEY, user_id INTEGER, '
+            'response TEXT NOT NULL, expires_at DATETIME NOT NULL)'))
+        db.session.execute(text('CREATE INDEX ix_idempotency_key_expires_at ON idempotency_key (expires_at)'))
+        db.session.execute(text(
+            "INSERT INTO idempotency_key VALUES ('lama', 1, '{}', '2999-01-01 00:00:00'), "
+            "('tanpa-user', NULL, '{}', '2999-01-01 00:00:00')"))
+        db.session.commit()
+
+        app_simple._tambah_kolom_baru()
+        db.session.commit()
+        assert inspect(db.engine).get_pk_constraint('idempotency_key')['constrained_columns'] == ['user_id', 'key']
+        assert [(r.user_id, r.key, r.sidik) for r in IdempotencyKey.query] == [(1, 'lama', None)]
+        # Baris lama tanpa sidik tetap di-replay
+        assert app_simple.idempotency_store.get('lama', 1, 'sidik-apa-saja') == {}
@@ -0,0 +1,91 @@
+"""
+Cache grid kasir: HTML kartu layar pertama dirender sekali per versi
+katalog, sama dengan render baru, dan dirender ulang hanya setelah produk atau
+harga variasi berubah; checkout hanya mengganti badge & filter stok.
+
+Cara pakai:
+    python -m pytest tests/test_kasir_grid.py
+"""
+
+from flask import render_template
+from app_simple import (app, db, Produk, Kategori, HargaVariasi, KATALOG_HALAMAN_AWAL,
+                        PenghitungStatement, grid_cache, halaman_katalog)
+
+
+def render_baru(kategori_id=None, stok='ada'):
+    items = halaman_katalog(limit=KATALOG_HALAMAN_AWAL, kategori_id=kategori_id, stok=stok)['items']
+    return render_template('transaksi/_grid_produk.html', items=items)
+
+
+def test_kasir_grid():
+    with app.app_context():
+        kategori = Kategori(nama='Grid Test')
+        db.session.add(kategori)
+        db.session.flush()
+        db.session.add_all([
+            Produk(kode=f'GRD-{n:03d}', nama=f'Produk <Grid> {n}', harga_beli=100, harga_jual=1000 + n,
+                   stok=5, kategori_id=kategori.id)
+            for n in range(40)
+        ])
+        db.session.commit()
+        kategori_id = kategori.id
+        produk_pertama = Produk.query.filter_by(kode='GRD-000').one().id
+
+        grid = grid_cache.get()
+        assert str(grid['grid']) == render_baru()
+        assert '&lt;Grid&gt;' in render_baru(kategori_id)
+        render = grid_cache.stats['render']
+
+        # Versi sama: hanya query (id, stok), tanpa render ulang
+        with PenghitungStatement() as penghitung:
+            assert grid_cache.get(versi=grid['versi'], penanda=grid['penanda']) == grid
+        assert penghitung.jumlah == 1 and grid_cache.stats['render'] == render
+
+        per_kategori = grid_cache.get(kategori_id)
+        assert str(per_kategori['grid']) == render_baru(kategori_id)
+        assert per_kategori['next_cursor'] is not None  # 40 produk > satu layar
+        assert grid_cache.stats['render'] > render
+        render = grid_cache.stats['render']
+
+        # Harga variasi baru: versi naik, grid dibangun ulang dan memuatnya
+        produk_id = per_kategori['next_cursor']
+        db.session.add(HargaVariasi(produk_id=produk_id, min_qty=10, harga=900, keterangan='Dus'))
+        db.session.commit()
+        baru = grid_cache.get(kategori_id)
+        assert baru['versi'] > per_kategori['versi'] and str(baru['grid']) == render_baru(kategori_id)
+        assert 'Dus' in str(baru['grid']) and grid_cache.stats['render'] == render + KATALOG_HALAMAN_AWAL
+        assert grid_cache._versi == baru['versi'] and len(grid_cache._entri) == KATALOG_HALAMAN_AWAL
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        halaman = client.get('/kasir').get_data(as_text=True)
+        with app.app_context():
+            assert render_baru() in halaman
+        render = grid_cache.stats['render']
+        client.get('/kasir')
+        assert grid_cache.stats['render'] == render
+
+        response = client.get(f'/kasir/grid?kategori_id={kategori_id}')
+        assert response.status_code == 200 and 'GRD-000' in response.get_data(as_text=True)
+        assert response.headers['X-Next-Cursor'] == str(baru['next_cursor'])
+        assert response.headers['X-Katalog-Versi'] == str(baru['versi'])
+        ulang = client.get(f'/kasir/grid?kategori_id={kategori_id}', headers={'If-None-Match': response.headers['ETag']})
+        assert ulang.status_code == 304
+
+        # Checkout menghabiskan stok: ETag berubah, grid tanpa produk itu, kartu lama tidak dirender ulang
+        render = grid_cache.stats['render']
+        client.post('/transaksi/checkout', json={
+            'items': [{'id': produk_pertama, 'quantity': 5}], 'total': 0, 'bayar': 10_000_000})
+        habis = client.get(f'/kasir/grid?kategori_id={kategori_id}', headers={'If-None-Match': response.headers['ETag']})
+        assert habis.status_code == 200 and 'GRD-000' not in habis.get_data(as_text=True)
+        assert habis.headers['X-Katalog-Versi'] == str(baru['versi'])
+        assert habis.headers['X-Next-Cursor'] != response.headers['X-Next-Cursor']
+        kosong = client.get(f'/kasir/grid?kategori_id={kategori_id}&stok=habis').get_data(as_text=True)
+        assert 'GRD-000' in kosong and 'Stok: 0' in kosong
+        with app.app_context():
+            assert habis.get_data(as_text=True) == render_baru(kategori_id)
+            assert kosong == render_baru(kategori_id, 'habis')
+        assert grid_cache.stats['render'] == render + 1  # hanya kartu yang baru masuk layar pertama
+        assert client.get('/kasir/grid?stok=x').status_code == 400
+        print(f"Grid kasir: hit {grid_cache.stats['hit']}, render {grid_cache.stats['render']}")
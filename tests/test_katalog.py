@@ -0,0 +1,60 @@
+"""
+Katalog per halaman untuk kasir: cursor tanpa duplikat/terlewat, filter,
+dan versi katalog yang naik saat produk diubah.
+
+Cara pakai:
+    python -m pytest tests/test_katalog.py
+"""
+
+from app_simple import app, db, Produk, HargaVariasi, Kategori
+
+
+def semua_halaman(client, **params):
+    ids, versi, cursor = [], set(), 0
+    while cursor is not None:
+        query = '&'.join(f'{k}={v}' for k, v in {'cursor': cursor, 'limit': 7, **params}.items())
+        data = client.get(f'/api/katalog?{query}').get_json()
+        ids += [p['id'] for p in data['items']]
+        versi.add(data['versi'])
+        cursor = data['next_cursor']
+    return ids, versi
+
+
+def test_katalog():
+    with app.app_context():
+        kategori = Kategori(nama='Uji Katalog')
+        db.session.add(kategori)
+        db.session.flush()
+        for p in Produk.query.order_by(Produk.id).limit(30):
+            p.stok = 10
+        for p in Produk.query.order_by(Produk.id).limit(5):
+            p.kategori_id = kategori.id
+        db.session.commit()
+        kategori_id = kategori.id
+        ada_stok = sorted(p.id for p in Produk.query.filter(Produk.stok > 0))
+        di_kategori = sorted(p.id for p in Produk.query.filter_by(kategori_id=kategori_id) if p.stok > 0)
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+
+        ids, versi = semua_halaman(client)
+        print(f"Halaman stok ada: {len(ids)} produk, versi {versi}")
+        assert ids == ada_stok, (len(ids), len(ada_stok))
+        assert len(versi) == 1
+
+        ids, _ = semua_halaman(client, kategori_id=kategori_id)
+        assert ids == di_kategori, ids
+        assert client.get('/api/katalog?stok=salah').status_code == 400
+
+        versi_awal = versi.pop()
+        with app.app_context():
+            db.session.add(HargaVariasi(produk_id=ada_stok[0], min_qty=10, harga=1000, keterangan='Grosir'))
+            db.session.commit()
+        data = client.get('/api/katalog?limit=1').get_json()
+        assert data['versi'] != versi_awal, data['versi']
+        assert data['items'][0]['harga_variasi'][-1]['keterangan'] == 'Grosir'
+
+        halaman = client.get('/kasir')
+        assert halaman.status_code == 200
+        assert b'id="katalogSentinel"' in halaman.data
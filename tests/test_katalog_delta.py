@@ -0,0 +1,107 @@
+"""
+Delta sync katalog: hanya produk yang berubah/dihapus sejak versi klien
+(dan yang terjual sejak penanda stok klien), 304 untuk GET bersyarat saat
+katalog tidak berubah, dan ETag berubah setelah checkout mengurangi stok.
+
+Cara pakai:
+    python -m pytest tests/test_katalog_delta.py
+"""
+
+from app_simple import app, db, Produk, HargaVariasi, Transaksi, TransaksiItem, PenghitungStatement
+
+
+def test_katalog_delta():
+    with app.app_context():
+        # Seed awal tidak lewat hook versi; satu edit supaya versi katalog > 0
+        db.session.get(Produk, 1).minimal_stok = 3
+        db.session.commit()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        snapshot = client.get('/api/kasir/snapshot').get_json()
+        versi, stok = snapshot['versi_katalog'], snapshot['stok_katalog']
+
+        # Tidak ada perubahan: delta kosong, dan GET bersyarat dijawab 304
+        pertama = client.get(f'/api/katalog/perubahan?sejak={versi}')
+        assert pertama.get_json() == {'versi': versi, 'stok': stok, 'reset': False, 'items': [], 'dihapus': []}
+        etag = pertama.headers['ETag']
+        with PenghitungStatement() as penghitung:
+            kedua = client.get(f'/api/katalog/perubahan?sejak={versi}', headers={'If-None-Match': etag})
+        assert kedua.status_code == 304, kedua.status_code
+        assert penghitung.jumlah <= 2, penghitung.jumlah  # user login + versi katalog & stok
+        halaman = client.get('/api/katalog?limit=5')
+        assert client.get('/api/katalog?limit=5', headers={'If-None-Match': halaman.headers['ETag']}).status_code == 304
+
+        with app.app_context():
+            ids = [p.id for p in Produk.query.order_by(Produk.id).limit(3)]
+            db.session.get(Produk, ids[0]).harga_jual += 500
+            db.session.add(HargaVariasi(produk_id=ids[1], min_qty=12, harga=900))
+            db.session.delete(db.session.get(Produk, ids[2]))
+            db.session.commit()
+            harga_baru = db.session.get(Produk, ids[0]).harga_jual
+
+        delta = client.get(f'/api/katalog/perubahan?sejak={versi}', headers={'If-None-Match': etag})
+        data = delta.get_json()
+        print(f"Delta sejak versi {versi}: {len(delta.data)} byte, versi baru {data['versi']}")
+        assert delta.status_code == 200
+        assert data['versi'] > versi and not data['reset']
+        assert sorted(p['id'] for p in data['items']) == ids[:2], data['items']
+        assert data['dihapus'] == [ids[2]]
+        assert next(p for p in data['items'] if p['id'] == ids[0])['harga_jual'] == harga_baru
+        assert len(delta.data) < len(client.get('/api/kasir/snapshot').data) / 20
+
+        # Versi yang tidak dikenal (mis. database di-restore) -> muat ulang penuh
+        assert client.get('/api/katalog/perubahan?sejak=0').get_json()['reset']
+        assert client.get(f"/api/katalog/perubahan?sejak={data['versi'] + 100}").get_json()['reset']
+
+
+def test_stok_dari_checkout():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        produk = Produk.query.order_by(Produk.id).first()
+        produk.stok = 2
+        db.session.commit()
+        produk_id, kode = produk.id, produk.kode
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        snapshot = client.get('/api/kasir/snapshot').get_json()
+        versi, stok = snapshot['versi_katalog'], snapshot['stok_katalog']
+        halaman = client.get('/api/katalog?limit=5')
+        cari = client.get(f'/api/produk?search={kode}')
+        assert produk_id in [p['id'] for p in cari.get_json()]
+
+        # Checkout tidak menaikkan versi katalog, tapi stoknya tidak boleh basi
+        hasil = client.post('/transaksi/checkout', json={
+            'items': [{'id': produk_id, 'quantity': 2}], 'total': 0, 'bayar': 10_000_000}).get_json()
+        assert hasil['success'], hasil
+
+        baru = client.get('/api/katalog?limit=5', headers={'If-None-Match': halaman.headers['ETag']})
+        assert baru.status_code == 200 and baru.get_json()['versi'] == versi
+        assert produk_id not in [p['id'] for p in baru.get_json()['items']]  # stok habis
+        cari = client.get(f'/api/produk?search={kode}', headers={'If-None-Match': cari.headers['ETag']})
+        assert cari.status_code == 200 and produk_id not in [p['id'] for p in cari.get_json()]
+
+        data = client.get(f'/api/katalog/perubahan?sejak={versi}&stok={stok}').get_json()
+        assert data['versi'] == versi and data['stok'] > stok and not data['reset']
+        assert [(p['id'], p['stok']) for p in data['items']] == [(produk_id, 0)]
+        # Klien lama tanpa penanda stok: hanya perubahan versi katalog
+        assert client.get(f'/api/katalog/perubahan?sejak={versi}').get_json()['items'] == []
+        kosong = client.get(f"/api/katalog/perubahan?sejak={versi}&stok={data['stok']}").get_json()
+        assert kosong['items'] == [] and not kosong['reset']
+        assert client.get(f"/api/katalog/perubahan?sejak={versi}&stok={data['stok'] + 5}").get_json()['reset']
+
+        # Transaksi dihapus (id bisa dipakai ulang SQLite): penanda stok tetap maju
+        with app.app_context():
+            db.session.query(TransaksiItem).delete(synchronize_session=False)
+            db.session.query(Transaksi).delete(synchronize_session=False)
+            lain = Produk.query.filter(Produk.id != produk_id, Produk.stok > 1).order_by(Produk.id).first()
+            db.session.commit()
+            lain_id, lain_stok = lain.id, lain.stok
+        hasil = client.post('/transaksi/checkout', json={
+            'items': [{'id': lain_id, 'quantity': 1}], 'total': 0, 'bayar': 10_000_000}).get_json()
+        assert hasil['success'], hasil
+        lagi = client.get(f"/api/katalog/perubahan?sejak={versi}&stok={data['stok']}").get_json()
+        assert lagi['stok'] > data['stok'] and not lagi['reset']
+        assert [(p['id'], p['stok']) for p in lagi['items']] == [(lain_id, lain_stok - 1)]
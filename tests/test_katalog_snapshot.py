@@ -0,0 +1,103 @@
+"""
+Snapshot katalog bersama (mmap): isi sama dengan query database, diganti
+atomik saat versi katalog berubah, dan hanya satu proses yang membangunnya.
+Stok tidak ikut di snapshot: halaman katalog, scan & snapshot register
+membacanya dari database, jadi penjualan langsung terlihat.
+
+Cara pakai:
+    python -m pytest tests/test_katalog_snapshot.py
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import app_simple
+from sqlalchemy import update
+
+from app_simple import (app, db, Produk, HargaVariasi, halaman_katalog, scan_barcode, _load_katalog_semua,
+                        _versi_katalog)
+from catalog_snapshot import SnapshotManager
+
+APP_DIR = Path(app_simple.__file__).parent
+WORKER = """
+import sys
+sys.path.insert(0, {app_dir!r})
+from app_simple import app, katalog_snapshot
+with app.app_context():
+    print(katalog_snapshot.get().versi, katalog_snapshot.stats['rebuild'])
+"""
+
+
+def test_katalog_snapshot(tmp_path, monkeypatch):
+    snapshot_file = tmp_path / 'katalog.snap'
+    katalog_snapshot = SnapshotManager(str(snapshot_file), _load_katalog_semua, _versi_katalog)
+    monkeypatch.setattr(app_simple, 'katalog_snapshot', katalog_snapshot)
+    with app.app_context():
+        db.session.get(Produk, 1).minimal_stok = 3  # versi katalog > 0
+        db.session.add(HargaVariasi(produk_id=2, min_qty=6, harga=1, keterangan='Grosir ½ lusin'))
+        db.session.commit()
+
+        versi, harapan = _load_katalog_semua()
+        snapshot = katalog_snapshot.get()
+        assert snapshot.versi == versi
+        assert snapshot.semua() == [{k: v for k, v in p.items() if k != 'stok'} for p in harapan]
+        assert snapshot.get(2)['harga_variasi'][-1]['keterangan'] == 'Grosir ½ lusin'
+        assert snapshot.get(10 ** 9) is None
+
+        # Halaman katalog dari snapshot sama dengan filter di database
+        for stok in ('ada', 'habis', 'semua'):
+            items, cursor = [], 0
+            while cursor is not None:
+                halaman = halaman_katalog(cursor, 7, stok=stok)
+                items += halaman['items']
+                cursor = halaman['next_cursor']
+            cocok = [p for p in harapan if stok == 'semua' or (p['stok'] > 0) == (stok == 'ada')]
+            assert items == cocok, stok
+
+        kode = harapan[0]['kode']
+        assert scan_barcode(kode.lower())['produk']['id'] == harapan[0]['id']
+        assert scan_barcode('TIDAK-ADA') is None
+
+        # Stok berubah tanpa versi katalog baru (seperti checkout): snapshot tetap,
+        # stok & filter stok mengikuti database
+        ada = next(p for p in harapan if p['stok'] > 0)
+        db.session.execute(update(Produk).where(Produk.id == ada['id']).values(stok=0))
+        db.session.commit()
+        assert katalog_snapshot.get() is snapshot and _versi_katalog() == versi
+        assert scan_barcode(ada['kode'])['produk']['stok'] == 0
+        semua = halaman_katalog(limit=10 ** 6, stok='semua')['items']
+        assert next(p for p in semua if p['id'] == ada['id'])['stok'] == 0
+        assert ada['id'] not in [p['id'] for p in halaman_katalog(limit=10 ** 6)['items']]
+        assert ada['id'] in [p['id'] for p in halaman_katalog(limit=10 ** 6, stok='habis')['items']]
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.test_client() as client:
+            client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+            produk = client.get('/api/kasir/snapshot').get_json()['produk']
+        assert next(p for p in produk if p['id'] == ada['id'])['stok'] == 0
+        _, harapan = _load_katalog_semua()
+
+        # Perubahan katalog: file baru (inode lain), snapshot lama tetap bisa dibaca
+        inode = snapshot_file.stat().st_ino
+        db.session.get(Produk, harapan[0]['id']).nama = 'Nama Baru'
+        db.session.commit()
+        baru = katalog_snapshot.get()
+        assert baru.versi > snapshot.versi and snapshot_file.stat().st_ino != inode
+        assert baru.get(harapan[0]['id'])['nama'] == 'Nama Baru'
+        assert snapshot.get(harapan[0]['id'])['nama'] == harapan[0]['nama']
+        assert not list(tmp_path.glob('*.tmp'))
+
+        db.session.get(Produk, 1).minimal_stok = 4
+        db.session.commit()
+        versi_baru = katalog_snapshot.version_fn()
+
+    # Beberapa worker sekaligus: satu membangun, sisanya memakai file yang sama
+    worker = [
+        subprocess.Popen([sys.executable, '-c', WORKER.format(app_dir=str(APP_DIR))], stdout=subprocess.PIPE, text=True,
+                         env={**os.environ, 'KATALOG_SNAPSHOT_PATH': str(snapshot_file), 'LOG_LEVEL': 'ERROR'})
+        for _ in range(3)
+    ]
+    hasil = [tuple(map(int, p.communicate()[0].split()[-2:])) for p in worker]
+    assert all(v == versi_baru for v, _ in hasil), hasil
+    assert sum(rebuild for _, rebuild in hasil) == 1, hasil
+    print(f"Snapshot {snapshot_file.stat().st_size} byte untuk {len(harapan)} produk, worker {hasil}")
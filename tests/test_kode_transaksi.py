@@ -0,0 +1,92 @@
+"""
+Kode transaksi tetap unik saat beberapa worker (masing-masing dengan blok
+nomor sendiri) checkout dan sync offline bersamaan, dan penghitung nomor
+per hari tidak pernah tertinggal dari nomor yang sudah dipakai.
+
+Cara pakai:
+    python -m pytest tests/test_kode_transaksi.py
+    KASIR_TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_kode_transaksi.py
+"""
+import re
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import app_simple
+from app_simple import (app, db, Produk, Transaksi, UrutanTransaksi, _release_kode_block,
+                        _reserve_kode_block)
+from kode_allocator import KodeAllocator
+
+JUMLAH_WORKER = 3
+JUMLAH_KASIR = 8
+CHECKOUT_PER_KASIR = 20
+BAYAR = 10_000_000
+
+
+class AllocatorPerWorker:
+    """kode_allocator berbeda per thread, seperti beberapa worker gunicorn"""
+
+    def __init__(self, jumlah):
+        self.worker = [KodeAllocator(_reserve_kode_block, _release_kode_block) for _ in range(jumlah)]
+        self.lokal = threading.local()
+
+    def __getattr__(self, nama):
+        return getattr(self.worker[getattr(self.lokal, 'nomor', 0)], nama)
+
+
+def kasir(allocator, produk_ids, hasil, lock, nomor):
+    allocator.lokal.nomor = nomor % JUMLAH_WORKER
+    kemarin = datetime.now() - timedelta(days=1)
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        for k in range(CHECKOUT_PER_KASIR):
+            items = [{'id': produk_ids[(nomor + k) % len(produk_ids)], 'quantity': 1}]
+            if k % 5 == 4:
+                # Sync offline: penjualan hari ini memesan blok langsung dari penghitung
+                sales = [{'client_id': str(uuid.uuid4()), 'tanggal': waktu.isoformat(), 'items': items,
+                          'bayar': BAYAR} for waktu in (datetime.now(), datetime.now(), kemarin)]
+                data = client.post('/transaksi/sync', json={'sales': sales}).get_json()
+                jumlah = [h['status'] == 'ok' for h in data['hasil']]
+            else:
+                data = client.post('/transaksi/checkout', json={
+                    'items': items, 'total': 0, 'bayar': BAYAR, 'payment_method': 'tunai'
+                }).get_json()
+                jumlah = [data['success']]
+            with lock:
+                hasil.extend(jumlah)
+
+
+def test_kode_unik_banyak_worker(monkeypatch):
+    app.config['WTF_CSRF_ENABLED'] = False
+    allocator = AllocatorPerWorker(JUMLAH_WORKER)
+    monkeypatch.setattr(app_simple, 'kode_allocator', allocator)
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 100_000})
+        db.session.commit()
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(5)]
+
+    hasil, lock = [], threading.Lock()
+    threads = [threading.Thread(target=kasir, args=(allocator, produk_ids, hasil, lock, n))
+               for n in range(JUMLAH_KASIR)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for worker in allocator.worker:
+        worker.release_unused()
+
+    assert hasil and all(hasil), f'{hasil.count(False)} dari {len(hasil)} penjualan gagal'
+    with app.app_context():
+        kode = [k for k, in db.session.query(Transaksi.kode_transaksi)]
+        urutan = dict(db.session.query(UrutanTransaksi.tanggal, UrutanTransaksi.terakhir))
+
+    assert len(kode) == len(hasil)
+    assert len(set(kode)) == len(kode), 'kode transaksi ganda'
+    terpakai = defaultdict(int)
+    for k in kode:
+        tanggal, nomor = re.fullmatch(r'TRX(\d{8})-(\d{5,})', k).groups()
+        terpakai[tanggal] = max(terpakai[tanggal], int(nomor))
+    # Sisa blok boleh dikembalikan, nomor yang sudah dipakai tidak
+    for tanggal, nomor in terpakai.items():
+        assert urutan[tanggal] >= nomor, (tanggal, urutan[tanggal], nomor)
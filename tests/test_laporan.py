@@ -0,0 +1,107 @@
+"""
+Laporan penjualan: total, keuntungan, penjualan harian, metode bayar dan
+produk terlaris dihitung dengan query GROUP BY, hasilnya sama dengan
+perhitungan per transaksi, dan jumlah query tidak bergantung pada panjang
+periode.
+
+Cara pakai:
+    python -m pytest tests/test_laporan.py
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+import app_simple
+from app_simple import (app, db, Member, Produk, Transaksi, TransaksiItem, PenghitungStatement,
+                        bangun_ulang_rekap, hitung_laporan)
+
+METODE = ['tunai', 'qris', None, 'debit']
+
+
+def laporan_manual(mulai, selesai):
+    """Perhitungan lama: muat semua transaksi lalu jumlahkan di Python"""
+    transaksi = [t for t in Transaksi.query.all() if mulai <= t.tanggal.date() <= selesai]
+    keuntungan = 0
+    harian = defaultdict(float)
+    metode = defaultdict(int)
+    produk = Counter()
+    for t in transaksi:
+        harian[t.tanggal.strftime('%Y-%m-%d')] += t.total
+        metode[t.payment_method or 'tunai'] += 1
+        for item in t.items:
+            if item.produk:  # produk dihapus: harga beli tidak diketahui, tidak masuk keuntungan
+                keuntungan += (item.harga - item.produk.harga_beli) * item.jumlah
+            produk[item.produk.nama if item.produk else '(produk dihapus)'] += item.subtotal
+    return {
+        'total_penjualan': sum(t.total for t in transaksi),
+        'total_transaksi': len(transaksi),
+        'total_keuntungan': keuntungan,
+        'sales_by_date': dict(harian),
+        'payment_count': dict(metode),
+        'top_products': [[nama, total] for nama, total in produk.most_common(5)],
+    }
+
+
+def test_laporan(monkeypatch):
+    app.config['WTF_CSRF_ENABLED'] = False
+    hari_ini = date.today()
+    with app.app_context():
+        produk = Produk.query.order_by(Produk.id).limit(8).all()
+        hapus = Produk(kode='LAP-HAPUS', nama='Produk Dihapus', harga_beli=100, harga_jual=300, stok=10)
+        db.session.add(hapus)
+        member = Member(nama='Member Laporan')
+        db.session.add(member)
+        db.session.flush()
+        for n in range(120):
+            # 40 hari ke belakang; jam 23:59 menguji batas akhir hari
+            waktu = datetime.combine(hari_ini - timedelta(days=n % 40), datetime.min.time()) + \
+                timedelta(hours=8 + n % 16, minutes=59 if n % 7 else 0)
+            if n % 11 == 0:
+                waktu = waktu.replace(hour=23, minute=59, second=59)
+            items = []
+            for k in range(1 + n % 3):
+                p = produk[(n + k) % len(produk)] if n % 13 else hapus
+                jumlah = 1 + (n + k) % 4
+                items.append(TransaksiItem(produk_id=p.id, jumlah=jumlah, harga=p.harga_jual,
+                                           subtotal=p.harga_jual * jumlah))
+            total = sum(i.subtotal for i in items)
+            db.session.add(Transaksi(kode_transaksi=f'LAP-{n:04d}', tanggal=waktu, subtotal=total, total=total,
+                                     bayar=total, kembalian=0, payment_method=METODE[n % len(METODE)],
+                                     member_id=member.id if n % 5 == 0 else None, user_id=1, items=items))
+        db.session.commit()
+        db.session.delete(hapus)
+        # Transaksi ditulis langsung (bukan lewat checkout): rekap harian dibangun ulang
+        bangun_ulang_rekap()
+        db.session.commit()
+
+        for mulai, selesai in [(hari_ini, hari_ini), (hari_ini - timedelta(days=6), hari_ini),
+                               (hari_ini - timedelta(days=60), hari_ini - timedelta(days=10))]:
+            hasil = hitung_laporan(mulai, selesai)
+            harapan = laporan_manual(mulai, selesai)
+            for kunci in ('total_transaksi', 'payment_count'):
+                assert hasil[kunci] == harapan[kunci], (kunci, hasil[kunci], harapan[kunci])
+            for kunci in ('total_penjualan', 'total_keuntungan'):
+                assert abs(hasil[kunci] - harapan[kunci]) < 0.01, (kunci, hasil[kunci], harapan[kunci])
+            assert hasil['sales_by_date'].keys() == harapan['sales_by_date'].keys()
+            assert all(abs(hasil['sales_by_date'][k] - v) < 0.01 for k, v in harapan['sales_by_date'].items())
+            assert [round(t) for _, t in hasil['top_products']] == [round(t) for _, t in harapan['top_products']]
+            assert {n for n, _ in hasil['top_products']} <= {p.nama for p in produk} | {'(produk dihapus)'}
+        semua = hitung_laporan(hari_ini - timedelta(days=60), hari_ini)
+        assert semua['total_transaksi'] == 120
+        assert semua['top_members'][0]['nama'] == 'Member Laporan'
+        assert semua['top_members'][0]['total_transaksi'] == 24
+
+    # Jumlah statement halaman laporan sama untuk satu hari dan satu tahun
+    monkeypatch.setattr(app_simple, 'LAPORAN_DETAIL_MAX', 50)
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        jumlah = []
+        for hari in (0, 365):
+            mulai = (hari_ini - timedelta(days=hari)).isoformat()
+            with PenghitungStatement() as penghitung:
+                halaman = client.get(f'/laporan?tanggal_mulai={mulai}&tanggal_selesai={hari_ini.isoformat()}')
+            assert halaman.status_code == 200
+            jumlah.append(penghitung.jumlah)
+        assert jumlah[0] == jumlah[1], jumlah
+        # Ringkasan seluruh periode, detail hanya transaksi terbaru
+        assert 'Menampilkan 50 transaksi terakhir dari 120' in halaman.get_data(as_text=True)
+        print(f"Halaman laporan: {jumlah[1]} statement")
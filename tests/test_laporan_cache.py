@@ -0,0 +1,111 @@
+"""
+Cache hasil laporan: periode yang sama dibaca dari cache, checkout hanya
+membuang periode yang memuat hari ini, penjualan offline mundur hanya
+periode lampau yang beririsan, perubahan yang dicatat worker lain
+(PerubahanLaporan) ikut membuang cache di proses ini, dan perubahan produk
+hanya membuang cache jika menyentuh data laporan (mis. harga beli).
+
+Cara pakai:
+    python -m pytest tests/test_laporan_cache.py
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from app_simple import (app, db, Produk, PenghitungStatement, VERSI_LAPORAN_KEY, Pengaturan,
+                        catat_perubahan_laporan, get_local_now, laporan_cache)
+
+BAYAR = 10_000_000
+
+
+def test_laporan_cache(monkeypatch):
+    app.config['WTF_CSRF_ENABLED'] = False
+    hari_ini = get_local_now().date()
+    lalu = hari_ini - timedelta(days=3)
+    minggu = (hari_ini - timedelta(days=6), hari_ini)
+    bulan_lalu = (hari_ini - timedelta(days=40), hari_ini - timedelta(days=10))
+    kemarin = (lalu, hari_ini - timedelta(days=1))
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 1000})
+        db.session.commit()
+        produk_id = Produk.query.order_by(Produk.id).first().id
+
+    def buka(client, periode):
+        with PenghitungStatement() as penghitung:
+            halaman = client.get(f'/laporan?tanggal_mulai={periode[0]}&tanggal_selesai={periode[1]}')
+        assert halaman.status_code == 200
+        return halaman.get_data(as_text=True), penghitung.jumlah
+
+    def miss(client, periode):
+        sebelum = laporan_cache.stats['miss']
+        buka(client, periode)
+        return laporan_cache.stats['miss'] - sebelum
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        # Dibuka lagi: hasil dari cache, query laporan tidak dijalankan
+        _, dihitung = buka(client, bulan_lalu)
+        _, dari_cache = buka(client, bulan_lalu)
+        assert laporan_cache.info()['hit'] == 1
+        for periode in (minggu, kemarin):
+            assert miss(client, periode) == 1
+        assert dari_cache < dihitung, (dari_cache, dihitung)
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [0, 0, 0]
+
+        # Checkout hari ini: hanya periode yang memuat hari ini dihitung ulang
+        halaman, _ = buka(client, minggu)
+        data = client.post('/transaksi/checkout', json={
+            'items': [{'id': produk_id, 'quantity': 2}], 'total': 0, 'bayar': BAYAR,
+        }).get_json()
+        assert data['success'], data
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [1, 0, 0]
+        halaman_baru, _ = buka(client, minggu)
+        assert halaman_baru != halaman
+
+        # Penjualan offline tiga hari lalu: periode kemarin & minggu ini, bulan lalu tetap
+        hasil = client.post('/transaksi/sync', json={'sales': [{
+            'client_id': str(uuid.uuid4()),
+            'tanggal': datetime.combine(lalu, datetime.min.time()).replace(hour=10).isoformat(),
+            'items': [{'id': produk_id, 'quantity': 1}], 'bayar': BAYAR,
+        }]}).get_json()
+        assert hasil['ringkasan'] == {'ok': 1}, hasil
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [1, 0, 1]
+
+        # Perubahan dari worker lain hanya terlihat lewat versi_laporan di database
+        with app.app_context():
+            versi = int(Pengaturan.get(VERSI_LAPORAN_KEY))
+            catat_perubahan_laporan(bulan_lalu[0], bulan_lalu[0])
+            db.session.info.pop('laporan_berubah')  # bukan proses ini yang menulis
+            db.session.commit()
+            assert int(Pengaturan.get(VERSI_LAPORAN_KEY)) == versi + 1
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [0, 1, 0]
+
+        # Harga jual & stok tidak dipakai laporan: cache tetap; harga beli membuang semua
+        with app.app_context():
+            produk = db.session.get(Produk, produk_id)
+            produk.harga_jual += 100
+            produk.stok += 5
+            db.session.commit()
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [0, 0, 0]
+        with app.app_context():
+            db.session.get(Produk, produk_id).harga_beli += 100
+            db.session.commit()
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [1, 1, 1]
+
+        # Rollback tidak membuang cache
+        with app.app_context():
+            catat_perubahan_laporan()
+            db.session.rollback()
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [0, 0, 0]
+
+        # Entri yang memuat hari ini kedaluwarsa sendiri (checkout di worker lain)
+        monkeypatch.setattr(laporan_cache, 'ttl_hari_ini', 0)
+        assert [miss(client, p) for p in (minggu, bulan_lalu, kemarin)] == [1, 0, 0]
+
+        # LRU: entri terlama dibuang saat penuh
+        monkeypatch.setattr(laporan_cache, 'max_entri', 2)
+        assert miss(client, (lalu, lalu)) == 1
+        assert [miss(client, p) for p in (kemarin, bulan_lalu)] == [0, 1]
+
+        halaman, _ = buka(client, kemarin)
+        info = laporan_cache.info()
+        assert f"Cache laporan: {info['hit']} hit / {info['miss']} miss" in halaman, info
@@ -0,0 +1,55 @@
+"""
+Pencarian produk & member lewat index teks: normalisasi singkatan satuan,
+prefix per kata, urutan relevansi, dan index ikut berubah saat produk
+diubah/dihapus.
+
+Cara pakai:
+    python -m pytest tests/test_pencarian.py
+"""
+
+from app_simple import app, db, Produk, Member, cari_ids
+from search_index import normalisasi_teks
+
+
+def test_pencarian():
+    assert normalisasi_teks('Minyak Goreng 2L (Pouch)') == 'minyak goreng 2 liter pouch'
+    assert normalisasi_teks('Gula Pasir 1Kg') == normalisasi_teks('gula pasir 1 kilogram')
+
+    with app.app_context():
+        db.session.add_all([
+            Produk(kode='TST-001', nama='Indomie Goreng Spesial 85gr', harga_beli=2500, harga_jual=3000, stok=50),
+            Produk(kode='TST-002', nama='Gula Pasir 1Kg', harga_beli=14000, harga_jual=16000, stok=20),
+            Produk(kode='TST-003', nama='Minyak Goreng 2L', harga_beli=30000, harga_jual=34000, stok=0),
+            Member(nama='Siti Rahma', no_telp='0812-3456-7890'),
+        ])
+        db.session.commit()
+        nama = lambda ids: [db.session.get(Produk, i).nama for i in ids]  # noqa: E731
+
+        assert nama(cari_ids(Produk, 'indo gor'))[0] == 'Indomie Goreng Spesial 85gr'
+        assert 'Gula Pasir 1Kg' in nama(cari_ids(Produk, 'gula 1 kilo'))
+        assert nama(cari_ids(Produk, 'minyak 2 ltr')) == ['Minyak Goreng 2L']
+        assert nama(cari_ids(Produk, 'tst-002')) == ['Gula Pasir 1Kg']
+        # Tidak ada awal kata yang cocok -> dicari sebagai potongan kata
+        assert 'Indomie Goreng Spesial 85gr' in nama(cari_ids(Produk, 'domie'))
+        # Filter tambahan ikut di query index
+        assert 'Minyak Goreng 2L' not in nama(cari_ids(Produk, 'goreng', Produk.stok > 0))
+
+        # Index ikut nama baru; produk yang dihapus hilang dari hasil
+        gula = Produk.query.filter_by(kode='TST-002').one()
+        gula.nama = 'Gula Aren Cair 1L'
+        db.session.delete(Produk.query.filter_by(kode='TST-003').one())
+        db.session.commit()
+        assert cari_ids(Produk, 'gula pasir') == []
+        assert nama(cari_ids(Produk, 'aren')) == ['Gula Aren Cair 1L']
+        assert cari_ids(Produk, 'minyak goreng') == []
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        data = client.get('/api/produk?search=indomie%20goreng').get_json()
+        assert data[0]['kode'] == 'TST-001', data
+        html = client.get('/produk?q=gula+aren').get_data(as_text=True)
+        assert 'TST-002' in html and 'TST-001' not in html
+        # Member dicari dengan nama atau 4 digit terakhir nomor telepon
+        assert 'Siti Rahma' in client.get('/member?q=7890').get_data(as_text=True)
+        assert 'Siti Rahma' in client.get('/member?q=rahma').get_data(as_text=True)
@@ -0,0 +1,88 @@
+"""
+Import/ekspor produk: ekspor XLSX/CSV berisi semua produk + tier harga,
+import upsert per kode dalam beberapa statement per potongan, baris tidak
+valid membatalkan seluruh import, dan hasil import terlihat di pencarian
+serta delta katalog.
+
+Cara pakai:
+    python -m pytest tests/test_produk_import.py
+"""
+import csv
+import io
+
+from openpyxl import load_workbook
+from app_simple import (app, db, Produk, Kategori, HargaVariasi, IMPOR_CHUNK, PenghitungStatement,
+                        cari_ids, impor_produk, perubahan_katalog, _versi_katalog)
+
+
+def csv_bytes(baris):
+    teks = io.StringIO()
+    csv.writer(teks).writerows(baris)
+    return io.BytesIO(teks.getvalue().encode())
+
+
+def test_produk_import():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        with app.app_context():
+            produk = Produk.query.order_by(Produk.id).first()
+            produk.harga_variasi.append(HargaVariasi(min_qty=6, harga=1, keterangan='Grosir: dus'))
+            db.session.commit()
+            jumlah = Produk.query.count()
+            kode_tier = produk.kode
+
+        # Ekspor XLSX dan CSV berisi baris yang sama
+        ws = load_workbook(io.BytesIO(client.get('/produk/export').data), read_only=True).active
+        xlsx = [list(r) for r in ws.iter_rows(values_only=True)]
+        teks = client.get('/produk/export?format=csv').get_data(as_text=True).lstrip('\ufeff')
+        baris_csv = list(csv.reader(io.StringIO(teks)))
+        assert len(xlsx) == len(baris_csv) == jumlah + 1 and xlsx[0] == baris_csv[0]
+        tier = {r[0]: r[9] for r in baris_csv[1:]}
+        assert tier[kode_tier] == '6:1:Grosir: dus'
+        assert client.get('/produk/template').status_code == 200
+
+        # Import: 2500 produk baru (3 potongan) + satu produk lama diubah, tiernya dihapus
+        header = baris_csv[0]
+        baris = [header] + [
+            [f'IMP-{n:05d}', f'Produk Impor {n}', 'Kategori Impor', '1.000', 1500 + n, 10, '', 'pcs', '',
+             '12:1400:Grosir; 24:1300' if n % 2 else '']
+            for n in range(2500)
+        ] + [[kode_tier, '', '', '', '99999', '', '', '', '', '-']]
+        with app.app_context():
+            versi = _versi_katalog()
+            with PenghitungStatement() as penghitung:
+                hasil = impor_produk(csv_bytes(baris), 'produk.csv')
+                db.session.commit()
+            assert hasil == {'ditambah': 2500, 'diperbarui': 1, 'galat': []}, hasil
+            # per potongan: insert produk, update, delete+insert tier; bukan per baris
+            assert penghitung.jumlah < 8 * (2500 // IMPOR_CHUNK + 1) + 10, penghitung.jumlah
+            baru = Produk.query.filter_by(kode='IMP-00001').one()
+            assert (baru.harga_beli, baru.harga_jual, baru.kategori_ref.nama) == (1000, 1501, 'Kategori Impor')
+            assert [(v.min_qty, v.harga, v.keterangan) for v in baru.harga_variasi] == [(12, 1400, 'Grosir'), (24, 1300, None)]
+            lama = Produk.query.filter_by(kode=kode_tier).one()
+            assert lama.harga_jual == 99999 and lama.harga_variasi == [] and lama.nama == produk.nama
+            assert baru.id in cari_ids(Produk, 'produk impor 1')
+            # Lebih dari KATALOG_DELTA_MAX produk berubah: register diminta memuat ulang katalog
+            assert perubahan_katalog(versi)['reset'] is True
+
+        # Import ulang ekspor tanpa perubahan: tidak ada produk baru
+        with app.app_context():
+            jumlah = Produk.query.count()
+        data = {'file': (io.BytesIO(client.get('/produk/export').data), 'produk.xlsx')}
+        client.post('/produk/import', data=data, content_type='multipart/form-data')
+        with app.app_context():
+            assert Produk.query.count() == jumlah
+            assert Produk.query.filter_by(kode='IMP-00001').one().harga_variasi[0].keterangan == 'Grosir'
+
+        # Baris tidak valid: seluruh import batal
+        rusak = [header, ['IMP-00001', '', '', '', '5', '', '', '', '', ''], ['BARU-X', 'Tanpa Harga', '', '', '', '', '', '', '', ''],
+                 ['IMP-00002', '', '', '', 'abc', '', '', '', '', '']]
+        halaman = client.post('/produk/import', data={'file': (csv_bytes(rusak), 'rusak.csv')},
+                              content_type='multipart/form-data', follow_redirects=True).get_data(as_text=True)
+        assert 'Import dibatalkan' in halaman and 'Baris 3' in halaman and 'Baris 4' in halaman
+        with app.app_context():
+            assert Produk.query.filter_by(kode='IMP-00001').one().harga_jual == 1501
+            assert Produk.query.filter_by(kode='BARU-X').count() == 0
+            assert Kategori.query.filter_by(nama='Kategori Impor').count() == 1
+        print(f"Import 2501 baris: {penghitung.jumlah} statement")
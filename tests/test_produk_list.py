@@ -0,0 +1,66 @@
+"""
+Daftar produk admin: keyset per halaman untuk setiap kolom sort (maju &
+mundur), kategori ikut dimuat, dan jumlah query per halaman tetap.
+
+Cara pakai:
+    python -m pytest tests/test_produk_list.py
+"""
+import re
+from html import unescape
+
+from app_simple import (app, db, Produk, Kategori, PRODUK_SORT, PenghitungStatement,
+                        halaman_produk, _decode_cursor)
+
+
+def semua_halaman(sort, arah, per):
+    ids, cursor, halaman = [], None, None
+    while True:
+        halaman = halaman_produk([], sort, arah, cursor, per)
+        ids += [p.id for p in halaman['items']]
+        if not halaman['berikutnya']:
+            return ids, halaman
+        cursor = _decode_cursor(halaman['berikutnya'])
+
+
+def test_produk_list():
+    with app.app_context():
+        kategori = Kategori(nama='Kategori Test')
+        db.session.add(kategori)
+        db.session.flush()
+        # Banyak nilai kembar supaya id ikut menentukan urutan
+        db.session.add_all([
+            Produk(kode=f'TST-{n:03d}', nama=f'Produk {n % 7}', harga_beli=100, harga_jual=1000 + n % 5 * 100,
+                   stok=n % 3, kategori_id=kategori.id)
+            for n in range(130)
+        ])
+        db.session.commit()
+
+        for sort in PRODUK_SORT:
+            for arah in ('asc', 'desc'):
+                kolom = PRODUK_SORT[sort]
+                urutan = (kolom.asc(), Produk.id.asc()) if arah == 'asc' else (kolom.desc(), Produk.id.desc())
+                harapan = [p.id for p in Produk.query.order_by(*urutan)]
+                ids, terakhir = semua_halaman(sort, arah, 40)
+                assert ids == harapan, (sort, arah)
+
+                # Mundur dari halaman terakhir sampai awal
+                mundur, halaman = [], terakhir
+                while halaman['sebelumnya']:
+                    halaman = halaman_produk([], sort, arah, _decode_cursor(halaman['sebelumnya']), 40)
+                    mundur = [p.id for p in halaman['items']] + mundur
+                assert mundur + [p.id for p in terakhir['items']] == harapan, (sort, arah)
+                assert halaman['items'][0].id == harapan[0]
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        client.get('/produk')  # isi cache jumlah produk
+        with PenghitungStatement() as penghitung:
+            halaman = client.get('/produk?sort=nama&arah=desc&per=100').get_data(as_text=True)
+        # user + versi (ringkasan kategori) + produk (kategori join) + harga variasi; COUNT dari cache
+        assert penghitung.jumlah <= 4, penghitung.jumlah
+        assert 'Kategori Test' in halaman
+        berikutnya = unescape(re.search(r'href="([^"]*c=[^"]*)"', halaman).group(1))
+        assert client.get(berikutnya).status_code == 200
+        assert 'TST-001' in client.get('/produk?q=tst-001').get_data(as_text=True)
+        print(f"Statement per halaman produk: {penghitung.jumlah}")
@@ -0,0 +1,97 @@
+"""
+Rekap penjualan harian (per produk, metode bayar, kasir): ditambah di
+transaksi checkout & sync offline, sama dengan hasil bangun ulang dari
+transaksi, dan laporan membaca rekap untuk hari yang sudah tutup serta
+transaksi mentah hanya untuk hari ini.
+
+Cara pakai:
+    python -m pytest tests/test_rekap_harian.py
+"""
+import io
+import uuid
+from datetime import datetime, timedelta
+
+from openpyxl import load_workbook
+from app_simple import (app, db, Produk, Transaksi, RekapProdukHarian, RekapPembayaranHarian,
+                        RekapKasirHarian, bangun_ulang_rekap, get_local_now, hitung_laporan)
+
+BAYAR = 10_000_000
+
+
+def isi_rekap():
+    """{tabel: {kunci: nilai dibulatkan}} dari ketiga tabel rekap"""
+    return {
+        'produk': {(r.tanggal, r.produk_id): (r.jumlah, round(r.penjualan, 2)) for r in RekapProdukHarian.query},
+        'pembayaran': {(r.tanggal, r.payment_method): (r.transaksi, round(r.total, 2))
+                       for r in RekapPembayaranHarian.query},
+        'kasir': {(r.tanggal, r.user_id): (r.transaksi, round(r.total, 2)) for r in RekapKasirHarian.query},
+    }
+
+
+def test_rekap_harian():
+    app.config['WTF_CSRF_ENABLED'] = False
+    sekarang = get_local_now()
+    hari_ini, lalu = sekarang.date(), (sekarang - timedelta(days=3)).date()
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 1000})
+        db.session.commit()
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(5)]
+
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        for n, metode in enumerate(['tunai', 'qris', 'tunai']):
+            data = client.post('/transaksi/checkout', json={
+                'items': [{'id': produk_ids[k], 'quantity': n + 1} for k in range(n + 1)],
+                'total': 0, 'bayar': BAYAR, 'payment_method': metode,
+            }).get_json()
+            assert data['success'], data
+        # Penjualan offline tiga hari lalu masuk ke rekap hari itu
+        sales = [{'client_id': str(uuid.uuid4()),
+                  'tanggal': datetime.combine(lalu, datetime.min.time()).replace(hour=9, minute=n).isoformat(),
+                  'items': [{'id': produk_ids[n % 5], 'quantity': 2}, {'id': produk_ids[0], 'quantity': 1}],
+                  'bayar': BAYAR, 'payment_method': 'debit' if n % 2 else None}
+                 for n in range(5)]
+        hasil = client.post('/transaksi/sync', json={'sales': sales}).get_json()
+        assert hasil['ringkasan'] == {'ok': 5}, hasil
+
+        with app.app_context():
+            # Rekap dari checkout sama dengan rekap yang dibangun ulang dari transaksi
+            dari_checkout = isi_rekap()
+            assert dari_checkout['pembayaran'][(lalu, 'tunai')][0] == 3
+            assert dari_checkout['pembayaran'][(hari_ini, 'tunai')][0] == 2
+            assert dari_checkout['produk'][(lalu, produk_ids[0])][0] == 2 + 5
+            bangun_ulang_rekap()
+            db.session.commit()
+            assert isi_rekap() == dari_checkout
+
+            laporan = hitung_laporan(lalu, hari_ini)
+            assert laporan['total_transaksi'] == 8
+            assert laporan['payment_count'] == {'tunai': 5, 'qris': 1, 'debit': 2}
+            assert laporan['per_kasir'][0]['nama'] == 'Administrator'
+            assert laporan['per_kasir'][0]['total_transaksi'] == 8
+            assert abs(sum(laporan['sales_by_date'].values()) - laporan['total_penjualan']) < 0.01
+
+            # Hari tutup dibaca dari rekap: koreksi langsung di database baru
+            # terlihat setelah rekap hari itu dibangun ulang; hari ini langsung
+            total_lalu = laporan['sales_by_date'][lalu.isoformat()]
+            total_hari_ini = laporan['sales_by_date'][hari_ini.isoformat()]
+            for tanggal in (lalu, hari_ini):
+                t = Transaksi.query.filter(db.func.date(Transaksi.tanggal) == tanggal.isoformat()).first()
+                t.total += 1000
+            db.session.commit()
+            harian = hitung_laporan(lalu, hari_ini)['sales_by_date']
+            assert harian[lalu.isoformat()] == total_lalu
+            assert harian[hari_ini.isoformat()] == total_hari_ini + 1000
+            assert bangun_ulang_rekap(lalu) == {'rekap_produk_harian': 5, 'rekap_pembayaran_harian': 2,
+                                                'rekap_kasir_harian': 1}
+            db.session.commit()
+            assert hitung_laporan(lalu, lalu)['sales_by_date'][lalu.isoformat()] == total_lalu + 1000
+
+        # Export laporan dari rekap yang sama
+        response = client.get(f'/laporan/export?tanggal_mulai={lalu}&tanggal_selesai={hari_ini}')
+        assert response.status_code == 200
+        wb = load_workbook(io.BytesIO(response.data), read_only=True)
+        assert wb.sheetnames == ['Ringkasan', 'Per Hari', 'Pembayaran', 'Produk', 'Kasir']
+        produk = list(wb['Produk'].iter_rows(min_row=2, values_only=True))
+        assert len(produk) == 5 and produk[0][3] >= produk[-1][3]
+        assert sum(r[2] for r in produk) == (1 + 4 + 9) + 5 * 3
@@ -0,0 +1,92 @@
+"""
+Ringkasan kategori: satu query GROUP BY untuk jumlah produk, stok habis,
+hampir habis & nilai stok, di-cache dan dibuang saat produk/kategori ditulis.
+Stok negatif/kosong dihitung habis sama seperti daftar produk & katalog kasir.
+
+Cara pakai:
+    python -m pytest tests/test_ringkasan_kategori.py
+"""
+
+from app_simple import app, db, Produk, Kategori, PenghitungStatement, halaman_katalog, ringkasan_kategori
+
+
+def hitung_manual(produk_list):
+    return {
+        'jumlah': len(produk_list),
+        'habis': sum(1 for p in produk_list if (p.stok or 0) <= 0),
+        'hampir_habis': sum(1 for p in produk_list if 0 < p.stok <= p.minimal_stok),
+        'nilai_stok': sum(p.stok * p.harga_beli for p in produk_list),
+    }
+
+
+def test_ringkasan_kategori():
+    with app.app_context():
+        kosong = Kategori(nama='Kategori Kosong')
+        db.session.add(kosong)
+        db.session.add(Produk(kode='TST-001', nama='Tanpa Kategori', harga_beli=1000, harga_jual=1500, stok=0))
+        db.session.commit()
+
+        with PenghitungStatement() as penghitung:
+            ringkasan = ringkasan_kategori()
+        assert penghitung.jumlah == 2, penghitung.jumlah  # versi + satu query agregat
+        for baris in ringkasan['kategori']:
+            produk = Produk.query.filter_by(kategori_id=baris['id']).all()
+            assert {k: baris[k] for k in ('jumlah', 'habis', 'hampir_habis')} == \
+                {k: v for k, v in hitung_manual(produk).items() if k != 'nilai_stok'}, baris['nama']
+            assert abs(baris['nilai_stok'] - hitung_manual(produk)['nilai_stok']) < 0.01
+        assert next(k for k in ringkasan['kategori'] if k['nama'] == 'Kategori Kosong')['jumlah'] == 0
+        assert ringkasan['tanpa_kategori']['jumlah'] == Produk.query.filter(Produk.kategori_id.is_(None)).count()
+        assert ringkasan['total']['jumlah'] == Produk.query.count()
+
+        # Cache: hanya cek versi
+        with PenghitungStatement() as penghitung:
+            assert ringkasan_kategori() is ringkasan
+        assert penghitung.jumlah == 1, penghitung.jumlah
+
+        # Tulis produk / kategori membuang cache
+        db.session.add(Produk(kode='TST-002', nama='Produk Baru', harga_beli=500, harga_jual=800, stok=2,
+                              minimal_stok=5, kategori_id=kosong.id))
+        db.session.commit()
+        kosong_id = kosong.id
+        baris = next(k for k in ringkasan_kategori()['kategori'] if k['id'] == kosong_id)
+        assert (baris['jumlah'], baris['hampir_habis'], baris['nilai_stok']) == (1, 1, 1000)
+        db.session.get(Kategori, kosong_id).nama = 'Kategori Diganti'
+        db.session.commit()
+        assert any(k['nama'] == 'Kategori Diganti' for k in ringkasan_kategori()['kategori'])
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        assert 'Kategori Diganti' in client.get('/kategori').get_data(as_text=True)
+        assert client.get('/').status_code == 200
+        assert 'Hampir Habis' in client.get(f'/produk?kategori_id={kosong_id}').get_data(as_text=True)
+
+
+def test_stok_habis_satu_aturan():
+    with app.app_context():
+        kategori = Kategori(nama='Kategori Minus')
+        db.session.add(kategori)
+        db.session.flush()
+        db.session.add_all([
+            Produk(kode='MIN-001', nama='Stok Minus', harga_beli=100, harga_jual=150, stok=-2, kategori_id=kategori.id),
+            Produk(kode='MIN-002', nama='Stok Kosong', harga_beli=100, harga_jual=150, stok=None, kategori_id=kategori.id),
+            Produk(kode='MIN-003', nama='Stok Nol', harga_beli=100, harga_jual=150, stok=0, kategori_id=kategori.id),
+            Produk(kode='MIN-004', nama='Stok Tipis', harga_beli=100, harga_jual=150, stok=1, minimal_stok=5,
+                   kategori_id=kategori.id),
+        ])
+        db.session.commit()
+        kategori_id = kategori.id
+
+        baris = next(k for k in ringkasan_kategori()['kategori'] if k['id'] == kategori_id)
+        assert (baris['jumlah'], baris['habis'], baris['hampir_habis']) == (4, 3, 1)
+        habis = halaman_katalog(kategori_id=kategori_id, stok='habis')
+        assert sorted(p['kode'] for p in habis['items']) == ['MIN-001', 'MIN-002', 'MIN-003']
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        halaman = client.get(f'/produk?kategori_id={kategori_id}&filter=habis').get_data(as_text=True)
+        assert all(kode in halaman for kode in ('MIN-001', 'MIN-002', 'MIN-003')) and 'MIN-004' not in halaman
+        halaman = client.get(f'/produk?kategori_id={kategori_id}&filter=hampir_habis').get_data(as_text=True)
+        assert 'MIN-004' in halaman and 'MIN-001' not in halaman
+        assert client.get(f'/kategori/{kategori_id}/produk').get_data(as_text=True).count('Habis') >= 3
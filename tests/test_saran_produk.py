@@ -0,0 +1,46 @@
+"""
+Saran produk tahan salah ketik: awal kata, typo, pembaruan bertahap saat
+produk diubah/dihapus, dan fallback /api/produk saat pencarian kosong.
+
+Cara pakai:
+    python -m pytest tests/test_saran_produk.py
+"""
+
+from app_simple import app, db, Produk, saran_index
+
+
+def test_saran_produk():
+    with app.app_context():
+        db.session.add_all([
+            Produk(kode='TST-001', nama='Indomie Goreng Spesial 85gr', harga_beli=2500, harga_jual=3000, stok=50),
+            Produk(kode='TST-002', nama='Indomie Kuah Soto', harga_beli=2500, harga_jual=3000, stok=50),
+            Produk(kode='TST-003', nama='Minyak Goreng Bimoli 2L', harga_beli=30000, harga_jual=34000, stok=10),
+        ])
+        db.session.commit()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        saran = lambda q: [p['kode'] for p in client.get('/api/produk/saran', query_string={'q': q}).get_json()['items']]  # noqa: E731
+
+        assert saran('indomi gorng')[0] == 'TST-001'
+        assert saran('minyk 2l')[0] == 'TST-003'
+        assert saran('bimoli')[0] == 'TST-003'
+        assert {'TST-001', 'TST-002'} <= set(saran('indom'))
+        assert saran('zzzz qqqq') == []
+        assert len(saran('a')) <= 10
+        # /api/produk jatuh ke saran fuzzy saat index teks tidak menemukan apa pun
+        assert [p['kode'] for p in client.get('/api/produk?search=indomi%20gorng').get_json()][0] == 'TST-001'
+
+        # Perubahan produk diterapkan bertahap, tanpa membangun ulang index
+        rebuild = saran_index.stats['rebuild']
+        with app.app_context():
+            produk = Produk.query.filter_by(kode='TST-002').one()
+            produk.nama = 'Sarimi Ayam Bawang'
+            db.session.delete(Produk.query.filter_by(kode='TST-003').one())
+            db.session.commit()
+        assert saran('sarmi ayam') == ['TST-002']
+        assert 'TST-002' not in saran('indomie')
+        assert saran('minyak bimoli') == []
+        assert saran_index.stats['rebuild'] == rebuild, saran_index.stats
+        print(f"Index saran: {saran_index.ukuran()}, stats {saran_index.stats}")
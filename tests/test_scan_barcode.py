@@ -0,0 +1,79 @@
+"""
+Scan barcode: lookup persis dari index di memori, pembaruan bertahap saat
+produk diubah/dihapus, dan barcode timbangan EAN-13 (ditolak jika nilainya
+bukan quantity bulat produk, bukan dibulatkan).
+
+Cara pakai:
+    python -m pytest tests/test_scan_barcode.py
+"""
+
+from app_simple import app, db, Produk, HargaVariasi, barcode_index
+
+
+def ean13(dua_belas_digit):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(dua_belas_digit))
+    return dua_belas_digit + str((10 - total % 10) % 10)
+
+
+def test_scan_barcode():
+    with app.app_context():
+        produk = Produk.query.order_by(Produk.id).first()
+        kode, produk_id = produk.kode, produk.id
+        db.session.add(Produk(kode='2012345', nama='Daging Sapi', harga_beli=100, harga_jual=130,
+                              stok=10_000, satuan='gram'))
+        db.session.add(Produk(kode='12346', nama='Keju Potong', harga_beli=1000, harga_jual=1500,
+                              stok=100, satuan='pcs'))
+        db.session.add(Produk(kode='12347', nama='Beras Curah', harga_beli=10_000, harga_jual=12_000,
+                              stok=100, satuan='Kg'))
+        db.session.commit()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+
+        data = client.get(f'/api/scan?kode={kode.lower()}%20').get_json()
+        assert data['success'] and data['produk']['id'] == produk_id and data['quantity'] == 1, data
+        assert client.get('/api/scan?kode=TIDAK-ADA').status_code == 404
+        rebuild = barcode_index.stats['rebuild']
+
+        # Barcode timbangan: berat 512 gram & harga Rp 4.500
+        data = client.get(f"/api/scan?kode={ean13('201234500512')}").get_json()
+        assert data['produk']['nama'] == 'Daging Sapi' and data['quantity'] == 512, data
+        assert data['timbang'] == {'jenis': 'berat', 'nilai': 512}
+        data = client.get(f"/api/scan?kode={ean13('251234604500')}").get_json()
+        assert data['produk']['nama'] == 'Keju Potong' and data['quantity'] == 3, data
+
+        # Nilai yang bukan quantity bulat ditolak (422), bukan dibulatkan
+        for kode_timbang, pesan in (
+            ('251234604600', 'kelipatan harga'),   # Rp 4.600 / Rp 1.500
+            ('251234600500', 'kelipatan harga'),   # kurang dari harga satuan
+            ('201234600512', 'satuan pcs'),        # berat untuk produk pcs
+            ('201234701500', 'kelipatan 1 Kg'),    # 1,5 kg
+            ('201234500000', 'kelipatan'),         # berat 0
+        ):
+            respons = client.get(f'/api/scan?kode={ean13(kode_timbang)}')
+            assert respons.status_code == 422 and pesan in respons.get_json()['message'], \
+                (kode_timbang, respons.get_json())
+        data = client.get(f"/api/scan?kode={ean13('201234702000')}").get_json()
+        assert data['produk']['nama'] == 'Beras Curah' and data['quantity'] == 2, data
+        data = client.get(f"/api/scan?kode={ean13('251234724000')}").get_json()
+        assert data['produk']['nama'] == 'Beras Curah' and data['quantity'] == 2, data
+
+        # Check digit salah -> bukan barcode timbangan
+        salah = ean13('201234500512')[:-1] + str((int(ean13('201234500512')[-1]) + 1) % 10)
+        assert client.get(f'/api/scan?kode={salah}').status_code == 404
+
+        # Perubahan produk hanya memuat ulang produk itu, bukan seluruh index
+        with app.app_context():
+            p = db.session.get(Produk, produk_id)
+            p.kode = 'KODE-BARU'
+            db.session.add(HargaVariasi(produk_id=produk_id, min_qty=6, harga=1))
+            db.session.delete(Produk.query.filter_by(kode='12346').one())
+            db.session.commit()
+        data = client.get('/api/scan?kode=kode-baru').get_json()
+        assert data['produk']['id'] == produk_id
+        assert data['produk']['harga_variasi'][-1]['min_qty'] == 6
+        assert client.get(f'/api/scan?kode={kode}').status_code == 404
+        assert client.get(f"/api/scan?kode={ean13('251234604500')}").status_code == 404
+        assert barcode_index.stats['rebuild'] == rebuild, barcode_index.stats
+        print(f"Index: {len(barcode_index)} kode, stats {barcode_index.stats}")
@@ -0,0 +1,80 @@
+"""
+Logging terstruktur: format JSON satu baris berisi field extra & traceback,
+SamplingFilter hanya menyaring record DEBUG logger yang disebut (prefix
+terpanjang menang), dan proses hasil fork menulis log lewat listener baru.
+
+Cara pakai:
+    python -m pytest tests/test_structured_log.py
+"""
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+import structured_log
+from structured_log import JsonFormatter, SamplingFilter, get_logger
+
+
+def buat_record(name='kasir.checkout', level=logging.INFO, msg='Checkout %s', args=('ok',), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    record = buat_record(kode='TRX1', total=1500.0, tanggal=structured_log)
+    data = json.loads(JsonFormatter().format(record))
+    assert data['level'] == 'INFO' and data['logger'] == 'kasir.checkout' and data['msg'] == 'Checkout ok'
+    assert data['kode'] == 'TRX1' and data['total'] == 1500.0
+    assert isinstance(data['tanggal'], str)  # objek lain ditulis sebagai teks
+    assert len(data['ts']) == len('2024-01-01T00:00:00.000')
+    assert 'exc' not in data and '\n' not in JsonFormatter().format(record)
+
+    # Traceback yang sudah dirender (oleh _QueueHandler) ikut sebagai field exc
+    try:
+        raise ValueError('stok minus')
+    except ValueError:
+        record = structured_log._QueueHandler(None).prepare(
+            logging.LogRecord('kasir.checkout', logging.ERROR, __file__, 1, 'Error', (), sys.exc_info()))
+    data = json.loads(JsonFormatter().format(record))
+    assert 'ValueError: stok minus' in data['exc']
+
+
+def test_sampling_filter(monkeypatch):
+    sampling = SamplingFilter({'kasir.checkout': '1', 'kasir.checkout.item': '0'})
+    assert not sampling.filter(buat_record('kasir.checkout.item', logging.DEBUG))
+    assert sampling.filter(buat_record('kasir.checkout.item', logging.INFO))
+    assert sampling.filter(buat_record('kasir.checkout', logging.DEBUG))
+    assert sampling.filter(buat_record('kasir.checkout.lain', logging.DEBUG))
+    # Nama yang hanya berawalan sama bukan anak logger
+    assert sampling.filter(buat_record('kasir.checkout.itemx', logging.DEBUG))
+    assert sampling.filter(buat_record('kasir.backup', logging.DEBUG))
+
+    sampling = SamplingFilter({'kasir.checkout.item': '0.25'})
+    for acak, lolos in ((0.1, True), (0.5, False)):
+        monkeypatch.setattr(structured_log.random, 'random', lambda: acak)
+        assert sampling.filter(buat_record('kasir.checkout.item', logging.DEBUG)) is lolos
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='butuh os.fork')
+def test_listener_setelah_fork(tmp_path):
+    structured_log.setup_logging()
+    keluaran = tmp_path / 'anak.log'
+    pid = os.fork()
+    if pid == 0:
+        # Proses anak: listener induk tidak ikut, record harus tetap tertulis
+        kode = 1
+        try:
+            with open(keluaran, 'w') as f:
+                sys.stdout = f
+                get_logger('test').warning('Log dari anak', extra={'pid_anak': os.getpid()})
+                structured_log._stop_listener()
+                kode = 0
+        finally:
+            os._exit(kode)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    teks = keluaran.read_text()
+    assert 'Log dari anak' in teks and str(pid) in teks
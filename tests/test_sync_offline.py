@@ -0,0 +1,102 @@
+"""
+Sync antrian penjualan offline: dedupe, konflik stok, jumlah statement
+yang tidak bertambah dengan ukuran batch, dan tanggal dari browser
+(toISOString, akhiran Z) dibaca sebagai UTC.
+
+Cara pakai:
+    python -m pytest tests/test_sync_offline.py
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app_simple import app, db, Produk, Transaksi, PenghitungStatement, proses_sync_penjualan, _waktu_iso
+
+BAYAR = 10_000_000
+
+
+def buat_penjualan(produk_ids, jumlah, mulai):
+    return [
+        {
+            'client_id': str(uuid.uuid4()),
+            'tanggal': (mulai + timedelta(minutes=n)).isoformat(),
+            'items': [{'id': produk_ids[(n + k) % len(produk_ids)], 'quantity': 1} for k in range(3)],
+            'bayar': BAYAR,
+            'payment_method': 'tunai',
+        }
+        for n in range(jumlah)
+    ]
+
+
+def jumlah_statement(sales):
+    with app.test_request_context():
+        with PenghitungStatement() as penghitung:
+            hasil = proses_sync_penjualan(sales, user_id=1)
+    assert all(h['status'] == 'ok' for h in hasil), hasil
+    return penghitung.jumlah
+
+
+def test_sync_offline():
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 100_000})
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(20)]
+        langka = produk_ids[0]
+        db.session.get(Produk, langka).stok = 2
+        db.session.commit()
+        tersedia = produk_ids[1:]
+
+    mulai = datetime.now() - timedelta(hours=8)
+    # Sync pertama ikut memuat tabel harga & membersihkan key kedaluwarsa
+    jumlah_statement(buat_penjualan(tersedia, 1, mulai))
+    counts = {n: jumlah_statement(buat_penjualan(tersedia, n, mulai)) for n in (10, 300)}
+    print(f"Statement per sync: {counts}")
+    assert len(set(counts.values())) == 1, counts
+
+    sales = buat_penjualan(tersedia, 2, mulai)
+    sales += [
+        {'client_id': 'langka-1', 'tanggal': mulai.isoformat(), 'items': [{'id': langka, 'quantity': 2}], 'bayar': BAYAR},
+        {'client_id': 'langka-2', 'tanggal': (mulai + timedelta(seconds=1)).isoformat(),
+         'items': [{'id': langka, 'quantity': 1}], 'bayar': BAYAR},
+        {'client_id': 'kurang-bayar', 'tanggal': mulai.isoformat(), 'items': [{'id': tersedia[0], 'quantity': 1}], 'bayar': 1},
+        {'client_id': 'tanpa-tanggal', 'items': [{'id': tersedia[0], 'quantity': 1}], 'bayar': BAYAR},
+    ]
+    sales.append(dict(sales[0]))
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        pertama = client.post('/transaksi/sync', json={'sales': sales}).get_json()
+        kedua = client.post('/transaksi/sync', json={'sales': sales}).get_json()
+
+    status = [h['status'] for h in pertama['hasil']]
+    print(f"Sync pertama: {pertama['ringkasan']} | kedua: {kedua['ringkasan']}")
+    assert status == ['ok', 'ok', 'ok', 'konflik', 'konflik', 'ditolak', 'duplikat'], status
+    # Sync ulang (mis. respons pertama hilang di jalan) tidak menyimpan apa pun lagi
+    assert [h['status'] for h in kedua['hasil']] == ['duplikat'] * 3 + status[3:6] + ['duplikat']
+    assert kedua['hasil'][0]['kode_transaksi'] == pertama['hasil'][0]['kode_transaksi']
+
+    with app.app_context():
+        assert db.session.get(Produk, langka).stok == 0
+        assert Transaksi.query.count() == 1 + 310 + 3
+
+
+def test_tanggal_dari_browser():
+    # Format new Date().toISOString(): milidetik + Z (ditolak fromisoformat Python 3.10)
+    utc = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=2)
+    teks = utc.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    assert _waktu_iso(teks) == utc and _waktu_iso(teks.lower()) == utc
+    assert _waktu_iso('2026-10-18T05:00:00') == datetime(2026, 10, 18, 5)
+
+    with app.app_context():
+        produk_id = Produk.query.order_by(Produk.id).first().id
+        db.session.get(Produk, produk_id).stok = 10
+        db.session.commit()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_client() as client:
+        client.post('/login', data={'username': 'admin', 'password': 'Admin123'})
+        hasil = client.post('/transaksi/sync', json={'sales': [{
+            'client_id': str(uuid.uuid4()), 'tanggal': teks, 'items': [{'id': produk_id, 'quantity': 1}],
+            'bayar': BAYAR}]}).get_json()['hasil']
+    assert hasil[0]['status'] == 'ok', hasil
+    with app.app_context():
+        transaksi = Transaksi.query.order_by(Transaksi.id.desc()).first()
+        assert transaksi.tanggal == utc.astimezone().replace(tzinfo=None)
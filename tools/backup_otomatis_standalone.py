@@ -12,6 +12,7 @@ import sys
 import shutil
 import csv
 import json
+import logging
 import sqlite3
 from datetime import datetime
 from pathlib import Path
@@ -30,6 +31,16 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 INSTANCE_DIR = os.path.join(BASE_DIR, 'instance')
 DB_PATH = os.path.join(INSTANCE_DIR, 'kasir.db')
 
+# Helper backup SQLite (hanya pakai library bawaan Python) dari folder app/
+sys.path.insert(0, os.path.join(BASE_DIR, 'app'))
+from backup_service import ChangeDetector, online_backup, verify_backup
+from structured_log import setup_logging, get_logger
+
+# Mode perintah (cron) menulis hasil backup/cleanup sebagai log (bisa
+# LOG_FORMAT=json); menu interaktif menampilkannya dengan print, lihat lapor()
+setup_logging(fmt=os.getenv('LOG_FORMAT') or 'text')
+log = get_logger('tools.backup')
+
 # Pastikan direktori ada
 os.makedirs(BACKUP_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -48,13 +59,30 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+# ===============================
+# HASIL OPERASI
+# ===============================
+_interaktif = False
+_WARNA = {logging.INFO: Colors.OKGREEN, logging.WARNING: Colors.WARNING, logging.ERROR: Colors.FAIL}
+
+def lapor(level, pesan, exc=None, **detail):
+    """Hasil operasi: print untuk operator di menu interaktif, log di mode perintah"""
+    if not _interaktif:
+        log.log(level, pesan, exc_info=exc, extra=detail)
+        return
+    if exc is not None:
+        pesan = f"{pesan}: {exc}"
+    print(f"{_WARNA.get(level, '')}{pesan}{Colors.ENDC}")
+    for key, value in detail.items():
+        print(f"   {key}: {value}")
+
 # ===============================
 # DATABASE CONNECTION
 # ===============================
 def get_db_connection():
     """Buat koneksi ke database SQLite"""
     if not os.path.exists(DB_PATH):
-        print(f"{Colors.FAIL}❌ Database tidak ditemukan: {DB_PATH}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Database tidak ditemukan', path=DB_PATH)
         return None
     
     try:
@@ -62,7 +90,7 @@ def get_db_connection():
         conn.row_factory = sqlite3.Row
         return conn
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal connect ke database: {str(e)}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Gagal connect ke database', exc=e)
         return None
 
 # ===============================
@@ -94,7 +122,7 @@ def backup_produk():
         produk_list = cursor.fetchall()
         
         if not produk_list:
-            print(f"{Colors.WARNING}[WARNING] Tidak ada produk untuk di-backup{Colors.ENDC}")
+            lapor(logging.WARNING, 'Tidak ada produk untuk di-backup')
             conn.close()
             return
         
@@ -146,15 +174,12 @@ def backup_produk():
             json.dump(produk_data, jsonfile, ensure_ascii=False, indent=2)
         
         total = len(produk_list)
-        print(f"{Colors.OKGREEN}[OK] Backup Produk Berhasil!{Colors.ENDC}")
-        print(f"   📊 Total produk: {total}")
-        print(f"   📄 CSV: {csv_filename}")
-        print(f"   📋 JSON: {json_filename}")
+        lapor(logging.INFO, 'Backup produk berhasil', total=total, csv=csv_filename, json=json_filename)
         
         conn.close()
         
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal backup produk: {str(e)}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Gagal backup produk', exc=e)
 
 # ===============================
 # BACKUP TRANSAKSI
@@ -188,7 +213,7 @@ def backup_transaksi():
         transaksi_list = cursor.fetchall()
         
         if not transaksi_list:
-            print(f"{Colors.WARNING}[WARNING] Tidak ada transaksi untuk di-backup{Colors.ENDC}")
+            lapor(logging.WARNING, 'Tidak ada transaksi untuk di-backup')
             conn.close()
             return
         
@@ -247,57 +272,62 @@ def backup_transaksi():
             json.dump(transaksi_data, jsonfile, ensure_ascii=False, indent=2)
         
         total = len(transaksi_list)
-        print(f"{Colors.OKGREEN}[OK] Backup Transaksi Berhasil!{Colors.ENDC}")
-        print(f"   📊 Total transaksi: {total}")
-        print(f"   📄 CSV: {csv_filename}")
-        print(f"   📋 JSON: {json_filename}")
+        lapor(logging.INFO, 'Backup transaksi berhasil', total=total, csv=csv_filename, json=json_filename)
         
         conn.close()
         
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal backup transaksi: {str(e)}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Gagal backup transaksi', exc=e)
 
 # ===============================
 # BACKUP DATABASE LENGKAP
 # ===============================
 def backup_database():
-    """Backup database lengkap"""
+    """Backup database lengkap (SQLite online backup API, dilewati jika tidak berubah)"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_name = f"kasir_backup_{timestamp}.db"
     backup_path = os.path.join(BACKUP_DIR, backup_name)
     
     try:
         if not os.path.exists(DB_PATH):
-            print(f"{Colors.FAIL}❌ Database tidak ditemukan: {DB_PATH}{Colors.ENDC}")
+            lapor(logging.ERROR, 'Database tidak ditemukan', path=DB_PATH)
             return
         
-        shutil.copy2(DB_PATH, backup_path)
+        # State backup terakhir dipakai bersama aplikasi, jadi backup yang sudah
+        # dibuat aplikasi tidak diulang di sini
+        detector = ChangeDetector(DB_PATH, os.path.join(BACKUP_DIR, '.backup_state.json'))
+        changed, signature = detector.check()
+        if not changed:
+            lapor(logging.INFO, 'Backup database dilewati: tidak berubah sejak backup terakhir')
+            return
+        
+        expected_pages = online_backup(DB_PATH, backup_path)
+        ok, pesan = verify_backup(backup_path, expected_pages)
+        if not ok:
+            os.remove(backup_path)
+            lapor(logging.ERROR, 'Backup database tidak konsisten', detail=pesan)
+            return
+        detector.mark_backed_up(signature)
         filesize = os.path.getsize(backup_path) / (1024*1024)  # Convert to MB
         
-        print(f"{Colors.OKGREEN}[OK] Backup Database Berhasil!{Colors.ENDC}")
-        print(f"   📦 File: {backup_name}")
-        print(f"   💾 Ukuran: {filesize:.2f} MB")
+        lapor(logging.INFO, 'Backup database berhasil', file=backup_name, ukuran_mb=round(filesize, 2), verifikasi=pesan)
         
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal backup database: {str(e)}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Gagal backup database', exc=e)
 
 # ===============================
 # BACKUP LENGKAP (SEMUA)
 # ===============================
 def backup_lengkap():
     """Backup semua (produk + transaksi + database)"""
-    print(f"\n{Colors.BOLD}{Colors.OKBLUE}[AUTO] Memulai Backup Lengkap...{Colors.ENDC}\n")
+    lapor(logging.INFO, 'Memulai backup lengkap')
     
     backup_produk()
-    print()
     backup_transaksi()
-    print()
     backup_database()
-    
-    print()
     cleanup_old_backups(keep=10)
     
-    print(f"\n{Colors.OKGREEN}{Colors.BOLD}[SUCCESS] Backup Lengkap Selesai!{Colors.ENDC}\n")
+    lapor(logging.INFO, 'Backup lengkap selesai')
 
 # ===============================
 # LIST BACKUPS
@@ -346,21 +376,19 @@ def cleanup_old_backups(keep=10):
         db_files = sorted([f for f in os.listdir(BACKUP_DIR) if f.endswith('.db')], reverse=True)
         
         if len(db_files) <= keep:
-            print(f"ℹ️ Database backup: {len(db_files)} file (simpan {keep})")
+            lapor(logging.INFO, 'Cleanup tidak diperlukan', jumlah=len(db_files), simpan=keep)
             return
         
         old_files = db_files[keep:]
-        print(f"\n{Colors.WARNING}🗑️  Menghapus {len(old_files)} backup database lama...{Colors.ENDC}")
-        
         for f in old_files:
             path = os.path.join(BACKUP_DIR, f)
             os.remove(path)
-            print(f"   [-] Dihapus: {f}")
+            lapor(logging.DEBUG, 'Backup lama dihapus', file=f)
         
-        print(f"{Colors.OKGREEN}[OK] Cleanup selesai. Mempertahankan {keep} backup terbaru.{Colors.ENDC}")
+        lapor(logging.INFO, 'Cleanup selesai', dihapus=len(old_files), simpan=keep)
         
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal cleanup: {str(e)}{Colors.ENDC}")
+        lapor(logging.ERROR, 'Gagal cleanup backup', exc=e)
 
 # ===============================
 # RESTORE DATABASE
@@ -402,16 +430,18 @@ def restore_database():
         if os.path.exists(DB_PATH):
             backup_current = os.path.join(BACKUP_DIR, f"kasir_backup_before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
             shutil.copy2(DB_PATH, backup_current)
-            print(f"   💾 Backup database saat ini: kasir_backup_before_restore_*.db")
+            print(f"   Database saat ini disalin ke: {os.path.basename(backup_current)}")
         
-        # Restore
+        # Restore (database aplikasi diganti: tetap dicatat di log)
         shutil.copy2(backup_path, DB_PATH)
+        log.info('Restore database', extra={'file': selected_backup})
         print(f"{Colors.OKGREEN}[OK] Restore berhasil dari: {selected_backup}{Colors.ENDC}\n")
         
     except ValueError:
         print(f"{Colors.FAIL}[ERROR] Input tidak valid{Colors.ENDC}")
     except Exception as e:
-        print(f"{Colors.FAIL}[ERROR] Gagal restore: {str(e)}{Colors.ENDC}")
+        log.exception('Gagal restore database')
+        print(f"{Colors.FAIL}[ERROR] Gagal restore: {e}{Colors.ENDC}")
 
 # ===============================
 # MAIN MENU
@@ -439,6 +469,8 @@ def show_menu():
 
 def main_interactive():
     """Main loop interaktif"""
+    global _interaktif
+    _interaktif = True
     while True:
         try:
             pilihan = show_menu()
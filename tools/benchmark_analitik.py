@@ -0,0 +1,120 @@
+"""Benchmark analitik margin: array NumPy vs perulangan ORM per item.
+
+Mengisi database sementara dengan penjualan sintetis satu tahun sampai
+sekitar N item (default 1 juta, produk dari benchmark_pencarian.py dibagi
+ke beberapa kategori), lalu mengukur:
+  - muat: query kolom item + transaksi ke array (muat_data_penjualan)
+  - hitung: ringkasan, peringkat produk & kategori, per bulan, per jam dan
+    tahun ke tahun di NumPy
+  - ORM: perulangan TransaksiItem dengan produk & transaksi (joinedload),
+    laba dihitung per item seperti laporan lama
+Hasil laba kotor keduanya dibandingkan.
+
+Cara pakai:
+    python tools/benchmark_analitik.py
+    python tools/benchmark_analitik.py --item 200000 --tanpa-orm
+"""
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from benchmark_pencarian import app, db, isi_produk  # noqa: E402  (menyiapkan database sementara)
+from benchmark_laporan import isi_penjualan  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+import analitik  # noqa: E402
+from app_simple import Kategori, Produk, TransaksiItem, muat_data_penjualan  # noqa: E402
+
+ITEM_PER_TRANSAKSI = 2.5  # rata-rata 1-4 item di isi_penjualan
+
+
+def isi_kategori(jumlah):
+    with app.app_context():
+        db.session.execute(db.insert(Kategori), [{"nama": f"Kategori {n + 1}"} for n in range(jumlah)])
+        db.session.execute(db.update(Produk).values(kategori_id=Produk.id % jumlah + 1,
+                                                    harga_beli=900 + Produk.id % 7 * 50))
+        db.session.commit()
+
+
+def hitung_numpy(data):
+    return {
+        "ringkasan": analitik.ringkasan(data),
+        "produk": analitik.per_produk(data, limit=20),
+        "kategori": analitik.per_kategori(data),
+        "bulan": analitik.per_waktu(data, "bulan"),
+        "jam": analitik.per_waktu(data, "jam"),
+        "tahun": analitik.tahun_ke_tahun(data),
+    }
+
+
+def hitung_orm(mulai, selesai):
+    """Perulangan per item: laba, per produk, per kategori, per bulan, per jam"""
+    laba = 0.0
+    produk, kategori, bulan, jam = (defaultdict(float) for _ in range(4))
+    query = (TransaksiItem.query
+             .options(joinedload(TransaksiItem.produk), joinedload(TransaksiItem.transaksi_ref))
+             .yield_per(10_000))
+    for item in query:
+        tanggal = item.transaksi_ref.tanggal
+        if not mulai <= tanggal.date() <= selesai:
+            continue
+        if item.produk is None:
+            continue  # produk dihapus: modal tidak diketahui, tidak masuk laba
+        untung = (item.harga - item.produk.harga_beli) * item.jumlah
+        laba += untung
+        produk[item.produk_id] += untung
+        kategori[item.produk.kategori_id or 0] += untung
+        bulan[tanggal.strftime("%Y-%m")] += untung
+        jam[tanggal.hour] += untung
+    return laba, sorted(produk.items(), key=lambda p: -p[1])[:20]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--item", type=int, default=1_000_000, help="perkiraan jumlah item penjualan")
+    parser.add_argument("--produk", type=int, default=2_000, help="jumlah produk")
+    parser.add_argument("--kategori", type=int, default=25, help="jumlah kategori")
+    parser.add_argument("--ulang", type=int, default=3, help="pengulangan NumPy")
+    parser.add_argument("--tanpa-orm", action="store_true", help="lewati perulangan ORM (lama)")
+    args = parser.parse_args()
+
+    isi_produk(args.produk)
+    isi_kategori(args.kategori)
+    mulai = time.perf_counter()
+    per_hari = max(1, round(args.item / ITEM_PER_TRANSAKSI / 365))
+    transaksi, items = isi_penjualan(per_hari, 365)
+    print(f"Data: {transaksi} transaksi, {items} item, {args.produk} produk, {args.kategori} kategori "
+          f"(disiapkan {time.perf_counter() - mulai:.1f} detik)\n")
+
+    selesai = date.today()
+    awal = selesai - timedelta(days=364)
+    muat, hitung = [], []
+    with app.app_context():
+        for _ in range(args.ulang):
+            t0 = time.perf_counter()
+            data = muat_data_penjualan(awal, selesai)
+            t1 = time.perf_counter()
+            hasil = hitung_numpy(data)
+            muat.append(t1 - t0)
+            hitung.append(time.perf_counter() - t1)
+        ukuran = sum(getattr(data, k).nbytes for k in data.__slots__ if k != "label_metode")
+    print(f"NumPy muat   {min(muat) * 1000:>9.0f} ms  ({len(data)} item, array {ukuran / 2 ** 20:.0f} MB)")
+    print(f"NumPy hitung {min(hitung) * 1000:>9.0f} ms")
+    print(f"NumPy total  {min(m + h for m, h in zip(muat, hitung)) * 1000:>9.0f} ms")
+
+    if args.tanpa_orm:
+        return
+    with app.app_context():
+        t0 = time.perf_counter()
+        laba, top = hitung_orm(awal, selesai)
+        orm = time.perf_counter() - t0
+    print(f"ORM loop     {orm * 1000:>9.0f} ms")
+    laba_numpy = hasil["ringkasan"]["laba"]
+    print(f"\nLaba kotor: NumPy {laba_numpy:,.0f} | ORM {laba:,.0f} | selisih {abs(laba_numpy - laba):.4f}")
+    sama = [p["kunci"] for p in hasil["produk"]] == [k for k, _ in top]
+    print(f"Top 20 produk sama: {'ya' if sama else 'tidak'}")
+
+
+if __name__ == "__main__":
+    main()
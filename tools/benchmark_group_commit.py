@@ -0,0 +1,106 @@
+"""Benchmark checkout SQLite: commit per request vs group commit.
+
+Menjalankan banyak kasir (thread) yang checkout bersamaan ke database SQLite
+sementara, lalu membandingkan penjualan per detik dan latency p50/p99.
+
+Cara pakai:
+    python tools/benchmark_group_commit.py
+    python tools/benchmark_group_commit.py --kasir 32 --checkout 100 --window-ms 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+DB_FILE = Path(tempfile.mkdtemp()) / "kasir_benchmark.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+# Log per checkout dimatikan supaya yang diukur hanya database
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, str(APP_DIR))
+
+import app_simple  # noqa: E402
+from app_simple import app, db, Produk  # noqa: E402
+from group_commit import GroupCommitWriter  # noqa: E402
+
+
+def persentil(data, p):
+    data = sorted(data)
+    return data[min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))]
+
+
+def kasir_worker(produk_ids, jumlah, latency, gagal, seed):
+    with app.test_client() as client:
+        client.post("/login", data={"username": "admin", "password": "Admin123"})
+        for n in range(jumlah):
+            items = [{"id": produk_ids[(seed * 7 + n + k) % len(produk_ids)], "quantity": 1} for k in range(3)]
+            mulai = time.perf_counter()
+            data = client.post("/transaksi/checkout", json={
+                "items": items, "total": 0, "bayar": 10_000_000, "payment_method": "tunai"
+            }).get_json()
+            latency.append(time.perf_counter() - mulai)
+            if not data["success"]:
+                gagal.append(data["message"])
+
+
+def jalankan(nama, writer, args, produk_ids):
+    app_simple.checkout_writer = writer
+    latency, gagal = [], []
+    threads = [
+        threading.Thread(target=kasir_worker, args=(produk_ids, args.checkout, latency, gagal, seed))
+        for seed in range(args.kasir)
+    ]
+    mulai = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    durasi = time.perf_counter() - mulai
+
+    sukses = len(latency) - len(gagal)
+    print(f"{nama:<18} {sukses / durasi:>10.1f} {persentil(latency, 50) * 1000:>9.1f} "
+          f"{persentil(latency, 99) * 1000:>9.1f} {len(gagal):>6}")
+    if writer is not None:
+        rata = writer.stats["item"] / max(writer.stats["batch"], 1)
+        print(f"{'':<18} batch: {writer.stats['batch']} | rata-rata {rata:.1f} | terbesar {writer.stats['max_batch']}")
+    if gagal:
+        print(f"{'':<18} contoh gagal: {gagal[0]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kasir", type=int, default=16, help="jumlah kasir bersamaan (thread)")
+    parser.add_argument("--checkout", type=int, default=50, help="checkout per kasir")
+    parser.add_argument("--window-ms", type=float, default=5, help="jendela group commit (ms)")
+    args = parser.parse_args()
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.app_context():
+        db.session.query(Produk).update({Produk.stok: 10_000_000})
+        db.session.commit()
+        produk_ids = [p.id for p in Produk.query.order_by(Produk.id).limit(100)]
+        journal = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+
+    print(f"Database: {DB_FILE} (journal_mode={journal})")
+    print(f"{args.kasir} kasir x {args.checkout} checkout, 3 item per penjualan\n")
+    print(f"{'mode':<18} {'penjualan/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'gagal':>6}")
+
+    writer = GroupCommitWriter(
+        app_simple._proses_batch_checkout,
+        window=args.window_ms / 1000,
+        max_batch=app_simple.GROUP_COMMIT_MAX_BATCH,
+    )
+    # Pemanasan: cache harga & blok nomor transaksi
+    jalankan("pemanasan", None, argparse.Namespace(kasir=2, checkout=5), produk_ids)
+    jalankan("commit per request", None, args, produk_ids)
+    jalankan("group commit", writer, args, produk_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark harga massal: pratinjau & penerapan untuk N produk sekaligus.
+
+Memakai data sintetis benchmark_pencarian.py (ditambah satu tier harga per
+lima produk), lalu mengukur waktu dan jumlah statement untuk aturan +10%
+kelipatan 500 ke seluruh katalog dan untuk daftar harga supplier (CSV).
+
+Cara pakai:
+    python tools/benchmark_harga_massal.py
+    python tools/benchmark_harga_massal.py --produk 50000
+"""
+
+import argparse
+import io
+import time
+
+from benchmark_pencarian import app, db, isi_produk  # noqa: E402  (menyiapkan database sementara)
+from app_simple import (AturanHarga, HargaVariasi, PenghitungStatement, Produk, baca_daftar_harga,  # noqa: E402
+                        rencana_harga_massal, terapkan_harga_massal)
+
+
+def ukur(nama, aturan, daftar=None):
+    with PenghitungStatement() as penghitung:
+        mulai = time.perf_counter()
+        hasil = rencana_harga_massal(aturan, daftar=daftar)
+        pratinjau = time.perf_counter() - mulai
+        terapkan_harga_massal(hasil["perubahan"], "massal", aturan.keterangan())
+        db.session.commit()
+        total = time.perf_counter() - mulai
+    print(f"{nama:<22} {len(hasil['perubahan']):>8} {pratinjau * 1000:>13.0f} {(total - pratinjau) * 1000:>12.0f} "
+          f"{penghitung.jumlah:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=10_000, help="jumlah produk")
+    args = parser.parse_args()
+
+    isi_produk(args.produk)
+    with app.app_context():
+        ids = db.session.execute(db.select(Produk.id, Produk.kode).order_by(Produk.id)).all()
+        db.session.execute(db.insert(HargaVariasi), [
+            {"produk_id": pid, "min_qty": 12, "harga": 1400, "keterangan": "Grosir"} for pid, _ in ids[::5]
+        ])
+        db.session.commit()
+
+        print(f"Produk: {args.produk}\n")
+        print(f"{'aturan':<22} {'berubah':>8} {'pratinjau ms':>13} {'terapkan ms':>12} {'statement':>10}")
+        ukur("+10% kelipatan 500", AturanHarga("persen", 10, 500, "atas"))
+        csv = "kode,harga_beli\n" + "".join(f"{kode},{1100 + n % 7}\n" for n, (_, kode) in enumerate(ids))
+        mulai = time.perf_counter()
+        daftar = baca_daftar_harga(io.BytesIO(csv.encode()), "supplier.csv")
+        print(f"{'(baca CSV supplier)':<22} {len(daftar):>8} {(time.perf_counter() - mulai) * 1000:>13.0f}")
+        ukur("supplier + margin 25%", AturanHarga("margin", 25, 100), daftar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark import/ekspor produk: waktu & puncak memori Python untuk N baris.
+
+Membuat file XLSX dan CSV sintetis berisi N produk (sebagian dengan tier
+harga), mengimpornya ke database SQLite sementara (semua baru), mengimpor
+ulang (semua update), lalu mengekspor kembali. Dengan --memori, puncak
+alokasi Python (termasuk openpyxl) diukur dengan tracemalloc; ini membuat
+waktu beberapa kali lebih lambat, jadi ukur waktu tanpa opsi itu.
+
+Cara pakai:
+    python tools/benchmark_impor_produk.py
+    python tools/benchmark_impor_produk.py --produk 50000 --memori
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+TMP_DIR = Path(tempfile.mkdtemp())
+DB_FILE = TMP_DIR / "kasir_benchmark.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, str(APP_DIR))
+
+from app_simple import app, db, Produk, impor_produk, _baris_ekspor_produk  # noqa: E402
+from product_io import tulis_csv, tulis_xlsx  # noqa: E402
+
+
+def baris_sintetis(jumlah, harga_tambah=0):
+    for n in range(jumlah):
+        yield [f"899{n:010d}", f"Produk Benchmark {n}", f"Kategori {n % 20}", 1000 + n % 500,
+               1500 + n % 500 + harga_tambah, n % 100, 5, "pcs", "",
+               "12:1400:Grosir; 24:1300" if n % 4 == 0 else ""]
+
+
+def ukur(nama, fungsi, memori):
+    if memori:
+        tracemalloc.start()
+    mulai = time.perf_counter()
+    hasil = fungsi()
+    durasi = time.perf_counter() - mulai
+    puncak = "-"
+    if memori:
+        puncak = f"{tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f}"
+        tracemalloc.stop()
+    print(f"{nama:<24} {durasi:>9.2f} {puncak:>15}   {hasil}")
+
+
+def impor(path):
+    def jalankan():
+        with app.app_context(), open(path, "rb") as f:
+            hasil = impor_produk(f, path.name)
+            db.session.commit()
+            return f"{hasil['ditambah']} ditambah, {hasil['diperbarui']} diperbarui"
+    return jalankan
+
+
+def ekspor_csv():
+    with app.app_context():
+        return f"{sum(len(potong) for potong in tulis_csv(_baris_ekspor_produk())) / 1024 / 1024:.1f} MB"
+
+
+def ekspor_xlsx():
+    with app.app_context():
+        berkas = io.BytesIO()
+        tulis_xlsx(_baris_ekspor_produk(), berkas)
+        return f"{len(berkas.getvalue()) / 1024 / 1024:.1f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=20_000, help="jumlah baris")
+    parser.add_argument("--memori", action="store_true", help="ukur puncak memori (tracemalloc, lebih lambat)")
+    args = parser.parse_args()
+
+    xlsx, csv_baru = TMP_DIR / "produk.xlsx", TMP_DIR / "produk.csv"
+    tulis_xlsx(baris_sintetis(args.produk), str(xlsx))
+    with open(csv_baru, "w", encoding="utf-8", newline="") as f:
+        f.writelines(tulis_csv(baris_sintetis(args.produk, harga_tambah=100)))
+    print(f"Baris: {args.produk} | XLSX {xlsx.stat().st_size / 1024 / 1024:.1f} MB, "
+          f"CSV {csv_baru.stat().st_size / 1024 / 1024:.1f} MB\n")
+    print(f"{'langkah':<24} {'detik':>9} {'puncak mem MB':>15}")
+    ukur("import XLSX (baru)", impor(xlsx), args.memori)
+    ukur("import CSV (update)", impor(csv_baru), args.memori)
+    ukur("ekspor CSV", ekspor_csv, args.memori)
+    ukur("ekspor XLSX", ekspor_xlsx, args.memori)
+    with app.app_context():
+        print(f"\nProduk di database: {db.session.query(Produk).count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark laporan penjualan: agregat SQL vs perulangan ORM per transaksi.
+
+Mengisi database sementara dengan penjualan sintetis satu tahun (N transaksi
+per hari, 1-4 item per transaksi, produk dari benchmark_pencarian.py),
+membangun rekap harian dari transaksi itu (waktunya dicetak), lalu mengukur
+hitung_laporan() untuk periode satu minggu, satu bulan dan satu tahun:
+latency rata-rata dan jumlah statement. Sebagai pembanding,
+perhitungan lama (muat semua transaksi, jumlahkan item di Python) diukur
+untuk minggu dan bulan; untuk setahun hanya dengan --lama-setahun karena
+butuh waktu lama.
+
+Cara pakai:
+    python tools/benchmark_laporan.py
+    python tools/benchmark_laporan.py --per-hari 500 --lama-setahun
+"""
+
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from benchmark_pencarian import app, db, isi_produk  # noqa: E402  (menyiapkan database sementara)
+from app_simple import (PenghitungStatement, Produk, Transaksi, TransaksiItem, bangun_ulang_rekap,  # noqa: E402
+                        hitung_laporan)
+
+METODE = ["tunai", "tunai", "tunai", "qris", "ewallet", "debit"]
+PERIODE = [("1 minggu", 7), ("1 bulan", 30), ("1 tahun", 365)]
+
+
+def isi_penjualan(per_hari, hari):
+    rng = random.Random(2)
+    with app.app_context():
+        produk = db.session.execute(db.select(Produk.id, Produk.harga_jual)).all()
+        awal = datetime.combine(date.today() - timedelta(days=hari - 1), datetime.min.time())
+        transaksi_id = 0
+        for h in range(hari):
+            transaksi, items = [], []
+            for n in range(per_hari):
+                transaksi_id += 1
+                total = 0
+                for _ in range(rng.randint(1, 4)):
+                    produk_id, harga = rng.choice(produk)
+                    jumlah = rng.randint(1, 5)
+                    items.append({"transaksi_id": transaksi_id, "produk_id": produk_id, "jumlah": jumlah,
+                                  "harga": harga, "subtotal": harga * jumlah})
+                    total += harga * jumlah
+                transaksi.append({"id": transaksi_id, "kode_transaksi": f"TRX-{transaksi_id:08d}",
+                                  "tanggal": awal + timedelta(days=h, seconds=rng.randint(7 * 3600, 22 * 3600)),
+                                  "subtotal": total, "total": total, "bayar": total, "kembalian": 0,
+                                  "payment_method": rng.choice(METODE), "user_id": 1})
+            db.session.execute(db.insert(Transaksi), transaksi)
+            db.session.execute(db.insert(TransaksiItem), items)
+        db.session.commit()
+        return transaksi_id, db.session.query(TransaksiItem).count()
+
+
+def laporan_lama(mulai, selesai):
+    """Perhitungan sebelum agregat SQL: satu lazy load item per transaksi"""
+    transaksi_list = Transaksi.query.filter(
+        db.func.date(Transaksi.tanggal) >= mulai,
+        db.func.date(Transaksi.tanggal) <= selesai
+    ).order_by(Transaksi.tanggal).all()
+    keuntungan = 0
+    harian = defaultdict(float)
+    metode = defaultdict(int)
+    produk = Counter()
+    for t in transaksi_list:
+        harian[t.tanggal.strftime("%Y-%m-%d")] += t.total
+        metode[t.payment_method or "tunai"] += 1
+        for item in t.items:
+            keuntungan += (item.harga - (item.produk.harga_beli if item.produk else 0)) * item.jumlah
+            produk[item.produk.nama] += item.subtotal
+    return sum(t.total for t in transaksi_list), keuntungan, produk.most_common(5)
+
+
+def ukur(fungsi, mulai, selesai, ulang):
+    durasi = []
+    for _ in range(ulang):
+        with app.app_context(), PenghitungStatement() as penghitung:
+            awal = time.perf_counter()
+            fungsi(mulai, selesai)
+            durasi.append(time.perf_counter() - awal)
+    return sum(durasi) / len(durasi) * 1000, penghitung.jumlah
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-hari", type=int, default=200, help="transaksi per hari")
+    parser.add_argument("--produk", type=int, default=2_000, help="jumlah produk")
+    parser.add_argument("--ulang", type=int, default=5, help="pengulangan per periode (agregat SQL)")
+    parser.add_argument("--lama-setahun", action="store_true", help="ukur juga perhitungan lama untuk setahun")
+    args = parser.parse_args()
+
+    isi_produk(args.produk)
+    mulai = time.perf_counter()
+    transaksi, items = isi_penjualan(args.per_hari, 365)
+    print(f"Data: {transaksi} transaksi, {items} item, {args.produk} produk "
+          f"(disiapkan {time.perf_counter() - mulai:.1f} detik)")
+    with app.app_context():
+        mulai = time.perf_counter()
+        rekap = bangun_ulang_rekap()
+        db.session.commit()
+        print(f"Rekap harian dibangun ulang dalam {time.perf_counter() - mulai:.1f} detik: {rekap}\n")
+
+    print(f"{'periode':<10} {'SQL ms':>9} {'stmt':>6} {'ORM lama ms':>12} {'stmt':>7}")
+    hari_ini = date.today()
+    for nama, hari in PERIODE:
+        awal = hari_ini - timedelta(days=hari - 1)
+        sql_ms, sql_stmt = ukur(hitung_laporan, awal, hari_ini, args.ulang)
+        lama = "-", "-"
+        if hari < 365 or args.lama_setahun:
+            lama_ms, lama_stmt = ukur(laporan_lama, awal, hari_ini, 1)
+            lama = f"{lama_ms:.0f}", lama_stmt
+        print(f"{nama:<10} {sql_ms:>9.1f} {sql_stmt:>6} {lama[0]:>12} {lama[1]:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark pencarian produk: index teks (FTS5/tsvector) vs ILIKE '%q%'.
+
+Membuat database SQLite sementara berisi N produk dengan nama mirip data
+toko (merek + jenis + varian + ukuran), lalu mengukur latency p50/p99
+untuk sekumpulan query ketikan kasir.
+
+Cara pakai:
+    python tools/benchmark_pencarian.py
+    python tools/benchmark_pencarian.py --produk 100000 --ulang 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+DB_FILE = Path(tempfile.mkdtemp()) / "kasir_benchmark.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, str(APP_DIR))
+
+from app_simple import app, db, Produk, cari_ids, pencarian  # noqa: E402
+from search_index import teks_cari_produk  # noqa: E402
+from sqlalchemy import or_  # noqa: E402
+
+MEREK = ["Indomie", "Sedaap", "Sarimi", "Aqua", "Le Minerale", "Bimoli", "Filma", "Gulaku", "Rose Brand",
+         "Sunlight", "Rinso", "Lifebuoy", "Pepsodent", "Teh Pucuk", "Sosro", "Kapal Api", "ABC", "Indomilk",
+         "Frisian Flag", "Dancow", "Chitato", "Qtela", "Roma", "Khong Guan", "Sania", "Tropical", "Djarum"]
+JENIS = ["Mie Goreng", "Mie Kuah", "Air Mineral", "Minyak Goreng", "Gula Pasir", "Sabun Cuci", "Sabun Mandi",
+         "Pasta Gigi", "Teh Botol", "Kopi Bubuk", "Susu Kental Manis", "Susu Bubuk", "Keripik Kentang",
+         "Biskuit Kelapa", "Wafer Coklat", "Kecap Manis", "Saus Sambal", "Deterjen Bubuk", "Beras Premium"]
+VARIAN = ["Original", "Ayam Bawang", "Soto", "Pedas", "Jeruk Nipis", "Lemon", "Vanila", "Coklat", "Keju",
+          "Rendang", "Extra", "Gold", "Refill", "Pouch", "Sachet", ""]
+UKURAN = ["85gr", "250ml", "600ml", "1L", "2L", "1Kg", "5kg", "500gr", "50 gr", "1 Ltr", "10 sct", "1 Krt"]
+
+QUERY = ["indomie", "mie goreng", "indo gor ayam", "minyak 2 liter", "gula 1kg", "aqua 600", "susu coklat",
+         "sabun cuci lemon", "kopi", "keripik kent", "teh botol sosro", "beras 5 kilo"]
+
+
+def persentil(data, p):
+    data = sorted(data)
+    return data[min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))]
+
+
+def isi_produk(jumlah):
+    rng = random.Random(1)
+    baris = []
+    for n in range(jumlah):
+        nama = " ".join(filter(None, [rng.choice(MEREK), rng.choice(JENIS), rng.choice(VARIAN), rng.choice(UKURAN)]))
+        kode = f"899{n:010d}"
+        baris.append({"kode": kode, "nama": nama, "harga_beli": 1000, "harga_jual": 1500, "stok": n % 50,
+                      "satuan": "pcs", "versi": 0, "cari": teks_cari_produk(nama, kode)})
+    with app.app_context():
+        db.session.execute(db.insert(Produk), baris)
+        db.session.commit()
+
+
+def cari_ilike(search, limit):
+    # Query lama /api/produk: ILIKE pada nama & kode, tanpa urutan relevansi
+    return [p.id for p in Produk.query.filter(Produk.stok > 0).filter(
+        or_(Produk.nama.ilike(f"%{search}%"), Produk.kode.ilike(f"%{search}%"))
+    ).limit(limit)]
+
+
+def ukur(nama, fungsi, ulang):
+    latency, hasil = [], {}
+    for _ in range(ulang):
+        for q in QUERY:
+            mulai = time.perf_counter()
+            hasil[q] = len(fungsi(q))
+            latency.append(time.perf_counter() - mulai)
+    print(f"{nama:<26} {persentil(latency, 50) * 1000:>9.2f} {persentil(latency, 99) * 1000:>9.2f}")
+    return hasil
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=50_000, help="jumlah produk")
+    parser.add_argument("--ulang", type=int, default=10, help="pengulangan setiap query")
+    parser.add_argument("--limit", type=int, default=50, help="jumlah hasil per query (seperti /api/produk)")
+    args = parser.parse_args()
+
+    isi_produk(args.produk)
+    print(f"Produk: {args.produk} | backend: {pencarian.nama}\n")
+    print(f"{'jalur':<26} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    with app.app_context():
+        hasil_fts = ukur("index teks (cari_ids)", lambda q: cari_ids(Produk, q, Produk.stok > 0, limit=args.limit),
+                         args.ulang)
+        hasil_ilike = ukur("ILIKE '%q%'", lambda q: cari_ilike(q, args.limit), args.ulang)
+
+    print(f"\n{'query':<22} {'index':>6} {'ILIKE':>6}")
+    for q in QUERY:
+        print(f"{q:<22} {hasil_fts[q]:>6} {hasil_ilike[q]:>6}")
+
+
+if __name__ == "__main__":
+    main()
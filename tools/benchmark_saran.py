@@ -0,0 +1,53 @@
+"""Benchmark saran produk (index fuzzy di memori): waktu build & top-10 per query.
+
+Memakai data sintetis yang sama dengan benchmark_pencarian.py, lalu mengukur
+p50/p99 saran untuk query dengan salah ketik dan awal kata.
+
+Cara pakai:
+    python tools/benchmark_saran.py
+    python tools/benchmark_saran.py --produk 50000
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_pencarian import app, isi_produk, persentil  # noqa: E402  (menyiapkan database sementara)
+from app_simple import saran_index  # noqa: E402
+
+QUERY = ["indomi gorng", "minyk 2l", "gula pasr 1kg", "aqua 600", "sedap soto", "kapal api kopi bubk",
+         "susu kentl manis", "rinso deterjn", "chitato kej", "teh pucuk", "frisian flg coklat", "ind", "m"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=20_000, help="jumlah produk")
+    parser.add_argument("--ulang", type=int, default=50, help="pengulangan setiap query")
+    args = parser.parse_args()
+
+    isi_produk(args.produk)
+    with app.app_context():
+        mulai = time.perf_counter()
+        saran_index.cari("x")
+        print(f"Produk: {args.produk} | build index: {(time.perf_counter() - mulai) * 1000:.0f} ms | "
+              f"{saran_index.ukuran()}\n")
+
+        print(f"{'query':<22} {'p50 (ms)':>9} {'p99 (ms)':>9} {'hasil':>6}")
+        semua = []
+        query = QUERY * args.ulang
+        random.Random(1).shuffle(query)
+        per_query = {q: [] for q in QUERY}
+        for q in query:
+            mulai = time.perf_counter()
+            hasil = saran_index.cari(q, limit=10)
+            per_query[q].append(time.perf_counter() - mulai)
+        for q in QUERY:
+            latency = per_query[q]
+            semua += latency
+            print(f"{q:<22} {persentil(latency, 50) * 1000:>9.2f} {persentil(latency, 99) * 1000:>9.2f} "
+                  f"{len(saran_index.cari(q, limit=10)):>6}")
+        print(f"\n{'semua query':<22} {persentil(semua, 50) * 1000:>9.2f} {persentil(semua, 99) * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark scan barcode: /api/scan (index di memori) vs /api/produk?search= (ILIKE).
+
+Membuat database SQLite sementara berisi N produk, lalu mengukur latency
+p50/p99 per scan untuk kode acak, termasuk barcode timbangan.
+
+Cara pakai:
+    python tools/benchmark_scan.py
+    python tools/benchmark_scan.py --produk 10000 --scan 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+DB_FILE = Path(tempfile.mkdtemp()) / "kasir_benchmark.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, str(APP_DIR))
+
+from app_simple import app, db, login_required, Produk, HargaVariasi, barcode_index, scan_barcode  # noqa: E402
+
+
+@app.route("/_benchmark/kosong")
+@login_required
+def kosong():
+    # Baseline: biaya request + login tanpa pekerjaan apa pun
+    return {"success": True}
+
+
+def persentil(data, p):
+    data = sorted(data)
+    return data[min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))]
+
+
+def ean13(dua_belas_digit):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(dua_belas_digit))
+    return dua_belas_digit + str((10 - total % 10) % 10)
+
+
+def isi_produk(jumlah):
+    with app.app_context():
+        mulai = db.session.query(db.func.max(Produk.id)).scalar() or 0
+        db.session.execute(db.insert(Produk), [
+            {
+                "kode": f"899{n:010d}",
+                "nama": f"Produk Benchmark {n}",
+                "harga_beli": 1000,
+                "harga_jual": 1500 + n % 100,
+                "stok": 100,
+                "satuan": "pcs",
+                "versi": 0,
+            }
+            for n in range(jumlah)
+        ])
+        # Satu dari sepuluh produk punya harga grosir; 100 produk timbangan
+        db.session.execute(db.insert(HargaVariasi), [
+            {"produk_id": mulai + n + 1, "min_qty": 12, "harga": 1200} for n in range(0, jumlah, 10)
+        ])
+        db.session.execute(db.insert(Produk), [
+            {"kode": f"20{n:05d}", "nama": f"Timbang {n}", "harga_beli": 50, "harga_jual": 80,
+             "stok": 10_000, "satuan": "gram", "versi": 0}
+            for n in range(100)
+        ])
+        db.session.commit()
+        return [kode for (kode,) in db.session.execute(db.select(Produk.kode))]
+
+
+def ukur(nama, fungsi, kode_list):
+    latency = []
+    for kode in kode_list:
+        mulai = time.perf_counter()
+        fungsi(kode)
+        latency.append(time.perf_counter() - mulai)
+    print(f"{nama:<28} {persentil(latency, 50) * 1000:>9.3f} {persentil(latency, 99) * 1000:>9.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=10_000, help="jumlah produk")
+    parser.add_argument("--scan", type=int, default=2_000, help="jumlah scan yang diukur")
+    args = parser.parse_args()
+
+    semua_kode = isi_produk(args.produk)
+    rng = random.Random(1)
+    kode_list = [rng.choice(semua_kode) for _ in range(args.scan)]
+    kode_list += [ean13(f"20{rng.randrange(100):05d}{rng.randrange(1, 2000):05d}") for _ in range(args.scan // 10)]
+    rng.shuffle(kode_list)
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.test_client() as client:
+        client.post("/login", data={"username": "admin", "password": "Admin123"})
+        with app.app_context():
+            mulai = time.perf_counter()
+            scan_barcode(kode_list[0])
+            print(f"Produk: {len(semua_kode)} | build index: {(time.perf_counter() - mulai) * 1000:.0f} ms "
+                  f"({len(barcode_index)} kode)\n")
+
+        print(f"{'jalur':<28} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        with app.app_context():
+            ukur("scan_barcode() langsung", scan_barcode, kode_list)
+
+        def lewat_http(kode):
+            assert client.get("/api/scan", query_string={"kode": kode}).status_code == 200
+
+        def lewat_ilike(kode):
+            client.get("/api/produk", query_string={"search": kode})
+
+        ukur("GET route kosong (baseline)", lambda kode: client.get("/_benchmark/kosong"), kode_list)
+        ukur("GET /api/scan", lewat_http, kode_list)
+        ukur("GET /api/produk?search=", lewat_ilike, kode_list[:200])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark memori katalog per worker: index dict per proses vs snapshot mmap bersama.
+
+Membuat database SQLite sementara berisi N produk, lalu menjalankan W proses
+"worker" sekaligus untuk setiap mode. Setiap worker memuat katalog dan
+melakukan lookup semua kode; yang diukur adalah memori anonim (heap) yang
+bertambah per worker, serta Pss file snapshot (halaman yang dibagi).
+Hanya Linux (/proc/self/smaps_rollup).
+
+Cara pakai:
+    python tools/benchmark_snapshot.py
+    python tools/benchmark_snapshot.py --produk 100000 --worker 8
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+TMP_DIR = Path(tempfile.mkdtemp())
+DB_FILE = TMP_DIR / "kasir_benchmark.db"
+SNAPSHOT_FILE = TMP_DIR / "katalog.snap"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+WORKER = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+
+def memori():
+    nilai = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for baris in f:
+            kolom = baris.split()
+            if len(kolom) >= 2 and kolom[1].isdigit():
+                nilai[kolom[0].rstrip(':')] = int(kolom[1])
+    return nilai
+
+from app_simple import app, db, Produk, barcode_index, katalog_snapshot, scan_barcode
+with app.app_context():
+    kode_list = [k for (k,) in db.session.execute(db.select(Produk.kode))]
+    awal = memori()
+    mulai = time.perf_counter()
+    for kode in kode_list:
+        assert scan_barcode(kode)
+    durasi = time.perf_counter() - mulai
+    akhir = memori()
+    print('HASIL', akhir['Anonymous'] - awal['Anonymous'], akhir['Pss_File'] - awal['Pss_File'],
+          round(durasi / len(kode_list) * 1e6, 1), flush=True)
+    sys.stdin.read()  # tetap hidup sampai semua worker selesai mengukur
+"""
+
+
+def isi_produk(jumlah):
+    sys.path.insert(0, str(APP_DIR))
+    from app_simple import app, db, Produk, HargaVariasi  # noqa: E402
+    from search_index import teks_cari_produk  # noqa: E402
+
+    with app.app_context():
+        # cari diisi di sini: worker tidak perlu mengisi ulang kolom pencarian saat startup
+        db.session.execute(db.insert(Produk), [
+            {"kode": f"899{n:010d}", "nama": f"Produk Benchmark Nomor {n}", "harga_beli": 1000,
+             "harga_jual": 1500 + n % 100, "stok": 100, "satuan": "pcs", "versi": 0,
+             "cari": teks_cari_produk(f"Produk Benchmark Nomor {n}", f"899{n:010d}")}
+            for n in range(jumlah)
+        ])
+        mulai = db.session.query(db.func.min(Produk.id)).scalar()
+        db.session.execute(db.insert(HargaVariasi), [
+            {"produk_id": mulai + n, "min_qty": 12, "harga": 1200, "keterangan": "Grosir"}
+            for n in range(0, jumlah, 5)
+        ])
+        db.session.commit()
+
+
+def baca_hasil(proses):
+    # stdout juga berisi log aplikasi; hasil ada di baris berawalan HASIL
+    for baris in proses.stdout:
+        if baris.startswith("HASIL"):
+            return tuple(float(x) for x in baris.split()[1:])
+    raise RuntimeError("worker berhenti tanpa hasil")
+
+
+def jalankan(mode, jumlah_worker):
+    env = dict(os.environ)
+    if mode == "snapshot":
+        env["KATALOG_SNAPSHOT_PATH"] = str(SNAPSHOT_FILE)
+    else:
+        env.pop("KATALOG_SNAPSHOT_PATH", None)
+    skrip = WORKER.format(app_dir=str(APP_DIR))
+    proses = [
+        subprocess.Popen([sys.executable, "-c", skrip], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         text=True, env=env)
+        for _ in range(jumlah_worker)
+    ]
+    hasil = [baca_hasil(p) for p in proses]
+    for p in proses:
+        p.communicate("")
+    anon = [h[0] for h in hasil]
+    pss = [h[1] for h in hasil]
+    lookup = [h[2] for h in hasil]
+    print(f"{mode:<10} {sum(anon) / len(anon) / 1024:>14.1f} {sum(anon) / 1024:>12.1f} "
+          f"{sum(pss) / 1024:>14.1f} {sum(lookup) / len(lookup):>11.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produk", type=int, default=50_000, help="jumlah produk")
+    parser.add_argument("--worker", type=int, default=4, help="jumlah proses worker")
+    args = parser.parse_args()
+
+    mulai = time.perf_counter()
+    isi_produk(args.produk)
+    print(f"Produk: {args.produk} | worker: {args.worker} | isi data {time.perf_counter() - mulai:.1f} s\n")
+    print(f"{'mode':<10} {'heap/worker MB':>14} {'heap total MB':>12} {'file Pss total':>14} {'lookup us':>11}")
+    jalankan("dict", args.worker)
+    jalankan("snapshot", args.worker)
+    print(f"\nUkuran file snapshot: {SNAPSHOT_FILE.stat().st_size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
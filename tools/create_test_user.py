@@ -5,8 +5,11 @@ sys.path.insert(0, 'd:\\python')
 os.chdir('d:\\python')
 
 from app_simple import app, db, User
+from structured_log import get_logger
 from werkzeug.security import generate_password_hash
 
+log = get_logger('tools.create_test_user')
+
 with app.app_context():
     # Check if admin user exists
     admin = User.query.filter_by(username='admin').first()
@@ -19,9 +22,9 @@ with app.app_context():
         )
         db.session.add(admin)
         db.session.commit()
-        print("✓ Admin user created (username: admin, password: Admin@123)")
+        log.info('User test dibuat', extra={'username': 'admin', 'role': 'admin'})
     else:
-        print("✓ Admin user already exists")
+        log.info('User test sudah ada', extra={'username': 'admin'})
     
     # Check if cashier user exists
     kasir = User.query.filter_by(username='kasir').first()
@@ -34,6 +37,6 @@ with app.app_context():
         )
         db.session.add(kasir)
         db.session.commit()
-        print("✓ Kasir user created (username: kasir, password: Kasir@123)")
+        log.info('User test dibuat', extra={'username': 'kasir', 'role': 'kasir'})
     else:
-        print("✓ Kasir user already exists")
+        log.info('User test sudah ada', extra={'username': 'kasir'})
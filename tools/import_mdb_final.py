@@ -11,6 +11,13 @@ import json
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+# Logger teks di terminal (LOG_FORMAT=json untuk dibaca mesin); harus sebelum
+# import aplikasi supaya format ini yang dipakai
+from structured_log import setup_logging, get_logger
+setup_logging(fmt=os.getenv('LOG_FORMAT') or 'text')
+log = get_logger('tools.import_mdb')
 
 from app.app_simple import db, app, Produk
 
@@ -76,7 +83,7 @@ catch {{
     with open(ps_file, 'w', encoding='utf-8') as f:
         f.write(ps_script)
     
-    print(f"\n🔧 Menjalankan PowerShell untuk extract MDB...")
+    log.info('Menjalankan PowerShell untuk extract MDB')
     
     try:
         # Jalankan PowerShell
@@ -92,14 +99,14 @@ catch {{
             print(result.stderr)
         
         if result.returncode == 0 and os.path.exists(csv_output):
-            print(f"\n✅ File CSV berhasil dibuat: {csv_output}")
+            log.info('File CSV berhasil dibuat', extra={'file': csv_output})
             return csv_output
         else:
-            print(f"⚠️  Export gagal, coba metode alternatif...")
+            log.warning('Export MDB gagal', extra={'returncode': result.returncode})
             return None
     
     except Exception as e:
-        print(f"❌ Error menjalankan PowerShell: {e}")
+        log.exception('Error menjalankan PowerShell')
         return None
     finally:
         # Cleanup PS file
@@ -110,10 +117,10 @@ def import_csv_to_db(csv_file):
     """Import CSV ke SQLite"""
     
     if not os.path.exists(csv_file):
-        print(f"❌ File CSV tidak ditemukan: {csv_file}")
+        log.error('File CSV tidak ditemukan', extra={'file': csv_file})
         return
     
-    print(f"\n📂 Membaca file CSV: {csv_file}")
+    log.info('Membaca file CSV', extra={'file': csv_file})
     
     import csv
     
@@ -122,7 +129,7 @@ def import_csv_to_db(csv_file):
             reader = csv.DictReader(f)
             rows = list(reader)
         
-        print(f"✅ Ditemukan {len(rows)} baris")
+        log.info('CSV dibaca', extra={'baris': len(rows)})
         
         if rows:
             print(f"📋 Kolom: {list(rows[0].keys())}")
@@ -131,7 +138,7 @@ def import_csv_to_db(csv_file):
                 print(f"   {i}. {row}")
         
         # Import ke database
-        print(f"\n🔄 Mengimport ke database SQLite...")
+        log.info('Mengimport ke database')
         
         with app.app_context():
             imported = 0
@@ -176,25 +183,19 @@ def import_csv_to_db(csv_file):
                     imported += 1
                     
                     if (idx + 1) % 20 == 0:
-                        print(f"   ✅ Diproses {idx + 1}...")
+                        log.debug('Progres import', extra={'diproses': idx + 1})
                 
                 except Exception as e:
                     error += 1
-                    print(f"   ❌ Baris {idx}: {e}")
+                    log.warning('Baris %s gagal: %s', idx, e)
             
             db.session.commit()
-            print(f"\n" + "=" * 70)
-            print(f"✅ IMPORT SELESAI!")
-            print(f"   - Produk diimport: {imported}")
-            print(f"   - Duplikat (skip): {duplicate}")
-            print(f"   - Error: {error}")
-            print(f"   - Total diproses: {len(rows)}")
-            print("=" * 70)
+            log.info('Import selesai', extra={
+                'diimport': imported, 'duplikat': duplicate, 'error': error, 'total': len(rows),
+            })
     
     except Exception as e:
-        print(f"❌ Error membaca CSV: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Error membaca CSV')
     finally:
         # Cleanup
         if os.path.exists(csv_file):
@@ -208,8 +209,7 @@ def main():
         # Step 2: Import CSV ke database
         import_csv_to_db(csv_file)
     else:
-        print("\n❌ Tidak bisa extract MDB ke CSV")
-        print("   Pastikan Microsoft Access atau LibreOffice terinstall")
+        log.error('Tidak bisa extract MDB ke CSV, pastikan Microsoft Access atau LibreOffice terinstall')
 
 if __name__ == '__main__':
     main()
@@ -13,6 +13,13 @@ from pathlib import Path
 from io import StringIO
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+# Logger teks di terminal (LOG_FORMAT=json untuk dibaca mesin); harus sebelum
+# import aplikasi supaya format ini yang dipakai
+from structured_log import setup_logging, get_logger
+setup_logging(fmt=os.getenv('LOG_FORMAT') or 'text')
+log = get_logger('tools.import_sql')
 
 from app.app_simple import db, app, Produk
 
@@ -101,17 +108,15 @@ def migrate_with_better_parsing():
     print("IMPORT PRODUK DARI SQL (IMPROVED PARSING)")
     print("=" * 70)
     
-    print(f"\n📂 Membaca file SQL: {MDB_FILE}")
+    log.info('Membaca file SQL', extra={'file': MDB_FILE})
     
     try:
         # Extract rows
-        print("\n🔍 Extracting rows dari SQL...")
         rows = extract_sql_rows()
-        print(f"✅ Ditemukan {len(rows)} rows")
+        log.info('Rows SQL ditemukan', extra={'rows': len(rows)})
         
         # Parse to products
         products = []
-        print(f"\n📦 Parsing data...")
         
         for idx, row_str in enumerate(rows):
             try:
@@ -164,12 +169,12 @@ def migrate_with_better_parsing():
                 })
                 
                 if (idx + 1) % 100 == 0:
-                    print(f"   ✅ Processed {idx + 1}...")
+                    log.debug('Progres parsing', extra={'diproses': idx + 1})
             
             except Exception as e:
                 pass
         
-        print(f"\n✅ Total products parsed: {len(products)}")
+        log.info('Parsing selesai', extra={'produk': len(products)})
         
         if products:
             print(f"\n📦 Preview (5 products):")
@@ -177,7 +182,7 @@ def migrate_with_better_parsing():
                 print(f"   {i}. {p['kode']:20} | {p['nama'][:30]:30} | {p['satuan']:8} | Rp {p['harga_jual']:,.0f}")
         
         # Import ke DB
-        print(f"\n🔄 Importing ke database...")
+        log.info('Mengimport ke database')
         
         with app.app_context():
             imported = 0
@@ -202,24 +207,19 @@ def migrate_with_better_parsing():
                     imported += 1
                     
                     if (imported + duplicate) % 50 == 0:
-                        print(f"   ✅ Imported {imported}...")
+                        log.debug('Progres import', extra={'diimport': imported})
                 
                 except Exception as e:
-                    print(f"   ❌ Error: {e}")
+                    log.warning('Produk %s gagal: %s', prod['kode'], e)
             
             db.session.commit()
-            print(f"\n" + "=" * 70)
-            print(f"✅ IMPORT COMPLETED!")
-            print(f"   - Produk imported: {imported}")
-            print(f"   - Duplicates: {duplicate}")
-            print(f"   - Total: {len(products)}")
-            print(f"   - Total in DB: {Produk.query.count()}")
-            print("=" * 70)
+            log.info('Import selesai', extra={
+                'diimport': imported, 'duplikat': duplicate, 'total': len(products),
+                'total_db': Produk.query.count(),
+            })
     
     except Exception as e:
-        print(f"❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Import gagal')
 
 if __name__ == '__main__':
     migrate_with_better_parsing()
@@ -0,0 +1,48 @@
+"""Bangun ulang tabel rekap penjualan harian dari transaksi.
+
+Checkout memperbarui rekap di transaksi yang sama, jadi perintah ini hanya
+perlu setelah transaksi diubah atau dihapus langsung di database (koreksi
+manual, import data lama). Tanpa argumen semua hari dihitung ulang.
+
+Cara pakai:
+    python tools/rekap_ulang.py
+    python tools/rekap_ulang.py --mulai 2026-01-01 --selesai 2026-01-31
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+APP_DIR = BASE_DIR / "app"
+
+sys.path.insert(0, str(APP_DIR))
+
+from structured_log import setup_logging, get_logger  # noqa: E402
+
+setup_logging(fmt=os.getenv("LOG_FORMAT") or "text")
+log = get_logger("tools.rekap_ulang")
+
+from app_simple import app, db, bangun_ulang_rekap  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mulai", type=date.fromisoformat, help="tanggal awal (YYYY-MM-DD)")
+    parser.add_argument("--selesai", type=date.fromisoformat, help="tanggal akhir (YYYY-MM-DD), default = --mulai")
+    args = parser.parse_args()
+    if args.selesai and not args.mulai:
+        parser.error("--selesai butuh --mulai")
+
+    with app.app_context():
+        hasil = bangun_ulang_rekap(args.mulai, args.selesai)
+        db.session.commit()
+
+    log.info("Rekap harian dibangun ulang", extra={"mulai": str(args.mulai or "semua"),
+                                                   "selesai": str(args.selesai or args.mulai or "semua"), **hasil})
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Cara pakai:
 """
 
 from pathlib import Path
+import os
 import sys
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -12,7 +13,14 @@ APP_DIR = BASE_DIR / "app"
 
 sys.path.insert(0, str(APP_DIR))
 
-from app_simple import app, db, Member, Transaksi, TransaksiItem  # noqa: E402
+from structured_log import setup_logging, get_logger  # noqa: E402
+
+setup_logging(fmt=os.getenv("LOG_FORMAT") or "text")
+log = get_logger("tools.reset_transaksi")
+
+from app_simple import (  # noqa: E402
+    app, db, Member, Transaksi, TransaksiItem, bangun_ulang_rekap, _naikkan_versi_katalog_sql,
+)
 
 
 def main() -> None:
@@ -24,15 +32,19 @@ def main() -> None:
         return
 
     with app.app_context():
+        jumlah = db.session.query(Transaksi).count()
         db.session.query(TransaksiItem).delete(synchronize_session=False)
         db.session.query(Transaksi).delete(synchronize_session=False)
+        bangun_ulang_rekap()  # transaksi kosong: rekap ikut kosong
         db.session.query(Member).update(
             {Member.points: 0, Member.total_spent: 0},
             synchronize_session=False
         )
+        # Riwayat transaksi hilang: paksa klien katalog/grid memuat ulang penuh
+        _naikkan_versi_katalog_sql(db.session.connection())
         db.session.commit()
 
-    print("Selesai: transaksi dihapus, poin/total belanja member direset.")
+    log.warning("Transaksi dihapus, poin/total belanja member direset", extra={"transaksi": jumlah})
 
 
 if __name__ == "__main__":
@@ -10,6 +10,13 @@ import re
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+# Logger teks di terminal (LOG_FORMAT=json untuk dibaca mesin); harus sebelum
+# import aplikasi supaya format ini yang dipakai
+from structured_log import setup_logging, get_logger
+setup_logging(fmt=os.getenv('LOG_FORMAT') or 'text')
+log = get_logger('tools.update_harga_beli')
 
 from app.app_simple import db, app, Produk
 
@@ -65,7 +72,7 @@ def parse_sql_values(content):
     """Parse SQL VALUES dari file dengan regex"""
     match = re.search(r'VALUES\s*\((.*)\);', content, re.DOTALL)
     if not match:
-        print("❌ VALUES clause tidak ditemukan")
+        log.error('VALUES clause tidak ditemukan')
         return []
     
     values_content = match.group(1)
@@ -74,24 +81,23 @@ def parse_sql_values(content):
     return tuples
 
 def main():
-    print("📖 Reading SQL file...")
     try:
         with open(MDB_FILE, 'r', encoding='utf-8') as f:
             content = f.read()
     except Exception as e:
-        print(f"❌ Error reading file: {e}")
+        log.error('Gagal membaca file %s: %s', MDB_FILE, e)
         return
     
-    print(f"📊 File size: {len(content)} characters")
+    log.info('File dibaca', extra={'file': MDB_FILE, 'karakter': len(content)})
     
     # Parse VALUES
     tuples = parse_sql_values(content)
     
     if not tuples:
-        print("❌ Tidak ada data ditemukan")
+        log.error('Tidak ada data ditemukan')
         return
     
-    print(f"✅ Ditemukan {len(tuples)} tuples")
+    log.info('Tuple ditemukan', extra={'tuples': len(tuples)})
     
     # Mapping dari file:
     # Index 3: barcode
@@ -99,7 +105,7 @@ def main():
     # Index 20: hargabeli
     # Index 22: hpp (harga pokok penjualan)
     
-    print("\n💾 Updating harga_beli dari kolom hpp...")
+    log.info('Updating harga_beli dari kolom hpp')
     
     with app.app_context():
         updated = 0
@@ -130,21 +136,19 @@ def main():
                     updated += 1
                     
                     if (i + 1) % 50 == 0:
-                        print(f"  ✅ Updated {i + 1}/{len(tuples)}")
+                        log.debug('Progres update', extra={'diproses': i + 1, 'total': len(tuples)})
                 else:
                     # Produk tidak ada di database
                     failed += 1
                 
             except Exception as e:
-                print(f"  ❌ Tuple {i+1}: {str(e)[:60]}")
+                log.warning('Tuple %s gagal: %s', i + 1, str(e)[:60])
                 failed += 1
         
         # Commit
         try:
             db.session.commit()
-            print(f"\n✅ SUCCESS!")
-            print(f"   - Updated: {updated}")
-            print(f"   - Failed: {failed}")
+            log.info('Update harga_beli selesai', extra={'updated': updated, 'failed': failed})
             
             # Sample verification
             print(f"\n📊 Sample Updated Products:")
@@ -153,7 +157,7 @@ def main():
             
         except Exception as e:
             db.session.rollback()
-            print(f"❌ Commit failed: {e}")
+            log.exception('Commit gagal')
 
 if __name__ == '__main__':
     main()